@@ -2,21 +2,131 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.controllers.log_controller import log_handler
 from app.controllers.media_controller import media_handler
+from app.controllers.metrics_controller import metrics_handler
+from app.controllers.debug_controller import debug_handler
+from app.controllers.health_controller import health_handler
+from app.core import readiness
+from app.middleware.admission_middleware import AdmissionMiddleware
+from app.middleware.metrics_middleware import MetricsMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import os
+import tempfile
+
+
+_maintenance_lock = None
+
+
+def _lock_file(name: str, *, blocking: bool):
+    """
+    Exclusive lock on a file shared by the workers of this host. Returns the open file (the lock
+    is held until it is closed), None if `blocking` is False and another process holds it.
+    Without fcntl (Windows) nothing is locked.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return open(os.devnull, "a")
+    f = open(os.path.join(tempfile.gettempdir(), name), "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _is_maintenance_leader() -> bool:
+    """
+    With several workers (gunicorn), only the one holding an exclusive lock on a local file runs
+    the periodic DB maintenance. The lock is kept for the process lifetime; when that worker
+    exits, the next worker to try takes over.
+    """
+    global _maintenance_lock
+    if _maintenance_lock is None:
+        _maintenance_lock = _lock_file("deeptrust-log-maintenance.lock", blocking=False)
+    return _maintenance_lock is not None
+
+
+def _init_db_serialized() -> bool:
+    """`init_db` with the workers of this host taking turns: the first runs the DDL, the others find the schema current."""
+    from app.models.detection_log_model import init_db
+
+    with _lock_file("deeptrust-init-db.lock", blocking=True):
+        return init_db()
+
+
+async def _log_maintenance_loop(interval_s: float):
+    """Create upcoming DetectionLog partitions and apply retention periodically (see `detection_log_repository`)."""
+    from app.repository.detection_log_repository import run_maintenance
+
+    while True:
+        await asyncio.sleep(interval_s)
+        if not _is_maintenance_leader():
+            continue
+        try:
+            await asyncio.to_thread(run_maintenance)
+        except Exception as e:
+            print(f"DetectionLog maintenance warning: {e}")
+
+
+def _schema_is_current() -> bool:
+    from app.models.detection_log_model import SCHEMA_VERSION, stored_schema_version
+
+    return stored_schema_version() == SCHEMA_VERSION
+
+
+async def _init_db_in_background(retry_s: float, run_init: bool = True):
+    """
+    Run `init_db` off the event loop, retrying until it succeeds; `/ready` reports the outcome.
+    With `run_init` False (schema managed elsewhere) only wait until the database is reachable and
+    its schema version is current.
+    """
+    readiness.begin("database")
+    while True:
+        try:
+            if run_init:
+                ok = await asyncio.to_thread(_init_db_serialized)
+                error = None if ok else "database initialization failed"
+            else:
+                ok = await asyncio.to_thread(_schema_is_current)
+                error = None if ok else "database unreachable or schema not current"
+        except Exception as e:
+            ok, error = False, str(e)
+            print(f"Database initialization warning: {e}")
+        readiness.finish("database", ok=ok, error=error)
+        if ok or retry_s <= 0:
+            return
+        await asyncio.sleep(retry_s)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize database
-    try:
-        from app.models.detection_log_model import init_db
-        init_db()
-    except Exception as e:
-        print(f"Database initialization warning: {e}")
+    # Startup: Initialize database in the background, so the server starts accepting connections
+    # right away (each gunicorn worker does this; see `_init_db_serialized`).
+    init_task = asyncio.create_task(
+        _init_db_in_background(
+            float(os.getenv("INIT_DB_RETRY_S", "10")),
+            run_init=os.getenv("INIT_DB_ON_STARTUP", "true").lower() != "false",
+        )
+    )
+    maintenance_interval_s = float(os.getenv("LOG_MAINTENANCE_INTERVAL_S", "3600"))
+    maintenance = asyncio.create_task(_log_maintenance_loop(maintenance_interval_s)) if maintenance_interval_s > 0 else None
     yield
-    # Shutdown (if needed)
+    init_task.cancel()
+    if maintenance is not None:
+        maintenance.cancel()
+    # Shutdown: stop the segment-decoding worker processes (if any were started).
+    from app.services.segment_decoder import shutdown_pool
+    shutdown_pool()
 
 app = FastAPI(lifespan=lifespan)
 
+# Innermost: rejected media requests still get CORS headers and are counted by MetricsMiddleware.
+app.add_middleware(
+    AdmissionMiddleware,
+    unknown_length_bytes=int(os.getenv("ADMISSION_UNKNOWN_LENGTH_BYTES", str(32 * 1024 * 1024))),
+)
 # Configure CORS to allow all origins
 app.add_middleware(
     CORSMiddleware,
@@ -24,9 +134,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
+app.add_middleware(MetricsMiddleware)
 app.include_router(log_handler)
 app.include_router(media_handler)
+app.include_router(metrics_handler)
+app.include_router(debug_handler)
+app.include_router(health_handler)
 
 @app.get("/")
 def root():
@@ -0,0 +1,73 @@
+"""
+Regenerate the tiny ONNX test models shipped next to this script.
+
+They are *not* deepfake detectors: they exist so the onnx inference backend can be exercised
+offline (CI, benchmarks, local dev) with the same input/output contract as a real export.
+
+- tiny_image_classifier.onnx: pixel_values [N, 3, H, W] -> logits [N, 2] ("Deepfake", "Realism")
+  (global average pool over the image, then a fixed 3x2 linear layer)
+- tiny_audio_classifier.onnx: input_values [N, T] -> logits [N, 2] ("bonafide", "spoof")
+  (mean absolute amplitude, then a fixed 1x2 linear layer)
+
+Usage:
+    python app/assets/onnx/generate_tiny_models.py
+"""
+import os
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+OPSET = 13
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _image_model() -> onnx.ModelProto:
+    w = numpy_helper.from_array(np.array([[0.8, -0.8], [-0.5, 0.5], [0.3, -0.3]], dtype=np.float32), "W")
+    b = numpy_helper.from_array(np.array([0.0, 0.2], dtype=np.float32), "B")
+    nodes = [
+        helper.make_node("GlobalAveragePool", ["pixel_values"], ["pooled"]),
+        helper.make_node("Flatten", ["pooled"], ["features"], axis=1),
+        helper.make_node("MatMul", ["features", "W"], ["mm"]),
+        helper.make_node("Add", ["mm", "B"], ["logits"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "tiny_image_classifier",
+        [helper.make_tensor_value_info("pixel_values", TensorProto.FLOAT, ["batch", 3, "height", "width"])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", 2])],
+        initializer=[w, b],
+    )
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", OPSET)], producer_name="deeptrust")
+
+
+def _audio_model() -> onnx.ModelProto:
+    w = numpy_helper.from_array(np.array([[-4.0, 4.0]], dtype=np.float32), "W")
+    b = numpy_helper.from_array(np.array([0.5, -0.5], dtype=np.float32), "B")
+    nodes = [
+        helper.make_node("Abs", ["input_values"], ["magnitude"]),
+        helper.make_node("ReduceMean", ["magnitude"], ["energy"], axes=[1], keepdims=1),
+        helper.make_node("MatMul", ["energy", "W"], ["mm"]),
+        helper.make_node("Add", ["mm", "B"], ["logits"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "tiny_audio_classifier",
+        [helper.make_tensor_value_info("input_values", TensorProto.FLOAT, ["batch", "samples"])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", 2])],
+        initializer=[w, b],
+    )
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", OPSET)], producer_name="deeptrust")
+
+
+def main():
+    for name, model in (("tiny_image_classifier.onnx", _image_model()), ("tiny_audio_classifier.onnx", _audio_model())):
+        model.ir_version = 8  # loadable by onnxruntime >= 1.10
+        onnx.checker.check_model(model)
+        path = os.path.join(HERE, name)
+        onnx.save(model, path)
+        print(f"wrote {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Offline bulk analysis of media archives, straight from disk.
+
+Files go through the same pipelines and verdict rules as the HTTP endpoints, without the
+upload / multipart / base64 overhead:
+- video: decoding, frame sampling and face cropping (`VideoAnalyzer.prepare_frames`) run in a
+  pool of worker processes (one file per worker at a time); frame inference runs in threads of
+  this process, in the upstream scheduler's `bulk` lane (see `core.priority`). That scheduler is
+  this process's own, so the lane does not yield to the API server's interactive calls; bound
+  the run's upstream calls with UPSTREAM_MAX_CONCURRENT when it shares the upstream with the API;
+- audio: ffmpeg conversion (already a subprocess) and inference run in those same threads.
+
+Verdicts are written to `DetectionLog` (with raw scores, see `rescoring`) in batched inserts.
+Once a batch is committed, its files are appended to the checkpoint file (JSON lines: path,
+status, classification/score or error); rerunning with the same checkpoint skips every file it
+lists, so an interrupted run resumes where it stopped. A crash between the insert and the
+checkpoint write re-analyzes (and logs again) at most that one batch.
+
+Inputs: directories (walked recursively, by extension) and/or `--manifest` files with one path
+per line. The modality follows the extension unless `--modality` forces it.
+
+Settings (env): the usual pipeline settings apply. In the decode workers VIDEO_SEGMENT_WORKERS
+defaults to 0 (no nested segment processes): with `--coverage full` the parallelism comes from
+analyzing several files at once.
+
+Usage:
+    python -m app.cli.bulk_analyze /data/archive --checkpoint archive.jsonl
+    python -m app.cli.bulk_analyze --manifest files.txt --coverage full --workers 8 --concurrency 16
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+
+VIDEO_EXTENSIONS = {".mp4", ".m4v", ".mov", ".webm", ".mkv", ".avi", ".ogv"}
+AUDIO_EXTENSIONS = {".wav", ".flac", ".mp3", ".ogg", ".oga", ".opus", ".m4a", ".weba"}
+
+
+def iter_inputs(paths: list[str], manifests: list[str]):
+    """Absolute file paths: manifest entries as listed, directories walked in sorted order."""
+    for manifest in manifests:
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield os.path.abspath(line)
+    for path in paths:
+        if os.path.isfile(path):
+            yield os.path.abspath(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS | AUDIO_EXTENSIONS:
+                    yield os.path.abspath(os.path.join(root, name))
+
+
+def load_checkpoint(path: str, retry_failed: bool) -> set:
+    """Paths already handled by a previous run (failures excluded with `retry_failed`)."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash: that file is simply analyzed again.
+                continue
+            if retry_failed and entry.get("status") != "ok":
+                continue
+            done.add(entry["path"])
+    return done
+
+
+# ---- Decode workers (separate processes) ----
+
+_worker_analyzer = None
+
+
+def _init_decode_worker():
+    global _worker_analyzer
+    os.environ.setdefault("VIDEO_SEGMENT_WORKERS", "0")
+    from app.services.video_analyzer import VideoAnalyzer
+
+    _worker_analyzer = VideoAnalyzer(decode_only=True)
+
+
+def _decode_video(path: str, media_format: str, options: dict) -> dict:
+    from app.services.media_probe import probe_media
+
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        data = f.read()
+    container = probe_media(data, media_format) if options["coverage"] == "full" else None
+    prepared = _worker_analyzer.prepare_frames(
+        data,
+        filename=os.path.basename(path),
+        seconds=options["seconds"],
+        frames=options["frames"],
+        selection=options["selection"],
+        coverage=options["coverage"],
+        media_format=media_format,
+        container=container,
+    )
+    prepared["bytes"] = len(data)
+    prepared["decode_s"] = time.perf_counter() - t0
+    return prepared
+
+
+# ---- Analysis (threads of the main process) ----
+
+
+class BulkAnalyzer:
+    def __init__(self, *, workers: int, options: dict, modality: str = "auto"):
+        from app.services.audio_analyzer import AudioAnalyzer
+        from app.services.video_analyzer import VideoAnalyzer
+
+        self.options = options
+        self.modality = modality
+        self.video_analyzer = VideoAnalyzer()
+        self.audio_analyzer = AudioAnalyzer()
+        # spawn: worker processes must not inherit this process's threads and open connections.
+        self.decode_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_decode_worker,
+        )
+
+    def close(self):
+        self.decode_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _modality_of(self, path: str) -> str:
+        if self.modality != "auto":
+            return self.modality
+        return "audio" if os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS else "video"
+
+    def analyze_file(self, path: str) -> dict:
+        """Returns {"path", "status": "ok" | "error", "modality", ...}; "log" holds the DetectionLog row."""
+        from app.core.priority import lane_scope
+        from app.services.media_probe import AUDIO_FORMATS, VIDEO_FORMATS, sniff_media_format
+
+        modality = self._modality_of(path)
+        outcome = {"path": path, "modality": modality}
+        try:
+            with open(path, "rb") as f:
+                media_format = sniff_media_format(f.read(16))
+            allowed = AUDIO_FORMATS if modality == "audio" else VIDEO_FORMATS
+            if media_format not in allowed:
+                return {**outcome, "status": "error", "error": f"Unsupported media format: {media_format}"}
+            with lane_scope("bulk"):
+                if modality == "audio":
+                    outcome.update(self._analyze_audio(path, media_format))
+                else:
+                    outcome.update(self._analyze_video(path, media_format))
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            return {**outcome, "status": "error", "error": f"{type(e).__name__}: {e}"}
+        return outcome
+
+    def _analyze_video(self, path: str, media_format: str) -> dict:
+        from app.services.rescoring import video_log_fields
+        from app.services.scoring import VIDEO_MAX_FRAMES_FOR_MEAN, frame_realism_scores, video_verdict
+
+        prepared = self.decode_pool.submit(_decode_video, path, media_format, self.options).result()
+        stats = {"bytes": prepared.pop("bytes"), "decode_s": prepared.pop("decode_s")}
+        if "error" in prepared:
+            return {**stats, "status": "error", "error": prepared["error"]}
+
+        t0 = time.perf_counter()
+        result = self.video_analyzer.score_prepared(prepared)
+        stats["inference_s"] = time.perf_counter() - t0
+
+        realism_scores = [rs for _, rs in frame_realism_scores(result.get("per_frame_results"))]
+        if not realism_scores:
+            return {**stats, "status": "error", "error": "No parsable frame scores were returned"}
+        coverage = result["metadata"]["coverage"]
+        classification, score = video_verdict(
+            realism_scores, max_frames=None if coverage == "full" else VIDEO_MAX_FRAMES_FOR_MEAN
+        )
+        return {
+            **stats,
+            "status": "ok",
+            "classification": classification,
+            "score": score,
+            "partial": result.get("partial") or None,
+            "log": _log_row(classification, score, video_log_fields(result, coverage)),
+        }
+
+    def _analyze_audio(self, path: str, media_format: str) -> dict:
+        from app.services.rescoring import audio_log_fields
+        from app.services.scoring import audio_verdict
+
+        with open(path, "rb") as f:
+            data = f.read()
+        t0 = time.perf_counter()
+        result = self.audio_analyzer.analyze_audio(data, filename=os.path.basename(path), media_format=media_format)
+        stats = {"bytes": len(data), "inference_s": time.perf_counter() - t0}
+        if isinstance(result, dict) and "error" in result:
+            return {**stats, "status": "error", "error": result["error"]}
+        classification, score = audio_verdict(result)
+        return {
+            **stats,
+            "status": "ok",
+            "classification": classification,
+            "score": score,
+            "log": _log_row(classification, score, audio_log_fields(result)),
+        }
+
+
+def _log_row(classification: str, score: float, raw_fields: dict) -> dict:
+    return {
+        "isDeepFake": classification == "Deepfake",
+        "date": date.today(),
+        "hour": datetime.now().time(),
+        "classification": classification,
+        "score": score,
+        **raw_fields,
+    }
+
+
+class _Progress:
+    def __init__(self, every_s: float):
+        self.every_s = every_s
+        self.t0 = time.perf_counter()
+        self.last = self.t0
+        self.stats = {
+            "files_done": 0,
+            "ok": 0,
+            "errors": 0,
+            "skipped_checkpoint": 0,
+            "bytes": 0,
+            "decode_s": 0.0,
+            "inference_s": 0.0,
+            "by_modality": {},
+        }
+
+    def add(self, outcome: dict):
+        s = self.stats
+        s["files_done"] += 1
+        s["ok" if outcome["status"] == "ok" else "errors"] += 1
+        s["bytes"] += outcome.get("bytes", 0)
+        s["decode_s"] += outcome.get("decode_s", 0.0)
+        s["inference_s"] += outcome.get("inference_s", 0.0)
+        s["by_modality"][outcome["modality"]] = s["by_modality"].get(outcome["modality"], 0) + 1
+
+    def maybe_print(self):
+        now = time.perf_counter()
+        if self.every_s > 0 and now - self.last >= self.every_s:
+            self.last = now
+            s = self.stats
+            elapsed = now - self.t0
+            print(
+                f"bulk_analyze: {s['files_done']} files ({s['errors']} errors) in {elapsed:.0f}s "
+                f"{s['files_done'] / elapsed:.2f} files/s {s['bytes'] / elapsed / 1e6:.2f} MB/s",
+                file=sys.stderr,
+            )
+
+    def summary(self) -> dict:
+        s = dict(self.stats)
+        elapsed = time.perf_counter() - self.t0
+        s["elapsed_s"] = round(elapsed, 3)
+        s["files_per_s"] = round(s["files_done"] / elapsed, 3) if elapsed > 0 else None
+        s["mb_per_s"] = round(s["bytes"] / elapsed / 1e6, 3) if elapsed > 0 else None
+        # Summed over files: with N files in flight these add up to about N x elapsed.
+        s["decode_s"] = round(s["decode_s"], 3)
+        s["inference_s"] = round(s["inference_s"], 3)
+        return s
+
+
+def run(args) -> dict:
+    from app.models.detection_log_model import init_db
+    from app.services.log_service import LogService
+
+    done = load_checkpoint(args.checkpoint, args.retry_failed)
+    if not args.no_log:
+        init_db()
+    log_service = LogService()
+    progress = _Progress(args.progress_every)
+    bulk = BulkAnalyzer(
+        workers=args.workers,
+        modality=args.modality,
+        options={"coverage": args.coverage, "frames": args.frames, "seconds": args.seconds, "selection": args.selection},
+    )
+
+    pending: list[dict] = []
+
+    def flush(checkpoint):
+        logs = [o.pop("log") for o in pending if "log" in o]
+        if logs and not args.no_log:
+            log_service.save_logs(logs)
+        for o in pending:
+            entry = {k: round(v, 3) if isinstance(v, float) else v for k, v in o.items() if v is not None}
+            checkpoint.write(json.dumps(entry) + "\n")
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+        pending.clear()
+
+    def collect(futures):
+        for fut in futures:
+            outcome = fut.result()
+            progress.add(outcome)
+            pending.append(outcome)
+
+    submitted = 0
+    threads = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="bulk")
+    try:
+        with open(args.checkpoint, "a") as checkpoint:
+            in_flight = set()
+            try:
+                for path in iter_inputs(args.paths, args.manifest):
+                    if path in done:
+                        progress.stats["skipped_checkpoint"] += 1
+                        continue
+                    if args.limit and submitted >= args.limit:
+                        break
+                    done.add(path)  # the same file listed twice is analyzed once
+                    while len(in_flight) >= 2 * args.concurrency:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(finished)
+                        if len(pending) >= args.batch_size:
+                            flush(checkpoint)
+                        progress.maybe_print()
+                    in_flight.add(threads.submit(bulk.analyze_file, path))
+                    submitted += 1
+                while in_flight:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                    if len(pending) >= args.batch_size:
+                        flush(checkpoint)
+                    progress.maybe_print()
+            finally:
+                # Interrupted (Ctrl-C, broken worker pool): keep what already finished.
+                collect([f for f in in_flight if f.done() and not f.cancelled() and f.exception() is None])
+                flush(checkpoint)
+    finally:
+        threads.shutdown(wait=False, cancel_futures=True)
+        bulk.close()
+    return progress.summary()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Analyze media files from disk in bulk and log the verdicts.")
+    p.add_argument("paths", nargs="*", help="Files or directories (walked recursively).")
+    p.add_argument("--manifest", action="append", default=[], help="File with one media path per line (repeatable).")
+    p.add_argument("--checkpoint", default="bulk_analyze.checkpoint.jsonl", help="Progress / results file (JSON lines).")
+    p.add_argument("--retry-failed", action="store_true", help="Analyze files that failed in a previous run again.")
+    p.add_argument("--modality", choices=("auto", "video", "audio"), default="auto")
+    p.add_argument("--coverage", choices=("window", "full"), default="window")
+    p.add_argument("--frames", type=int, default=None, help="Frames per video (default: 10, or VIDEO_FULL_COVERAGE_FRAMES for full).")
+    p.add_argument("--seconds", type=int, default=10, help="Window length for --coverage window.")
+    p.add_argument("--selection", choices=("reservoir", "quality"), default=None)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode worker processes.")
+    p.add_argument("--concurrency", type=int, default=None, help="Files in flight (default: 2 x workers).")
+    p.add_argument("--batch-size", type=int, default=100, help="Log rows per insert / checkpoint write.")
+    p.add_argument("--limit", type=int, default=0, help="Stop after this many new files (0 = all).")
+    p.add_argument("--no-log", action="store_true", help="Do not write DetectionLog rows (checkpoint only).")
+    p.add_argument("--progress-every", type=float, default=10.0, help="Seconds between progress lines on stderr (0 = off).")
+    args = p.parse_args(argv)
+
+    if not args.paths and not args.manifest:
+        p.error("give at least one path or --manifest")
+    if args.frames is None:
+        args.frames = int(os.getenv("VIDEO_FULL_COVERAGE_FRAMES", "20")) if args.coverage == "full" else 10
+    args.workers = max(1, args.workers)
+    args.concurrency = max(1, args.concurrency or 2 * args.workers)
+    args.batch_size = max(1, args.batch_size)
+
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
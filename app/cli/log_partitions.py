@@ -0,0 +1,51 @@
+"""
+DetectionLog partition management (see `repository.detection_log_repository`).
+
+Usage:
+    LOG_PARTITIONING=month python -m app.cli.log_partitions migrate    # convert an existing plain table
+    python -m app.cli.log_partitions list
+    python -m app.cli.log_partitions maintain                          # upcoming partitions + retention
+    python -m app.cli.log_partitions purge --start 2025-01-01 --end 2025-04-01
+
+Prints JSON.
+"""
+import argparse
+import json
+from datetime import date
+
+from app.config.db import engine
+from app.repository import detection_log_repository as partitions
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Manage the time-partitioned DetectionLog table.")
+    sub = p.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Convert the existing table into partitions (stop the API first).")
+    migrate.add_argument("--batch-days", type=int, default=31, help="Days of rows copied per INSERT ... SELECT.")
+    sub.add_parser("list", help="Show the partitions.")
+    sub.add_parser("maintain", help="Create upcoming partitions and apply LOG_RETENTION_DAYS.")
+    purge = sub.add_parser("purge", help="Delete all logs dated in [start, end).")
+    purge.add_argument("--start", type=date.fromisoformat, required=True)
+    purge.add_argument("--end", type=date.fromisoformat, required=True)
+    args = p.parse_args(argv)
+
+    if args.command == "migrate":
+        out = partitions.migrate_to_partitions(batch_days=max(1, args.batch_days))
+    elif args.command == "list":
+        with engine.connect() as conn:
+            out = {
+                "partitioned": partitions.is_partitioned(conn),
+                "partitions": [
+                    {"name": x["name"], "start": x["start"].isoformat(), "end": x["end"].isoformat()}
+                    for x in partitions.list_partitions(conn)
+                ],
+            }
+    elif args.command == "maintain":
+        out = partitions.run_maintenance()
+    else:
+        out = partitions.delete_range(args.start, args.end)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Re-score historical detection logs from their stored raw scores (no upstream calls).
+
+Usage:
+    python -m app.cli.rescore --threshold 15 --rule mean --dry-run
+    python -m app.cli.rescore --threshold 15 --window-max-frames 20 --audio-threshold 1.2
+
+Prints the run statistics as JSON (rows scanned/changed, flips per direction, rows/s).
+"""
+import argparse
+import json
+
+from app.services.rescoring import VIDEO_RULES, rescore
+from app.services.scoring import REAL_MEAN_THRESHOLD, VIDEO_MAX_FRAMES_FOR_MEAN
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Re-score stored detection logs with new verdict settings.")
+    p.add_argument("--threshold", type=float, default=REAL_MEAN_THRESHOLD, help="Video: realism score (0..100) below which a row is Deepfake.")
+    p.add_argument("--rule", choices=VIDEO_RULES, default="mean", help="Video: how per-frame scores are aggregated.")
+    p.add_argument(
+        "--window-max-frames",
+        type=int,
+        default=VIDEO_MAX_FRAMES_FOR_MEAN,
+        help="Video: frames used for window-mode rows (0 = all stored frames). Full-coverage rows always use all.",
+    )
+    p.add_argument(
+        "--audio-threshold",
+        type=float,
+        default=None,
+        help="Audio: raw deepfake_score (0..2) at or above which a row is Deepfake. Audio rows are left alone when omitted.",
+    )
+    p.add_argument("--batch-size", type=int, default=10000)
+    p.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+    args = p.parse_args(argv)
+
+    from app.models.detection_log_model import init_db
+
+    init_db()
+    stats = rescore(
+        threshold=args.threshold,
+        rule=args.rule,
+        window_max_frames=args.window_max_frames or None,
+        audio_threshold=args.audio_threshold,
+        batch_size=max(1, args.batch_size),
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from app.core.debug import debug_token_is_valid
+from app.utils.profiling import profile_path
+
+debug_handler = APIRouter(tags=["debug"])
+
+
+@debug_handler.get(
+    "/debug/profiles/{profile_id}",
+    summary="Download a saved request profile",
+    description=(
+        "## Input\n"
+        "- **Path param**: `profile_id` (returned in `debug.profile.id` of a profiled request)\n"
+        "- **Header**: `X-Debug-Token`\n\n"
+        "## Output\n"
+        "A binary cProfile dump, readable with `python -m pstats <file>` or snakeviz."
+    ),
+    responses={403: {"description": "Missing/invalid debug token."}, 404: {"description": "Profile not found."}},
+)
+def get_profile(profile_id: str, x_debug_token: str | None = Header(None)):
+    if not debug_token_is_valid(x_debug_token):
+        raise HTTPException(status_code=403, detail="A valid X-Debug-Token header is required.")
+
+    path = profile_path(profile_id)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
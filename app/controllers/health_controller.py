@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core import readiness
+
+health_handler = APIRouter(tags=["health"])
+
+
+@health_handler.get(
+    "/health",
+    summary="Liveness probe",
+    description=(
+        "## What this endpoint does\n"
+        "Returns 200 as soon as the process serves HTTP; it does not touch the database.\n\n"
+        "## Output\n"
+        "`{\"status\": \"ok\"}`"
+    ),
+)
+def health():
+    return {"status": "ok"}
+
+
+@health_handler.get(
+    "/ready",
+    summary="Readiness probe",
+    description=(
+        "## What this endpoint does\n"
+        "Reports whether background startup work (database schema check / migration) has finished.\n\n"
+        "## Output\n"
+        "- `ready`: true once every startup check passed\n"
+        "- `checks`: per check `status` (\"pending\" | \"ok\" | \"failed\"), `error` and `after_s` "
+        "(seconds after process start)\n"
+        "- `uptime_s`\n\n"
+        "Status code 200 when ready, 503 otherwise."
+    ),
+    responses={503: {"description": "Startup checks still running or failed."}},
+)
+def ready():
+    body = readiness.status()
+    return JSONResponse(content=body, status_code=200 if body["ready"] else 503)
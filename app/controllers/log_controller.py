@@ -1,10 +1,21 @@
 from fastapi import APIRouter, HTTPException, Query
-from app.services.log_service import LogService
 from app.schemas.detection_log_schema import DetectionLog
+from datetime import date
 from typing import List
 
 log_handler = APIRouter(tags=["logs"])
-log_service = LogService()
+_log_service = None
+
+
+def get_log_service():
+    # Created on first use: importing LogService pulls in SQLAlchemy, which slows down startup.
+    global _log_service
+    if _log_service is None:
+        from app.services.log_service import LogService
+
+        _log_service = LogService()
+    return _log_service
+
 
 @log_handler.get(
     "/logs/get_by_id",
@@ -27,7 +38,7 @@ log_service = LogService()
 def get_log_by_id(
     id: int = Query(..., description="DetectionLog id (primary key).", examples=[1, 2, 123])
 ):
-    log = log_service.get_log_by_id(id)
+    log = get_log_service().get_log_by_id(id)
     if log is None:
         raise HTTPException(status_code=404, detail="Log not found")
     row = getattr(log, "_mapping", log)
@@ -45,15 +56,19 @@ def get_log_by_id(
     summary="List all detection logs",
     description=(
         "## Input\n"
-        "- No parameters\n\n"
+        "- **Query params** (optional): `start`, `end` (ISO dates, `end` exclusive)\n\n"
         "## What this endpoint does\n"
-        "Returns all rows from the `DetectionLog` table.\n\n"
+        "Returns all rows from the `DetectionLog` table, or only those dated in [`start`, `end`). "
+        "With a partitioned table (`LOG_PARTITIONING`) a date range only reads the matching partitions.\n\n"
         "## Output\n"
         "A JSON array of `DetectionLog` objects."
     ),
 )
-def get_all_logs():
-    list_of_logs = log_service.get_all_logs()
+def get_all_logs(
+    start: date | None = Query(None, description="Only logs dated on or after this day."),
+    end: date | None = Query(None, description="Only logs dated before this day."),
+):
+    list_of_logs = get_log_service().get_all_logs(start, end)
     
     result = []
     for log in list_of_logs:
@@ -76,7 +91,8 @@ def get_all_logs():
     description=(
         "## Input\n"
         "- **Query param**: `state`\n"
-        "  - accepted values (case-insensitive): `deepfake`, `bonafide`\n\n"
+        "  - accepted values (case-insensitive): `deepfake`, `bonafide`\n"
+        "- **Query params** (optional): `start`, `end` (ISO dates, `end` exclusive)\n\n"
         "## What this endpoint does\n"
         "Filters rows in `DetectionLog` by the `classification` column.\n\n"
         "## Output\n"
@@ -84,7 +100,9 @@ def get_all_logs():
     ),
 )
 def get_logs_by_state(
-    state: str = Query(..., description="Classification filter: deepfake|bonafide (case-insensitive).")
+    state: str = Query(..., description="Classification filter: deepfake|bonafide (case-insensitive)."),
+    start: date | None = Query(None, description="Only logs dated on or after this day."),
+    end: date | None = Query(None, description="Only logs dated before this day."),
 ):
         
     # Backwards-compatible endpoint: accepts "deepfake" or "bonafide"
@@ -92,7 +110,7 @@ def get_logs_by_state(
     if normalized not in ("deepfake", "bonafide"):
         return []
 
-    list_of_logs = log_service.get_logs_by_classification(normalized.capitalize())
+    list_of_logs = get_log_service().get_logs_by_classification(normalized.capitalize(), start, end)
     
     result = []
     for log in list_of_logs:
@@ -121,4 +139,33 @@ def get_logs_by_state(
     ),
 )
 def delete_log(id: int = Query(..., description="DetectionLog id (primary key).")):
-    return log_service.delete_log_by_id(id)
+    return get_log_service().delete_log_by_id(id)
+
+
+@log_handler.delete(
+    "/logs/delete_range",
+    summary="Delete all logs in a date range",
+    description=(
+        "## Input\n"
+        "- **Query params**: `start`, `end` (ISO dates, `end` exclusive)\n\n"
+        "## What this endpoint does\n"
+        "Deletes every `DetectionLog` row dated in [`start`, `end`). With a partitioned table "
+        "(`LOG_PARTITIONING`), partitions entirely inside the range are truncated and rows are deleted "
+        "only in the partitions at its edges.\n\n"
+        "## Output\n"
+        "```json\n"
+        "{\"start\": \"2025-01-01\", \"end\": \"2025-04-01\", "
+        "\"partitions_truncated\": [\"DetectionLog_p20250101_20250201\"], \"rows_deleted\": 1234}\n"
+        "```\n"
+        "`rows_deleted` does not include rows removed by truncating PostgreSQL partitions."
+    ),
+    responses={400: {"description": "`end` is not after `start`."}},
+)
+def delete_logs_by_range(
+    start: date = Query(..., description="First day to delete."),
+    end: date = Query(..., description="First day to keep (exclusive end)."),
+):
+    try:
+        return get_log_service().delete_logs_by_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,84 +1,185 @@
 from app.services.analyzer import Analyzer
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.encoders import jsonable_encoder
-from app.services.log_service import LogService
+from fastapi.responses import StreamingResponse
+from app.services.media_probe import AUDIO_FORMATS, VIDEO_FORMATS, probe_media, sniff_media_format
+from app.services.rescoring import audio_log_fields, video_log_fields
+from app.services.scoring import (
+    VIDEO_MAX_FRAMES_FOR_MEAN,
+    audio_verdict,
+    frame_realism_scores,
+    fuse_verdicts,
+    segment_verdicts,
+    video_verdict,
+)
+from app.core.deadline import request_deadline
+from app.core.priority import request_lane
+from app.core.debug import request_debug
+from app.services.stream_analyzer import StreamLimitExceeded, StreamSession
+from app.utils.metrics import ANALYSES_IN_FLIGHT, timed_stage
+from app.utils.profiling import RequestTrace, profiled
 from datetime import date, datetime
 from pydantic import BaseModel, Field
+import asyncio
+import base64
 import json
 import os
-import subprocess
-import tempfile
 
 
-def _sniff_media_format(file_bytes: bytes, filename: str = "", content_type: str = "") -> str:
+# Enough for every magic number `sniff_media_format` checks (and for a base64 prefix that decodes to one).
+_SNIFF_BYTES = 64
+_BASE64_ALPHABET = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=")
+
+
+def _decode_base64_head(head: bytes) -> bytes | None:
+    """The first decoded bytes of a base64 upload (which `VideoAnalyzer` accepts), or None if it is not base64."""
+    text = bytes(head).strip()
+    usable = len(text) - len(text) % 4
+    if usable < 24 or any(ch not in _BASE64_ALPHABET for ch in text[:usable]):
+        return None
+    try:
+        return base64.b64decode(text[:usable], validate=True)
+    except Exception:
+        return None
+
+
+async def _read_upload(file: UploadFile, pipeline: str, allowed: tuple[str, ...], *, allow_base64: bool = False):
     """
-    Best-effort "what kind of audio/video is this?" detector based on:
-    - provided content_type
-    - filename extension
-    - magic bytes
+    Sniff the first chunk and reject unsupported containers with 415 before loading the rest.
+
+    By the time the handler runs, Starlette has already received the whole multipart body and
+    spooled the file (in memory, then a temp file past 1 MB), so the 415 does not save the
+    transfer. It saves loading the upload into memory, the analyzers' temp files and starting
+    OpenCV/ffmpeg on it. Only the admission decision (`AdmissionMiddleware`) comes before the body.
+
+    Returns (data, media_format). Base64 uploads (video only) are decoded here, so the
+    analyzers always receive raw container bytes together with their format.
     """
-    ext = (os.path.splitext(filename or "")[1] or "").lower().lstrip(".")
-    head = file_bytes[:16] if isinstance(file_bytes, (bytes, bytearray)) else b""
-
-    # Common magic numbers
-    if head.startswith(b"RIFF") and file_bytes[8:12] == b"WAVE":
-        magic = "wav (RIFF/WAVE)"
-    elif head.startswith(b"fLaC"):
-        magic = "flac"
-    elif head.startswith(b"OggS"):
-        magic = "ogg/opus (OggS container)"
-    elif head.startswith(b"ID3"):
-        magic = "mp3 (ID3 tag)"
-    elif head[:2] == b"\xff\xfb" or head[:2] == b"\xff\xf3" or head[:2] == b"\xff\xf2":
-        magic = "mp3 (frame sync)"
-    elif head.startswith(b"\x00\x00\x00") and b"ftyp" in file_bytes[:16]:
-        magic = "mp4/m4a (ISO BMFF ftyp)"
-    elif head.startswith(b"\x1a\x45\xdf\xa3"):
-        magic = "webm/mkv (EBML)"
-    else:
-        magic = "unknown"
-
-    guessed_by_ext = ""
-    if ext:
-        guessed_by_ext = f"ext={ext}"
-
-    guessed_by_mime = ""
-    if content_type:
-        guessed_by_mime = f"content_type={content_type}"
-
-    return " | ".join([p for p in [magic, guessed_by_ext, guessed_by_mime] if p]) or "unknown"
-
-
-def _ffprobe_summary(file_bytes: bytes, filename: str = "") -> dict:
+    with timed_stage(pipeline, "upload_read"):
+        head = await file.read(_SNIFF_BYTES)
+        media_format = sniff_media_format(head)
+
+        is_base64 = False
+        if media_format == "unknown" and allow_base64:
+            decoded_head = _decode_base64_head(head)
+            if decoded_head:
+                media_format = sniff_media_format(decoded_head)
+                is_base64 = True
+
+        if media_format not in allowed:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported media format: {media_format} (supported: {', '.join(allowed)})",
+            )
+
+        await file.seek(0)
+        data = await file.read()
+
+    if is_base64:
+        try:
+            data = base64.b64decode(b"".join(data.split()), validate=True)
+        except Exception:
+            raise HTTPException(status_code=415, detail="Malformed base64 upload")
+    return data, media_format
+
+
+def _probe_upload(data: bytes, media_format: str, *, need_metadata: bool) -> dict | None:
     """
-    Best-effort ffprobe metadata (if ffprobe is installed).
-    Returns a dict with either {"ffprobe": <json>} or {"ffprobe_error": "..."}.
+    Parse container metadata (see `media_probe`) and reject over-long media with 413.
+
+    Only runs when `MEDIA_MAX_DURATION_S` is set or the caller needs the metadata
+    (full-coverage planning, audio-track detection).
     """
-    suffix = os.path.splitext(filename or "")[1] or ""
-    try:
-        with tempfile.NamedTemporaryFile(prefix="deeptrust_", suffix=suffix, delete=True) as tmp:
-            tmp.write(file_bytes)
-            tmp.flush()
-
-            cmd = [
-                "ffprobe",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-show_format",
-                "-show_streams",
-                "-of",
-                "json",
-                tmp.name,
-            ]
-            out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True)
-            return {"ffprobe": json.loads(out)}
-    except FileNotFoundError:
-        return {"ffprobe_error": "ffprobe not installed / not in PATH"}
-    except subprocess.CalledProcessError as e:
-        return {"ffprobe_error": f"ffprobe failed: exit={e.returncode} output={str(e.output)[:800]}"}
-    except Exception as e:
-        return {"ffprobe_error": f"ffprobe unexpected error: {type(e).__name__}: {e}"}
+    max_duration_s = float(os.getenv("MEDIA_MAX_DURATION_S", "0"))
+    if max_duration_s <= 0 and not need_metadata:
+        return None
+
+    container = probe_media(data, media_format)
+    duration_s = (container or {}).get("duration_s")
+    if max_duration_s > 0 and duration_s and duration_s > max_duration_s:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Media is too long: {duration_s:.1f}s (limit {max_duration_s:g}s)",
+        )
+    return container
+
+
+def _video_verdict_or_502(result, coverage: str) -> tuple[str, float]:
+    """Classification + score from a `VideoAnalyzer` result, or HTTP 502 if there is nothing to score."""
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=504 if result.get("skipped") == "deadline" else 502, detail=result["error"])
+
+    # ---- Derive score + classification from image endpoint outputs (see `scoring`) ----
+    realism_scores = [rs for _, rs in frame_realism_scores(result.get("per_frame_results"))]
+
+    if not realism_scores:
+        if result.get("partial"):
+            raise HTTPException(status_code=504, detail="Request deadline reached before any frame was scored.")
+        # Nothing parsable; avoid logging misleading score.
+        raise HTTPException(status_code=502, detail="Video inference succeeded but no parsable frame scores were returned.")
+
+    # Full coverage: every stratified sample counts; window mode keeps the mean over up to 10 frames.
+    return video_verdict(realism_scores, max_frames=None if coverage == "full" else VIDEO_MAX_FRAMES_FOR_MEAN)
+
+
+def _finish_video_analysis(result, coverage: str) -> dict:
+    """Verdict + detection log for a `VideoAnalyzer` result; returns the `VideoAnalysisResponse` payload."""
+    classification, normalized_score = _video_verdict_or_502(result, coverage)
+
+    # ---- Persist log (same pattern as audio) ----
+    _save_detection_log(classification, normalized_score, video_log_fields(result, coverage))
+
+    response = {
+        "classification": classification,
+        "score": normalized_score,
+    }
+    segments = segment_verdicts(result)
+    if segments is not None:
+        response["segments"] = segments
+    if result.get("partial"):
+        response["partial"] = True
+    return response
+
+
+def _audio_error(result: dict) -> HTTPException:
+    """
+    HTTPException for an audio pipeline error: 422 when voice-activity trimming found too little
+    speech, 504 when it was cut off by the request deadline, otherwise 502.
+    """
+    if result.get("rejected") == "no_speech":
+        return HTTPException(status_code=422, detail=result["error"])
+    return HTTPException(status_code=504 if result.get("skipped") == "deadline" else 502, detail=result["error"])
+
+
+def _audio_debug(result: dict) -> dict:
+    """Audio pre-processing details for the debug output (VAD trimming, upstream payload size/encoding)."""
+    return {"vad": result.get("vad"), "upstream_payload": result.get("upstream_payload")}
+
+
+async def _run_blocking(fn, *args, **kwargs):
+    """
+    Run analysis / DB work in a worker thread, so the event loop keeps serving (and admission
+    control keeps answering) while it runs. The request's contextvars (trace, deadline, lane)
+    are copied into the thread; the trace's profiler, if any, covers the call.
+    """
+    return await asyncio.to_thread(profiled, fn, *args, **kwargs)
+
+
+def _save_detection_log(classification: str, score: float, raw_fields: dict | None = None) -> None:
+    """`raw_fields`: modality + raw model scores (see `rescoring.video_log_fields` / `audio_log_fields`)."""
+    log = {
+        "isDeepFake": classification == "Deepfake",
+        "date": date.today(),
+        "hour": datetime.now().time(),
+        "classification": classification,
+        "score": score,
+        **(raw_fields or {}),
+    }
+
+    from app.services.log_service import LogService
+
+    log_service = LogService()
+    log_service.save_log(log)
 
 
 class AudioAnalysisResponse(BaseModel):
@@ -106,6 +207,21 @@ class AudioAnalysisResponse(BaseModel):
         ),
         examples=[0.7, 45.2, 98.9],
     )
+    debug: dict | None = Field(
+        None,
+        description="Stage-timing breakdown; only present for `?debug=true` requests with a valid `X-Debug-Token`.",
+    )
+
+
+class SegmentScore(BaseModel):
+    """Per-segment verdict for `coverage=full` video analysis."""
+
+    index: int
+    start_s: float
+    end_s: float
+    frames: int = Field(..., description="Frames with a parsable score in this segment.")
+    classification: str | None = Field(None, examples=["Bonafide", "Deepfake"])
+    score: float | None = Field(None, ge=0.0, le=100.0, description="Mean Realism score (0..100) of the segment.")
 
 
 class VideoAnalysisResponse(BaseModel):
@@ -122,11 +238,61 @@ class VideoAnalysisResponse(BaseModel):
         ge=0.0,
         le=100.0,
         description=(
-            "Mean Realism score (0..100) aggregated across up to 10 sampled frames. "
-            "Higher means 'more real'."
+            "Mean Realism score (0..100) aggregated across up to 10 sampled frames "
+            "(all sampled frames with `coverage=full`). Higher means 'more real'."
         ),
         examples=[12.0, 55.0, 97.0],
     )
+    segments: list[SegmentScore] | None = Field(
+        None, description="Per-segment scores; only present with `coverage=full`."
+    )
+    partial: bool | None = Field(
+        None,
+        description=(
+            "`true` when the request deadline (`deadline_s` / `REQUEST_DEADLINE_S`) dropped frames or cut "
+            "decoding short; the verdict is computed from the frames that finished. Absent otherwise."
+        ),
+    )
+    debug: dict | None = Field(
+        None,
+        description=(
+            "Stage-timing breakdown (frames decoded vs sampled, per-frame encode and upstream times, DB time); "
+            "only present for `?debug=true` requests with a valid `X-Debug-Token`."
+        ),
+    )
+
+
+class ModalityVerdict(BaseModel):
+    """Classification + score of one modality, with the same meaning as the single-modality endpoints."""
+
+    classification: str = Field(..., examples=["Bonafide", "Deepfake"])
+    score: float = Field(..., ge=0.0, le=100.0)
+
+
+class MediaAnalysisResponse(BaseModel):
+    """
+    Output payload for `POST /analyze_media`.
+
+    - **classification**: fused decision; `"Deepfake"` if either the frames or the soundtrack are classified as deepfake.
+    - **video**: same classification/score as `/analyze_video` (score = mean Realism, higher is more real).
+    - **audio**: same classification/score as `/analyze_audio` (score = deepfake risk, higher is more fake);
+      absent when the upload has no audio track.
+    """
+
+    classification: str = Field(..., examples=["Bonafide", "Deepfake"])
+    video: ModalityVerdict
+    audio: ModalityVerdict | None = None
+    partial: bool | None = Field(
+        None,
+        description=(
+            "`true` when the request deadline (`deadline_s` / `REQUEST_DEADLINE_S`) dropped frames, cut "
+            "decoding short or skipped the soundtrack; the verdict is computed from what finished. Absent otherwise."
+        ),
+    )
+    debug: dict | None = Field(
+        None,
+        description="Stage-timing breakdown; only present for `?debug=true` requests with a valid `X-Debug-Token`.",
+    )
 
 
 media_handler = APIRouter()
@@ -140,21 +306,52 @@ media_handler = APIRouter()
         "- **Content-Type**: `multipart/form-data`\n"
         "- **Form field**: `file` (UploadFile)\n\n"
         "## What this endpoint does\n"
-        "1. Reads the uploaded video bytes.\n"
+        "1. Detects the container from the first bytes (`415` unless MP4/MOV, WebM/MKV, AVI or Ogg), then reads the upload.\n"
         "2. Samples frames from the first seconds of the video and calls the configured image inference endpoint.\n"
+        "   `selection=quality` prefers sharp, well-exposed, visually distinct frames over a uniform random sample.\n"
+        "   `coverage=full` instead decodes the whole video in parallel segments and samples across all of it\n"
+        "   (`VIDEO_FULL_COVERAGE_FRAMES` frames in total, default 20); per-segment scores are returned.\n"
         "3. Derives a classification + score.\n"
         "4. Stores a detection log entry.\n\n"
         "## Output\n"
         "Returns a minimal JSON payload:\n"
         "```json\n"
         "{\"classification\": \"Bonafide\", \"score\": 72.0}\n"
-        "```"
+        "```\n\n"
+        "## Latency budget\n"
+        "`?deadline_s=` (or an `X-Deadline-S` header; capped by the server-side `REQUEST_DEADLINE_S`) bounds the whole request. Decoding and "
+        "upstream timeouts shrink to the time left, frames not yet sent when it runs out are dropped and the "
+        "verdict comes from the frames that finished, flagged `partial: true` (`504` if none finished).\n\n"
+        "## Debug mode\n"
+        "`?debug=true` (and optionally `&profile=true`) with an `X-Debug-Token` header adds a `debug` object "
+        "with per-stage timings and, when profiling, a downloadable cProfile dump."
     ),
     response_model=VideoAnalysisResponse,
-    responses={200: {"description": "Classification + score."}, 502: {"description": "Upstream inference endpoint error."}},
+    response_model_exclude_none=True,
+    responses={
+        200: {"description": "Classification + score."},
+        403: {"description": "Debug output requested without a valid token."},
+        413: {"description": "Media longer than `MEDIA_MAX_DURATION_S`."},
+        415: {"description": "Unsupported or unrecognised container (detected from the first bytes)."},
+        502: {"description": "Upstream inference endpoint error."},
+        504: {"description": "Request deadline reached before anything was scored."},
+    },
 )
 async def post_video(
-    file: UploadFile = File(..., description="Video file to analyze (multipart/form-data field name: `file`).")
+    file: UploadFile = File(..., description="Video file to analyze (multipart/form-data field name: `file`)."),
+    selection: str | None = Query(
+        None,
+        pattern="^(reservoir|quality)$",
+        description="Frame selection strategy (default: `VIDEO_FRAME_SELECTION`, else `reservoir`).",
+    ),
+    coverage: str = Query(
+        "window",
+        pattern="^(window|full)$",
+        description="`window`: first 10 seconds only. `full`: stratified sample over the whole video.",
+    ),
+    trace: RequestTrace | None = Depends(request_debug),
+    deadline: float | None = Depends(request_deadline),
+    lane: str = Depends(request_lane),
 ):
     """
     Video analysis endpoint.
@@ -166,115 +363,145 @@ async def post_video(
     
     analyzer = Analyzer()
 
-    video_data = await file.read()
-    
+    video_data, media_format = await _read_upload(file, "video", VIDEO_FORMATS, allow_base64=True)
+    container = await _run_blocking(_probe_upload, video_data, media_format, need_metadata=coverage == "full")
+
     try:
         # Sample enough frames to make the final decision more stable.
-        result = analyzer.analyze_video(video_data, filename=getattr(file, "filename", None), frames=10, seconds=10)
+        frames = int(os.getenv("VIDEO_FULL_COVERAGE_FRAMES", "20")) if coverage == "full" else 10
+        result = await _run_blocking(
+            analyzer.analyze_video,
+            video_data,
+            filename=getattr(file, "filename", None),
+            frames=frames,
+            seconds=10,
+            selection=selection,
+            coverage=coverage,
+            media_format=media_format,
+            container=container,
+        )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Video inference failed: {type(e).__name__}: {e}")
 
-    if isinstance(result, dict) and "error" in result:
-        raise HTTPException(status_code=502, detail=result["error"])
-
-    # ---- Derive score + classification from image endpoint outputs ----
-    # Endpoint output example (per frame):
-    # [
-    #   {"label": "Deepfake", "score": 0.54},
-    #   {"label": "Realism", "score": 0.46}
-    # ]
-    #
-    # Aggregation rule (less sensitive than max-of-one-frame):
-    # - Extract the per-frame "Realism" score (0..1).
-    # - Compute mean Realism score over up to 10 frames.
-    # - If mean Realism >= 10 (on 0..100 scale) => Bonafide else Deepfake.
-    REAL_MEAN_THRESHOLD = 10.0
-
-    def _extract_label_to_score(output) -> dict[str, float]:
-        try:
-            items = output
-            if isinstance(output, dict):
-                # Some endpoints return {"label": "...", "score": ...} or {"outputs": [...]}
-                if "outputs" in output and isinstance(output["outputs"], list):
-                    items = output["outputs"]
-                elif "label" in output and "score" in output:
-                    items = [output]
-
-            if not isinstance(items, list):
-                return {}
-
-            out: dict[str, float] = {}
-
-            for it in items:
-                if not isinstance(it, dict):
-                    continue
-                label = str(it.get("label", "")).strip()
-                score = it.get("score", None)
-                try:
-                    score_f = float(score)
-                except Exception:
-                    continue
-
-                if label:
-                    out[label.strip().lower()] = score_f
-
-            return out
-        except Exception:
-            return {}
-
-    def _get_realism_score_01(label_scores: dict[str, float]) -> float | None:
-        # Common label variants across image deepfake models
-        for key in ("realism", "real", "bonafide", "bona fide"):
-            if key in label_scores:
-                s = label_scores[key]
-                try:
-                    return max(0.0, min(float(s), 1.0))
-                except Exception:
-                    return None
-        return None
+    response = await _run_blocking(_finish_video_analysis, result, coverage)
+    if trace is not None:
+        response["debug"] = {**trace.summary(), "analysis": result.get("metadata")}
 
-    frame_results = []
-    if isinstance(result, dict):
-        frame_results = result.get("per_frame_results") or []
+    return jsonable_encoder(response)
 
-    realism_scores: list[float] = []
-    for fr in frame_results:
-        if not isinstance(fr, dict):
-            continue
-        out = fr.get("output")
-        label_scores = _extract_label_to_score(out)
-        rs = _get_realism_score_01(label_scores)
-        if rs is not None:
-            realism_scores.append(rs)
 
-    if not realism_scores:
-        # Nothing parsable; avoid logging misleading score.
-        raise HTTPException(status_code=502, detail="Video inference succeeded but no parsable frame scores were returned.")
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    # Mean of up to 10 realism scores (0..1), then scale to 0..100.
-    scores_for_mean = realism_scores[:10]
-    mean_realism = sum(scores_for_mean) / float(len(scores_for_mean))
-    normalized_score = max(0.0, min(mean_realism, 1.0)) * 100.0
-    classification = "Bonafide" if normalized_score >= REAL_MEAN_THRESHOLD else "Deepfake"
-    is_deepfake = classification == "Deepfake"
 
-    # ---- Persist log (same pattern as audio) ----
-    log = {
-        "isDeepFake": is_deepfake,
-        "date": date.today(),
-        "hour": datetime.now().time(),
-        "classification": classification,
-        "score": normalized_score,
-    }
+def _video_sse_events(
+    analyzer: Analyzer,
+    video_data: bytes,
+    filename: str | None,
+    frames: int,
+    selection,
+    coverage: str,
+    media_format: str,
+    container: dict | None,
+):
+    """Runs in Starlette's threadpool; one `frame` event per scored frame, then `result` (or `error`)."""
+    max_frames = None if coverage == "full" else VIDEO_MAX_FRAMES_FOR_MEAN
+    realism_scores = []
+    try:
+        for kind, payload in analyzer.iter_analyze_video(
+            video_data,
+            filename=filename,
+            frames=frames,
+            seconds=10,
+            selection=selection,
+            coverage=coverage,
+            media_format=media_format,
+            container=container,
+        ):
+            if kind == "frame":
+                event = {"frame_index": payload.get("frame_index")}
+                if "error" in payload:
+                    event["error"] = payload["error"]
+                else:
+                    scores = frame_realism_scores([payload])
+                    if scores:
+                        realism_scores.append(scores[0][1])
+                        event["realism"] = scores[0][1] * 100.0
+                if realism_scores:
+                    classification, running_mean = video_verdict(realism_scores, max_frames=max_frames)
+                    event["running_mean"] = running_mean
+                    event["provisional_classification"] = classification
+                event["frames_scored"] = len(realism_scores)
+                if payload.get("segment") is not None:
+                    event["segment"] = payload["segment"]
+                yield _sse("frame", event)
+            else:
+                # The detection log is written once, here, exactly like `/analyze_video`.
+                response = _finish_video_analysis(payload, coverage)
+                yield _sse("result", jsonable_encoder(response))
+    except HTTPException as e:
+        yield _sse("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        yield _sse("error", {"status_code": 502, "detail": f"Video inference failed: {type(e).__name__}: {e}"})
 
-    log_service = LogService()
-    log_service.save_log(log)
 
-    return jsonable_encoder(
-        {
-            "classification": classification,
-            "score": normalized_score,
-        }
+@media_handler.post(
+    "/analyze_video/stream",
+    tags=["media"],
+    summary="Analyze a video and stream per-frame results (Server-Sent Events)",
+    description=(
+        "Same input, options and final verdict as `/analyze_video`, but the response is a "
+        "`text/event-stream` that reports progress while frames are being scored.\n\n"
+        "## Events\n"
+        "- `frame` (one per sampled frame, in the order results arrive):\n"
+        "  `{\"frame_index\", \"realism\" (0..100), \"running_mean\", \"provisional_classification\", \"frames_scored\"}`;\n"
+        "  failed frames carry `error` instead of `realism`.\n"
+        "- `result` (last event): the `VideoAnalysisResponse` payload (`classification`, `score`, `segments`).\n"
+        "- `error` (instead of `result`): `{\"status_code\", \"detail\"}` with the status `/analyze_video` would return.\n\n"
+        "The detection log entry is written once, before the `result` event. `?deadline_s=` works as for "
+        "`/analyze_video`; frames dropped by the deadline are reported as `frame` events with an `error`."
+    ),
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "Event stream.", "content": {"text/event-stream": {}}},
+        413: {"description": "Media longer than `MEDIA_MAX_DURATION_S`."},
+        415: {"description": "Unsupported or unrecognised container (detected from the first bytes)."},
+    },
+)
+async def post_video_stream(
+    file: UploadFile = File(..., description="Video file to analyze (multipart/form-data field name: `file`)."),
+    selection: str | None = Query(
+        None,
+        pattern="^(reservoir|quality)$",
+        description="Frame selection strategy (default: `VIDEO_FRAME_SELECTION`, else `reservoir`).",
+    ),
+    coverage: str = Query(
+        "window",
+        pattern="^(window|full)$",
+        description="`window`: first 10 seconds only. `full`: stratified sample over the whole video.",
+    ),
+    deadline: float | None = Depends(request_deadline),
+    lane: str = Depends(request_lane),
+):
+    """
+    Streaming video analysis endpoint.
+
+    - **Input**: multipart/form-data file upload (the video)
+    - **Output**: SSE stream of per-frame `frame` events and a final `result` event
+    """
+
+    analyzer = Analyzer()
+
+    video_data, media_format = await _read_upload(file, "video", VIDEO_FORMATS, allow_base64=True)
+    container = await _run_blocking(_probe_upload, video_data, media_format, need_metadata=coverage == "full")
+
+    frames = int(os.getenv("VIDEO_FULL_COVERAGE_FRAMES", "20")) if coverage == "full" else 10
+    return StreamingResponse(
+        _video_sse_events(
+            analyzer, video_data, getattr(file, "filename", None), frames, selection, coverage, media_format, container
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -287,7 +514,7 @@ async def post_video(
         "- **Content-Type**: `multipart/form-data`\n"
         "- **Form field**: `file` (UploadFile)\n\n"
         "## What this endpoint does\n"
-        "1. Reads the uploaded audio bytes.\n"
+        "1. Detects the container from the first bytes (`415` unless WAV, FLAC, Ogg, MP3, MP4/M4A or WebM), then reads the upload.\n"
         "2. Calls the configured inference endpoint (via `AudioAnalyzer`).\n"
         "3. Extracts the model decision (`is_bonafide` / `label`).\n"
         "4. Normalizes the raw `deepfake_score` (0..2) into a client-friendly `score` (0..100).\n"
@@ -307,16 +534,32 @@ async def post_video(
         "  - final range: **0..100**\n\n"
         "## Classification\n"
         "- `is_bonafide=true`  → `classification=\"Bonafide\"`\n"
-        "- `is_bonafide=false` → `classification=\"Deepfake\"`\n"
+        "- `is_bonafide=false` → `classification=\"Deepfake\"`\n\n"
+        "## Voice-activity trimming\n"
+        "With `AUDIO_VAD=trim` (leading/trailing silence) or `AUDIO_VAD=drop` (all non-speech gaps) the converted "
+        "audio is trimmed before it is sent upstream; clips with less than `AUDIO_VAD_MIN_SPEECH_S` of speech "
+        "are rejected with `422` without any inference call. The debug output reports the seconds removed.\n\n"
+        "## Debug mode\n"
+        "`?debug=true` (and optionally `&profile=true`) with an `X-Debug-Token` header adds a `debug` object "
+        "with per-stage timings and, when profiling, a downloadable cProfile dump."
     ),
     response_model=AudioAnalysisResponse,
+    response_model_exclude_none=True,
     responses={
         200: {"description": "Classification + normalized score."},
+        403: {"description": "Debug output requested without a valid token."},
+        413: {"description": "Media longer than `MEDIA_MAX_DURATION_S`."},
+        415: {"description": "Unsupported or unrecognised container (detected from the first bytes)."},
+        422: {"description": "Too little speech in the clip (only with `AUDIO_VAD` enabled)."},
         502: {"description": "Upstream inference endpoint error."},
+        504: {"description": "Request deadline reached before anything was scored."},
     },
 )
 async def post_audio(
-    file: UploadFile = File(..., description="Audio file to analyze (multipart/form-data field name: `file`).")
+    file: UploadFile = File(..., description="Audio file to analyze (multipart/form-data field name: `file`)."),
+    trace: RequestTrace | None = Depends(request_debug),
+    deadline: float | None = Depends(request_deadline),
+    lane: str = Depends(request_lane),
 ):
     """
     Audio analysis endpoint.
@@ -330,50 +573,258 @@ async def post_audio(
     """
     
     analyzer = Analyzer()
-    audio_data = await file.read()
+    audio_data, media_format = await _read_upload(file, "audio", AUDIO_FORMATS)
+    await _run_blocking(_probe_upload, audio_data, media_format, need_metadata=False)
 
     # ---- Call analyzer ----
     try:
-        result = analyzer.analyze_audio(
+        result = await _run_blocking(
+            analyzer.analyze_audio,
             audio_data,
             filename=getattr(file, "filename", None),
             content_type=getattr(file, "content_type", None),
+            media_format=media_format,
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Audio inference failed: {type(e).__name__}: {e}")
     
     if isinstance(result, dict) and "error" in result:
-        raise HTTPException(status_code=502, detail=result["error"])
-
-    # Endpoint contract:
-    # - deepfake_score is in range 0..2 (higher = more fake)
-    # - is_bonafide is the primary decision flag
-    raw_score = float(result.get("deepfake_score", 0.0) or 0.0)
-    normalized_score = max(0.0, min(raw_score / 2.0, 1.0)) * 100.0
+        raise _audio_error(result)
 
-    is_bonafide = result.get("is_bonafide", None)
-    if is_bonafide is None:
-        label = str(result.get("label", "")).strip().lower()
-        is_bonafide = (label == "bonafide")
+    # Endpoint contract (deepfake_score 0..2, is_bonafide flag) is handled in `scoring.audio_verdict`.
+    classification, normalized_score = audio_verdict(result)
 
-    classification = "Bonafide" if bool(is_bonafide) else "Deepfake"
-    is_deepfake = classification == "Deepfake"  # keep boolean for backward compatibility
+    await _run_blocking(_save_detection_log, classification, normalized_score, audio_log_fields(result))
 
-    log = {
-        "isDeepFake": is_deepfake,
-        "date": date.today(),
-        "hour": datetime.now().time(),
+    response = {
         "classification": classification,
         "score": normalized_score,
     }
-        
-    log_service = LogService()
-    
-    log_service.save_log(log)
-    
-    return jsonable_encoder(
-        {
-            "classification": classification,
-            "score": normalized_score,
+    if trace is not None:
+        response["debug"] = {**trace.summary(), "analysis": _audio_debug(result)}
+
+    return jsonable_encoder(response)
+
+
+@media_handler.post(
+    "/analyze_media",
+    tags=["media"],
+    summary="Analyze the frames and the soundtrack of a video in one request",
+    description=(
+        "## Input\n"
+        "- **Content-Type**: `multipart/form-data`\n"
+        "- **Form field**: `file` (UploadFile, a video with or without an audio track)\n\n"
+        "## What this endpoint does\n"
+        "1. Detects the container from the first bytes (`415` unless MP4/MOV, WebM/MKV, AVI or Ogg), then reads the upload once.\n"
+        "2. Concurrently:\n"
+        "   - extracts the audio track with ffmpeg and scores it like `/analyze_audio`;\n"
+        "   - samples frames and scores them like `/analyze_video` (same `selection` / `coverage` options).\n"
+        "3. Fuses both verdicts: `Deepfake` if either modality is classified as deepfake.\n"
+        "4. Stores one detection log entry per analyzed modality.\n\n"
+        "## Output\n"
+        "```json\n"
+        "{\"classification\": \"Deepfake\", \"video\": {\"classification\": \"Bonafide\", \"score\": 72.0}, "
+        "\"audio\": {\"classification\": \"Deepfake\", \"score\": 81.5}}\n"
+        "```\n"
+        "`audio` is omitted when the upload has no audio track.\n\n"
+        "## Latency budget\n"
+        "`?deadline_s=` (or an `X-Deadline-S` header; capped by the server-side `REQUEST_DEADLINE_S`) bounds the whole request. Decoding and "
+        "upstream timeouts shrink to the time left, frames not yet sent when it runs out are dropped and the "
+        "verdict comes from the frames that finished, flagged `partial: true` (`504` if none finished).\n\n"
+        "## Debug mode\n"
+        "`?debug=true` (and optionally `&profile=true`) with an `X-Debug-Token` header adds a `debug` object "
+        "with per-stage timings of both pipelines."
+    ),
+    response_model=MediaAnalysisResponse,
+    response_model_exclude_none=True,
+    responses={
+        200: {"description": "Fused classification + per-modality verdicts."},
+        403: {"description": "Debug output requested without a valid token."},
+        413: {"description": "Media longer than `MEDIA_MAX_DURATION_S`."},
+        415: {"description": "Unsupported or unrecognised container (detected from the first bytes)."},
+        502: {"description": "Upstream inference endpoint error."},
+        504: {"description": "Request deadline reached before anything was scored."},
+    },
+)
+async def post_media(
+    file: UploadFile = File(..., description="Video file to analyze (multipart/form-data field name: `file`)."),
+    selection: str | None = Query(
+        None,
+        pattern="^(reservoir|quality)$",
+        description="Frame selection strategy (default: `VIDEO_FRAME_SELECTION`, else `reservoir`).",
+    ),
+    coverage: str = Query(
+        "window",
+        pattern="^(window|full)$",
+        description="`window`: first 10 seconds only. `full`: stratified sample over the whole video.",
+    ),
+    trace: RequestTrace | None = Depends(request_debug),
+    deadline: float | None = Depends(request_deadline),
+    lane: str = Depends(request_lane),
+):
+    """
+    Combined audio + video analysis endpoint.
+
+    - **Input**: multipart/form-data file upload (the video)
+    - **Side effects**: writes a `DetectionLog` row for the video verdict and one for the audio verdict
+    - **Output**: fused classification plus both per-modality verdicts
+    """
+
+    analyzer = Analyzer()
+
+    media_data, media_format = await _read_upload(file, "media", VIDEO_FORMATS, allow_base64=True)
+    container = await _run_blocking(_probe_upload, media_data, media_format, need_metadata=True)
+
+    try:
+        frames = int(os.getenv("VIDEO_FULL_COVERAGE_FRAMES", "20")) if coverage == "full" else 10
+        result = await _run_blocking(
+            analyzer.analyze_media,
+            media_data,
+            filename=getattr(file, "filename", None),
+            frames=frames,
+            seconds=10,
+            selection=selection,
+            coverage=coverage,
+            media_format=media_format,
+            container=container,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Media inference failed: {type(e).__name__}: {e}")
+
+    video_classification, video_score = _video_verdict_or_502(result["video"], coverage)
+
+    audio_result = result["audio"]
+    audio = None
+    partial = bool(result["video"].get("partial"))
+    if audio_result is not None:
+        if isinstance(audio_result, dict) and audio_result.get("skipped") == "deadline":
+            # Out of time for the soundtrack: answer from the frames, like any other partial result.
+            partial = True
+        elif isinstance(audio_result, dict) and "error" in audio_result:
+            raise _audio_error(audio_result)
+        else:
+            audio_classification, audio_score = audio_verdict(audio_result)
+            audio = {"classification": audio_classification, "score": audio_score}
+
+    # Each modality is logged exactly as its single-modality endpoint would log it.
+    await _run_blocking(_save_detection_log, video_classification, video_score, video_log_fields(result["video"], coverage))
+    if audio is not None:
+        await _run_blocking(_save_detection_log, audio["classification"], audio["score"], audio_log_fields(audio_result))
+
+    response = {
+        "classification": fuse_verdicts(video_classification, audio["classification"] if audio else None),
+        "video": {"classification": video_classification, "score": video_score},
+        "audio": audio,
+    }
+    if partial:
+        response["partial"] = True
+    if trace is not None:
+        response["debug"] = {
+            **trace.summary(),
+            "analysis": result["video"].get("metadata"),
+            "audio_analysis": _audio_debug(audio_result) if isinstance(audio_result, dict) else None,
         }
-    )
+
+    return jsonable_encoder(response)
+
+
+def _is_end_message(text: str) -> bool:
+    text = (text or "").strip()
+    if text.lower() == "end":
+        return True
+    try:
+        return json.loads(text).get("type") == "end"
+    except Exception:
+        return False
+
+
+@media_handler.websocket("/ws/analyze_stream")
+async def analyze_stream(websocket: WebSocket):
+    """
+    Live analysis of a MediaRecorder recording (WebM/Opus, optionally with VP8/VP9 video).
+
+    Protocol:
+    - client sends each `MediaRecorder` chunk as a **binary** message (the first one carries the WebM header)
+    - every `STREAM_UPDATE_INTERVAL_S` seconds (default 2) the server scores the rolling audio/frame
+      windows and sends `{"type": "update", "seq", "media_seconds", "classification", "audio", "video", "errors"}`
+      (`audio` / `video` are `{"classification", "score"}` with the same meaning as the upload endpoints)
+    - client sends the text message `end` (or `{"type": "end"}`) when recording stops; the server
+      flushes the decoders, sends `{"type": "final", ...}`, logs the final verdicts once and closes
+    - errors are sent as `{"type": "error", "detail": "..."}` before closing
+    """
+    await websocket.accept()
+    try:
+        session = StreamSession()
+        await session.start()
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": f"Stream analysis unavailable: {type(e).__name__}: {e}"})
+        await websocket.close(code=1011)
+        return
+
+    interval = float(os.getenv("STREAM_UPDATE_INTERVAL_S", "2"))
+
+    async def push_updates():
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if session.has_new_data():
+                    update = await session.analyze_window()
+                    await websocket.send_json({"type": "update", **update})
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            raise
+        except Exception as e:
+            # Closing makes the receive loop below see the disconnect and clean up.
+            try:
+                await websocket.send_json({"type": "error", "detail": f"Stream analysis failed: {type(e).__name__}: {e}"})
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+
+    in_flight = ANALYSES_IN_FLIGHT.labels(pipeline="stream")
+    in_flight.inc()
+    pusher = asyncio.create_task(push_updates())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                await session.feed(message["bytes"])
+            elif message.get("text") is not None and _is_end_message(message["text"]):
+                break
+
+        pusher.cancel()
+        await asyncio.gather(pusher, return_exceptions=True)
+        await session.close_input()
+        final = await session.analyze_window()
+
+        # Log once per connection, like `/analyze_media` (one row per analyzed modality).
+        if final["video"] is not None:
+            await _run_blocking(
+                _save_detection_log, final["video"]["classification"], final["video"]["score"], {"modality": "video", "coverage": "stream"}
+            )
+        if final["audio"] is not None:
+            await _run_blocking(_save_detection_log, final["audio"]["classification"], final["audio"]["score"], {"modality": "audio"})
+
+        await websocket.send_json(jsonable_encoder({"type": "final", **final}))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except StreamLimitExceeded as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1009)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1003)
+    except Exception as e:
+        # Same report as a failed periodic update (decoder crash, DB error on the final log, ...).
+        try:
+            await websocket.send_json({"type": "error", "detail": f"Stream analysis failed: {type(e).__name__}: {e}"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        pusher.cancel()
+        await asyncio.gather(pusher, return_exceptions=True)
+        await session.abort()
+        in_flight.dec()
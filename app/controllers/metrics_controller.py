@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Response
+from app.utils.metrics import render_metrics
+
+metrics_handler = APIRouter(tags=["metrics"])
+
+
+@metrics_handler.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description=(
+        "## What this endpoint does\n"
+        "Exposes request counters, per-stage latency histograms, upstream error/byte counters and "
+        "in-flight gauges in the Prometheus text format.\n\n"
+        "When `PROMETHEUS_MULTIPROC_DIR` is set, samples from all worker processes are aggregated."
+    ),
+    include_in_schema=False,
+)
+def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,198 @@
+"""
+Admission control for the media endpoints.
+
+Requests are admitted (or rejected) from their headers alone, before the body is read, so a
+rejected upload costs almost nothing. See `AdmissionMiddleware`.
+
+Settings (env):
+- ADMISSION_MAX_CONCURRENT: analyses running at once (default 8)
+- ADMISSION_MAX_QUEUE: requests allowed to wait for a slot (default 16)
+- ADMISSION_MAX_QUEUED_BYTES: declared body bytes of running + waiting requests (default 512 MB)
+- ADMISSION_QUEUE_TIMEOUT_S: max time in the queue before a 503 (default 10)
+- ADMISSION_UNKNOWN_LENGTH_BYTES: bytes assumed when there is no Content-Length (default 32 MB)
+- RATE_LIMIT_RPS / RATE_LIMIT_BURST: optional per-client token bucket (disabled when RPS is 0, the default);
+  clients are identified by `X-API-Key`, else by IP address
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from app.utils.metrics import (
+    ADMISSION_ACTIVE,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUED_BYTES,
+    ADMISSION_REJECTIONS,
+    ADMISSION_WAIT_SECONDS,
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int | None = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded FIFO wait queue and a byte budget.
+
+    Single event loop only (one instance per worker process). Slots are handed directly from
+    a finishing request to the oldest waiter, so queued requests are served in order.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent: int,
+        max_queue: int,
+        max_queued_bytes: int,
+        queue_timeout_s: float,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_queued_bytes = max_queued_bytes
+        self.queue_timeout_s = queue_timeout_s
+
+        self.running = 0
+        self.queued_bytes = 0
+        self._waiters = deque()
+        # EWMA of how long an admitted request holds its slot; drives Retry-After.
+        self._avg_hold_s = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        backlog = (len(self._waiters) + 1) / float(self.max_concurrent)
+        return max(1, math.ceil(self._avg_hold_s * backlog))
+
+    def _reject(self, status_code: int, reason: str, detail: str) -> AdmissionRejected:
+        ADMISSION_REJECTIONS.labels(reason=reason).inc()
+        # Retrying cannot help a request that is larger than the whole budget.
+        retry_after = self.retry_after() if status_code == 503 else None
+        return AdmissionRejected(status_code, reason, detail, retry_after)
+
+    def _add_bytes(self, nbytes: int) -> None:
+        self.queued_bytes += nbytes
+        ADMISSION_QUEUED_BYTES.inc(nbytes)
+
+    def _remove_bytes(self, nbytes: int) -> None:
+        self.queued_bytes -= nbytes
+        ADMISSION_QUEUED_BYTES.dec(nbytes)
+
+    async def acquire(self, nbytes: int) -> None:
+        """Wait for a slot or raise `AdmissionRejected`. Pair every successful call with `release()`."""
+        if nbytes > self.max_queued_bytes:
+            raise self._reject(413, "too_large", f"Request body exceeds the admission byte budget ({self.max_queued_bytes} bytes)")
+        if self.queued_bytes + nbytes > self.max_queued_bytes:
+            raise self._reject(503, "queued_bytes", "Server is busy (too many bytes queued); retry later")
+
+        if self.running < self.max_concurrent and not self._waiters:
+            self.running += 1
+            ADMISSION_ACTIVE.inc()
+            self._add_bytes(nbytes)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(503, "queue_full", "Server is busy (analysis queue full); retry later")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        ADMISSION_QUEUE_DEPTH.inc()
+        self._add_bytes(nbytes)
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(fut, self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self._forget(fut, nbytes)
+            raise self._reject(503, "queue_timeout", "Server is busy (timed out waiting for an analysis slot); retry later")
+        except asyncio.CancelledError:
+            # Client went away while queued. If the slot was handed over in the meantime, pass it on.
+            if fut.done() and not fut.cancelled():
+                self.release(nbytes, hold_s=None)
+            else:
+                self._forget(fut, nbytes)
+            raise
+        finally:
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - t0)
+
+    def _forget(self, fut, nbytes: int) -> None:
+        try:
+            self._waiters.remove(fut)
+            ADMISSION_QUEUE_DEPTH.dec()
+        except ValueError:
+            pass
+        self._remove_bytes(nbytes)
+
+    def release(self, nbytes: int, hold_s: float | None) -> None:
+        self._remove_bytes(nbytes)
+        if hold_s is not None:
+            self._avg_hold_s = 0.8 * self._avg_hold_s + 0.2 * hold_s
+        while self._waiters:
+            fut = self._waiters.popleft()
+            ADMISSION_QUEUE_DEPTH.dec()
+            if not fut.done():
+                # Hand the slot over; `running` stays the same.
+                fut.set_result(None)
+                return
+        self.running -= 1
+        ADMISSION_ACTIVE.dec()
+
+
+class ClientRateLimiter:
+    """Token bucket per client key (`rate` tokens/s, up to `burst`). Keeps at most `max_clients` buckets (LRU)."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._buckets: OrderedDict = OrderedDict()  # key -> (tokens, last_refill)
+
+    def check(self, key: str) -> None:
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            ADMISSION_REJECTIONS.labels(reason="rate_limited").inc()
+            raise AdmissionRejected(
+                429,
+                "rate_limited",
+                "Rate limit exceeded for this client; retry later",
+                max(1, math.ceil((1.0 - tokens) / self.rate)),
+            )
+        self._buckets[key] = (tokens - 1.0, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+
+_controller = None
+_rate_limiter = None
+
+
+def admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "8")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+            max_queued_bytes=int(os.getenv("ADMISSION_MAX_QUEUED_BYTES", str(512 * 1024 * 1024))),
+            queue_timeout_s=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "10")),
+        )
+    return _controller
+
+
+def client_rate_limiter() -> ClientRateLimiter | None:
+    global _rate_limiter
+    rate = float(os.getenv("RATE_LIMIT_RPS", "0"))
+    if rate <= 0:
+        return None
+    if _rate_limiter is None:
+        _rate_limiter = ClientRateLimiter(rate, float(os.getenv("RATE_LIMIT_BURST", str(max(1.0, 2 * rate)))))
+    return _rate_limiter
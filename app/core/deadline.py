@@ -0,0 +1,41 @@
+import os
+import time
+
+from fastapi import Header, Query, Request
+
+from app.utils.deadline import deadline_scope
+
+
+async def request_deadline(
+    request: Request,
+    deadline_s: float | None = Query(
+        None,
+        gt=0,
+        description=(
+            "Latency budget for this request in seconds. Frames still unscored when it runs out are "
+            "dropped and the verdict is computed from the frames that finished (`partial: true`). "
+            "Capped by the server's `REQUEST_DEADLINE_S`."
+        ),
+    ),
+    x_deadline_s: float | None = Header(
+        None,
+        gt=0,
+        description="Same as `deadline_s`, for clients that set it per connection; the smaller of the two applies.",
+    ),
+):
+    """
+    FastAPI dependency for the media endpoints.
+
+    Yields the absolute deadline (`time.perf_counter()` based) or None. The budget is the
+    smaller of `REQUEST_DEADLINE_S` (0/unset = no server-side deadline) and the client's
+    `deadline_s` / `X-Deadline-S`, counted from when the request reached the app (admission wait included).
+    """
+    server_budget_s = float(os.getenv("REQUEST_DEADLINE_S", "0"))
+    budgets = [b for b in (server_budget_s, deadline_s, x_deadline_s) if b and b > 0]
+    if not budgets:
+        yield None
+        return
+
+    started_at = getattr(request.state, "request_started_at", None) or time.perf_counter()
+    with deadline_scope(started_at + min(budgets)) as at:
+        yield at
@@ -0,0 +1,40 @@
+import hmac
+import os
+
+from fastapi import Header, HTTPException, Query, Request
+
+from app.utils.profiling import RequestTrace, activate_trace
+
+
+def debug_token_is_valid(x_debug_token: str | None) -> bool:
+    expected = os.getenv("DEBUG_TOKEN")
+    if not expected or not x_debug_token:
+        return False
+    return hmac.compare_digest(expected.encode("utf-8"), x_debug_token.encode("utf-8"))
+
+
+async def request_debug(
+    request: Request,
+    debug: bool = Query(False, description="Attach a stage-timing breakdown to the response (requires `X-Debug-Token`)."),
+    profile: bool = Query(False, description="Also capture a cProfile profile of this request (requires `X-Debug-Token`)."),
+    x_debug_token: str | None = Header(None, description="Must match the server's `DEBUG_TOKEN` to enable debug output."),
+):
+    """
+    FastAPI dependency for the media endpoints.
+
+    Yields a `RequestTrace` when debug output was requested with a valid token, otherwise None.
+    Debug mode is disabled entirely while `DEBUG_TOKEN` is unset.
+    """
+    if not debug and not profile:
+        yield None
+        return
+
+    if not debug_token_is_valid(x_debug_token):
+        raise HTTPException(status_code=403, detail="Debug mode requires a valid X-Debug-Token header.")
+
+    trace = RequestTrace(
+        profile=profile,
+        request_started_at=getattr(request.state, "request_started_at", None),
+    )
+    with activate_trace(trace):
+        yield trace
@@ -0,0 +1,258 @@
+"""
+Priority lanes for upstream inference calls.
+
+Every upstream call (one image frame, one audio clip) takes a slot from a per-process budget
+before it is sent. When calls are waiting, freed slots go to the lanes in proportion to their
+weights (stride scheduling), so a bulk job cannot crowd out interactive checks, and a bulk
+call that has waited longer than LANE_MAX_WAIT_S is served next regardless of weights.
+
+Lanes and the slot budget are per process: every API worker has its own scheduler, and the bulk
+CLI (`app.cli.bulk_analyze`) runs in a separate process with its own. Lanes only order the calls
+made within one process; they do not throttle a bulk CLI run against the API. Bound such a run
+with UPSTREAM_MAX_CONCURRENT in its environment (or point it at separate upstream replicas).
+
+The lane of a request is chosen by `request_lane` and carried in a ContextVar, so the
+upstream fan-out threads (started with `contextvars.copy_context()`) use it too.
+
+Settings (env):
+- UPSTREAM_MAX_CONCURRENT: upstream calls in flight per process, all lanes (default 16; 0 disables the scheduler)
+- LANE_WEIGHTS: share of the freed slots per lane (default "interactive=4,bulk=1")
+- LANE_MAX_WAIT_S: starvation guard, max wait before a call jumps the weights (default 5)
+- LANE_QUEUE_TIMEOUT_S: max wait for a slot (default 60; shortened by the request deadline)
+- PRIORITY_DEFAULT_LANE: lane when neither the request nor its API key choose one (default "interactive")
+- PRIORITY_LANE_API_KEYS: pinned lanes per `X-API-Key`, e.g. "batch-key=bulk,ui-key=interactive"
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from fastapi import Header, Query
+
+from app.utils.deadline import remaining
+from app.utils.metrics import (
+    UPSTREAM_LANE_ACTIVE,
+    UPSTREAM_LANE_QUEUE_DEPTH,
+    UPSTREAM_LANE_TIMEOUTS,
+    UPSTREAM_LANE_WAIT_SECONDS,
+)
+
+# Highest priority first.
+LANES = ("interactive", "bulk")
+
+_lane: contextvars.ContextVar = contextvars.ContextVar("deeptrust_priority_lane", default=None)
+
+
+class UpstreamSlotTimeout(Exception):
+    """Raised when an upstream call could not get a scheduler slot in time."""
+
+
+class _Waiter:
+    __slots__ = ("lane", "enqueued_at", "event", "granted")
+
+    def __init__(self, lane: str):
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+
+
+class LaneScheduler:
+    """
+    Weighted fair sharing of `max_concurrent` slots between lanes (thread-safe).
+
+    Each grant advances the lane's pass by 1/weight; a freed slot goes to the waiting lane with
+    the lowest pass. A lane that was idle re-enters at the current minimum pass instead of
+    spending credit it banked while idle.
+    """
+
+    def __init__(self, *, max_concurrent: int, weights: dict, max_wait_s: float):
+        self.max_concurrent = max(1, max_concurrent)
+        self.weights = {lane: max(0.01, float(weights.get(lane, 1.0))) for lane in LANES}
+        self.max_wait_s = max_wait_s
+
+        self.running = 0
+        self._lock = threading.Lock()
+        self._queues = {lane: deque() for lane in LANES}
+        self._active = {lane: 0 for lane in LANES}
+        self._pass = {lane: 0.0 for lane in LANES}
+
+    def queue_depth(self, lane: str) -> int:
+        return len(self._queues[lane])
+
+    def _busy(self, lane: str) -> bool:
+        return bool(self._queues[lane]) or self._active[lane] > 0
+
+    def _wake(self, lane: str) -> None:
+        if self._busy(lane):
+            return
+        others = [self._pass[other] for other in LANES if other != lane and self._busy(other)]
+        if others:
+            self._pass[lane] = max(self._pass[lane], min(others))
+
+    def _grant(self, lane: str) -> None:
+        self._active[lane] += 1
+        self._pass[lane] += 1.0 / self.weights[lane]
+        UPSTREAM_LANE_ACTIVE.labels(lane=lane).inc()
+
+    def _pick(self) -> _Waiter | None:
+        heads = [q[0] for q in self._queues.values() if q]
+        if not heads:
+            return None
+        now = time.monotonic()
+        starving = [w for w in heads if now - w.enqueued_at >= self.max_wait_s]
+        if starving:
+            return min(starving, key=lambda w: w.enqueued_at)
+        # Ties go to the higher-priority lane (LANES order).
+        return min(heads, key=lambda w: (self._pass[w.lane], LANES.index(w.lane)))
+
+    def acquire(self, lane: str, timeout_s: float | None) -> None:
+        """Wait for a slot or raise `UpstreamSlotTimeout`. Pair every successful call with `release(lane)`."""
+        t0 = time.perf_counter()
+        with self._lock:
+            self._wake(lane)
+            if self.running < self.max_concurrent and not any(self._queues.values()):
+                self.running += 1
+                self._grant(lane)
+                UPSTREAM_LANE_WAIT_SECONDS.labels(lane=lane).observe(0.0)
+                return
+            waiter = _Waiter(lane)
+            self._queues[lane].append(waiter)
+            UPSTREAM_LANE_QUEUE_DEPTH.labels(lane=lane).inc()
+
+        waiter.event.wait(timeout_s)
+        UPSTREAM_LANE_WAIT_SECONDS.labels(lane=lane).observe(time.perf_counter() - t0)
+        with self._lock:
+            if waiter.granted:
+                return
+            self._queues[lane].remove(waiter)
+            UPSTREAM_LANE_QUEUE_DEPTH.labels(lane=lane).dec()
+        UPSTREAM_LANE_TIMEOUTS.labels(lane=lane).inc()
+        raise UpstreamSlotTimeout(f"Timed out waiting for an upstream inference slot (lane={lane})")
+
+    def release(self, lane: str) -> None:
+        with self._lock:
+            self._active[lane] -= 1
+            UPSTREAM_LANE_ACTIVE.labels(lane=lane).dec()
+            waiter = self._pick()
+            if waiter is None:
+                self.running -= 1
+                return
+            # Hand the slot over; `running` stays the same.
+            self._queues[waiter.lane].popleft()
+            UPSTREAM_LANE_QUEUE_DEPTH.labels(lane=waiter.lane).dec()
+            self._grant(waiter.lane)
+            waiter.granted = True
+            waiter.event.set()
+
+
+def _parse_weights(spec: str) -> dict:
+    weights = {}
+    for item in spec.split(","):
+        lane, _, weight = item.partition("=")
+        if lane.strip() in LANES and weight.strip():
+            weights[lane.strip()] = float(weight)
+    return weights
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def upstream_scheduler() -> LaneScheduler | None:
+    """The per-process scheduler, or None when UPSTREAM_MAX_CONCURRENT is 0."""
+    global _scheduler
+    max_concurrent = int(os.getenv("UPSTREAM_MAX_CONCURRENT", "16"))
+    if max_concurrent <= 0:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LaneScheduler(
+                    max_concurrent=max_concurrent,
+                    weights=_parse_weights(os.getenv("LANE_WEIGHTS", "interactive=4,bulk=1")),
+                    max_wait_s=float(os.getenv("LANE_MAX_WAIT_S", "5")),
+                )
+    return _scheduler
+
+
+def _default_lane() -> str:
+    lane = (os.getenv("PRIORITY_DEFAULT_LANE") or "interactive").strip().lower()
+    return lane if lane in LANES else "interactive"
+
+
+def current_lane() -> str:
+    return _lane.get() or _default_lane()
+
+
+@contextmanager
+def lane_scope(lane: str | None):
+    """Publish the priority lane for the current context (no-op for None)."""
+    if lane is None:
+        yield None
+        return
+    token = _lane.set(lane)
+    try:
+        yield lane
+    finally:
+        _lane.reset(token)
+
+
+@contextmanager
+def upstream_slot():
+    """Hold a scheduler slot in the current lane around one upstream call."""
+    scheduler = upstream_scheduler()
+    if scheduler is None:
+        yield
+        return
+    lane = current_lane()
+    left = remaining()
+    timeout_s = float(os.getenv("LANE_QUEUE_TIMEOUT_S", "60"))
+    scheduler.acquire(lane, timeout_s if left is None else max(0.0, min(timeout_s, left)))
+    try:
+        yield
+    finally:
+        scheduler.release(lane)
+
+
+def _pinned_lanes() -> dict:
+    pinned = {}
+    for item in (os.getenv("PRIORITY_LANE_API_KEYS") or "").split(","):
+        key, _, lane = item.partition("=")
+        if key.strip() and lane.strip().lower() in LANES:
+            pinned[key.strip()] = lane.strip().lower()
+    return pinned
+
+
+def resolve_lane(requested: str | None, api_key: str | None) -> str:
+    """
+    Lane for a request: the lower priority of the requested lane and the API key's pinned lane.
+
+    A client can always demote itself to `bulk`; a key pinned to `bulk` cannot opt into `interactive`.
+    """
+    candidates = [lane for lane in (requested, _pinned_lanes().get(api_key or "")) if lane in LANES]
+    if not candidates:
+        return _default_lane()
+    return max(candidates, key=LANES.index)
+
+
+async def request_lane(
+    priority: str | None = Query(
+        None,
+        pattern="^(interactive|bulk)$",
+        description=(
+            "Scheduling lane for the upstream inference calls: `interactive` (default) or `bulk`. "
+            "API keys pinned to `bulk` (`PRIORITY_LANE_API_KEYS`) stay in `bulk`."
+        ),
+    ),
+    x_api_key: str | None = Header(None, description="Client API key; may pin the priority lane."),
+):
+    """
+    FastAPI dependency for the media endpoints.
+
+    Yields the lane name and makes it current for the request's upstream calls.
+    """
+    with lane_scope(resolve_lane(priority, x_api_key)) as lane:
+        yield lane
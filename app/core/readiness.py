@@ -0,0 +1,38 @@
+"""
+Startup readiness, reported by `GET /ready`.
+
+Startup work that would delay serving (database schema checks, see `init_db`) runs in the
+background after the server starts accepting connections. Each piece registers a check here;
+the instance is ready once every check has passed. Point load balancer / orchestrator readiness
+probes at `/ready` and liveness probes at `/health`.
+"""
+import threading
+import time
+
+_lock = threading.Lock()
+_checks: dict = {}
+_started_at = time.monotonic()
+
+
+def begin(name: str) -> None:
+    with _lock:
+        _checks[name] = {"status": "pending", "error": None}
+
+
+def finish(name: str, ok: bool = True, error: str | None = None) -> None:
+    with _lock:
+        _checks[name] = {
+            "status": "ok" if ok else "failed",
+            "error": error,
+            "after_s": round(time.monotonic() - _started_at, 3),
+        }
+
+
+def status() -> dict:
+    with _lock:
+        checks = {name: dict(check) for name, check in _checks.items()}
+    return {
+        "ready": all(c["status"] == "ok" for c in checks.values()),
+        "checks": checks,
+        "uptime_s": round(time.monotonic() - _started_at, 3),
+    }
@@ -1,16 +1,40 @@
-from jose import jwt
+"""
+User auth: password hashing, JWT access tokens and the `get_current_user` dependency.
+
+Not wired into any endpoint yet. Auth must stay cheap per request, so:
+- verified token claims are kept in a bounded LRU cache (AUTH_TOKEN_CACHE_SIZE, default 4096),
+  keyed by a SHA-256 of the token; an entry expires with the token's `exp` claim, or after
+  AUTH_TOKEN_CACHE_MAX_S (default 300) if that comes first. Invalid tokens are never cached.
+- user records are cached for AUTH_USER_CACHE_TTL_S (default 60; 0 disables the cache), up to
+  AUTH_USER_CACHE_SIZE (default 1024) users. Call `invalidate_user()` after changing or disabling
+  a user, so the change applies right away instead of after the TTL.
+- bcrypt (`verify_password`, ~0.2-0.4 s of CPU per check) runs in its own small thread pool
+  (AUTH_HASH_WORKERS, default 2) through `authenticate_user_async`, so logins neither block the
+  event loop nor take the threads the analysis endpoints use. Logins beyond the pool wait in line.
+
+Settings (env): SECRET_KEY (required to issue/verify tokens), ALGORITHM (default HS256).
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
 from passlib.context import CryptContext
-from datetime import datetime, timedelta, timezone
-import os
 
-# The content in this file is inteded to be used for the user auth.
-# Not finished yet, ignore...
+from app.schemas.other_schemas import User, UserInDB
+from app.utils.metrics import AUTH_CACHE, timed_stage
 
 SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="Auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth_2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -20,37 +44,138 @@ mock_db = {
         "email": "tim@gmail.com",
         "names": "Tim Andrew",
         "last_names": "Johnson",
-        "hashed_password": "",
+        "hash_password": "",
         "disabled": False,
     }
 }
 
+_CREDENTIALS_ERROR = HTTPException(
+    status_code=401,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+
+class _TTLCache:
+    """Thread-safe LRU of key -> (value, expires_at monotonic)."""
+
+    def __init__(self, name: str, size_env: str, default_size: int):
+        self.name = name
+        self._size_env = size_env
+        self._default_size = default_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(key)
+                AUTH_CACHE.labels(cache=self.name, result="hit").inc()
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+        AUTH_CACHE.labels(cache=self.name, result="miss").inc()
+        return None
+
+    def put(self, key, value, ttl_s: float) -> None:
+        if ttl_s <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl_s)
+            self._data.move_to_end(key)
+            while len(self._data) > int(os.getenv(self._size_env, str(self._default_size))):
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_token_cache = _TTLCache("token", "AUTH_TOKEN_CACHE_SIZE", 4096)
+_user_cache = _TTLCache("user", "AUTH_USER_CACHE_SIZE", 1024)
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+# Verified against when the user does not exist, so a login for an unknown user costs as much as a
+# wrong password and response times do not reveal which user names exist.
+_dummy_hash = None
+
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                _hash_pool = ThreadPoolExecutor(
+                    max_workers=max(1, int(os.getenv("AUTH_HASH_WORKERS", "2"))),
+                    thread_name_prefix="auth-hash",
+                )
+    return _hash_pool
+
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed_stage("auth", "verify_password"):
+        try:
+            return pwd_context.verify(plain_password, hashed_password)
+        except ValueError:
+            # Empty or malformed stored hash.
+            return False
 
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-#def get_user(db, username: str):
-#    if username in db:
-#        return UserInDB(**db[username])
+def _load_user(db, username: str) -> UserInDB | None:
+    record = db.get(username)
+    if record is None:
+        return None
+    return UserInDB(**record)
+
+
+def get_user(db, username: str) -> UserInDB | None:
+    """User record by name, served from the user cache when possible (missing users are not cached)."""
+    user = _user_cache.get(username)
+    if user is None:
+        user = _load_user(db, username)
+        if user is not None:
+            _user_cache.put(username, user, float(os.getenv("AUTH_USER_CACHE_TTL_S", "60")))
+    return user
 
 
-#def authenticate_user(db, username: str, password: str):
- #   user = get_user(db, username)
-#
-  #  if not user:
-    #    return False
-   # elif not verify_password(password, user.hash_password):
-     #   return False
-    #else:
-     #   return user
+def invalidate_user(username: str) -> None:
+    """Drop a user from the cache; call after updating, disabling or deleting the user."""
+    _user_cache.pop(username)
 
 
-def create_access_token(data: dict, expires_delta: timedelta or None = None):
+def authenticate_user(db, username: str, password: str) -> UserInDB | None:
+    # Always read the stored hash, never a cached copy, so a password change applies right away.
+    user = _load_user(db, username)
+    if user is None:
+        global _dummy_hash
+        if _dummy_hash is None:
+            _dummy_hash = get_password_hash("not-a-user")
+        verify_password(password, _dummy_hash)
+        return None
+    if not verify_password(password, user.hash_password):
+        return None
+    return user
+
+
+async def authenticate_user_async(db, username: str, password: str) -> UserInDB | None:
+    """`authenticate_user` on the bcrypt thread pool, for async handlers."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_pool(), authenticate_user, db, username, password)
+
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
 
     if expires_delta:  # if we have some sort of a specific expire time we want, or we put some one by default
@@ -58,8 +183,40 @@ def create_access_token(data: dict, expires_delta: timedelta or None = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
 
-    to_encode.update({"expires": expire})
+    # "exp" is the registered claim jose checks on decode.
+    to_encode.update({"exp": expire})
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    
+
     return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """Verified claims of `token` (cached until it expires); raises JWTError when invalid or expired."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    claims = _token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    with timed_stage("auth", "decode_token"):
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    ttl_s = float(os.getenv("AUTH_TOKEN_CACHE_MAX_S", "300"))
+    if "exp" in claims:
+        ttl_s = min(ttl_s, float(claims["exp"]) - time.time())
+    _token_cache.put(key, claims, ttl_s)
+    return claims
+
+
+async def get_current_user(token: str = Depends(oauth_2_scheme)) -> User:
+    """FastAPI dependency: the active user the bearer token belongs to, else 401."""
+    try:
+        claims = decode_access_token(token)
+    except JWTError:
+        raise _CREDENTIALS_ERROR
+    username = claims.get("sub")
+    if not username:
+        raise _CREDENTIALS_ERROR
+    user = get_user(mock_db, username)
+    if user is None or user.disabled:
+        raise _CREDENTIALS_ERROR
+    return User(**user.model_dump(exclude={"hash_password"}))
@@ -0,0 +1,74 @@
+import json
+import time
+
+from app.core.admission import AdmissionRejected, admission_controller, client_rate_limiter
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware that admits media requests before their body is read.
+
+    Only HTTP requests whose path starts with one of `path_prefixes` are controlled. The
+    decision uses the declared `Content-Length` (multipart overhead included), so a rejected
+    upload is answered with `503` / `429` / `413` + `Retry-After` without reading the body.
+    The slot is held until the response (including streamed responses) has been sent.
+    Checks on the content itself (the 415 format sniff) run in the handlers, after the body
+    has been received.
+    """
+
+    def __init__(self, app, path_prefixes: tuple[str, ...] = ("/analyze_",), unknown_length_bytes: int = 32 * 1024 * 1024):
+        self.app = app
+        self.path_prefixes = path_prefixes
+        self.unknown_length_bytes = unknown_length_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope.get("path", "").startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        nbytes = self._declared_length(headers)
+
+        try:
+            limiter = client_rate_limiter()
+            if limiter is not None:
+                limiter.check(self._client_key(scope, headers))
+            controller = admission_controller()
+            await controller.acquire(nbytes)
+        except AdmissionRejected as e:
+            await self._send_rejection(send, e)
+            return
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(nbytes, hold_s=time.perf_counter() - t0)
+
+    def _declared_length(self, headers: dict) -> int:
+        try:
+            return max(0, int(headers[b"content-length"]))
+        except (KeyError, ValueError):
+            return self.unknown_length_bytes
+
+    @staticmethod
+    def _client_key(scope, headers: dict) -> str:
+        api_key = headers.get(b"x-api-key")
+        if api_key:
+            return "key:" + api_key.decode("latin-1")
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    @staticmethod
+    async def _send_rejection(send, e: AdmissionRejected) -> None:
+        body = json.dumps({"detail": e.detail}).encode("utf-8")
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            # The body was never read; make sure the client does not try to reuse the connection.
+            (b"connection", b"close"),
+        ]
+        if e.retry_after is not None:
+            headers.append((b"retry-after", str(e.retry_after).encode("ascii")))
+        await send({"type": "http.response.start", "status": e.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,41 @@
+import time
+
+from app.utils.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that counts requests by endpoint/status and tracks in-flight requests.
+
+    The `endpoint` label is the matched route template (e.g. `/logs/get_by_id`), never the raw
+    path, so unknown URLs collapse into a single `unmatched` series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        t0 = time.perf_counter()
+        # Exposed as `request.state.request_started_at` for the debug timing breakdown.
+        scope.setdefault("state", {})["request_started_at"] = t0
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.labels(endpoint=endpoint, method=scope.get("method", ""), status=str(status_code)).inc()
+            HTTP_REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - t0)
@@ -1,8 +1,12 @@
 import os
 
-from sqlalchemy import Table, Column, Boolean, Integer, Date, Time, Float, String, text
+from sqlalchemy import Table, Column, Boolean, Integer, Date, Time, Float, String, LargeBinary, func, inspect, select, text
 from app.config.db import meta, engine
 
+# Bump when `detection_log` gains columns or its layout changes: `init_db` skips the DDL checks
+# (create/inspect/ALTER) when the database already records this version.
+SCHEMA_VERSION = 1
+
 detection_log = Table(
     "DetectionLog",
     meta,
@@ -12,39 +16,97 @@ detection_log = Table(
     Column("hour", Time, index=True),
     Column("classification", String, index=True, nullable=True),
     Column("score", Float, nullable=True),
+    # Raw model outputs, so verdicts can be recomputed offline (see `services.rescoring`):
+    # - modality: "video" | "audio"; coverage: "window" | "full" for video uploads
+    # - raw_scores: little-endian float32 array; per-frame realism (0..1, frame order) for video,
+    #   [deepfake_score (0..2)] for audio
+    # - raw_segments: little-endian int16 segment index per frame (video, coverage=full only)
+    Column("modality", String, nullable=True),
+    Column("coverage", String, nullable=True),
+    Column("raw_scores", LargeBinary, nullable=True),
+    Column("raw_segments", LargeBinary, nullable=True),
 )
 
+schema_version = Table(
+    "SchemaVersion",
+    meta,
+    Column("version", Integer, nullable=False),
+)
+
+
+def stored_schema_version() -> int | None:
+    """Schema version recorded in the database, None when there is none (fresh or pre-versioning DB)."""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(func.max(schema_version.c.version))).scalar()
+    except Exception:
+        return None
+
+
+def _record_schema_version() -> None:
+    with engine.begin() as connection:
+        connection.execute(schema_version.delete())
+        connection.execute(schema_version.insert().values(version=SCHEMA_VERSION))
+
+
+def _add_missing_columns():
+    """Lightweight "migration" for existing DBs: add any column of `detection_log` the table lacks."""
+    from app.repository import detection_log_repository as partitions
+
+    existing = {c["name"] for c in inspect(engine).get_columns(detection_log.name)}
+    missing = [column for column in detection_log.columns if column.name not in existing]
+    if not missing:
+        return
+    with engine.connect() as connection:
+        emulated = engine.dialect.name == "sqlite" and partitions.is_partitioned(connection)
+    if emulated:
+        # SQLite partitions sit behind a view: alter each partition table, then the view.
+        partitions.add_missing_columns(missing)
+        return
+    with engine.begin() as connection:
+        for column in missing:
+            column_type = column.type.compile(dialect=engine.dialect)
+            connection.execute(text(f'ALTER TABLE "{detection_log.name}" ADD COLUMN "{column.name}" {column_type}'))
+
 # Wrap table creation in try-except to prevent startup failures
-def init_db():
-    """Initialize database tables. Call this on app startup."""
+def init_db() -> bool:
+    """
+    Initialize database tables. Call this on app startup.
+
+    Returns False when the database could not be initialized (the error is printed, not raised).
+    """
     try:
         # NOTE: Never drop tables on import. If you need a local reset, set RESET_DB=true.
-        if os.getenv("RESET_DB", "").lower() == "true":
+        from app.repository import detection_log_repository as partitions
+
+        reset = os.getenv("RESET_DB", "").lower() == "true"
+        if reset:
+            partitions.drop_partitioned_table()
             meta.drop_all(engine)
-        
-        meta.create_all(engine)
-        
-        # Lightweight "migration" for existing DBs: add new columns if missing.
+
+        # Schema already current: one SELECT instead of the create/inspect/ALTER round-trips.
+        if reset or stored_schema_version() != SCHEMA_VERSION:
+            # Time-partitioned layout on a fresh DB when LOG_PARTITIONING is set (see `detection_log_repository`).
+            partitions.create_partitioned_table()
+            meta.create_all(engine)
+
+            # Lightweight "migration" for existing DBs: add new columns if missing.
+            try:
+                _add_missing_columns()
+                _record_schema_version()
+            except Exception as e:
+                # Columns may already exist, that's okay; the version is not recorded, so this runs again next start.
+                print(f"Note: Could not add columns (may already exist): {e}")
+
         try:
-            with engine.begin() as connection:
-                connection.execute(
-                    text(
-                        'ALTER TABLE "DetectionLog" '
-                        'ADD COLUMN IF NOT EXISTS "classification" VARCHAR'
-                    )
-                )
-                connection.execute(
-                    text(
-                        'ALTER TABLE "DetectionLog" '
-                        'ADD COLUMN IF NOT EXISTS "score" DOUBLE PRECISION'
-                    )
-                )
+            partitions.run_maintenance()
         except Exception as e:
-            # Columns may already exist, that's okay
-            print(f"Note: Could not add columns (may already exist): {e}")
+            print(f"Note: DetectionLog partition maintenance failed: {e}")
+        return True
     except Exception as e:
         print(f"Warning: Database initialization error (may be expected on first run): {e}")
         # Don't fail startup - let the app start and handle DB errors at runtime
+        return False
 
 # Only create tables if explicitly requested via environment variable
 # This prevents failures during import
@@ -0,0 +1,511 @@
+"""
+Time-partitioned storage for `DetectionLog`, retention and bulk purge.
+
+With LOG_PARTITIONING=day|week|month the table is split into one partition per period of the
+`date` column (`DetectionLog_p<start YYYYMMDD>_<end YYYYMMDD>`) plus `DetectionLog_default`,
+which catches rows outside every partition. Each partition has its own (small) indexes, so
+inserts and date-bounded queries stay flat as history grows, and old data goes away by dropping
+whole partitions instead of deleting rows.
+
+- PostgreSQL: native declarative partitioning. `DetectionLog` is `PARTITION BY RANGE ("date")`;
+  the primary key becomes (id, date) as PostgreSQL requires, ids still come from one identity.
+- SQLite (local runs and tests): emulated. Partitions are plain tables, `DetectionLog` is a
+  UNION ALL view over them and INSTEAD OF triggers route inserts by date (ids from a shared
+  sequence table) and apply updates/deletes by id, so `LogService` queries run unchanged.
+  Updates do not move a row to another partition: `date` is not meant to change.
+- Other dialects, or LOG_PARTITIONING=off (default): one plain table; retention and range
+  deletes fall back to row deletes.
+
+An existing plain table is converted with `python -m app.cli.log_partitions migrate`; `init_db`
+only creates the partitioned layout on a fresh database.
+
+Maintenance (`run_maintenance`, at startup and every LOG_MAINTENANCE_INTERVAL_S):
+- creates the partitions for the current period and LOG_PARTITIONS_AHEAD (default 2) more, one
+  transaction per period; rows that reached the default partition before their period's
+  partition existed are moved into it;
+- retention: with LOG_RETENTION_DAYS > 0, drops every partition that ends on or before the
+  cutoff (a partition is kept until all of it has expired) and deletes expired rows from the
+  default partition.
+
+`delete_range(start, end)` truncates the partitions inside [start, end) and deletes rows only in
+the partitions that overlap its edges.
+"""
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import Column, Identity, Integer, MetaData, Table, func, select, text
+
+from app.config.db import engine
+from app.models.detection_log_model import detection_log
+from app.utils.metrics import LOG_PARTITIONS_DROPPED, LOG_ROWS_PURGED, timed_stage
+
+INTERVALS = ("day", "week", "month")
+
+_PARENT = detection_log.name
+_DEFAULT = f"{_PARENT}_default"
+_PREFIX = f"{_PARENT}_p"
+_SEQUENCE = f"{_PARENT}_seq"
+_LEGACY = f"{_PARENT}_legacy"
+
+
+def partitioning_interval() -> str | None:
+    """Configured partition period (LOG_PARTITIONING), or None when partitioning is off."""
+    interval = (os.getenv("LOG_PARTITIONING") or "off").strip().lower()
+    return interval if interval in INTERVALS else None
+
+
+def period_bounds(day: date, interval: str) -> tuple[date, date]:
+    """[start, end) of the partition period containing `day`."""
+    if interval == "day":
+        start = day
+        return start, start + timedelta(days=1)
+    if interval == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start, end
+
+
+def partition_name(start: date, end: date) -> str:
+    return f"{_PREFIX}{start:%Y%m%d}_{end:%Y%m%d}"
+
+
+def _parse_partition_name(name: str) -> dict | None:
+    bounds = name[len(_PREFIX):].split("_") if name.startswith(_PREFIX) else []
+    if len(bounds) != 2:
+        return None
+    try:
+        start, end = (date(int(b[:4]), int(b[4:6]), int(b[6:8])) for b in bounds)
+    except ValueError:
+        return None
+    return {"name": name, "start": start, "end": end}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _dialect() -> str:
+    return engine.dialect.name
+
+
+def is_partitioned(conn) -> bool:
+    """True when `DetectionLog` is partitioned (native, or the SQLite view emulation)."""
+    if _dialect() == "postgresql":
+        kind = conn.execute(
+            text("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(:name)"), {"name": _quote(_PARENT)}
+        ).scalar()
+        return kind == "p"
+    if _dialect() == "sqlite":
+        kind = conn.execute(text("SELECT type FROM sqlite_master WHERE name = :name"), {"name": _PARENT}).scalar()
+        return kind == "view"
+    return False
+
+
+def list_partitions(conn) -> list[dict]:
+    """Range partitions (not the default one), oldest first: [{"name", "start", "end"}, ...]."""
+    if _dialect() == "postgresql":
+        names = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:parent)"
+            ),
+            {"parent": _quote(_PARENT)},
+        ).scalars()
+    else:
+        names = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars()
+
+    out = [p for p in (_parse_partition_name(name) for name in names) if p is not None]
+    out.sort(key=lambda p: p["start"])
+    return out
+
+
+def _default_has_rows(conn, start: date, end: date) -> bool:
+    return (
+        conn.execute(
+            text(f'SELECT 1 FROM {_quote(_DEFAULT)} WHERE "date" >= :start AND "date" < :end LIMIT 1'),
+            {"start": start, "end": end},
+        ).first()
+        is not None
+    )
+
+
+# ---- PostgreSQL ----
+
+
+def _pg_parent_table() -> Table:
+    """`detection_log` as a partitioned table: identity id, primary key (id, date)."""
+    columns = []
+    for column in detection_log.columns:
+        if column.name == "id":
+            columns.append(Column("id", Integer, Identity(), primary_key=True))
+        else:
+            copy = column._copy()
+            if column.name == "date":
+                copy.primary_key = True
+                copy.nullable = False
+            columns.append(copy)
+    return Table(_PARENT, MetaData(), *columns, postgresql_partition_by='RANGE ("date")')
+
+
+def _pg_create_partition(conn, start: date, end: date) -> None:
+    name = _quote(partition_name(start, end))
+    create = text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {_quote(_PARENT)} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    if not _default_has_rows(conn, start, end):
+        conn.execute(create)
+        return
+    # Rows for this range already landed in the default partition (written before the partition
+    # existed); PostgreSQL refuses the new partition while they are there. Detach the default,
+    # create the partition, move the rows over and re-attach, all in this transaction.
+    default = _quote(_DEFAULT)
+    cols = ", ".join(_quote(c.name) for c in detection_log.columns)
+    conn.execute(text(f"ALTER TABLE {_quote(_PARENT)} DETACH PARTITION {default}"))
+    conn.execute(create)
+    conn.execute(
+        text(
+            f'WITH moved AS (DELETE FROM {default} WHERE "date" >= :start AND "date" < :end RETURNING {cols}) '
+            f"INSERT INTO {name} ({cols}) SELECT {cols} FROM moved"
+        ),
+        {"start": start, "end": end},
+    )
+    conn.execute(text(f"ALTER TABLE {_quote(_PARENT)} ATTACH PARTITION {default} DEFAULT"))
+
+
+def _pg_create_layout(conn) -> None:
+    _pg_parent_table().create(conn)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {_quote(_DEFAULT)} PARTITION OF {_quote(_PARENT)} DEFAULT"))
+
+
+# ---- SQLite emulation ----
+
+
+def _sqlite_partition_table(name: str) -> Table:
+    return detection_log.to_metadata(MetaData(), name=name)
+
+
+def _sqlite_create_partition(conn, start: date, end: date) -> None:
+    name = partition_name(start, end)
+    _sqlite_partition_table(name).create(conn, checkfirst=True)
+    if _default_has_rows(conn, start, end):
+        # Rows written before the partition existed: move them, like the PostgreSQL path.
+        cols = ", ".join(_quote(c.name) for c in detection_log.columns)
+        bounds = {"start": start, "end": end}
+        conn.execute(
+            text(
+                f"INSERT INTO {_quote(name)} ({cols}) SELECT {cols} FROM {_quote(_DEFAULT)} "
+                'WHERE "date" >= :start AND "date" < :end'
+            ),
+            bounds,
+        )
+        conn.execute(text(f'DELETE FROM {_quote(_DEFAULT)} WHERE "date" >= :start AND "date" < :end'), bounds)
+
+
+def _sqlite_rebuild_view(conn) -> None:
+    """(Re)create the `DetectionLog` view and its routing triggers over the current partitions."""
+    partitions = list_partitions(conn)
+    tables = [p["name"] for p in partitions] + [_DEFAULT]
+    cols = [c.name for c in detection_log.columns]
+    col_list = ", ".join(_quote(c) for c in cols)
+    new_values = ", ".join(
+        "COALESCE(NEW.id, last_insert_rowid())" if c == "id" else f"NEW.{_quote(c)}" for c in cols
+    )
+
+    conn.execute(text(f"DROP VIEW IF EXISTS {_quote(_PARENT)}"))
+    conn.execute(
+        text(
+            f"CREATE VIEW {_quote(_PARENT)} AS "
+            + " UNION ALL ".join(f"SELECT {col_list} FROM {_quote(t)}" for t in tables)
+        )
+    )
+
+    # Inserts: take an id from the sequence table (unless one was given), then route by date.
+    conditions = [
+        f"(NEW.\"date\" >= '{p['start'].isoformat()}' AND NEW.\"date\" < '{p['end'].isoformat()}')"
+        for p in partitions
+    ]
+    default_condition = f"NEW.\"date\" IS NULL OR NOT ({' OR '.join(conditions)})" if conditions else "1"
+    routes = [
+        f"INSERT INTO {_quote(p['name'])} ({col_list}) SELECT {new_values} WHERE {cond};"
+        for p, cond in zip(partitions, conditions)
+    ]
+    routes.append(f"INSERT INTO {_quote(_DEFAULT)} ({col_list}) SELECT {new_values} WHERE {default_condition};")
+    conn.execute(
+        text(
+            f"CREATE TRIGGER {_quote(_PARENT + '_insert')} INSTEAD OF INSERT ON {_quote(_PARENT)} BEGIN "
+            f"INSERT INTO {_quote(_SEQUENCE)} (id) SELECT NEW.id WHERE NEW.id IS NOT NULL "
+            f"AND NEW.id > (SELECT COALESCE(MAX(id), 0) FROM {_quote(_SEQUENCE)}); "
+            f"INSERT INTO {_quote(_SEQUENCE)} (id) SELECT NULL WHERE NEW.id IS NULL; "
+            f"DELETE FROM {_quote(_SEQUENCE)} WHERE id < last_insert_rowid(); "
+            + " ".join(routes)
+            + " END"
+        )
+    )
+
+    assignments = ", ".join(f"{_quote(c)} = NEW.{_quote(c)}" for c in cols if c != "id")
+    conn.execute(
+        text(
+            f"CREATE TRIGGER {_quote(_PARENT + '_update')} INSTEAD OF UPDATE ON {_quote(_PARENT)} BEGIN "
+            + " ".join(f"UPDATE {_quote(t)} SET {assignments} WHERE id = OLD.id;" for t in tables)
+            + " END"
+        )
+    )
+    conn.execute(
+        text(
+            f"CREATE TRIGGER {_quote(_PARENT + '_delete')} INSTEAD OF DELETE ON {_quote(_PARENT)} BEGIN "
+            + " ".join(f"DELETE FROM {_quote(t)} WHERE id = OLD.id;" for t in tables)
+            + " END"
+        )
+    )
+
+
+def _sqlite_create_layout(conn) -> None:
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {_quote(_SEQUENCE)} (id INTEGER PRIMARY KEY AUTOINCREMENT)"))
+    _sqlite_partition_table(_DEFAULT).create(conn, checkfirst=True)
+    _sqlite_rebuild_view(conn)
+
+
+# ---- Public API ----
+
+
+def _create_partition(conn, start: date, end: date) -> None:
+    if _dialect() == "postgresql":
+        _pg_create_partition(conn, start, end)
+    else:
+        _sqlite_create_partition(conn, start, end)
+
+
+def _supported() -> bool:
+    return _dialect() in ("postgresql", "sqlite")
+
+
+def table_exists(conn) -> bool:
+    if _dialect() == "sqlite":
+        return conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": _PARENT}).first() is not None
+    from sqlalchemy import inspect
+
+    return inspect(conn).has_table(_PARENT)
+
+
+def create_partitioned_table() -> bool:
+    """Create the partitioned layout on a database without `DetectionLog`. Returns False if not applicable."""
+    if partitioning_interval() is None or not _supported():
+        return False
+    with engine.begin() as conn:
+        if table_exists(conn):
+            return False
+        if _dialect() == "postgresql":
+            _pg_create_layout(conn)
+        else:
+            _sqlite_create_layout(conn)
+    ensure_partitions()
+    return True
+
+
+def drop_partitioned_table() -> None:
+    """RESET_DB: remove the partitioned layout (partitions, default partition, SQLite view and sequence)."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return
+        if _dialect() == "postgresql":
+            conn.execute(text(f"DROP TABLE {_quote(_PARENT)} CASCADE"))
+            return
+        tables = [p["name"] for p in list_partitions(conn)] + [_DEFAULT, _SEQUENCE]
+        conn.execute(text(f"DROP VIEW {_quote(_PARENT)}"))
+        for name in tables:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_quote(name)}"))
+
+
+def ensure_partitions(today: date | None = None) -> list[str]:
+    """Create the partitions for the current period and LOG_PARTITIONS_AHEAD more; returns the new ones."""
+    interval = partitioning_interval()
+    if interval is None or not _supported():
+        return []
+    today = today or date.today()
+    ahead = max(0, int(os.getenv("LOG_PARTITIONS_AHEAD", "2")))
+    created = []
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        existing = list_partitions(conn)
+    start, end = period_bounds(today, interval)
+    for _ in range(ahead + 1):
+        # Overlap, not name: partitions made under another LOG_PARTITIONING period stay valid.
+        if not any(p["start"] < end and start < p["end"] for p in existing):
+            # One transaction per period, so a failing period does not roll back the others.
+            try:
+                with engine.begin() as conn:
+                    _create_partition(conn, start, end)
+                    if _dialect() == "sqlite":
+                        _sqlite_rebuild_view(conn)
+                created.append(partition_name(start, end))
+            except Exception as e:
+                print(f"DetectionLog partition {partition_name(start, end)} could not be created: {e}")
+        start, end = period_bounds(end, interval)
+    if created:
+        print(f"DetectionLog partitions created: {', '.join(created)}")
+    return created
+
+
+def add_missing_columns(missing: list) -> None:
+    """Add `detection_log` columns to every partition of the SQLite emulation and refresh the view."""
+    with engine.begin() as conn:
+        tables = [p["name"] for p in list_partitions(conn)] + [_DEFAULT]
+        for name in tables:
+            for column in missing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {_quote(name)} ADD COLUMN {_quote(column.name)} {column_type}"))
+        _sqlite_rebuild_view(conn)
+
+
+def drop_partitions_before(cutoff: date) -> dict:
+    """Drop every partition ending on or before `cutoff`; delete older rows from the default partition."""
+    dropped = []
+    rows = 0
+    with timed_stage("log_service", "drop_partitions"), engine.begin() as conn:
+        if not is_partitioned(conn):
+            rows = conn.execute(detection_log.delete().where(detection_log.c.date < cutoff)).rowcount
+        else:
+            for p in list_partitions(conn):
+                if p["end"] <= cutoff:
+                    conn.execute(text(f"DROP TABLE {_quote(p['name'])}"))
+                    dropped.append(p["name"])
+            default = _quote(_DEFAULT)
+            rows = conn.execute(text(f'DELETE FROM {default} WHERE "date" < :cutoff'), {"cutoff": cutoff}).rowcount
+            if dropped and _dialect() == "sqlite":
+                _sqlite_rebuild_view(conn)
+    if dropped:
+        LOG_PARTITIONS_DROPPED.inc(len(dropped))
+        print(f"DetectionLog retention: dropped {', '.join(dropped)}")
+    LOG_ROWS_PURGED.labels(reason="retention").inc(max(rows, 0))
+    return {"cutoff": cutoff.isoformat(), "partitions_dropped": dropped, "rows_deleted": max(rows, 0)}
+
+
+def apply_retention(today: date | None = None) -> dict | None:
+    """LOG_RETENTION_DAYS (0 = keep everything, the default)."""
+    days = int(os.getenv("LOG_RETENTION_DAYS", "0"))
+    if days <= 0:
+        return None
+    return drop_partitions_before((today or date.today()) - timedelta(days=days))
+
+
+def delete_range(start: date, end: date) -> dict:
+    """
+    Delete every log with start <= date < end.
+
+    Partitions entirely inside the range are truncated; rows are deleted only where a partition
+    (or the default one) overlaps the range edges. Returns counts for the API / CLI.
+    """
+    if end <= start:
+        raise ValueError("end must be after start")
+    truncated = []
+    rows = 0
+    with timed_stage("log_service", "delete_range"), engine.begin() as conn:
+        partitioned = is_partitioned(conn)
+        if partitioned:
+            for p in list_partitions(conn):
+                if start <= p["start"] and p["end"] <= end:
+                    if _dialect() == "postgresql":
+                        conn.execute(text(f"TRUNCATE TABLE {_quote(p['name'])}"))
+                    else:
+                        # No WHERE: SQLite's truncate optimization, no per-row work.
+                        rows += conn.execute(text(f"DELETE FROM {_quote(p['name'])}")).rowcount
+                    truncated.append(p["name"])
+        date_col = detection_log.c.date
+        if partitioned and _dialect() == "sqlite":
+            # Straight to the partitions: the view's delete trigger works row by row.
+            targets = [p["name"] for p in list_partitions(conn) if p["name"] not in truncated] + [_DEFAULT]
+            for name in targets:
+                rows += conn.execute(
+                    text(f'DELETE FROM {_quote(name)} WHERE "date" >= :start AND "date" < :end'),
+                    {"start": start, "end": end},
+                ).rowcount
+        else:
+            # PostgreSQL prunes this to the edge partitions (truncated ones are empty anyway).
+            rows += conn.execute(detection_log.delete().where(date_col >= start, date_col < end)).rowcount
+    LOG_ROWS_PURGED.labels(reason="range").inc(max(rows, 0))
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "partitions_truncated": truncated,
+        # PostgreSQL TRUNCATE does not report row counts: only row-level deletes are counted there.
+        "rows_deleted": max(rows, 0),
+    }
+
+
+def run_maintenance() -> dict:
+    """Create upcoming partitions and apply retention (safe to run concurrently from several workers)."""
+    return {"partitions_created": ensure_partitions(), "retention": apply_retention()}
+
+
+def migrate_to_partitions(batch_days: int = 31) -> dict:
+    """
+    Convert an existing plain `DetectionLog` table into the partitioned layout.
+
+    The old table is renamed, its rows are copied date range by date range into the new
+    partitions (ids preserved) and it is dropped at the end. Stop the API while this runs.
+    """
+    interval = partitioning_interval()
+    if interval is None:
+        raise ValueError("Set LOG_PARTITIONING=day|week|month first")
+    if not _supported():
+        raise ValueError(f"Partitioning is not supported on {_dialect()}")
+
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            return {"migrated": False, "reason": "already partitioned"}
+        if not table_exists(conn):
+            return {"migrated": False, "reason": "no DetectionLog table", "created": create_partitioned_table()}
+        c = detection_log.c
+        first, last, max_id = conn.execute(select(func.min(c.date), func.max(c.date), func.max(c.id))).first()
+        conn.execute(text(f"ALTER TABLE {_quote(_PARENT)} RENAME TO {_quote(_LEGACY)}"))
+        if _dialect() == "sqlite":
+            _sqlite_create_layout(conn)
+        else:
+            # The new parent reuses these names.
+            conn.execute(text(f"ALTER INDEX IF EXISTS {_quote(_PARENT + '_pkey')} RENAME TO {_quote(_LEGACY + '_pkey')}"))
+            for index_name in conn.execute(
+                text("SELECT indexname FROM pg_indexes WHERE tablename = :t AND indexname LIKE 'ix_%'"), {"t": _LEGACY}
+            ).scalars().all():
+                conn.execute(text(f"DROP INDEX {_quote(index_name)}"))
+            _pg_create_layout(conn)
+
+        day = first
+        while day is not None and day <= last:
+            start, end = period_bounds(day, interval)
+            _create_partition(conn, start, end)
+            day = end
+        if _dialect() == "sqlite":
+            _sqlite_rebuild_view(conn)
+
+        cols = ", ".join(_quote(c.name) for c in detection_log.columns)
+        values = ", ".join(
+            "COALESCE(\"date\", DATE '1970-01-01')" if c.name == "date" and _dialect() == "postgresql" else _quote(c.name)
+            for c in detection_log.columns
+        )
+        day = first
+        while day is not None and day <= last:
+            stop = day + timedelta(days=batch_days)
+            conn.execute(
+                text(
+                    f"INSERT INTO {_quote(_PARENT)} ({cols}) SELECT {values} FROM {_quote(_LEGACY)} "
+                    'WHERE "date" >= :start AND "date" < :stop'
+                ),
+                {"start": day, "stop": stop},
+            ).rowcount
+            day = stop
+        conn.execute(
+            text(f'INSERT INTO {_quote(_PARENT)} ({cols}) SELECT {values} FROM {_quote(_LEGACY)} WHERE "date" IS NULL')
+        )
+        # Counted afterwards: SQLite reports no row count for inserts through the view's trigger.
+        copied = conn.execute(select(func.count()).select_from(detection_log)).scalar()
+
+        if _dialect() == "postgresql" and max_id is not None:
+            conn.execute(text("SELECT setval(pg_get_serial_sequence(:t, 'id'), :v)"), {"t": _quote(_PARENT), "v": max_id})
+        conn.execute(text(f"DROP TABLE {_quote(_LEGACY)}"))
+
+    created = ensure_partitions()
+    return {"migrated": True, "rows_copied": copied, "partitions_created": created}
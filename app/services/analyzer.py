@@ -1,5 +1,9 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from app.services.audio_analyzer import AudioAnalyzer
 from app.services.video_analyzer import VideoAnalyzer
+from app.utils.profiling import profiled
 
 class Analyzer:
     
@@ -10,18 +14,126 @@ class Analyzer:
         self.audio_analyzer = AudioAnalyzer()
         self.video_analyzer = VideoAnalyzer()
             
-    def analyze_audio(self, audio_data: bytes, filename: str | None = None, content_type: str | None = None):
+    def analyze_audio(
+        self,
+        audio_data: bytes,
+        filename: str | None = None,
+        content_type: str | None = None,
+        media_format: str | None = None,
+    ):
         
-        result = self.audio_analyzer.analyze_audio(audio_data, filename=filename, content_type=content_type)
+        result = self.audio_analyzer.analyze_audio(
+            audio_data, filename=filename, content_type=content_type, media_format=media_format
+        )
         
         return result
     
     
-    def analyze_video(self, video_data: bytes, filename: str | None = None, *, seconds: int = 10, frames: int = 10):
+    def analyze_video(
+        self,
+        video_data: bytes,
+        filename: str | None = None,
+        *,
+        seconds: int = 10,
+        frames: int = 10,
+        selection: str | None = None,
+        coverage: str = "window",
+        media_format: str | None = None,
+        container: dict | None = None,
+    ):
         result = self.video_analyzer.analyze_video(
             video_data,
             filename=filename,
             seconds=seconds,
             frames=frames,
+            selection=selection,
+            coverage=coverage,
+            media_format=media_format,
+            container=container,
         )
-        return result
\ No newline at end of file
+        return result
+
+    def iter_analyze_video(
+        self,
+        video_data: bytes,
+        filename: str | None = None,
+        *,
+        seconds: int = 10,
+        frames: int = 10,
+        selection: str | None = None,
+        coverage: str = "window",
+        media_format: str | None = None,
+        container: dict | None = None,
+    ):
+        return self.video_analyzer.iter_analyze_video(
+            video_data,
+            filename=filename,
+            seconds=seconds,
+            frames=frames,
+            selection=selection,
+            coverage=coverage,
+            media_format=media_format,
+            container=container,
+        )
+
+    def analyze_media(
+        self,
+        media_data: bytes,
+        filename: str | None = None,
+        *,
+        seconds: int = 10,
+        frames: int = 10,
+        selection: str | None = None,
+        coverage: str = "window",
+        media_format: str | None = None,
+        container: dict | None = None,
+    ) -> dict:
+        """
+        Run the audio and video pipelines on one upload concurrently.
+
+        Audio extraction (ffmpeg) and frame decoding/inference overlap, so latency is close to
+        the slower of the two pipelines. Returns {"video": <video result>, "audio": <audio
+        result | None when the file has no audio track>}; either may be an {"error": ...} dict.
+        """
+        # Decode a base64 payload once instead of in each pipeline (already done when the format is known).
+        media_bytes = media_data if media_format else VideoAnalyzer._coerce_video_bytes(media_data)
+
+        # A parsed header without an audio track: skip the ffmpeg extraction entirely.
+        if container and container.get("source") == "parser" and not container.get("audio_codec"):
+            return {
+                "video": self.analyze_video(
+                    media_bytes,
+                    filename,
+                    seconds=seconds,
+                    frames=frames,
+                    selection=selection,
+                    coverage=coverage,
+                    media_format=media_format,
+                    container=container,
+                ),
+                "audio": None,
+            }
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            # copy_context() keeps the request trace visible in both pipeline threads.
+            audio_future = pool.submit(
+                contextvars.copy_context().run,
+                profiled,
+                self.audio_analyzer.analyze_audio_track,
+                media_bytes,
+                filename,
+            )
+            video_future = pool.submit(
+                contextvars.copy_context().run,
+                profiled,
+                self.analyze_video,
+                media_bytes,
+                filename,
+                seconds=seconds,
+                frames=frames,
+                selection=selection,
+                coverage=coverage,
+                media_format=media_format,
+                container=container,
+            )
+            return {"video": video_future.result(), "audio": audio_future.result()}
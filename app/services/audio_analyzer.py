@@ -1,12 +1,30 @@
-import requests
 import os
-import base64
 from dotenv import load_dotenv
 import shutil
 import subprocess
+import tempfile
+import time
+
+from app.services.inference_backends import get_audio_backend
+from app.services.vad import apply_vad, vad_mode
+from app.utils.deadline import decode_budget
+from app.utils.metrics import (
+    ANALYSES_IN_FLIGHT,
+    AUDIO_UPSTREAM_PAYLOAD_BYTES,
+    AUDIO_VAD_REJECTIONS,
+    AUDIO_VAD_SECONDS,
+    observe_stage,
+    timed_stage,
+)
 
 load_dotenv()
 
+# ffmpeg demuxer per sniffed container: naming it skips ffmpeg's own format probing on the pipe.
+_FFMPEG_DEMUXERS = {"flac": "flac", "ogg": "ogg", "mp3": "mp3", "webm": "matroska"}
+
+# Payload formats for the audio backend (AUDIO_UPSTREAM_ENCODING).
+_UPSTREAM_ENCODINGS = ("wav", "flac")
+
 class AudioAnalyzer:
     """
     Here must be loaded the video analysis model. The goal is to access the model through the instance
@@ -14,13 +32,8 @@ class AudioAnalyzer:
     """
         
     def __init__(self):
-        self.api_url = os.getenv("HUGGINGFACE_AUDIO_API_URL")
-        self.api_key = os.getenv("HUGGINGFACE_API_KEY")
-        # DEBUG: show config presence (never print full key)
-        if not self.api_key:
-            raise ValueError("HUGGINGFACE_API_KEY is not set")
-        if not self.api_url:
-            raise ValueError("HUGGINGFACE_AUDIO_API_URL is not set")
+        # HTTP endpoint by default, or in-process ONNX (see `inference_backends`).
+        self.backend = get_audio_backend()
         
     
     @staticmethod
@@ -30,6 +43,10 @@ class AudioAnalyzer:
         except Exception:
             return False
 
+    @staticmethod
+    def _looks_like_flac(file_bytes: bytes) -> bool:
+        return bool(file_bytes) and file_bytes.startswith(b"fLaC")
+
     @staticmethod
     def _looks_like_webm(file_bytes: bytes) -> bool:
         # EBML header (WebM/Matroska container)
@@ -47,38 +64,54 @@ class AudioAnalyzer:
         except Exception:
             return ""
 
-    def _convert_to_wav_bytes(self, audio_bytes: bytes, input_ext: str = "", content_type: str = ""):
+    def _upstream_encoding(self) -> str:
         """
-        Convert arbitrary audio container/codec to WAV using ffmpeg.
-        Uses stdin/stdout pipes (no temp files). Returns bytes or {"error": "..."}.
+        Payload format sent to the backend: AUDIO_UPSTREAM_ENCODING (wav|flac, default wav).
+        FLAC is lossless and about half the size of PCM WAV, but only backends that declare
+        `accepts_flac` get it (the ONNX backend needs PCM).
         """
-        if not audio_bytes:
-            return audio_bytes
+        encoding = (os.getenv("AUDIO_UPSTREAM_ENCODING") or "wav").strip().lower()
+        if encoding in _UPSTREAM_ENCODINGS and (encoding == "wav" or getattr(self.backend, "accepts_flac", False)):
+            return encoding
+        return "wav"
 
-        if self._looks_like_wav(audio_bytes):
-            return audio_bytes
+    def _conversion_format(self) -> str:
+        """Output of the ffmpeg conversion pass: the upstream encoding, or WAV when VAD needs the PCM first."""
+        return self._upstream_encoding() if vad_mode() == "off" else "wav"
 
-        ffmpeg_path = shutil.which("ffmpeg")
-        if not ffmpeg_path:
-            return {"error": "ffmpeg is required to convert non-wav audio (e.g. webm) but was not found in PATH"}
+    @staticmethod
+    def _output_args(output_format: str) -> list[str]:
+        if output_format == "flac":
+            level = os.getenv("AUDIO_FLAC_COMPRESSION_LEVEL", "5")
+            # s16 like the WAV path; from float decoders (Opus) ffmpeg would otherwise pick 32-bit samples.
+            return ["-f", "flac", "-acodec", "flac", "-sample_fmt", "s16", "-compression_level", level]
+        return ["-f", "wav", "-acodec", "pcm_s16le"]
 
+    @staticmethod
+    def _wav_ffmpeg_cmd(
+        ffmpeg_path: str,
+        input_spec: str,
+        extra_args: list[str] | None = None,
+        input_args: list[str] | None = None,
+        output_format: str = "wav",
+    ) -> list[str]:
         # Many anti-spoof models expect mono PCM WAV at a fixed sample rate.
         # Make it configurable; keep sane defaults.
         target_sr = int(os.getenv("AUDIO_TARGET_SAMPLE_RATE", "16000"))
         target_ch = int(os.getenv("AUDIO_TARGET_CHANNELS", "1"))
 
         # ffmpeg auto-detects input format from the container/codec; extension is just for debug.
-        cmd = [
+        # `output_format="flac"` encodes FLAC in the same pass (same samples, smaller payload).
+        return [
             ffmpeg_path,
             "-hide_banner",
             "-loglevel",
             "error",
+            *(input_args or []),
             "-i",
-            "pipe:0",
-            "-f",
-            "wav",
-            "-acodec",
-            "pcm_s16le",
+            input_spec,
+            *(extra_args or []),
+            *AudioAnalyzer._output_args(output_format),
             "-ac",
             str(target_ch),
             "-ar",
@@ -86,29 +119,177 @@ class AudioAnalyzer:
             "pipe:1",
         ]
 
+    def _convert_to_wav_bytes(
+        self,
+        audio_bytes: bytes,
+        input_ext: str = "",
+        content_type: str = "",
+        input_format: str | None = None,
+        output_format: str = "wav",
+    ):
+        """
+        Convert arbitrary audio container/codec to WAV using ffmpeg.
+        Uses stdin/stdout pipes (no temp files). Returns bytes or {"error": "..."}.
+        `input_format` (an ffmpeg demuxer name) skips input probing when the container is known.
+        `output_format="flac"` produces FLAC instead (WAV input is still returned unchanged).
+        """
+        if not audio_bytes:
+            return audio_bytes
+
+        if self._looks_like_wav(audio_bytes):
+            return audio_bytes
+
+        ffmpeg_path = shutil.which("ffmpeg")
+        if not ffmpeg_path:
+            return {"error": "ffmpeg is required to convert non-wav audio (e.g. webm) but was not found in PATH"}
+
+        cmd = self._wav_ffmpeg_cmd(
+            ffmpeg_path,
+            "pipe:0",
+            input_args=["-f", input_format] if input_format else None,
+            output_format=output_format,
+        )
+        looks_right = self._looks_like_flac if output_format == "flac" else self._looks_like_wav
+
         try:
-            p = subprocess.run(
-                cmd,
-                input=audio_bytes,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=False,
-            )
+            with timed_stage("audio", f"convert_to_{output_format}"):
+                p = subprocess.run(
+                    cmd,
+                    input=audio_bytes,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    check=False,
+                    timeout=decode_budget(),
+                )
             if p.returncode != 0:
                 err = (p.stderr or b"").decode("utf-8", errors="replace")[:2000]
                 return {"error": f"ffmpeg conversion failed (exit={p.returncode}): {err}"}
 
             wav_bytes = p.stdout or b""
-            if not self._looks_like_wav(wav_bytes):
-                return {"error": "ffmpeg conversion produced non-wav output (unexpected)"}
+            if not looks_right(wav_bytes):
+                return {"error": f"ffmpeg conversion produced non-{output_format} output (unexpected)"}
 
             return wav_bytes
+        except subprocess.TimeoutExpired:
+            return {"error": "ffmpeg conversion did not finish within the request deadline", "skipped": "deadline"}
         except Exception as e:
             return {"error": f"ffmpeg conversion exception: {type(e).__name__}: {e}"}
 
-    def analyze_audio(self, audio_bytes, filename: str | None = None, content_type: str | None = None):
-        # The handler expects {"inputs": <base64_encoded_audio>}
-        # Encode bytes to base64 string
+    def analyze_audio(
+        self,
+        audio_bytes,
+        filename: str | None = None,
+        content_type: str | None = None,
+        media_format: str | None = None,
+    ):
+        in_flight = ANALYSES_IN_FLIGHT.labels(pipeline="audio")
+        in_flight.inc()
+        try:
+            with timed_stage("audio", "total"):
+                if media_format:
+                    return self._analyze_known_format(audio_bytes, media_format, filename=filename)
+                return self._analyze_audio(audio_bytes, filename=filename, content_type=content_type)
+        finally:
+            in_flight.dec()
+
+    def _analyze_known_format(self, audio_bytes: bytes, media_format: str, filename: str | None = None):
+        """
+        Fast path when the controller already sniffed the container:
+        - wav: sent as-is (no ffmpeg)
+        - mp4/m4a: converted from a temp file, since the moov index may sit at the end of the file
+        - others: piped through ffmpeg with the demuxer named explicitly
+        The conversion pass emits the upstream encoding directly (see `_conversion_format`).
+        """
+        output_format = self._conversion_format()
+        if media_format == "wav":
+            converted = audio_bytes
+        elif media_format == "mp4":
+            converted = self.extract_audio_track(audio_bytes, filename=filename, output_format=output_format)
+            if converted is None:
+                return {"error": "The uploaded file has no audio stream"}
+        else:
+            converted = self._convert_to_wav_bytes(
+                audio_bytes,
+                input_format=_FFMPEG_DEMUXERS.get(media_format),
+                output_format=output_format,
+            )
+        if isinstance(converted, dict):
+            return converted
+        return self._score(converted or b"")
+
+    def _score(self, audio: bytes):
+        """Score converted audio: FLAC from the conversion pass is sent as-is, WAV goes through `_score_wav`."""
+        if self._looks_like_flac(audio):
+            return self._send(audio, "flac")
+        return self._score_wav(audio)
+
+    def _send(self, payload: bytes, encoding: str):
+        AUDIO_UPSTREAM_PAYLOAD_BYTES.labels(encoding=encoding).observe(len(payload))
+        result = self.backend.score_audio(payload)
+        if isinstance(result, dict):
+            result["upstream_payload"] = {"encoding": encoding, "bytes": len(payload)}
+        return result
+
+    def _send_wav(self, wav_bytes: bytes):
+        """Send in-memory PCM (WAV uploads, VAD output), FLAC-encoded first when that is the upstream encoding."""
+        if self._upstream_encoding() == "flac":
+            flac_bytes = self._encode_flac(wav_bytes)
+            if flac_bytes is not None:
+                return self._send(flac_bytes, "flac")
+        return self._send(wav_bytes, "wav")
+
+    def _encode_flac(self, wav_bytes: bytes) -> bytes | None:
+        """
+        FLAC-encode a WAV clip as-is (no resampling). Only used when there was no conversion pass
+        to produce FLAC in. Returns None on failure, so the caller falls back to WAV.
+        """
+        ffmpeg_path = shutil.which("ffmpeg")
+        if not ffmpeg_path:
+            return None
+        cmd = [ffmpeg_path, "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+               *self._output_args("flac"), "pipe:1"]
+        t0 = time.perf_counter()
+        try:
+            p = subprocess.run(
+                cmd,
+                input=wav_bytes,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=False,
+                timeout=decode_budget(),
+            )
+            flac_bytes = p.stdout if p.returncode == 0 and self._looks_like_flac(p.stdout) else None
+        except Exception:
+            flac_bytes = None
+        # Failed encodes are timed as their own stage: its count is the number of WAV fallbacks.
+        observe_stage("audio", "encode_flac" if flac_bytes is not None else "encode_flac_failed", time.perf_counter() - t0)
+        return flac_bytes
+
+    def _score_wav(self, wav_bytes: bytes):
+        """
+        Optional voice-activity trimming (AUDIO_VAD, see `vad`), then the backend call.
+        The trimming stats are attached to the result as "vad".
+        """
+        mode = vad_mode()
+        if mode == "off" or not wav_bytes:
+            return self._send_wav(wav_bytes)
+
+        with timed_stage("audio", "vad"):
+            trimmed = apply_vad(wav_bytes, mode)
+        stats = trimmed["stats"]
+        if stats.get("applied"):
+            AUDIO_VAD_SECONDS.labels(outcome="kept").inc(stats["kept_s"])
+            AUDIO_VAD_SECONDS.labels(outcome="removed").inc(stats["removed_s"])
+        if "error" in trimmed:
+            AUDIO_VAD_REJECTIONS.inc()
+            return {"error": trimmed["error"], "rejected": trimmed["rejected"], "vad": stats}
+
+        result = self._send_wav(trimmed["wav"])
+        if isinstance(result, dict):
+            result["vad"] = stats
+        return result
+
+    def _analyze_audio(self, audio_bytes, filename: str | None = None, content_type: str | None = None):
         # Convert to wav if needed (webm uploads from browsers commonly contain Opus audio).
         try:
             ext = self._ext_from_filename(filename)
@@ -123,45 +304,78 @@ class AudioAnalyzer:
                     should_convert = True
 
             if should_convert:
-                converted = self._convert_to_wav_bytes(audio_bytes or b"", input_ext=ext, content_type=ct)
+                converted = self._convert_to_wav_bytes(
+                    audio_bytes or b"", input_ext=ext, content_type=ct, output_format=self._conversion_format()
+                )
                 if isinstance(converted, dict) and "error" in converted:
                     return converted
                 audio_bytes = converted
         except Exception as e:
             return {"error": f"audio pre-processing failed: {type(e).__name__}: {e}"}
 
-        base64_audio = base64.b64encode(audio_bytes or b"").decode('utf-8')
-        
-        payload = {
-            "inputs": base64_audio
-        }
+        return self._score(audio_bytes or b"")
+
+    def extract_audio_track(self, video_bytes: bytes, filename: str | None = None, output_format: str = "wav"):
+        """
+        Extract the soundtrack of a video upload as WAV (same format as `_convert_to_wav_bytes`),
+        or as FLAC with `output_format="flac"`.
 
-        headers = {
-            "Accept" : "application/json",
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        The video is spooled to a temp file because MP4/MOV often keep their index (moov) at the
+        end, which ffmpeg cannot reach on a non-seekable stdin pipe.
+        Returns WAV bytes, None when the video has no audio stream, or {"error": "..."}.
+        """
+        ffmpeg_path = shutil.which("ffmpeg")
+        if not ffmpeg_path:
+            return {"error": "ffmpeg is required to extract the audio track but was not found in PATH"}
 
+        suffix = "." + (self._ext_from_filename(filename) or "mp4")
         try:
-            if not self.api_url:
-                err = "HUGGINGFACE_AUDIO_API_URL is not set"
-                return {"error": err}
-
-            timeout_s = int(os.getenv("HUGGINGFACE_TIMEOUT", "60"))
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=timeout_s,
-            )
+            with tempfile.NamedTemporaryFile(prefix="deeptrust_media_", suffix=suffix, delete=True) as tmp:
+                tmp.write(video_bytes)
+                tmp.flush()
+                stage = "extract_audio_track" if output_format == "wav" else f"extract_audio_track_{output_format}"
+                with timed_stage("audio", stage):
+                    # -vn: skip video decoding entirely; only the audio stream is demuxed/decoded.
+                    p = subprocess.run(
+                        self._wav_ffmpeg_cmd(ffmpeg_path, tmp.name, ["-vn"], output_format=output_format),
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        check=False,
+                        timeout=decode_budget(),
+                    )
+        except subprocess.TimeoutExpired:
+            return {"error": "ffmpeg audio extraction did not finish within the request deadline", "skipped": "deadline"}
+        except Exception as e:
+            return {"error": f"ffmpeg audio extraction exception: {type(e).__name__}: {e}"}
 
-            response.raise_for_status()
-            
-            # Handler returns a list [{...}]
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                return result[0]
-            return result
-            
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+        if p.returncode != 0:
+            err = (p.stderr or b"").decode("utf-8", errors="replace")[:2000]
+            if "does not contain any stream" in err or "matches no streams" in err:
+                return None
+            return {"error": f"ffmpeg audio extraction failed (exit={p.returncode}): {err}"}
+
+        wav_bytes = p.stdout or b""
+        looks_right = self._looks_like_flac if output_format == "flac" else self._looks_like_wav
+        if not looks_right(wav_bytes):
+            return {"error": f"ffmpeg audio extraction produced non-{output_format} output (unexpected)"}
+        return wav_bytes
+
+    def analyze_audio_track(self, video_bytes: bytes, filename: str | None = None):
+        """
+        Score the soundtrack of a video upload. Returns the backend result, None (no audio, or no
+        speech when AUDIO_VAD is on) or {"error"}.
+        """
+        in_flight = ANALYSES_IN_FLIGHT.labels(pipeline="audio")
+        in_flight.inc()
+        try:
+            with timed_stage("audio", "total"):
+                audio = self.extract_audio_track(video_bytes, filename=filename, output_format=self._conversion_format())
+                if audio is None or isinstance(audio, dict):
+                    return audio
+                result = self._score(audio)
+                if isinstance(result, dict) and result.get("rejected") == "no_speech":
+                    # A silent soundtrack is not an error for a video: it is analyzed like one without audio.
+                    return None
+                return result
+        finally:
+            in_flight.dec()
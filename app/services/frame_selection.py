@@ -0,0 +1,234 @@
+"""
+Frame selection strategies for `VideoAnalyzer`.
+
+Each sampler sees every decoded frame in the analysis window once, in order, through
+`offer(frame_index, frame_bgr)` and returns its picks from `selected()` (sorted by index).
+
+- "reservoir": uniform random sample (the original behaviour).
+- "quality":   prefers sharp, well-exposed frames and spreads picks across visually distinct
+               content (scene changes), so fewer frames give a stable verdict.
+
+Choose with `VIDEO_FRAME_SELECTION=reservoir|quality` (default reservoir) or per call.
+"""
+import heapq
+import os
+import random
+
+
+class ReservoirSampler:
+    """Uniform reservoir sample of `k` frames."""
+
+    name = "reservoir"
+
+    def __init__(self, k: int, rng: random.Random | None = None):
+        self.k = max(1, int(k))
+        self.rng = rng or random
+        self.sampled = []  # list[tuple[frame_index, frame_bgr]]
+        self.seen = 0
+
+    def offer(self, frame_index: int, frame) -> None:
+        self.seen += 1
+        if len(self.sampled) < self.k:
+            self.sampled.append((frame_index, frame))
+        else:
+            # Reservoir sampling: replace existing with decreasing probability.
+            j = self.rng.randrange(self.seen)
+            if j < self.k:
+                self.sampled[j] = (frame_index, frame)
+
+    def selected(self) -> list:
+        return sorted(self.sampled, key=lambda t: t[0])
+
+    def stats(self) -> dict:
+        return {"strategy": self.name}
+
+
+class QualityDiverseSampler:
+    """
+    Picks the `k` most informative, mutually distinct frames.
+
+    Cheap signals per frame, all on a small grayscale copy:
+    - sharpness:    variance of the Laplacian; frames far below the recent peak (a slowly
+                    decaying max, so it adapts to soft-looking footage) are rejected as blurry
+    - brightness:   mean intensity (very dark / blown-out frames are rejected)
+    - scene change: mean absolute difference to the previous usable frame's thumbnail
+
+    A bounded candidate pool (`k * VIDEO_SELECTION_POOL_FACTOR`) is kept while decoding. When it
+    overflows, the candidate with the lowest quality x novelty (distance to its nearest
+    neighbour in the pool) is evicted, so near-duplicates go first. The final pick is a greedy
+    quality-weighted farthest-point selection over the pool. A small temporal term is added to
+    the visual distance so that, among look-alike frames, picks still spread over the window.
+
+    If every frame is rejected (a night-time or blown-out clip), the `k` best rejected frames by
+    sharpness x exposure are returned instead, so such clips are still scored.
+
+    Settings (env):
+    - VIDEO_SELECTION_POOL_FACTOR (default 3)
+    - VIDEO_SELECTION_MIN_BRIGHTNESS / VIDEO_SELECTION_MAX_BRIGHTNESS (default 16 / 240)
+    - VIDEO_SELECTION_SCENE_CHANGE_WEIGHT (default 1.0)
+    - VIDEO_SELECTION_BLUR_RATIO: min sharpness relative to the recent peak (default 0.5)
+    """
+
+    name = "quality"
+
+    _ANALYSIS_WIDTH = 160
+    _PEAK_DECAY = 0.97  # per frame; ~23 frame half-life
+    _TEMPORAL_WEIGHT = 0.05  # vs. visual distances of ~0.2-0.4 between different scenes
+    _THUMB_SIZE = (32, 32)
+
+    def __init__(self, k: int):
+        self.k = max(1, int(k))
+        self.pool_size = self.k * max(1, int(os.getenv("VIDEO_SELECTION_POOL_FACTOR", "3")))
+        self.min_brightness = float(os.getenv("VIDEO_SELECTION_MIN_BRIGHTNESS", "16"))
+        self.max_brightness = float(os.getenv("VIDEO_SELECTION_MAX_BRIGHTNESS", "240"))
+        self.scene_change_weight = float(os.getenv("VIDEO_SELECTION_SCENE_CHANGE_WEIGHT", "1.0"))
+        self.blur_ratio = float(os.getenv("VIDEO_SELECTION_BLUR_RATIO", "0.5"))
+
+        self.seen = 0
+        self.rejected_exposure = 0
+        self.rejected_blur = 0
+        self._prev_thumb = None
+        self._sharpness_peak = 0.0
+        # Min-heap of the best rejected frames: (score, frame_index, frame).
+        self._fallback = []
+        self.used_fallback = False
+        # Parallel lists describing the candidate pool.
+        self._items = []    # list[tuple[frame_index, frame_bgr]]
+        self._thumbs = None  # np.ndarray (len(pool) x thumb pixels) float32 thumbnails
+        self._quality = []  # list[float]
+        self._dist = None   # np.ndarray pairwise thumbnail distances (len(pool) x len(pool))
+
+    def _signals(self, frame):
+        import cv2  # type: ignore
+        import numpy as np
+
+        h, w = frame.shape[:2]
+        aw = min(self._ANALYSIS_WIDTH, w)
+        small = cv2.resize(frame, (aw, max(1, int(h * aw / float(w)))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+        brightness = float(gray.mean())
+        thumb = cv2.resize(gray, self._THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel() / 255.0
+        return sharpness, brightness, thumb
+
+    def offer(self, frame_index: int, frame) -> None:
+        import numpy as np
+
+        self.seen += 1
+        sharpness, brightness, thumb = self._signals(frame)
+        # log keeps sharpness comparable across resolutions/codecs; exposure peaks at mid-grey.
+        exposure = max(0.2, 1.0 - abs(brightness - 128.0) / 128.0)
+        base_quality = float(np.log1p(sharpness)) * exposure
+
+        if brightness < self.min_brightness or brightness > self.max_brightness:
+            self.rejected_exposure += 1
+            self._keep_fallback(base_quality, frame_index, frame)
+            return
+
+        self._sharpness_peak = max(sharpness, self._sharpness_peak * self._PEAK_DECAY)
+        if sharpness < self.blur_ratio * self._sharpness_peak:
+            self.rejected_blur += 1
+            self._keep_fallback(base_quality, frame_index, frame)
+            return
+
+        change = 0.0 if self._prev_thumb is None else float(np.abs(thumb - self._prev_thumb).mean())
+        self._prev_thumb = thumb
+
+        quality = base_quality * (1.0 + self.scene_change_weight * min(1.0, change * 4.0))
+
+        self._add(frame_index, frame, thumb, quality)
+        if len(self._items) > self.pool_size:
+            self._evict_one()
+
+    def _keep_fallback(self, score: float, frame_index: int, frame) -> None:
+        # Only needed while nothing was accepted; frame_index breaks ties (frames do not compare).
+        if self._items:
+            return
+        entry = (score, frame_index, frame)
+        if len(self._fallback) < self.k:
+            heapq.heappush(self._fallback, entry)
+        elif entry[:2] > self._fallback[0][:2]:
+            heapq.heapreplace(self._fallback, entry)
+
+    def _add(self, frame_index, frame, thumb, quality) -> None:
+        import numpy as np
+
+        n = len(self._items)
+        dist = np.zeros((n + 1, n + 1), dtype=np.float32)
+        if n:
+            d_new = np.abs(self._thumbs - thumb).mean(axis=1)
+            dist[:n, :n] = self._dist
+            dist[n, :n] = d_new
+            dist[:n, n] = d_new
+            self._thumbs = np.vstack([self._thumbs, thumb])
+        else:
+            self._thumbs = thumb.reshape(1, -1)
+        self._dist = dist
+        self._items.append((frame_index, frame))
+        self._quality.append(quality)
+
+    def _combined_dist(self):
+        import numpy as np
+
+        idx = np.asarray([i for i, _ in self._items], dtype=np.float32)
+        span = max(1.0, float(idx.max() - idx.min()))
+        return self._dist + self._TEMPORAL_WEIGHT * np.abs(idx[:, None] - idx[None, :]) / span
+
+    def _evict_one(self) -> None:
+        import numpy as np
+
+        d = self._combined_dist() + np.eye(len(self._items), dtype=np.float32) * 1e9
+        novelty = d.min(axis=1)
+        score = np.asarray(self._quality, dtype=np.float32) * (novelty + 1e-6)
+        i = int(score.argmin())
+
+        keep = [j for j in range(len(self._items)) if j != i]
+        self._dist = self._dist[np.ix_(keep, keep)]
+        self._thumbs = self._thumbs[keep]
+        del self._items[i]
+        del self._quality[i]
+
+    def selected(self) -> list:
+        import numpy as np
+
+        n = len(self._items)
+        if n == 0 and self._fallback:
+            self.used_fallback = True
+            return sorted(((i, f) for _, i, f in self._fallback), key=lambda t: t[0])
+        if n <= self.k:
+            return sorted(self._items, key=lambda t: t[0])
+
+        quality = np.asarray(self._quality, dtype=np.float32)
+        q = quality / max(float(quality.max()), 1e-6)
+
+        dist = self._combined_dist()
+        picks = [int(q.argmax())]
+        min_d = dist[picks[0]].copy()
+        while len(picks) < self.k:
+            score = q * min_d
+            score[picks] = -1.0
+            j = int(score.argmax())
+            picks.append(j)
+            min_d = np.minimum(min_d, dist[j])
+
+        return sorted((self._items[j] for j in picks), key=lambda t: t[0])
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.name,
+            "pool_size": self.pool_size,
+            "rejected_exposure": self.rejected_exposure,
+            "rejected_blur": self.rejected_blur,
+            "fallback": self.used_fallback,
+        }
+
+
+_SAMPLERS = {"reservoir": ReservoirSampler, "quality": QualityDiverseSampler}
+
+
+def make_sampler(k: int, strategy: str | None = None):
+    name = (strategy or os.getenv("VIDEO_FRAME_SELECTION") or "reservoir").strip().lower()
+    if name not in _SAMPLERS:
+        raise ValueError(f"Unknown frame selection strategy: {name}")
+    return _SAMPLERS[name](k)
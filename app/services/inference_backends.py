@@ -0,0 +1,468 @@
+"""
+Inference backends used by `VideoAnalyzer` and `AudioAnalyzer`.
+
+Both backends return the same shapes, so the aggregation in `media_controller` does not care
+which one produced a result:
+- image: per frame, a list like [{"label": "Deepfake", "score": 0.54}, {"label": "Realism", "score": 0.46}]
+- audio: {"deepfake_score": 0..2, "is_bonafide": bool, "label": "bonafide" | "spoof"}
+
+Selection (per modality, falling back to `INFERENCE_BACKEND`, default "http"):
+- IMAGE_INFERENCE_BACKEND=http|onnx
+- AUDIO_INFERENCE_BACKEND=http|onnx
+
+ONNX settings:
+- ONNX_IMAGE_MODEL_PATH / ONNX_AUDIO_MODEL_PATH: exported models on disk
+- ONNX_INTRA_OP_THREADS: intra-op threads per session (0 = onnxruntime default)
+- ONNX_BATCH_SIZE: max frames per `session.run` call (default 16)
+- ONNX_IMAGE_SIZE, ONNX_IMAGE_MEAN, ONNX_IMAGE_STD: preprocessing when the model input has no fixed size
+- ONNX_IMAGE_LABELS (default "Deepfake,Realism"), ONNX_AUDIO_LABELS (default "bonafide,spoof")
+
+Upstream HTTP calls take a slot from the priority-lane scheduler first (see `app.core.priority`).
+HUGGINGFACE_IMAGE_API_URL / HUGGINGFACE_AUDIO_API_URL may list several replicas (comma-separated);
+calls are balanced across them by `upstream_pool`.
+
+Request deadline (see `app.utils.deadline`):
+- upstream timeouts shrink to the time left
+- frames not yet started when less than DEADLINE_MIN_CALL_S (default 0.5) is left are not
+  sent; they come back as `{"frame_index", "error", "skipped": "deadline"}`
+"""
+import base64
+import contextvars
+import io
+import json
+import os
+import threading
+import time
+import traceback
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.core.priority import UpstreamSlotTimeout, upstream_slot
+from app.services.upstream_pool import parse_urls, replica_pool
+from app.utils.deadline import expired, timeout_for
+from app.utils.metrics import (
+    UPSTREAM_BYTES_SENT,
+    UPSTREAM_IN_FLIGHT,
+    VIDEO_FRAMES_SKIPPED,
+    observe_stage,
+    record_upstream_error,
+    timed_stage,
+)
+from app.utils.profiling import profiled
+
+
+def _backend_name(modality: str) -> str:
+    return (os.getenv(f"{modality}_INFERENCE_BACKEND") or os.getenv("INFERENCE_BACKEND") or "http").strip().lower()
+
+
+def _softmax(logits):
+    import numpy as np
+
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _labels(env_name: str, default: str) -> list[str]:
+    return [s.strip() for s in (os.getenv(env_name) or default).split(",") if s.strip()]
+
+
+def _deadline_near() -> bool:
+    """True when the request deadline is too close to start another inference call."""
+    return expired(float(os.getenv("DEADLINE_MIN_CALL_S", "0.5")))
+
+
+def _skipped_for_deadline(frame_indices: list) -> list[dict]:
+    VIDEO_FRAMES_SKIPPED.labels(reason="deadline").inc(len(frame_indices))
+    return [
+        {"frame_index": idx, "error": "Skipped: request deadline reached", "skipped": "deadline"}
+        for idx in frame_indices
+    ]
+
+
+# ---------------------------------------------------------------------------
+# HTTP (HuggingFace Inference Endpoints)
+# ---------------------------------------------------------------------------
+
+class HttpImageBackend:
+    """
+    Sends each frame as a base64 PNG to `HUGGINGFACE_IMAGE_API_URL` (one or more replicas).
+    Up to `HUGGINGFACE_MAX_CONCURRENCY` (default 4) frames are in flight at once.
+    """
+
+    name = "http"
+    target = "image"
+
+    def __init__(self):
+        self.api_urls = parse_urls(os.getenv("HUGGINGFACE_IMAGE_API_URL"))
+        self.api_key = os.getenv("HUGGINGFACE_API_KEY")
+        if not self.api_key:
+            raise ValueError("HUGGINGFACE_API_KEY is not set")
+        if not self.api_urls:
+            raise ValueError("HUGGINGFACE_IMAGE_API_URL is not set")
+        self.pool = replica_pool(self.target, self.api_urls)
+        self.max_concurrency = max(1, int(os.getenv("HUGGINGFACE_MAX_CONCURRENCY", "4")))
+
+    def _headers(self) -> dict:
+        return {
+            "Accept": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _query_image_endpoint(self, base64_png: str):
+        import requests
+
+        payload = {"inputs": base64_png, "parameters": {}}
+        body = json.dumps(payload).encode("utf-8")
+        with upstream_slot():
+            # Computed after the (possibly long) wait for a slot.
+            timeout_s = timeout_for(float(os.getenv("HUGGINGFACE_TIMEOUT", "60")))
+            UPSTREAM_BYTES_SENT.labels(target=self.target).inc(len(body))
+            UPSTREAM_IN_FLIGHT.labels(target=self.target).inc()
+            try:
+                with timed_stage("video", "upstream"):
+                    response = self.pool.post(body, self._headers(), timeout_s)
+                    return response.json()
+            except requests.exceptions.RequestException as e:
+                record_upstream_error(self.target, e)
+                raise
+            finally:
+                UPSTREAM_IN_FLIGHT.labels(target=self.target).dec()
+
+    def _classify_one(self, idx: int, frame) -> dict:
+        import cv2
+        import requests
+
+        # Checked when the worker picks the frame up, so queued frames are dropped, not started.
+        if _deadline_near():
+            return _skipped_for_deadline([idx])[0]
+
+        try:
+            t_enc = time.perf_counter()
+            with timed_stage("video", "encode"):
+                ok_enc, buf = cv2.imencode(".png", frame)
+                if not ok_enc:
+                    return {"frame_index": idx, "error": "Failed to encode frame as PNG"}
+                b64_png = base64.b64encode(buf.tobytes()).decode("utf-8")
+            encode_ms = (time.perf_counter() - t_enc) * 1000.0
+
+            t0 = time.time()
+            out = self._query_image_endpoint(b64_png)
+            dt_ms = (time.time() - t0) * 1000.0
+
+            return {
+                "frame_index": idx,
+                "elapsed_ms": dt_ms,
+                "encode_ms": encode_ms,
+                "output": out,
+            }
+        except UpstreamSlotTimeout as e:
+            if _deadline_near():
+                return _skipped_for_deadline([idx])[0]
+            return {"frame_index": idx, "error": str(e)}
+        except requests.exceptions.RequestException as e:
+            preview = None
+            try:
+                resp = getattr(e, "response", None)
+                if resp is not None:
+                    preview = (resp.text or "")[:2000]
+            except Exception:
+                preview = None
+            return {
+                "frame_index": idx,
+                "error": f"Image inference failed: {type(e).__name__}: {e}",
+                "upstream_body_preview": preview,
+            }
+        except Exception as e:
+            return {
+                "frame_index": idx,
+                "error": f"Unexpected error: {type(e).__name__}: {e}",
+                "traceback": traceback.format_exc()[:4000],
+            }
+
+    def classify_frames(self, frames: list) -> list[dict]:
+        """
+        frames: list[tuple[frame_index, frame_bgr]]
+        Returns one dict per frame (same order), either with "output" or with "error".
+        """
+        if len(frames) <= 1 or self.max_concurrency == 1:
+            return [self._classify_one(idx, frame) for idx, frame in frames]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(frames))) as pool:
+            # copy_context() keeps the request trace / contextvars visible in worker threads;
+            # `profiled` adds each worker to the trace's profile.
+            futures = [
+                pool.submit(contextvars.copy_context().run, profiled, self._classify_one, idx, frame)
+                for idx, frame in frames
+            ]
+            return [f.result() for f in futures]
+
+    def iter_classify_frames(self, frames: list):
+        """Like `classify_frames`, but yields each frame's dict as soon as its response arrives (completion order)."""
+        if not frames:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(frames))) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, profiled, self._classify_one, idx, frame)
+                for idx, frame in frames
+            ]
+            for f in as_completed(futures):
+                yield f.result()
+
+
+class HttpAudioBackend:
+    """
+    Sends the clip as base64 to `HUGGINGFACE_AUDIO_API_URL` (one or more replicas): PCM WAV, or FLAC with
+    AUDIO_UPSTREAM_ENCODING=flac (the endpoint must be able to decode it).
+    """
+
+    name = "http"
+    target = "audio"
+    accepts_flac = True
+
+    def __init__(self):
+        self.api_urls = parse_urls(os.getenv("HUGGINGFACE_AUDIO_API_URL"))
+        self.api_key = os.getenv("HUGGINGFACE_API_KEY")
+        if not self.api_key:
+            raise ValueError("HUGGINGFACE_API_KEY is not set")
+        if not self.api_urls:
+            raise ValueError("HUGGINGFACE_AUDIO_API_URL is not set")
+        self.pool = replica_pool(self.target, self.api_urls)
+
+    def score_audio(self, audio_bytes: bytes) -> dict:
+        import requests
+
+        if _deadline_near():
+            return {"error": "Skipped: request deadline reached", "skipped": "deadline"}
+
+        # The handler expects {"inputs": <base64_encoded_audio>}
+        with timed_stage("audio", "encode"):
+            base64_audio = base64.b64encode(audio_bytes or b"").decode('utf-8')
+
+            payload = {
+                "inputs": base64_audio
+            }
+            body = json.dumps(payload).encode("utf-8")
+
+        headers = {
+            "Accept" : "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        try:
+            with upstream_slot():
+                timeout_s = timeout_for(float(os.getenv("HUGGINGFACE_TIMEOUT", "60")))
+                UPSTREAM_BYTES_SENT.labels(target=self.target).inc(len(body))
+                UPSTREAM_IN_FLIGHT.labels(target=self.target).inc()
+                try:
+                    with timed_stage("audio", "upstream"):
+                        response = self.pool.post(body, headers, timeout_s)
+
+                        # Handler returns a list [{...}]
+                        result = response.json()
+                finally:
+                    UPSTREAM_IN_FLIGHT.labels(target=self.target).dec()
+            if isinstance(result, list) and len(result) > 0:
+                return result[0]
+            return result
+
+        except UpstreamSlotTimeout as e:
+            if _deadline_near():
+                return {"error": "Skipped: request deadline reached", "skipped": "deadline"}
+            return {"error": str(e)}
+        except requests.exceptions.RequestException as e:
+            record_upstream_error(self.target, e)
+            return {"error": str(e)}
+
+
+# ---------------------------------------------------------------------------
+# ONNX Runtime (in-process CPU inference)
+# ---------------------------------------------------------------------------
+
+_sessions: dict = {}
+_sessions_lock = threading.Lock()
+
+
+def _onnx_session(model_path: str):
+    """Load (once per process) and return an onnxruntime InferenceSession for `model_path`."""
+    threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+    key = (os.path.abspath(model_path), threads)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            try:
+                import onnxruntime as ort  # type: ignore
+            except Exception as e:
+                raise ValueError(f"Missing dependency for the onnx backend: onnxruntime ({type(e).__name__}: {e})")
+            if not os.path.isfile(model_path):
+                raise ValueError(f"ONNX model not found: {model_path}")
+
+            opts = ort.SessionOptions()
+            if threads > 0:
+                opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+            _sessions[key] = session
+    return session
+
+
+class OnnxImageBackend:
+    """
+    Runs an exported image classifier in-process.
+
+    Expects a single NCHW float input and a [N, num_labels] logits output.
+    """
+
+    name = "onnx"
+
+    def __init__(self):
+        self.model_path = os.getenv("ONNX_IMAGE_MODEL_PATH")
+        if not self.model_path:
+            raise ValueError("ONNX_IMAGE_MODEL_PATH is not set")
+        self.session = _onnx_session(self.model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.labels = _labels("ONNX_IMAGE_LABELS", "Deepfake,Realism")
+        self.batch_size = max(1, int(os.getenv("ONNX_BATCH_SIZE", "16")))
+
+        shape = self.session.get_inputs()[0].shape
+        default_size = int(os.getenv("ONNX_IMAGE_SIZE", "224"))
+        h, w = shape[2], shape[3]
+        self.size = (
+            w if isinstance(w, int) and w > 0 else default_size,
+            h if isinstance(h, int) and h > 0 else default_size,
+        )
+        self.mean = [float(x) for x in os.getenv("ONNX_IMAGE_MEAN", "0.5,0.5,0.5").split(",")]
+        self.std = [float(x) for x in os.getenv("ONNX_IMAGE_STD", "0.5,0.5,0.5").split(",")]
+
+    def _preprocess(self, frames_bgr: list):
+        import cv2
+        import numpy as np
+
+        batch = np.empty((len(frames_bgr), 3, self.size[1], self.size[0]), dtype=np.float32)
+        mean = np.asarray(self.mean, dtype=np.float32).reshape(3, 1, 1)
+        std = np.asarray(self.std, dtype=np.float32).reshape(3, 1, 1)
+        for i, frame in enumerate(frames_bgr):
+            rgb = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+            batch[i] = (rgb.transpose(2, 0, 1).astype(np.float32) / 255.0 - mean) / std
+        return batch
+
+    def classify_frames(self, frames: list) -> list[dict]:
+        """frames: list[tuple[frame_index, frame_bgr]] -> one dict per frame (same order)."""
+        return list(self.iter_classify_frames(frames))
+
+    def iter_classify_frames(self, frames: list):
+        """Yields one dict per frame, a batch (ONNX_BATCH_SIZE) at a time."""
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            if _deadline_near():
+                yield from _skipped_for_deadline([idx for idx, _ in frames[start:]])
+                return
+            try:
+                t_enc = time.perf_counter()
+                with timed_stage("video", "encode"):
+                    batch = self._preprocess([f for _, f in chunk])
+                encode_ms = (time.perf_counter() - t_enc) * 1000.0 / len(chunk)
+
+                t0 = time.perf_counter()
+                logits = self.session.run(None, {self.input_name: batch})[0]
+                dt = time.perf_counter() - t0
+                observe_stage("video", "onnx_inference", dt)
+
+                probs = _softmax(logits.reshape(len(chunk), -1))
+                results = []
+                for (idx, _), p in zip(chunk, probs):
+                    out = [{"label": self.labels[j] if j < len(self.labels) else str(j), "score": float(p[j])}
+                           for j in range(p.shape[0])]
+                    out.sort(key=lambda d: d["score"], reverse=True)
+                    results.append(
+                        {
+                            "frame_index": idx,
+                            "elapsed_ms": dt * 1000.0 / len(chunk),
+                            "encode_ms": encode_ms,
+                            "output": out,
+                        }
+                    )
+            except Exception as e:
+                results = [
+                    {"frame_index": idx, "error": f"ONNX inference failed: {type(e).__name__}: {e}"}
+                    for idx, _ in chunk
+                ]
+            yield from results
+
+
+class OnnxAudioBackend:
+    """
+    Runs an exported audio anti-spoofing model in-process.
+
+    Expects a [N, samples] float waveform input (mono, -1..1) and a [N, 2] logits output
+    ordered as `ONNX_AUDIO_LABELS` (default "bonafide,spoof"). `deepfake_score` is reported as
+    2 * P(spoof) to match the 0..2 range of the HTTP endpoint.
+    """
+
+    name = "onnx"
+    accepts_flac = False
+
+    def __init__(self):
+        self.model_path = os.getenv("ONNX_AUDIO_MODEL_PATH")
+        if not self.model_path:
+            raise ValueError("ONNX_AUDIO_MODEL_PATH is not set")
+        self.session = _onnx_session(self.model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.labels = [s.lower() for s in _labels("ONNX_AUDIO_LABELS", "bonafide,spoof")]
+
+    @staticmethod
+    def _wav_to_float32(wav_bytes: bytes):
+        import numpy as np
+
+        with wave.open(io.BytesIO(wav_bytes), "rb") as w:
+            if w.getsampwidth() != 2:
+                raise ValueError(f"expected 16-bit PCM WAV, got sample width {w.getsampwidth()}")
+            channels = w.getnchannels()
+            pcm = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+        if channels > 1:
+            pcm = pcm.reshape(-1, channels).mean(axis=1)
+        return (pcm.astype(np.float32) / 32768.0).reshape(1, -1)
+
+    def score_audio(self, audio_bytes: bytes) -> dict:
+        try:
+            with timed_stage("audio", "encode"):
+                waveform = self._wav_to_float32(audio_bytes)
+            with timed_stage("audio", "onnx_inference"):
+                logits = self.session.run(None, {self.input_name: waveform})[0]
+        except Exception as e:
+            return {"error": f"ONNX audio inference failed: {type(e).__name__}: {e}"}
+
+        probs = _softmax(logits.reshape(1, -1))[0]
+        spoof_idx = self.labels.index("spoof") if "spoof" in self.labels else len(probs) - 1
+        p_spoof = float(probs[spoof_idx])
+        is_bonafide = p_spoof < 0.5
+        return {
+            "deepfake_score": 2.0 * p_spoof,
+            "is_bonafide": is_bonafide,
+            "label": "bonafide" if is_bonafide else "spoof",
+        }
+
+
+_IMAGE_BACKENDS = {"http": HttpImageBackend, "onnx": OnnxImageBackend}
+_AUDIO_BACKENDS = {"http": HttpAudioBackend, "onnx": OnnxAudioBackend}
+
+
+def get_image_backend():
+    name = _backend_name("IMAGE")
+    if name not in _IMAGE_BACKENDS:
+        raise ValueError(f"Unknown image inference backend: {name}")
+    return _IMAGE_BACKENDS[name]()
+
+
+def get_audio_backend():
+    name = _backend_name("AUDIO")
+    if name not in _AUDIO_BACKENDS:
+        raise ValueError(f"Unknown audio inference backend: {name}")
+    return _AUDIO_BACKENDS[name]()
@@ -1,8 +1,21 @@
 from app.schemas.detection_log_schema import DetectionLog
 from app.models.detection_log_model import detection_log
 from app.config.db import engine
+from app.repository import detection_log_repository
+from app.utils.metrics import timed_stage
+from datetime import date
+from sqlalchemy import bindparam, select
 from typing import Any, Dict
 
+
+def _in_date_range(query, start: date | None, end: date | None):
+    """Optional [start, end) filter on `date`; on a partitioned table it limits the scan to those partitions."""
+    if start is not None:
+        query = query.where(detection_log.c.date >= start)
+    if end is not None:
+        query = query.where(detection_log.c.date < end)
+    return query
+
 class LogService:
     
     def __init__(self):
@@ -13,41 +26,108 @@ class LogService:
         return engine.connect()
     
     def save_log(self, log_to_save: Dict[str, Any]):
-        conn = self._get_conn()
-        try:
-            conn.execute(detection_log.insert().values(log_to_save))
-            return conn.commit()
-        finally:
-            conn.close()
+        with timed_stage("log_service", "save_log"):
+            conn = self._get_conn()
+            try:
+                conn.execute(detection_log.insert().values(log_to_save))
+                return conn.commit()
+            finally:
+                conn.close()
+    
+    def save_logs(self, logs_to_save: list[Dict[str, Any]]):
+        """Insert many rows in one transaction (executemany)."""
+        if not logs_to_save:
+            return None
+        with timed_stage("log_service", "save_logs"):
+            conn = self._get_conn()
+            try:
+                conn.execute(detection_log.insert(), logs_to_save)
+                return conn.commit()
+            finally:
+                conn.close()
     
     def delete_log_by_id(self, id: int):
-        conn = self._get_conn()
-        try:
-            conn.execute(detection_log.delete().where(detection_log.c.id == id))
-            return conn.commit()
-        finally:
-            conn.close()
+        with timed_stage("log_service", "delete_log_by_id"):
+            conn = self._get_conn()
+            try:
+                conn.execute(detection_log.delete().where(detection_log.c.id == id))
+                return conn.commit()
+            finally:
+                conn.close()
     
     def get_log_by_id(self, id: int):
-        conn = self._get_conn()
-        try:
-            return conn.execute(detection_log.select().where(detection_log.c.id == id)).fetchone()
-        finally:
-            conn.close()
+        with timed_stage("log_service", "get_log_by_id"):
+            conn = self._get_conn()
+            try:
+                return conn.execute(detection_log.select().where(detection_log.c.id == id)).fetchone()
+            finally:
+                conn.close()
 
-    def get_all_logs(self):
-        conn = self._get_conn()
-        try:
-            return conn.execute(detection_log.select()).fetchall()
-        finally:
-            conn.close()
+    def get_all_logs(self, start: date | None = None, end: date | None = None):
+        with timed_stage("log_service", "get_all_logs"):
+            conn = self._get_conn()
+            try:
+                return conn.execute(_in_date_range(detection_log.select(), start, end)).fetchall()
+            finally:
+                conn.close()
     
-    def get_logs_by_classification(self, classification: str):
-        conn = self._get_conn()
-        try:
-            return conn.execute(
-                detection_log.select().where(detection_log.c.classification == classification)
-            ).fetchall()
-        finally:
-            conn.close()
-        
\ No newline at end of file
+    def get_logs_by_classification(self, classification: str, start: date | None = None, end: date | None = None):
+        with timed_stage("log_service", "get_logs_by_classification"):
+            conn = self._get_conn()
+            try:
+                return conn.execute(
+                    _in_date_range(
+                        detection_log.select().where(detection_log.c.classification == classification), start, end
+                    )
+                ).fetchall()
+            finally:
+                conn.close()
+
+    def delete_logs_by_range(self, start: date, end: date) -> dict:
+        """Delete every log dated in [start, end): whole partitions where possible (see `detection_log_repository`)."""
+        return detection_log_repository.delete_range(start, end)
+        
+
+    def iter_raw_score_batches(self, batch_size: int = 10000):
+        """
+        Yield rows with stored raw scores in id order, `batch_size` at a time (keyset pagination,
+        so the cost per batch does not grow with the offset). Each row is a mapping with
+        id, modality, coverage, classification, score, raw_scores.
+        """
+        c = detection_log.c
+        last_id = 0
+        while True:
+            with timed_stage("log_service", "read_raw_scores"):
+                conn = self._get_conn()
+                try:
+                    rows = conn.execute(
+                        select(c.id, c.modality, c.coverage, c.classification, c.score, c.raw_scores)
+                        .where(c.raw_scores.is_not(None), c.id > last_id)
+                        .order_by(c.id)
+                        .limit(batch_size)
+                    ).mappings().fetchall()
+                finally:
+                    conn.close()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield rows
+
+    def update_verdicts(self, updates: list[dict]):
+        """Batched UPDATE (one executemany) of {"row_id", "new_classification", "new_score", "new_is_deepfake"} dicts."""
+        with timed_stage("log_service", "update_verdicts"):
+            conn = self._get_conn()
+            try:
+                conn.execute(
+                    detection_log.update()
+                    .where(detection_log.c.id == bindparam("row_id"))
+                    .values(
+                        classification=bindparam("new_classification"),
+                        score=bindparam("new_score"),
+                        isDeepFake=bindparam("new_is_deepfake"),
+                    ),
+                    updates,
+                )
+                return conn.commit()
+            finally:
+                conn.close()
@@ -0,0 +1,463 @@
+"""
+Container metadata straight from the upload bytes, without spawning ffprobe.
+
+- MP4/MOV (ISO BMFF): walks `moov` (wherever it sits in the file) for the movie duration and,
+  per track, handler, codec (`stsd`), resolution (`tkhd`), sample count / timing (`mdhd`, `stts`)
+  and sync samples (`stss`) -> keyframe timestamps.
+- WebM/Matroska (EBML): `Info` (duration, timestamp scale), `Tracks` (codec, resolution,
+  default frame duration) and `Cues` (keyframe timestamps), following the `SeekHead` when the
+  cues are stored after the clusters.
+- WAV: duration from the `fmt ` / `data` chunks.
+
+Anything else (or a header the parser cannot read) falls back to `ffprobe` over a pipe.
+Results are cached by content hash (MEDIA_PROBE_CACHE_SIZE entries, default 256), so a
+retried or re-analyzed upload is only parsed once.
+
+Returned dict (missing values are None):
+{"format", "duration_s", "fps", "width", "height", "video_codec", "audio_codec",
+ "keyframes_s": [..] | None, "source": "parser" | "ffprobe", "content_hash"}
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+
+from app.utils.metrics import MEDIA_PROBE_CACHE, timed_stage
+
+_MAX_KEYFRAMES = 10000
+
+# Containers the audio / video pipelines accept (names returned by `sniff_media_format`).
+AUDIO_FORMATS = ("wav", "flac", "ogg", "mp3", "mp4", "webm")
+VIDEO_FORMATS = ("mp4", "webm", "avi", "ogg")
+
+_cache: OrderedDict = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _empty(media_format: str) -> dict:
+    return {
+        "format": media_format,
+        "duration_s": None,
+        "fps": None,
+        "width": None,
+        "height": None,
+        "video_codec": None,
+        "audio_codec": None,
+        "keyframes_s": None,
+        "source": "parser",
+    }
+
+
+# ---------------------------------------------------------------------------
+# ISO BMFF (MP4 / MOV)
+# ---------------------------------------------------------------------------
+
+def _iter_boxes(buf, start: int, end: int):
+    """Yield (type, payload_start, box_end) for the boxes in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack(">I4s", buf[pos:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            (size,) = struct.unpack(">Q", buf[pos + 8:pos + 16])
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _child(buf, start: int, end: int, box_type: bytes):
+    for t, s, e in _iter_boxes(buf, start, end):
+        if t == box_type:
+            return s, e
+    return None
+
+
+def _full_box_times(buf, s: int):
+    """(timescale, duration) of an mvhd/mdhd payload."""
+    version = buf[s]
+    if version == 1:
+        timescale, duration = struct.unpack(">IQ", buf[s + 20:s + 32])
+    else:
+        timescale, duration = struct.unpack(">II", buf[s + 12:s + 20])
+    return timescale, duration
+
+
+def _parse_trak(buf, s: int, e: int) -> dict | None:
+    mdia = _child(buf, s, e, b"mdia")
+    if mdia is None:
+        return None
+    hdlr = _child(buf, *mdia, b"hdlr")
+    mdhd = _child(buf, *mdia, b"mdhd")
+    minf = _child(buf, *mdia, b"minf")
+    stbl = _child(buf, *minf, b"stbl") if minf else None
+    if hdlr is None or mdhd is None or stbl is None:
+        return None
+
+    track = {"handler": bytes(buf[hdlr[0] + 8:hdlr[0] + 12]).decode("latin-1")}
+    track["timescale"], track["duration"] = _full_box_times(buf, mdhd[0])
+
+    stsd = _child(buf, *stbl, b"stsd")
+    if stsd is not None and stsd[1] - stsd[0] >= 16:
+        entry = stsd[0] + 8
+        track["codec"] = bytes(buf[entry + 4:entry + 8]).decode("latin-1").strip()
+        if track["handler"] == "vide" and entry + 36 <= stsd[1]:
+            track["width"], track["height"] = struct.unpack(">HH", buf[entry + 32:entry + 36])
+
+    tkhd = _child(buf, s, e, b"tkhd")
+    if tkhd is not None and track["handler"] == "vide" and not track.get("width"):
+        off = tkhd[0] + (88 if buf[tkhd[0]] == 1 else 76)
+        if off + 8 <= tkhd[1]:
+            w, h = struct.unpack(">II", buf[off:off + 8])
+            track["width"], track["height"] = w >> 16, h >> 16
+
+    stts = _child(buf, *stbl, b"stts")
+    if stts is not None:
+        (n,) = struct.unpack(">I", buf[stts[0] + 4:stts[0] + 8])
+        track["stts"] = list(struct.iter_unpack(">II", buf[stts[0] + 8:stts[0] + 8 + 8 * n]))
+    stss = _child(buf, *stbl, b"stss")
+    if stss is not None:
+        (n,) = struct.unpack(">I", buf[stss[0] + 4:stss[0] + 8])
+        track["stss"] = [x for (x,) in struct.iter_unpack(">I", buf[stss[0] + 8:stss[0] + 8 + 4 * n])]
+    return track
+
+
+def _sample_times(stts: list, sample_numbers: list, timescale: int) -> list[float]:
+    """Decode timestamps (s) of 1-based sample numbers (sorted) from stts run-lengths."""
+    out = []
+    it = iter(sample_numbers)
+    target = next(it, None)
+    first, t = 1, 0
+    for count, delta in stts:
+        while target is not None and target < first + count:
+            out.append((t + (target - first) * delta) / float(timescale))
+            target = next(it, None)
+        first += count
+        t += count * delta
+        if target is None:
+            break
+    return out
+
+
+def _probe_mp4(buf) -> dict | None:
+    moov = _child(buf, 0, len(buf), b"moov")
+    if moov is None:
+        return None
+    info = _empty("mp4")
+
+    mvhd = _child(buf, *moov, b"mvhd")
+    if mvhd is not None:
+        timescale, duration = _full_box_times(buf, mvhd[0])
+        if timescale:
+            info["duration_s"] = duration / float(timescale)
+
+    for t, s, e in _iter_boxes(buf, *moov):
+        if t != b"trak":
+            continue
+        track = _parse_trak(buf, s, e)
+        if track is None:
+            continue
+        if track["handler"] == "soun" and info["audio_codec"] is None:
+            info["audio_codec"] = track.get("codec")
+        elif track["handler"] == "vide" and info["video_codec"] is None:
+            info["video_codec"] = track.get("codec")
+            info["width"], info["height"] = track.get("width"), track.get("height")
+            stts = track.get("stts") or []
+            samples = sum(c for c, _ in stts)
+            if track["timescale"] and track["duration"] and samples:
+                seconds = track["duration"] / float(track["timescale"])
+                info["fps"] = samples / seconds
+                if info["duration_s"] is None:
+                    info["duration_s"] = seconds
+            # No stss box means every sample is a sync sample.
+            if "stss" in track and track["timescale"]:
+                info["keyframes_s"] = _sample_times(stts, track["stss"][:_MAX_KEYFRAMES], track["timescale"])
+    return info
+
+
+# ---------------------------------------------------------------------------
+# EBML (WebM / Matroska)
+# ---------------------------------------------------------------------------
+
+_SEGMENT, _SEEKHEAD, _INFO, _TRACKS, _CUES, _CLUSTER = (
+    0x18538067, 0x114D9B74, 0x1549A966, 0x1654AE6B, 0x1C53BB6B, 0x1F43B675,
+)
+
+
+def _vint(buf, pos: int, keep_marker: bool):
+    first = buf[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("invalid EBML variable-length integer")
+    value = first if keep_marker else first & (mask - 1)
+    for b in buf[pos + 1:pos + length]:
+        value = (value << 8) | b
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, unknown
+
+
+def _iter_elements(buf, start: int, end: int):
+    """Yield (id, data_start, data_end, unknown_size); stops at the first unknown-size element."""
+    pos = start
+    while pos < end:
+        eid, n_id, _ = _vint(buf, pos, True)
+        size, n_size, unknown = _vint(buf, pos + n_id, False)
+        data = pos + n_id + n_size
+        if unknown:
+            yield eid, data, end, True
+            return
+        yield eid, data, min(data + size, end), False
+        pos = data + size
+
+
+def _uint(buf, s: int, e: int) -> int:
+    return int.from_bytes(buf[s:e], "big")
+
+
+def _probe_ebml(buf) -> dict | None:
+    info = _empty("webm")
+    segment = None
+    for eid, s, e, _ in _iter_elements(buf, 0, len(buf)):
+        if eid == _SEGMENT:
+            segment = (s, e)
+            break
+    if segment is None:
+        return None
+
+    scale = 1000000  # ns per timestamp unit
+    duration = None
+    video_track = None
+    cues = None
+    seek_cues = None
+
+    for eid, s, e, unknown in _iter_elements(buf, *segment):
+        if eid == _SEEKHEAD:
+            for sid, ss, se, _ in _iter_elements(buf, s, e):
+                if sid != 0x4DBB:
+                    continue
+                target, position = None, None
+                for fid, fs, fe, _ in _iter_elements(buf, ss, se):
+                    if fid == 0x53AB:
+                        target = _uint(buf, fs, fe)
+                    elif fid == 0x53AC:
+                        position = _uint(buf, fs, fe)
+                if target == _CUES and position is not None:
+                    seek_cues = segment[0] + position
+        elif eid == _INFO:
+            for fid, fs, fe, _ in _iter_elements(buf, s, e):
+                if fid == 0x2AD7B1:
+                    scale = _uint(buf, fs, fe)
+                elif fid == 0x4489:
+                    duration = struct.unpack(">f" if fe - fs == 4 else ">d", buf[fs:fe])[0]
+        elif eid == _TRACKS:
+            for tid, ts, te, _ in _iter_elements(buf, s, e):
+                if tid != 0xAE:
+                    continue
+                track = {}
+                for fid, fs, fe, _ in _iter_elements(buf, ts, te):
+                    if fid == 0xD7:
+                        track["number"] = _uint(buf, fs, fe)
+                    elif fid == 0x83:
+                        track["type"] = _uint(buf, fs, fe)
+                    elif fid == 0x86:
+                        track["codec"] = bytes(buf[fs:fe]).decode("latin-1").rstrip("\x00")
+                    elif fid == 0x23E383:
+                        track["default_duration_ns"] = _uint(buf, fs, fe)
+                    elif fid == 0xE0:
+                        for vid, vs, ve, _ in _iter_elements(buf, fs, fe):
+                            if vid == 0xB0:
+                                track["width"] = _uint(buf, vs, ve)
+                            elif vid == 0xBA:
+                                track["height"] = _uint(buf, vs, ve)
+                if track.get("type") == 1 and video_track is None:
+                    video_track = track
+                elif track.get("type") == 2 and info["audio_codec"] is None:
+                    info["audio_codec"] = track.get("codec")
+        elif eid == _CUES:
+            cues = (s, e)
+        elif eid == _CLUSTER and unknown:
+            # Live (MediaRecorder) output: clusters of unknown size, nothing after them is reachable.
+            break
+
+    if cues is None and seek_cues is not None and seek_cues < len(buf):
+        for eid, s, e, _ in _iter_elements(buf, seek_cues, len(buf)):
+            if eid == _CUES:
+                cues = (s, e)
+            break
+
+    if duration is not None:
+        info["duration_s"] = duration * scale / 1e9
+    if video_track is not None:
+        info["video_codec"] = video_track.get("codec")
+        info["width"], info["height"] = video_track.get("width"), video_track.get("height")
+        if video_track.get("default_duration_ns"):
+            info["fps"] = 1e9 / video_track["default_duration_ns"]
+    if cues is not None and video_track is not None:
+        keyframes = []
+        video_number = video_track.get("number")
+        for pid, ps, pe, _ in _iter_elements(buf, *cues):
+            if pid != 0xBB:
+                continue
+            time_units, track_number = None, None
+            for fid, fs, fe, _ in _iter_elements(buf, ps, pe):
+                if fid == 0xB3:
+                    time_units = _uint(buf, fs, fe)
+                elif fid == 0xB7:
+                    for cid, cs, ce, _ in _iter_elements(buf, fs, fe):
+                        if cid == 0xF7:
+                            track_number = _uint(buf, cs, ce)
+            if time_units is not None and track_number in (None, video_number):
+                keyframes.append(time_units * scale / 1e9)
+                if len(keyframes) >= _MAX_KEYFRAMES:
+                    break
+        info["keyframes_s"] = keyframes or None
+    return info
+
+
+# ---------------------------------------------------------------------------
+# WAV
+# ---------------------------------------------------------------------------
+
+def _probe_wav(buf) -> dict | None:
+    info = _empty("wav")
+    byte_rate = None
+    for t, s, e in _iter_riff_chunks(buf):
+        if t == b"fmt " and e - s >= 16:
+            codec, _, sample_rate, byte_rate = struct.unpack("<HHII", buf[s:s + 12])
+            info["audio_codec"] = "pcm" if codec == 1 else f"wav_format_{codec}"
+        elif t == b"data" and byte_rate:
+            info["duration_s"] = (e - s) / float(byte_rate)
+            return info
+    return None
+
+
+def _iter_riff_chunks(buf):
+    pos = 12
+    while pos + 8 <= len(buf):
+        chunk_id, size = struct.unpack("<4sI", buf[pos:pos + 8])
+        yield chunk_id, pos + 8, min(pos + 8 + size, len(buf))
+        pos += 8 + size + (size & 1)
+
+
+# ---------------------------------------------------------------------------
+# ffprobe fallback
+# ---------------------------------------------------------------------------
+
+def _probe_ffprobe(data: bytes, media_format: str) -> dict | None:
+    """Best-effort ffprobe over stdin (no temp file). None if ffprobe is missing or fails."""
+    ffprobe_path = shutil.which("ffprobe")
+    if not ffprobe_path:
+        return None
+    cmd = [ffprobe_path, "-hide_banner", "-loglevel", "error", "-show_format", "-show_streams", "-of", "json", "-i", "pipe:0"]
+    try:
+        p = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False, timeout=30)
+        if p.returncode != 0:
+            return None
+        probe = json.loads(p.stdout or b"{}")
+    except Exception:
+        return None
+
+    info = _empty(media_format)
+    info["source"] = "ffprobe"
+    try:
+        info["duration_s"] = float(probe.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        pass
+    for stream in probe.get("streams", []):
+        if stream.get("codec_type") == "video" and info["video_codec"] is None:
+            info["video_codec"] = stream.get("codec_name")
+            info["width"], info["height"] = stream.get("width"), stream.get("height")
+            try:
+                num, den = (int(x) for x in str(stream.get("avg_frame_rate", "0/0")).split("/"))
+                info["fps"] = num / den if den else None
+            except ValueError:
+                pass
+        elif stream.get("codec_type") == "audio" and info["audio_codec"] is None:
+            info["audio_codec"] = stream.get("codec_name")
+    return info
+
+
+# ---------------------------------------------------------------------------
+
+def sniff_media_format(file_bytes: bytes) -> str:
+    """
+    "What kind of audio/video is this?" from the magic bytes of the first chunk of the upload.
+
+    Returns one of "wav", "flac", "ogg", "mp3", "mp4", "webm", "avi" or "unknown".
+    Filename extensions and MIME types are deliberately ignored: clients routinely send wrong
+    ones (e.g. `audio/webm` for Ogg).
+    """
+    head = bytes(file_bytes[:16]) if isinstance(file_bytes, (bytes, bytearray)) else b""
+
+    # Common magic numbers
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        media_format = "wav"
+    elif head.startswith(b"RIFF") and head[8:12] == b"AVI ":
+        media_format = "avi"
+    elif head.startswith(b"fLaC"):
+        media_format = "flac"
+    elif head.startswith(b"OggS"):
+        media_format = "ogg"
+    elif head.startswith(b"ID3"):
+        media_format = "mp3"
+    elif head[:2] == b"\xff\xfb" or head[:2] == b"\xff\xf3" or head[:2] == b"\xff\xf2":
+        media_format = "mp3"
+    elif head[4:8] in (b"ftyp", b"moov", b"mdat", b"wide", b"free"):
+        # ISO BMFF / QuickTime: a 4-byte box size, then the box type.
+        media_format = "mp4"
+    elif head.startswith(b"\x1a\x45\xdf\xa3"):
+        media_format = "webm"
+    else:
+        media_format = "unknown"
+
+    return media_format
+
+
+_PARSERS = {"mp4": _probe_mp4, "webm": _probe_ebml, "wav": _probe_wav}
+
+
+def probe_media(data: bytes, media_format: str) -> dict | None:
+    """Container metadata for an upload whose format was sniffed as `media_format` (cached by content hash)."""
+    content_hash = hashlib.sha1(data, usedforsecurity=False).hexdigest()
+    with _cache_lock:
+        cached = _cache.get(content_hash)
+        if cached is not None:
+            _cache.move_to_end(content_hash)
+            MEDIA_PROBE_CACHE.labels(result="hit").inc()
+            return cached
+    MEDIA_PROBE_CACHE.labels(result="miss").inc()
+
+    info = None
+    parser = _PARSERS.get(media_format)
+    if parser is not None:
+        with timed_stage("media", "probe_parse"):
+            try:
+                info = parser(memoryview(data))
+            except (ValueError, IndexError, struct.error) as e:
+                print(f"probe_media: {media_format} header parse failed ({type(e).__name__}: {e}); trying ffprobe")
+                info = None
+    if info is None or info["duration_s"] is None:
+        with timed_stage("media", "probe_ffprobe"):
+            info = _probe_ffprobe(data, media_format) or info
+    if info is None:
+        return None
+
+    info["content_hash"] = content_hash
+    with _cache_lock:
+        _cache[content_hash] = info
+        while len(_cache) > int(os.getenv("MEDIA_PROBE_CACHE_SIZE", "256")):
+            _cache.popitem(last=False)
+    return info
@@ -0,0 +1,198 @@
+"""
+Raw score persistence and offline re-scoring of `DetectionLog` rows.
+
+Each log row written by the media endpoints carries the model outputs its verdict came from
+(`raw_scores`, packed float32; see `detection_log_model`). `rescore()` recomputes
+classification/score for historical rows with new settings, without any upstream call:
+rows are read in id-ordered batches, aggregated with vectorized NumPy (one `reduceat` per
+batch, no per-row Python loop) and only the rows whose verdict changed are written back with
+one executemany UPDATE per batch.
+
+Video rules (per row, over the stored per-frame realism scores):
+- mean (what the endpoints use), min (most suspicious frame), max
+Window-mode rows use the first `window_max_frames` frames; full-coverage rows use all of them.
+
+Audio rows keep the model's own `is_bonafide` decision unless `audio_threshold` is given, in
+which case deepfake_score (0..2) >= audio_threshold means "Deepfake".
+"""
+import time
+
+from app.services.scoring import REAL_MEAN_THRESHOLD, VIDEO_MAX_FRAMES_FOR_MEAN, frame_realism_scores
+
+VIDEO_RULES = ("mean", "min", "max")
+SCORE_TOLERANCE = 1e-3  # on the 0..100 scale
+
+
+def pack_scores(values) -> bytes | None:
+    import numpy as np
+
+    if values is None or len(values) == 0:
+        return None
+    return np.asarray(values, dtype="<f4").tobytes()
+
+
+def pack_segments(values) -> bytes | None:
+    import numpy as np
+
+    if values is None or len(values) == 0:
+        return None
+    return np.asarray(values, dtype="<i2").tobytes()
+
+
+def video_log_fields(result: dict, coverage: str) -> dict:
+    """Raw-score columns for a `VideoAnalyzer` result (frame order, as aggregated by `video_verdict`)."""
+    scored = frame_realism_scores(result.get("per_frame_results"))
+    segments = None
+    if coverage == "full":
+        segments = [fr.get("segment") if fr.get("segment") is not None else -1 for fr, _ in scored]
+    return {
+        "modality": "video",
+        "coverage": coverage,
+        "raw_scores": pack_scores([rs for _, rs in scored]),
+        "raw_segments": pack_segments(segments),
+    }
+
+
+def audio_log_fields(result: dict) -> dict:
+    """Raw-score columns for an audio backend result."""
+    try:
+        raw = float(result.get("deepfake_score"))
+    except (TypeError, ValueError):
+        raw = None
+    return {
+        "modality": "audio",
+        "coverage": None,
+        "raw_scores": pack_scores([raw]) if raw is not None else None,
+        "raw_segments": None,
+    }
+
+
+def aggregate_scores(blobs: list[bytes], max_frames, rule: str = "mean"):
+    """
+    Aggregate packed per-row score arrays.
+
+    `max_frames`: per-row limit (numpy int array) or None. Returns a float64 array with one
+    value per blob (NaN for rows without scores).
+    """
+    import numpy as np
+
+    if rule not in VIDEO_RULES:
+        raise ValueError(f"Unknown aggregation rule: {rule} (expected one of {', '.join(VIDEO_RULES)})")
+
+    n = len(blobs)
+    lengths = np.fromiter((len(b) // 4 for b in blobs), dtype=np.int64, count=n)
+    flat = np.frombuffer(b"".join(blobs), dtype="<f4").astype(np.float64)
+
+    if max_frames is not None:
+        starts = np.cumsum(lengths) - lengths
+        position = np.arange(flat.size) - np.repeat(starts, lengths)
+        keep = position < np.repeat(max_frames, lengths)
+        flat = flat[keep]
+        lengths = np.minimum(lengths, max_frames)
+
+    out = np.full(n, np.nan)
+    nonempty = lengths > 0
+    if not nonempty.any():
+        return out
+    # Rows are contiguous in `flat`, so one reduceat over the non-empty rows' offsets does it.
+    offsets = (np.cumsum(lengths) - lengths)[nonempty]
+    if rule == "mean":
+        out[nonempty] = np.add.reduceat(flat, offsets) / lengths[nonempty]
+    elif rule == "min":
+        out[nonempty] = np.minimum.reduceat(flat, offsets)
+    else:
+        out[nonempty] = np.maximum.reduceat(flat, offsets)
+    return out
+
+
+def _rescore_video(rows, *, threshold: float, rule: str, window_max_frames: int | None):
+    import numpy as np
+
+    limit = np.iinfo(np.int64).max
+    max_frames = np.array(
+        [window_max_frames if (r["coverage"] != "full" and window_max_frames) else limit for r in rows],
+        dtype=np.int64,
+    )
+    realism = aggregate_scores([r["raw_scores"] for r in rows], max_frames, rule)
+    scores = np.clip(realism, 0.0, 1.0) * 100.0
+    deepfake = scores < threshold
+    return scores, deepfake
+
+
+def _rescore_audio(rows, *, audio_threshold: float):
+    import numpy as np
+
+    raw = aggregate_scores([r["raw_scores"] for r in rows], None, "mean")
+    scores = np.clip(raw / 2.0, 0.0, 1.0) * 100.0
+    deepfake = raw >= audio_threshold
+    return scores, deepfake
+
+
+def rescore(
+    *,
+    threshold: float = REAL_MEAN_THRESHOLD,
+    rule: str = "mean",
+    window_max_frames: int | None = VIDEO_MAX_FRAMES_FOR_MEAN,
+    audio_threshold: float | None = None,
+    batch_size: int = 10000,
+    dry_run: bool = False,
+    log_service=None,
+) -> dict:
+    """
+    Recompute classification/score of every log row with stored raw scores.
+
+    Returns counts: rows scanned, rows changed, classification flips per direction, throughput.
+    With `dry_run` nothing is written.
+    """
+    import numpy as np
+
+    if rule not in VIDEO_RULES:
+        raise ValueError(f"Unknown aggregation rule: {rule} (expected one of {', '.join(VIDEO_RULES)})")
+    if log_service is None:
+        from app.services.log_service import LogService
+
+        log_service = LogService()
+
+    stats = {"rows_scanned": 0, "rows_changed": 0, "to_deepfake": 0, "to_bonafide": 0, "audio_skipped": 0}
+    t0 = time.perf_counter()
+    for batch in log_service.iter_raw_score_batches(batch_size):
+        stats["rows_scanned"] += len(batch)
+        updates = []
+        for modality in ("video", "audio"):
+            rows = [r for r in batch if r["modality"] == modality]
+            if not rows:
+                continue
+            if modality == "audio" and audio_threshold is None:
+                stats["audio_skipped"] += len(rows)
+                continue
+            if modality == "video":
+                scores, deepfake = _rescore_video(rows, threshold=threshold, rule=rule, window_max_frames=window_max_frames)
+            else:
+                scores, deepfake = _rescore_audio(rows, audio_threshold=audio_threshold)
+
+            old_scores = np.array([r["score"] if r["score"] is not None else np.nan for r in rows], dtype=np.float64)
+            old_deepfake = np.array([r["classification"] == "Deepfake" for r in rows])
+            valid = ~np.isnan(scores)
+            # Raw scores are stored as float32: score differences below SCORE_TOLERANCE are storage noise.
+            changed = valid & ((deepfake != old_deepfake) | ~np.isclose(scores, old_scores, rtol=0.0, atol=SCORE_TOLERANCE))
+            stats["to_deepfake"] += int((changed & deepfake & ~old_deepfake).sum())
+            stats["to_bonafide"] += int((changed & ~deepfake & old_deepfake).sum())
+            for i in np.flatnonzero(changed):
+                updates.append(
+                    {
+                        "row_id": rows[i]["id"],
+                        "new_classification": "Deepfake" if deepfake[i] else "Bonafide",
+                        "new_score": round(float(scores[i]), 4),
+                        "new_is_deepfake": bool(deepfake[i]),
+                    }
+                )
+
+        stats["rows_changed"] += len(updates)
+        if updates and not dry_run:
+            log_service.update_verdicts(updates)
+
+    elapsed = time.perf_counter() - t0
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["rows_per_s"] = round(stats["rows_scanned"] / elapsed, 1) if elapsed > 0 else None
+    stats["dry_run"] = dry_run
+    return stats
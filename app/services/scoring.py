@@ -0,0 +1,142 @@
+"""
+Turns raw analyzer output into the `classification` / `score` pair returned to clients and logged.
+
+Video endpoint output example (per frame):
+[
+  {"label": "Deepfake", "score": 0.54},
+  {"label": "Realism", "score": 0.46}
+]
+
+Video aggregation rule (less sensitive than max-of-one-frame):
+- Extract the per-frame "Realism" score (0..1).
+- Compute mean Realism score over up to 10 frames (every sampled frame in full coverage).
+- If mean Realism >= 10 (on 0..100 scale) => Bonafide else Deepfake.
+
+Audio endpoint contract:
+- deepfake_score is in range 0..2 (higher = more fake)
+- is_bonafide is the primary decision flag
+
+Combined (audio + video) verdict: a manipulated track in either modality makes the media a
+deepfake, so the fused classification is "Deepfake" if any available modality says so.
+"""
+
+REAL_MEAN_THRESHOLD = 10.0
+VIDEO_MAX_FRAMES_FOR_MEAN = 10
+
+
+def extract_label_to_score(output) -> dict[str, float]:
+    try:
+        items = output
+        if isinstance(output, dict):
+            # Some endpoints return {"label": "...", "score": ...} or {"outputs": [...]}
+            if "outputs" in output and isinstance(output["outputs"], list):
+                items = output["outputs"]
+            elif "label" in output and "score" in output:
+                items = [output]
+
+        if not isinstance(items, list):
+            return {}
+
+        out: dict[str, float] = {}
+
+        for it in items:
+            if not isinstance(it, dict):
+                continue
+            label = str(it.get("label", "")).strip()
+            score = it.get("score", None)
+            try:
+                score_f = float(score)
+            except Exception:
+                continue
+
+            if label:
+                out[label.strip().lower()] = score_f
+
+        return out
+    except Exception:
+        return {}
+
+
+def get_realism_score_01(label_scores: dict[str, float]) -> float | None:
+    # Common label variants across image deepfake models
+    for key in ("realism", "real", "bonafide", "bona fide"):
+        if key in label_scores:
+            s = label_scores[key]
+            try:
+                return max(0.0, min(float(s), 1.0))
+            except Exception:
+                return None
+    return None
+
+
+def frame_realism_scores(per_frame_results) -> list[tuple[dict, float]]:
+    """Return [(frame_result, realism_0_1), ...] for every frame with a parsable realism score."""
+    out = []
+    for fr in per_frame_results or []:
+        if not isinstance(fr, dict):
+            continue
+        rs = get_realism_score_01(extract_label_to_score(fr.get("output")))
+        if rs is not None:
+            out.append((fr, rs))
+    return out
+
+
+def video_verdict(realism_scores: list[float], max_frames: int | None = VIDEO_MAX_FRAMES_FOR_MEAN) -> tuple[str, float]:
+    """(classification, score 0..100) from per-frame realism scores (0..1). Scores must be non-empty."""
+    # Mean of up to `max_frames` realism scores (0..1), then scale to 0..100.
+    scores_for_mean = realism_scores[:max_frames] if max_frames else realism_scores
+    mean_realism = sum(scores_for_mean) / float(len(scores_for_mean))
+    normalized_score = max(0.0, min(mean_realism, 1.0)) * 100.0
+    classification = "Bonafide" if normalized_score >= REAL_MEAN_THRESHOLD else "Deepfake"
+    return classification, normalized_score
+
+
+def segment_verdicts(result: dict) -> list[dict] | None:
+    """Per-segment classification/score for full-coverage video results (None otherwise)."""
+    segments = result.get("segments") if isinstance(result, dict) else None
+    if segments is None:
+        return None
+
+    by_segment: dict[int, list[float]] = {}
+    for fr, rs in frame_realism_scores(result.get("per_frame_results")):
+        if fr.get("segment") is not None:
+            by_segment.setdefault(fr["segment"], []).append(rs)
+
+    out = []
+    for seg in segments:
+        scores = by_segment.get(seg["index"], [])
+        classification, score = video_verdict(scores, max_frames=None) if scores else (None, None)
+        out.append(
+            {
+                "index": seg["index"],
+                "start_s": seg["start_s"],
+                "end_s": seg["end_s"],
+                "frames": len(scores),
+                "classification": classification,
+                "score": score,
+            }
+        )
+    return out
+
+
+def audio_verdict(result: dict) -> tuple[str, float]:
+    """(classification, score 0..100) from the audio endpoint output."""
+    raw_score = float(result.get("deepfake_score", 0.0) or 0.0)
+    normalized_score = max(0.0, min(raw_score / 2.0, 1.0)) * 100.0
+
+    is_bonafide = result.get("is_bonafide", None)
+    if is_bonafide is None:
+        label = str(result.get("label", "")).strip().lower()
+        is_bonafide = (label == "bonafide")
+
+    classification = "Bonafide" if bool(is_bonafide) else "Deepfake"
+    return classification, normalized_score
+
+
+def fuse_verdicts(video_classification: str | None, audio_classification: str | None) -> str | None:
+    """Fused classification of one upload; a modality is None when it is missing (e.g. no audio track)."""
+    if "Deepfake" in (video_classification, audio_classification):
+        return "Deepfake"
+    if video_classification is None and audio_classification is None:
+        return None
+    return "Bonafide"
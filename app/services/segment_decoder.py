@@ -0,0 +1,246 @@
+"""
+Whole-video coverage: decode time segments in parallel worker processes.
+
+The video (already spooled to a temp file) is split into `n` equal time segments. Each worker
+opens its own `cv2.VideoCapture`, seeks to the segment start (the FFmpeg backend seeks to the
+preceding keyframe and decodes forward from there) and lets a sampler pick that segment's share
+of the frame budget (proportional to its duration), so the final sample is stratified across the
+whole duration.
+
+Settings (env):
+- VIDEO_SEGMENT_WORKERS: worker processes (default min(4, cpu_count)); 0 decodes in the calling
+  process, as one segment (for callers that already run in a worker process, e.g. `cli.bulk_analyze`)
+- VIDEO_SEGMENTS: segments per video (default = workers, capped by the frame budget)
+- VIDEO_FULL_COVERAGE_TIME_BUDGET_S: wall-clock decode budget per request (default 20); further
+  capped by the request deadline, minus the share reserved for inference (`deadline.decode_budget`)
+"""
+import bisect
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.services.frame_selection import make_sampler
+from app.utils.deadline import decode_budget
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def worker_count() -> int:
+    default = min(4, os.cpu_count() or 1)
+    return max(0, int(os.getenv("VIDEO_SEGMENT_WORKERS", str(default))))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that already runs uvicorn / request threads is unsafe.
+                _pool = ProcessPoolExecutor(
+                    max_workers=worker_count(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    """Forget a pool that lost a worker (OOM kill, codec crash); the next request starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def probe_duration(path: str) -> tuple[float | None, float | None]:
+    """Return (duration_s, fps) from container metadata, or (None, None) if unknown."""
+    import cv2  # type: ignore
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None, None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+        if fps <= 0 or count <= 0 or fps > 1000:
+            return None, fps if fps > 0 else None
+        return count / fps, fps
+    finally:
+        cap.release()
+
+
+def plan_segments(duration_s: float, frames: int, keyframes_s: list[float] | None = None) -> list[tuple[float, float, int]]:
+    """
+    Split [0, duration) into segments and share `frames` between them: [(start_s, end_s, k), ...].
+
+    With a keyframe index, each boundary is moved back to the nearest keyframe, so a worker's
+    seek lands exactly on its start and no frames are decoded only to be skipped. Boundaries
+    that collapse onto the same keyframe merge their segments. Snapped segments differ in
+    length, so each one's frame budget is proportional to its duration (at least 1 frame).
+    """
+    frames = max(1, int(frames))
+    n = int(os.getenv("VIDEO_SEGMENTS", str(worker_count())))
+    n = max(1, min(n, frames))
+    step = duration_s / n
+    starts = [i * step for i in range(n)]
+
+    if keyframes_s:
+        keyframes = sorted(keyframes_s)
+        snapped = [0.0]
+        for start in starts[1:]:
+            i = bisect.bisect_right(keyframes, start) - 1
+            kf = keyframes[i] if i >= 0 else 0.0
+            if kf > snapped[-1]:
+                snapped.append(kf)
+        starts = snapped
+
+    ends = starts[1:] + [math.inf]
+    durations = [max(0.0, min(end, duration_s) - start) for start, end in zip(starts, ends)]
+    return list(zip(starts, ends, _share_frames(frames, durations)))
+
+
+def _share_frames(frames: int, durations: list[float]) -> list[int]:
+    """Split `frames` proportionally to `durations` (largest remainder), at least 1 per segment."""
+    n = len(durations)
+    total = sum(durations)
+    if total <= 0:
+        durations, total = [1.0] * n, float(n)
+    exact = [frames * d / total for d in durations]
+    budgets = [max(1, int(e)) for e in exact]
+    # Hand out what rounding down left over, largest fractional part first...
+    by_remainder = sorted(range(n), key=lambda i: exact[i] - int(exact[i]), reverse=True)
+    for i in by_remainder[: max(0, frames - sum(budgets))]:
+        budgets[i] += 1
+    # ...or take back what the 1-frame minimum added, from the segments furthest above their share.
+    while sum(budgets) > frames:
+        i = max((j for j in range(n) if budgets[j] > 1), key=lambda j: budgets[j] - exact[j])
+        budgets[i] -= 1
+    return budgets
+
+
+def decode_segment(path: str, start_s: float, end_s: float, k: int, selection: str | None, deadline: float) -> dict:
+    """
+    Worker entry point (runs in a separate process).
+
+    Returns {"frames": [(frame_index, frame_bgr), ...], "frames_decoded": int, "timed_out": bool}.
+    """
+    import cv2  # type: ignore
+
+    sampler = make_sampler(k, selection)
+    decoded = 0
+    timed_out = False
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return {"error": "Failed to open video in segment worker"}
+
+        if start_s > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, start_s * 1000.0)
+
+        start_ms = start_s * 1000.0
+        end_ms = end_s * 1000.0
+        while True:
+            if time.time() >= deadline:
+                timed_out = True
+                break
+            # POS_FRAMES before read() is the index of the frame about to be decoded.
+            frame_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                break
+            pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC) or 0.0
+            if pos_ms >= end_ms:
+                break
+            decoded += 1
+            if pos_ms < start_ms:
+                # Frames between the keyframe the seek landed on and the segment start.
+                continue
+            sampler.offer(frame_index, frame)
+    finally:
+        cap.release()
+
+    return {"frames": sampler.selected(), "frames_decoded": decoded, "timed_out": timed_out}
+
+
+def decode_full_video(path: str, frames: int, selection: str | None = None, container: dict | None = None) -> dict:
+    """
+    Decode the whole video in parallel segments.
+
+    `container` is the parsed header metadata (see `media_probe`); its duration, fps and
+    keyframe index are used for planning. Without it, duration/fps come from OpenCV.
+
+    Returns:
+    - {"error": "..."} when the duration is unknown or a worker process died (caller falls back
+      to sequential decoding of the first window)
+    - otherwise {"sampled": [(frame_index, frame), ...], "segments": [...], "duration_s": float}
+    """
+    container = container or {}
+    duration_s, fps = container.get("duration_s"), container.get("fps")
+    if not duration_s:
+        duration_s, fps = probe_duration(path)
+    if not duration_s:
+        return {"error": "Video duration unknown; cannot plan segments"}
+
+    budget_s = decode_budget(float(os.getenv("VIDEO_FULL_COVERAGE_TIME_BUDGET_S", "20")))
+    # Wall clock, so the worker processes can compare against it.
+    deadline = time.time() + budget_s
+    plan = plan_segments(duration_s, frames, container.get("keyframes_s"))
+
+    pool = None
+    if worker_count() == 0:
+        futures = [None] * len(plan)
+    else:
+        pool = _get_pool()
+        try:
+            futures = [pool.submit(decode_segment, path, start, end, k, selection, deadline) for start, end, k in plan]
+        except BrokenProcessPool as e:
+            _discard_pool(pool)
+            return {"error": f"Segment decoder pool broken: {e}"}
+
+    sampled = []
+    segments = []
+    for i, ((start, end, k), fut) in enumerate(zip(plan, futures)):
+        try:
+            if fut is None:
+                out = decode_segment(path, start, end, k, selection, deadline)
+            else:
+                out = fut.result(timeout=budget_s + 30)
+        except BrokenProcessPool as e:
+            # Every pending segment of this pool fails the same way.
+            print(f"Segment decoder worker died, restarting the pool: {e}")
+            _discard_pool(pool)
+            return {"error": f"Segment decoder worker died: {e}"}
+        except Exception as e:
+            out = {"error": f"{type(e).__name__}: {e}"}
+
+        seg = {
+            "index": i,
+            "start_s": round(start, 3),
+            "end_s": round(min(end, duration_s), 3),
+            "requested_frames": k,
+        }
+        if "error" in out:
+            seg["error"] = out["error"]
+        else:
+            seg["frames_decoded"] = out["frames_decoded"]
+            seg["timed_out"] = out["timed_out"]
+            seg["frame_indices"] = [idx for idx, _ in out["frames"]]
+            sampled.extend(out["frames"])
+        segments.append(seg)
+
+    sampled.sort(key=lambda t: t[0])
+    return {"sampled": sampled, "segments": segments, "duration_s": duration_s, "fps": fps}
@@ -0,0 +1,317 @@
+"""
+Live analysis of a MediaRecorder stream (WebM with Opus audio and optionally VP8/VP9 video).
+
+Chunks are piped straight into two long-running ffmpeg processes as they arrive:
+- audio: the same WAV conversion `AudioAnalyzer` uses for uploads (mono PCM at
+  AUDIO_TARGET_SAMPLE_RATE), read incrementally from stdout;
+- video: frames at STREAM_VIDEO_FPS as an MJPEG stream, split on JPEG markers.
+
+Only bounded state is kept per connection: the last STREAM_AUDIO_WINDOW_S seconds of PCM, the
+last STREAM_FRAME_BUFFER frames (still JPEG-encoded) and the realism scores of the last
+STREAM_VIDEO_WINDOW_FRAMES scored frames. Chunks themselves are never buffered.
+`analyze_window()` scores the current rolling windows and returns an update for the client.
+
+Settings (env):
+- STREAM_AUDIO_WINDOW_S (default 4), STREAM_MIN_AUDIO_S (default 1)
+- STREAM_VIDEO_FPS (default 2), STREAM_VIDEO_WIDTH (default 640)
+- STREAM_FRAME_BUFFER (default 8), STREAM_FRAMES_PER_UPDATE (default 3)
+- STREAM_VIDEO_WINDOW_FRAMES (default 10)
+- STREAM_MAX_BYTES: total bytes accepted per connection (default 200 MB)
+"""
+import asyncio
+import io
+import os
+import shutil
+import struct
+import time
+import wave
+from collections import deque
+
+from app.services.audio_analyzer import AudioAnalyzer
+from app.services.scoring import audio_verdict, frame_realism_scores, fuse_verdicts, video_verdict
+from app.services.video_analyzer import VideoAnalyzer
+from app.utils.metrics import timed_stage
+
+# ffmpeg waits for `probesize` bytes / `analyzeduration` before emitting anything; MediaRecorder
+# WebM declares its tracks up front, so small values give the first output within a chunk or two.
+_LOW_LATENCY_INPUT = ["-probesize", "32768", "-analyzeduration", "500000"]
+
+_JPEG_SOI = b"\xff\xd8"
+_JPEG_EOI = b"\xff\xd9"
+_MAX_PENDING_FRAME_BYTES = 8 * 1024 * 1024
+
+
+class StreamLimitExceeded(Exception):
+    pass
+
+
+def _parse_wav_header(buf: bytes):
+    """Return (pcm_offset, sample_rate, channels) once the streamed WAV header is complete, else None."""
+    if len(buf) < 12:
+        return None
+    if buf[:4] != b"RIFF" or buf[8:12] != b"WAVE":
+        raise ValueError("ffmpeg audio output is not WAV")
+    pos = 12
+    sample_rate, channels = None, None
+    while pos + 8 <= len(buf):
+        chunk_id = buf[pos:pos + 4]
+        (size,) = struct.unpack("<I", buf[pos + 4:pos + 8])
+        if chunk_id == b"data":
+            # Streamed WAV has a placeholder size; the PCM just runs until EOF.
+            return pos + 8, sample_rate, channels
+        if chunk_id == b"fmt ":
+            if pos + 8 + 16 > len(buf):
+                return None
+            channels, sample_rate = struct.unpack("<HI", buf[pos + 10:pos + 16])
+        pos += 8 + size + (size & 1)
+    return None
+
+
+class StreamSession:
+    """State for one WebSocket connection; not thread-safe (drive it from one event loop)."""
+
+    def __init__(self):
+        self.audio_analyzer = AudioAnalyzer()
+        self.video_analyzer = VideoAnalyzer()
+
+        self.audio_window_s = float(os.getenv("STREAM_AUDIO_WINDOW_S", "4"))
+        self.min_audio_s = float(os.getenv("STREAM_MIN_AUDIO_S", "1"))
+        self.video_fps = float(os.getenv("STREAM_VIDEO_FPS", "2"))
+        self.video_width = int(os.getenv("STREAM_VIDEO_WIDTH", "640"))
+        self.frames_per_update = int(os.getenv("STREAM_FRAMES_PER_UPDATE", "3"))
+        self.max_bytes = int(os.getenv("STREAM_MAX_BYTES", str(200 * 1024 * 1024)))
+
+        self.started_at = time.perf_counter()
+        self.bytes_in = 0
+        self.seq = 0
+
+        # Audio: rolling PCM window.
+        self._pcm = bytearray()
+        self._pcm_header = bytearray()
+        self._pcm_format = None  # (sample_rate, channels) once the WAV header is parsed
+        self.audio_seconds = 0.0
+        self._audio_scored_at = 0.0
+
+        # Video: recent JPEG frames and recent per-frame realism scores.
+        self._frames = deque(maxlen=int(os.getenv("STREAM_FRAME_BUFFER", "8")))
+        self._realism = deque(maxlen=int(os.getenv("STREAM_VIDEO_WINDOW_FRAMES", "10")))
+        self.frames_received = 0
+        self._last_frame_scored = -1
+        self._video_buf = b""
+
+        self.audio = None  # latest {"classification", "score"} per modality
+        self.video = None
+        self.errors = []
+        self.decoder_errors = []
+
+        self._procs = {}
+        self._readers = []
+
+    # ---- ffmpeg plumbing -------------------------------------------------------------------
+
+    async def start(self) -> None:
+        ffmpeg_path = shutil.which("ffmpeg")
+        if not ffmpeg_path:
+            raise RuntimeError("ffmpeg is required for stream analysis but was not found in PATH")
+
+        audio_cmd = AudioAnalyzer._wav_ffmpeg_cmd(ffmpeg_path, "pipe:0", ["-vn"], input_args=_LOW_LATENCY_INPUT)
+        video_cmd = [
+            ffmpeg_path,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            *_LOW_LATENCY_INPUT,
+            "-i",
+            "pipe:0",
+            "-an",
+            "-vf",
+            f"fps={self.video_fps},scale='min({self.video_width},iw)':-2",
+            "-f",
+            "image2pipe",
+            "-c:v",
+            "mjpeg",
+            "-q:v",
+            "3",
+            "pipe:1",
+        ]
+        for name, cmd, on_data in (("audio", audio_cmd, self._on_audio), ("video", video_cmd, self._on_video)):
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            self._procs[name] = proc
+            self._readers.append(asyncio.create_task(self._read(name, proc, on_data)))
+
+    async def feed(self, chunk: bytes) -> None:
+        """Forward one MediaRecorder chunk to both decoders."""
+        if self.bytes_in == 0 and not AudioAnalyzer._looks_like_webm(chunk):
+            raise ValueError("Stream must start with a WebM (EBML) header, as produced by MediaRecorder")
+        self.bytes_in += len(chunk)
+        if self.bytes_in > self.max_bytes:
+            raise StreamLimitExceeded(f"Stream exceeded {self.max_bytes} bytes")
+
+        for proc in self._procs.values():
+            if proc.stdin is None or proc.stdin.is_closing():
+                continue
+            try:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # e.g. the video decoder exits on an audio-only recording.
+                proc.stdin.close()
+
+    async def close_input(self) -> None:
+        """Signal end of stream and wait until both decoders have flushed their output."""
+        for proc in self._procs.values():
+            if proc.stdin is not None and not proc.stdin.is_closing():
+                proc.stdin.close()
+        await asyncio.gather(*self._readers, return_exceptions=True)
+        for proc in self._procs.values():
+            await proc.wait()
+
+    async def abort(self) -> None:
+        for proc in self._procs.values():
+            if proc.returncode is None:
+                proc.kill()
+        for task in self._readers:
+            task.cancel()
+        await asyncio.gather(*self._readers, return_exceptions=True)
+        for proc in self._procs.values():
+            await proc.wait()
+
+    async def _read(self, name: str, proc, on_data) -> None:
+        try:
+            while True:
+                data = await proc.stdout.read(65536)
+                if not data:
+                    return
+                on_data(data)
+        except (ValueError, StreamLimitExceeded) as e:
+            # Stop this decoder; a stalled stdout would otherwise block `feed()` forever.
+            self.decoder_errors.append({name: str(e)})
+            if proc.returncode is None:
+                proc.kill()
+
+    def _on_audio(self, data: bytes) -> None:
+        if self._pcm_format is None:
+            self._pcm_header.extend(data)
+            parsed = _parse_wav_header(bytes(self._pcm_header))
+            if parsed is None:
+                if len(self._pcm_header) > 65536:
+                    raise ValueError("ffmpeg audio output has no WAV data chunk")
+                return
+            offset, sample_rate, channels = parsed
+            self._pcm_format = (sample_rate or 16000, channels or 1)
+            data = bytes(self._pcm_header[offset:])
+            self._pcm_header = bytearray()
+
+        sample_rate, channels = self._pcm_format
+        bytes_per_second = sample_rate * channels * 2
+        self.audio_seconds += len(data) / float(bytes_per_second)
+        self._pcm.extend(data)
+        limit = int(self.audio_window_s * bytes_per_second)
+        limit -= limit % (channels * 2)
+        if len(self._pcm) > limit:
+            del self._pcm[: len(self._pcm) - limit]
+
+    def _on_video(self, data: bytes) -> None:
+        buf = self._video_buf + data
+        while True:
+            start = buf.find(_JPEG_SOI)
+            if start < 0:
+                buf = b""
+                break
+            end = buf.find(_JPEG_EOI, start + 2)
+            if end < 0:
+                buf = buf[start:]
+                break
+            self._frames.append((self.frames_received, buf[start:end + 2]))
+            self.frames_received += 1
+            buf = buf[end + 2:]
+        if len(buf) > _MAX_PENDING_FRAME_BYTES:
+            raise StreamLimitExceeded("Decoded frame exceeds the streaming frame size limit")
+        self._video_buf = buf
+
+    # ---- rolling inference -----------------------------------------------------------------
+
+    def _window_wav(self) -> bytes:
+        sample_rate, channels = self._pcm_format
+        out = io.BytesIO()
+        with wave.open(out, "wb") as w:
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(sample_rate)
+            w.writeframes(bytes(self._pcm))
+        return out.getvalue()
+
+    async def _score_audio(self) -> None:
+        if self._pcm_format is None or self.audio_seconds < self.min_audio_s:
+            return
+        if self.audio_seconds <= self._audio_scored_at:
+            return
+        self._audio_scored_at = self.audio_seconds
+        wav = self._window_wav()
+        with timed_stage("stream", "audio_window"):
+            result = await asyncio.to_thread(self.audio_analyzer.backend.score_audio, wav)
+        if isinstance(result, dict) and "error" in result:
+            self.errors.append({"audio": result["error"]})
+            return
+        classification, score = audio_verdict(result)
+        self.audio = {"classification": classification, "score": score}
+
+    async def _score_frames(self) -> None:
+        pending = [(i, jpg) for i, jpg in self._frames if i > self._last_frame_scored]
+        if not pending:
+            return
+        pending = pending[-self.frames_per_update:]
+        self._last_frame_scored = pending[-1][0]
+
+        with timed_stage("stream", "video_window"):
+            results = await asyncio.to_thread(self._classify_jpegs, pending)
+        for fr in results:
+            if "error" in fr:
+                self.errors.append({"video": fr["error"], "frame_index": fr.get("frame_index")})
+        self._realism.extend(rs for _, rs in frame_realism_scores(results))
+        if self._realism:
+            classification, score = video_verdict(list(self._realism), max_frames=None)
+            self.video = {"classification": classification, "score": score}
+
+    def _classify_jpegs(self, frames: list) -> list[dict]:
+        import cv2  # type: ignore
+        import numpy as np
+
+        decoded = []
+        for idx, jpg in frames:
+            frame = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                decoded.append((idx, frame))
+        cropper = self.video_analyzer.face_cropper
+        if cropper is not None and decoded:
+            cropped, _ = cropper.crop_frames(decoded)
+            decoded = cropped or decoded
+        return self.video_analyzer.backend.classify_frames(decoded) if decoded else []
+
+    async def analyze_window(self) -> dict:
+        """Score whatever is new in the rolling windows and return an update message."""
+        self.errors = []
+        await asyncio.gather(self._score_audio(), self._score_frames())
+        self.seq += 1
+        return {
+            "seq": self.seq,
+            "elapsed_s": round(time.perf_counter() - self.started_at, 3),
+            "media_seconds": round(max(self.audio_seconds, self.frames_received / self.video_fps), 3),
+            "classification": fuse_verdicts(
+                self.video["classification"] if self.video else None,
+                self.audio["classification"] if self.audio else None,
+            ),
+            "audio": self.audio,
+            "video": self.video,
+            "errors": (self.decoder_errors + self.errors) or None,
+        }
+
+    def has_new_data(self) -> bool:
+        return self.audio_seconds > self._audio_scored_at or any(
+            i > self._last_frame_scored for i, _ in self._frames
+        )
@@ -0,0 +1,216 @@
+"""
+Client-side load balancing across upstream inference replicas.
+
+`HUGGINGFACE_IMAGE_API_URL` / `HUGGINGFACE_AUDIO_API_URL` accept several URLs separated by
+commas. Per replica (per process) the pool tracks an EWMA of successful-call latency, an EWMA
+of the failure rate and the calls in flight. Each call samples two eligible replicas
+(power of two choices) and takes the cheaper one, where
+
+    cost = latency_ewma * (in_flight + 1) / (1 - error_ewma)
+
+so a slow, busy or flaky replica gets less traffic without starving the others.
+
+Health:
+- a replica is ejected after UPSTREAM_EJECT_FAILURES consecutive failures (connection errors,
+  timeouts, 429 and 5xx; other 4xx are the request's fault) for UPSTREAM_EJECT_S seconds,
+  doubling on each repeated ejection up to UPSTREAM_EJECT_MAX_S;
+- once that time has passed it is re-admitted on probation: a single probe call at a time,
+  fully re-admitted on success, ejected again (for longer) on failure;
+- if every replica is ejected, the one whose ejection ends first is still tried.
+
+A failed call is retried UPSTREAM_RETRIES times (default 1) on another replica when there is one.
+
+Settings (env): UPSTREAM_EWMA_ALPHA (default 0.3), UPSTREAM_EJECT_FAILURES (default 3),
+UPSTREAM_EJECT_S (default 10), UPSTREAM_EJECT_MAX_S (default 300), UPSTREAM_RETRIES (default 1).
+"""
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from app.utils.deadline import expired, timeout_for
+from app.utils.metrics import UPSTREAM_REPLICA_EJECTIONS, UPSTREAM_REPLICA_REQUESTS, record_upstream_error
+
+
+def parse_urls(value: str | None) -> list[str]:
+    return [u.strip() for u in (value or "").split(",") if u.strip()]
+
+
+def _is_replica_failure(exc) -> bool:
+    """`exc`: a `requests.exceptions.RequestException`."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        # Connection refused/reset, timeouts, ...
+        return True
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class Replica:
+    __slots__ = (
+        "url",
+        "label",
+        "latency_ewma",
+        "error_ewma",
+        "in_flight",
+        "consecutive_failures",
+        "ejections",
+        "ejected_until",
+        "probation",
+    )
+
+    def __init__(self, url: str):
+        self.url = url
+        self.label = urlsplit(url).netloc or url
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probation = False
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "latency_ewma_ms": None if self.latency_ewma is None else round(self.latency_ewma * 1000.0, 3),
+            "error_ewma": round(self.error_ewma, 4),
+            "in_flight": self.in_flight,
+            "ejected": self.ejected_until > time.monotonic(),
+            "probation": self.probation,
+        }
+
+
+class ReplicaPool:
+    """Thread-safe; one instance per (target, URL list) and process, see `replica_pool()`."""
+
+    def __init__(self, target: str, urls: list[str]):
+        if not urls:
+            raise ValueError(f"No upstream URL configured for {target}")
+        self.target = target
+        self.replicas = [Replica(u) for u in urls]
+        self.alpha = float(os.getenv("UPSTREAM_EWMA_ALPHA", "0.3"))
+        self.eject_failures = max(1, int(os.getenv("UPSTREAM_EJECT_FAILURES", "3")))
+        self.eject_s = float(os.getenv("UPSTREAM_EJECT_S", "10"))
+        self.eject_max_s = float(os.getenv("UPSTREAM_EJECT_MAX_S", "300"))
+        self.retries = max(0, int(os.getenv("UPSTREAM_RETRIES", "1")))
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def _cost(self, r: Replica) -> float:
+        # Unmeasured replicas look cheap, so they get traffic and a latency estimate quickly.
+        latency = r.latency_ewma if r.latency_ewma is not None else 0.0
+        return (latency + 1e-3) * (r.in_flight + 1) / max(0.05, 1.0 - r.error_ewma)
+
+    def _eligible(self, r: Replica, now: float) -> bool:
+        if r.ejected_until > now:
+            return False
+        # Probation: one probe call at a time.
+        return not (r.probation and r.in_flight > 0)
+
+    def acquire(self, exclude: set | None = None) -> Replica:
+        """Pick a replica and count the call as in flight. Pair with `release()`."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [r for r in self.replicas if self._eligible(r, now) and r.url not in (exclude or ())]
+            if not candidates:
+                candidates = [r for r in self.replicas if self._eligible(r, now)]
+            if not candidates:
+                # Everything is ejected: try the replica that comes back first rather than fail outright.
+                replica = min(self.replicas, key=lambda r: r.ejected_until)
+            elif len(candidates) <= 2:
+                replica = min(candidates, key=self._cost)
+            else:
+                replica = min(self._rng.sample(candidates, 2), key=self._cost)
+            if replica.ejected_until and replica.ejected_until <= now and not replica.probation:
+                replica.probation = True
+            replica.in_flight += 1
+            return replica
+
+    def release(self, replica: Replica, elapsed_s: float, ok: bool) -> None:
+        with self._lock:
+            replica.in_flight -= 1
+            replica.error_ewma += self.alpha * ((0.0 if ok else 1.0) - replica.error_ewma)
+            if ok:
+                # Only successful calls feed the latency estimate; failures are often fast.
+                if replica.latency_ewma is None:
+                    replica.latency_ewma = elapsed_s
+                else:
+                    replica.latency_ewma += self.alpha * (elapsed_s - replica.latency_ewma)
+                replica.consecutive_failures = 0
+                if replica.probation:
+                    replica.probation = False
+                    replica.ejections = 0
+                    replica.ejected_until = 0.0
+                    print(f"Upstream replica re-admitted target={self.target} replica={replica.label}")
+            else:
+                replica.consecutive_failures += 1
+                if replica.probation or replica.consecutive_failures >= self.eject_failures:
+                    self._eject(replica)
+        UPSTREAM_REPLICA_REQUESTS.labels(
+            target=self.target, replica=replica.label, outcome="ok" if ok else "error"
+        ).inc()
+
+    def _eject(self, replica: Replica) -> None:
+        replica.ejections += 1
+        duration = min(self.eject_max_s, self.eject_s * (2 ** (replica.ejections - 1)))
+        replica.ejected_until = time.monotonic() + duration
+        replica.probation = False
+        UPSTREAM_REPLICA_EJECTIONS.labels(target=self.target, replica=replica.label).inc()
+        print(f"Upstream replica ejected target={self.target} replica={replica.label} for={duration:.0f}s")
+
+    def post(self, data: bytes, headers: dict, timeout_s: float):
+        """
+        POST `data` to a replica and return the (2xx) `requests.Response`.
+        Replica failures are retried on another replica; raises the last RequestException.
+        """
+        import requests
+
+        attempts = 1 + (self.retries if len(self.replicas) > 1 else 0)
+        tried = set()
+        for attempt in range(attempts):
+            replica = self.acquire(exclude=tried)
+            tried.add(replica.url)
+            t0 = time.perf_counter()
+            # Anything but a replica failure (including non-request errors) releases as ok, so
+            # the in-flight count is always given back and the replica is not blamed for it.
+            ok = True
+            try:
+                response = requests.post(
+                    replica.url,
+                    headers=headers,
+                    data=data,
+                    timeout=timeout_s if attempt == 0 else timeout_for(timeout_s),
+                )
+                response.raise_for_status()
+                return response
+            except requests.exceptions.RequestException as e:
+                ok = not _is_replica_failure(e)
+                if ok or attempt == attempts - 1 or expired(float(os.getenv("DEADLINE_MIN_CALL_S", "0.5"))):
+                    raise
+                # The caller only sees the last error; count the ones we retried here.
+                record_upstream_error(self.target, e)
+            finally:
+                self.release(replica, time.perf_counter() - t0, ok=ok)
+        raise RuntimeError("unreachable")
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [r.snapshot() for r in self.replicas]
+
+
+_pools: dict = {}
+_pools_lock = threading.Lock()
+
+
+def replica_pool(target: str, urls: list[str]) -> ReplicaPool:
+    """The process-wide pool for this target and URL list (backends are created per request)."""
+    key = (target, tuple(urls))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ReplicaPool(target, urls)
+                _pools[key] = pool
+    return pool
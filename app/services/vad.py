@@ -0,0 +1,142 @@
+"""
+Voice-activity trimming of WAV audio before inference.
+
+A vectorized energy / zero-crossing detector runs over fixed-size PCM frames:
+- a frame is speech when its energy is well above the clip's noise floor (10th percentile), or
+  moderately above it with a high zero-crossing rate (unvoiced consonants such as "s" / "f");
+- the speech mask is widened by AUDIO_VAD_PAD_MS on both sides so word edges are kept.
+
+Modes (AUDIO_VAD):
+- off (default): audio is scored unchanged
+- trim: cut leading and trailing non-speech only
+- drop: also cut non-speech gaps inside the clip
+
+Settings (env):
+- AUDIO_VAD_FRAME_MS (default 30), AUDIO_VAD_PAD_MS (default 200)
+- AUDIO_VAD_MIN_ENERGY_DBFS: frames quieter than this are never speech (default -50)
+- AUDIO_VAD_MARGIN_DB: required distance from the noise floor (default 12)
+- AUDIO_VAD_ZCR: zero-crossing rate marking unvoiced speech (default 0.25)
+- AUDIO_VAD_MIN_SPEECH_S: clips with less detected speech are rejected before any upstream call (default 0.5);
+  a clip with no speech frame at all is always rejected
+"""
+import io
+import os
+import struct
+import wave
+
+VAD_MODES = ("off", "trim", "drop")
+
+
+def vad_mode() -> str:
+    mode = (os.getenv("AUDIO_VAD") or "off").strip().lower()
+    return mode if mode in VAD_MODES else "off"
+
+
+def _parse_pcm16(wav_bytes: bytes):
+    """Return (sample_rate, channels, pcm_bytes) for 16-bit PCM WAV, else None."""
+    if len(wav_bytes) < 12 or wav_bytes[:4] != b"RIFF" or wav_bytes[8:12] != b"WAVE":
+        return None
+    pos = 12
+    fmt = None
+    while pos + 8 <= len(wav_bytes):
+        chunk_id = wav_bytes[pos:pos + 4]
+        (size,) = struct.unpack("<I", wav_bytes[pos + 4:pos + 8])
+        if chunk_id == b"fmt " and pos + 24 <= len(wav_bytes):
+            fmt = struct.unpack("<HHIIHH", wav_bytes[pos + 8:pos + 24])
+        elif chunk_id == b"data":
+            if fmt is None or fmt[0] != 1 or fmt[5] != 16:
+                return None
+            # WAV written to a pipe (ffmpeg) carries a placeholder size; the PCM runs until EOF.
+            pcm = wav_bytes[pos + 8:pos + 8 + size] if size else wav_bytes[pos + 8:]
+            return fmt[2], fmt[1], pcm
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def _to_wav(pcm: bytes, sample_rate: int, channels: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def speech_mask(samples, frame_len: int):
+    """Per-frame speech flags (numpy bool array) for mono float samples in -1..1."""
+    import numpy as np
+
+    n = len(samples) // frame_len
+    frames = samples[: n * frame_len].reshape(n, frame_len)
+
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+    margin_db = float(os.getenv("AUDIO_VAD_MARGIN_DB", "12"))
+    noise_floor = np.percentile(energy_db, 10)
+    # Capped below the loudest frame, so a clip without any pause is not all "noise".
+    threshold = max(
+        float(os.getenv("AUDIO_VAD_MIN_ENERGY_DBFS", "-50")),
+        min(noise_floor + margin_db, energy_db.max() - margin_db),
+    )
+    voiced = energy_db > threshold
+    unvoiced = (energy_db > threshold - margin_db / 2.0) & (zcr > float(os.getenv("AUDIO_VAD_ZCR", "0.25")))
+    return voiced | unvoiced
+
+
+def apply_vad(wav_bytes: bytes, mode: str) -> dict:
+    """
+    Trim non-speech from a WAV clip.
+
+    Returns:
+    - {"wav": bytes, "stats": {...}} (the input unchanged when it is not 16-bit PCM or too short)
+    - {"error": "...", "rejected": "no_speech", "stats": {...}} when the speech guard rejects it
+    """
+    import numpy as np
+
+    parsed = _parse_pcm16(wav_bytes)
+    if parsed is None:
+        return {"wav": wav_bytes, "stats": {"mode": mode, "applied": False, "reason": "not 16-bit PCM WAV"}}
+    sample_rate, channels, pcm = parsed
+
+    interleaved = np.frombuffer(pcm[: len(pcm) - len(pcm) % (2 * channels)], dtype="<i2").reshape(-1, channels)
+    mono = interleaved.mean(axis=1, dtype=np.float32) / 32768.0
+
+    frame_ms = float(os.getenv("AUDIO_VAD_FRAME_MS", "30"))
+    frame_len = max(1, int(sample_rate * frame_ms / 1000.0))
+    input_s = len(mono) / float(sample_rate)
+    if len(mono) < frame_len:
+        return {"wav": wav_bytes, "stats": {"mode": mode, "applied": False, "reason": "clip too short"}}
+
+    speech = speech_mask(mono, frame_len)
+    speech_s = float(speech.sum()) * frame_len / sample_rate
+    stats = {"mode": mode, "applied": True, "input_s": round(input_s, 3), "speech_s": round(speech_s, 3)}
+
+    min_speech_s = float(os.getenv("AUDIO_VAD_MIN_SPEECH_S", "0.5"))
+    # No speech frame at all is rejected even with AUDIO_VAD_MIN_SPEECH_S=0: there is nothing to keep.
+    if speech_s < min_speech_s or not speech.any():
+        stats.update({"kept_s": 0.0, "removed_s": round(input_s, 3)})
+        return {
+            "error": f"Too little speech in the clip ({speech_s:.2f}s detected, at least {min_speech_s:g}s required)",
+            "rejected": "no_speech",
+            "stats": stats,
+        }
+
+    pad = int(round(float(os.getenv("AUDIO_VAD_PAD_MS", "200")) / frame_ms))
+    keep = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0 if pad > 0 else speech
+    if mode == "trim":
+        hits = np.flatnonzero(keep)
+        keep[hits[0]:hits[-1] + 1] = True
+
+    # Frame mask -> sample mask; the tail shorter than one frame follows the last frame.
+    sample_keep = np.repeat(keep, frame_len)
+    sample_keep = np.concatenate([sample_keep, np.full(len(mono) - len(sample_keep), keep[-1])])
+    kept = interleaved[sample_keep]
+
+    kept_s = len(kept) / float(sample_rate)
+    stats.update({"kept_s": round(kept_s, 3), "removed_s": round(input_s - kept_s, 3)})
+    if len(kept) == len(interleaved):
+        return {"wav": wav_bytes, "stats": stats}
+    return {"wav": _to_wav(kept.tobytes(), sample_rate, channels), "stats": stats}
@@ -1,36 +1,44 @@
 import base64
-import os
-import random
 import tempfile
 import time
-import traceback
 # from datetime import datetime
 # from pathlib import Path
 
-import requests
 from dotenv import load_dotenv
 
+from app.services.face_detector import FaceCropper
+from app.services.frame_selection import make_sampler
+from app.services.inference_backends import get_image_backend
+from app.services.segment_decoder import decode_full_video
+from app.utils.deadline import decode_budget, remaining
+from app.utils.metrics import ANALYSES_IN_FLIGHT, VIDEO_FRAMES_SKIPPED, observe_stage, timed_stage
+
 load_dotenv()
 
+# Temp-file suffix per sniffed container (OpenCV/FFmpeg probe the content anyway; this keeps it honest).
+_VIDEO_SUFFIXES = {"mp4": ".mp4", "webm": ".webm", "avi": ".avi", "ogg": ".ogv"}
+
 
 class VideoAnalyzer:
     """
     Video analyzer pipeline:
     - Accepts video input as bytes (raw file bytes) OR a base64-encoded string/bytes.
-    - Restricts analysis to the first N seconds (default: 10s).
-    - Randomly samples K frames (default: 10) from that window.
-    - Sends each sampled frame (PNG base64) to an image inference endpoint.
+    - Restricts analysis to the first N seconds (default: 10s), or with coverage="full" decodes
+      the whole video in parallel segments and samples across all of it (see `segment_decoder`).
+    - Selects K frames (default: 10) from that window: uniform reservoir sample, or
+      quality/diversity-aware selection (see `frame_selection`).
+    - Optionally (VIDEO_FACE_CROP=true) crops each frame to the largest face and skips frames
+      without one.
+    - Scores each sampled frame with the configured inference backend
+      (HTTP image endpoint by default, or in-process ONNX; see `inference_backends`).
+
+    `decode_only=True` builds an analyzer without an inference backend, for running
+    `prepare_frames` in a worker process and `score_prepared` elsewhere (see `cli.bulk_analyze`).
     """
 
-    def __init__(self):
-        self.api_url = os.getenv("HUGGINGFACE_IMAGE_API_URL")
-        self.api_key = os.getenv("HUGGINGFACE_API_KEY")
-
-        # DEBUG: show config presence (never print full key)
-        if not self.api_key:
-            raise ValueError("HUGGINGFACE_API_KEY is not set")
-        if not self.api_url:
-            raise ValueError("HUGGINGFACE_IMAGE_API_URL is not set")
+    def __init__(self, *, decode_only: bool = False):
+        self.backend = None if decode_only else get_image_backend()
+        self.face_cropper = FaceCropper() if FaceCropper.enabled() else None
 
     @staticmethod
     def _coerce_video_bytes(video_input) -> bytes:
@@ -70,25 +78,6 @@ class VideoAnalyzer:
         # Unknown type
         return b""
 
-    def _headers(self) -> dict:
-        return {
-            "Accept": "application/json",
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
-    def _query_image_endpoint(self, base64_png: str) -> dict:
-        payload = {"inputs": base64_png, "parameters": {}}
-        timeout_s = int(os.getenv("HUGGINGFACE_TIMEOUT", "60"))
-        response = requests.post(
-            self.api_url,
-            headers=self._headers(),
-            json=payload,
-            timeout=timeout_s,
-        )
-        response.raise_for_status()
-        return response.json()
-
     @staticmethod
     def _safe_name(s: str) -> str:
         s = (s or "").strip()
@@ -109,26 +98,151 @@ class VideoAnalyzer:
     #     # app/services/video_analyzer.py -> app -> repo root
     #     return Path(__file__).resolve().parents[2]
 
-    def analyze_video(self, video_input, *, filename: str | None = None, seconds: int = 10, frames: int = 10) -> dict:
+    def analyze_video(
+        self,
+        video_input,
+        *,
+        filename: str | None = None,
+        seconds: int = 10,
+        frames: int = 10,
+        selection: str | None = None,
+        coverage: str = "window",
+        media_format: str | None = None,
+        container: dict | None = None,
+    ) -> dict:
         """
         Returns a dict with:
         - sampled_frame_indices
-        - per_frame_results (list)
+        - per_frame_results (list; each has a "segment" index in full coverage)
         - errors (list)
+        - segments (list, full coverage only; None otherwise)
+        - partial (True when the request deadline dropped frames or cut decoding short)
         - metadata (fps, limit_frames, etc.)
         """
+        in_flight = ANALYSES_IN_FLIGHT.labels(pipeline="video")
+        in_flight.inc()
+        try:
+            with timed_stage("video", "total"):
+                return self._analyze_video(
+                    video_input,
+                    filename=filename,
+                    seconds=seconds,
+                    frames=frames,
+                    selection=selection,
+                    coverage=coverage,
+                    media_format=media_format,
+                    container=container,
+                )
+        finally:
+            in_flight.dec()
+
+    def iter_analyze_video(
+        self,
+        video_input,
+        *,
+        filename: str | None = None,
+        seconds: int = 10,
+        frames: int = 10,
+        selection: str | None = None,
+        coverage: str = "window",
+        media_format: str | None = None,
+        container: dict | None = None,
+    ):
+        """
+        Streaming variant of `analyze_video`.
+
+        Yields ("frame", frame_result) for each scored frame as soon as the backend returns it
+        (completion order), then ("result", <same dict as analyze_video>).
+        """
+        in_flight = ANALYSES_IN_FLIGHT.labels(pipeline="video")
+        in_flight.inc()
+        try:
+            with timed_stage("video", "total"):
+                prepared = self.prepare_frames(
+                    video_input,
+                    filename=filename,
+                    seconds=seconds,
+                    frames=frames,
+                    selection=selection,
+                    coverage=coverage,
+                    media_format=media_format,
+                    container=container,
+                )
+                if "error" in prepared:
+                    yield "result", prepared
+                    return
+
+                scored = []
+                for fr in self.backend.iter_classify_frames(prepared["to_score"]):
+                    self._tag_segment(prepared, fr)
+                    scored.append(fr)
+                    yield "frame", fr
+
+                # Same frame order as `classify_frames`, so aggregation matches the non-streaming path.
+                scored.sort(key=lambda fr: fr.get("frame_index", 0))
+                yield "result", self._build_result(prepared, scored)
+        finally:
+            in_flight.dec()
+
+    def _analyze_video(
+        self,
+        video_input,
+        *,
+        filename: str | None,
+        seconds: int,
+        frames: int,
+        selection: str | None,
+        coverage: str,
+        media_format: str | None = None,
+        container: dict | None = None,
+    ) -> dict:
+        prepared = self.prepare_frames(
+            video_input,
+            filename=filename,
+            seconds=seconds,
+            frames=frames,
+            selection=selection,
+            coverage=coverage,
+            media_format=media_format,
+            container=container,
+        )
+        if "error" in prepared:
+            return prepared
+        return self.score_prepared(prepared)
+
+    def score_prepared(self, prepared: dict) -> dict:
+        """Score the frames of a `prepare_frames` result (possibly decoded in another process)."""
+        if prepared["metadata"].get("inference_backend") is None:
+            prepared["metadata"]["inference_backend"] = self.backend.name
+        scored = self.backend.classify_frames(prepared["to_score"])
+        for fr in scored:
+            self._tag_segment(prepared, fr)
+        return self._build_result(prepared, scored)
+
+    def prepare_frames(
+        self,
+        video_input,
+        *,
+        filename: str | None,
+        seconds: int,
+        frames: int,
+        selection: str | None,
+        coverage: str,
+        media_format: str | None = None,
+        container: dict | None = None,
+    ) -> dict:
+        """Decode, sample and (optionally) face-crop; returns the frames to score plus bookkeeping, or {"error"}."""
         try:
             n_in = len(video_input) if isinstance(video_input, (bytes, bytearray)) else None
             print(f"VideoAnalyzer.analyze_video input_type={type(video_input).__name__} input_bytes={n_in}")
         except Exception:
             pass
 
-        if not self.api_url:
-            err = "HUGGINGFACE_IMAGE_API_URL is not set"
-            print(f"VideoAnalyzer DEBUG: {err}")
-            return {"error": err}
-
-        video_bytes = self._coerce_video_bytes(video_input)
+        # A sniffed format means the controller already has raw container bytes (base64 decoded).
+        if media_format and isinstance(video_input, (bytes, bytearray)):
+            video_bytes = bytes(video_input)
+        else:
+            video_bytes = self._coerce_video_bytes(video_input)
         if not video_bytes:
             return {"error": "Empty video payload"}
 
@@ -138,147 +252,212 @@ class VideoAnalyzer:
         except Exception as e:
             return {"error": f"Missing dependency for video decoding: cv2 ({type(e).__name__}: {e})"}
 
+        try:
+            sampler = make_sampler(frames, selection)
+        except ValueError as e:
+            return {"error": str(e)}
+
         errors = []
-        per_frame_results = []
-        sampled_indices = []
+        face_crop = None
+        segments = None
+        coverage_used = "window"
+        decode_truncated = False
 
         # Write to a temp file so OpenCV can decode it reliably.
         # Suffix is best-effort; OpenCV usually detects by container.
-        with tempfile.NamedTemporaryFile(prefix="deeptrust_video_", suffix=".mp4", delete=True) as tmp:
-            tmp.write(video_bytes)
-            tmp.flush()
-
-            cap = cv2.VideoCapture(tmp.name)
-            if not cap.isOpened():
-                return {"error": "Failed to open video (unsupported codec/container?)"}
+        suffix = _VIDEO_SUFFIXES.get(media_format, ".mp4")
+        with tempfile.NamedTemporaryFile(prefix="deeptrust_video_", suffix=suffix, delete=True) as tmp:
+            with timed_stage("video", "spool_to_disk"):
+                tmp.write(video_bytes)
+                tmp.flush()
+
+            sampled = None
+            if coverage == "full":
+                with timed_stage("video", "decode_segments"):
+                    full = decode_full_video(tmp.name, frames, selection, container=container)
+                if "error" in full:
+                    errors.append({"error": f"Full coverage unavailable, analyzing the first {seconds}s: {full['error']}"})
+                else:
+                    sampled = full["sampled"]
+                    segments = full["segments"]
+                    coverage_used = "full"
+                    decode_stats = {
+                        "frames_decoded": sum(seg.get("frames_decoded", 0) for seg in segments),
+                        "duration_s": round(full["duration_s"], 3),
+                    }
+                    decode_truncated = any(seg.get("timed_out") for seg in segments)
+
+            if sampled is None:
+                window = self._sample_window(cv2, tmp.name, seconds, sampler)
+                if "error" in window:
+                    return window
+                sampled = window["sampled"]
+                decode_stats = window["stats"]
+                decode_truncated = window["truncated"]
+
+        # The temp file is gone; the sampled frames live in memory from here on.
+        if not sampled:
+            if decode_truncated:
+                return {"error": "Request deadline reached before any frame was decoded", "skipped": "deadline"}
+            return {"error": "No frames available in the first time window"}
+
+        sampled_indices = [i for (i, _) in sampled]
+
+        print(
+            "VideoAnalyzer DEBUG sampling="
+            f"coverage={coverage_used} seconds={seconds} sampled={sampled_indices} "
+            f"stats={decode_stats}"
+        )
 
-            try:
-                # Avoid random seeks on VP9/WebM: seeking to non-keyframes causes
-                # "[vp9] Not all references are available" warnings and sometimes invalid frames.
-                # Instead, read sequentially through the first `seconds` and reservoir-sample `frames`.
-
-                # Try to use POS_MSEC to enforce the time window; it's more reliable than FPS metadata.
-                max_ms = int(max(1, seconds) * 1000)
-                k = max(1, int(frames))
-
-                sampled = []  # list[tuple[frame_index, frame_bgr]]
-                seen = 0
-                frame_index = 0
-
-                while True:
-                    ok, frame = cap.read()
-                    if not ok or frame is None:
-                        break
-
-                    # CAP_PROP_POS_MSEC is "timestamp of the *current* position".
-                    # After cap.read(), this should represent the frame just grabbed.
-                    pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC) or 0.0
-                    if pos_ms >= max_ms:
-                        break
-
-                    seen += 1
-                    if len(sampled) < k:
-                        sampled.append((frame_index, frame))
-                    else:
-                        # Reservoir sampling: replace existing with decreasing probability.
-                        j = random.randrange(seen)
-                        if j < k:
-                            sampled[j] = (frame_index, frame)
-
-                    frame_index += 1
-
-                if not sampled:
-                    return {"error": "No frames available in the first time window"}
-
-                # ---- TEMP FRAME EXTRACTION (DISABLED) ----
-                # If you want to re-enable saving sampled frames locally, uncomment this block.
-                #
-                # ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                # video_name = self._safe_name(os.path.splitext(os.path.basename(filename or "video"))[0])
-                # frames_dir = self._project_root() / "temp_files" / video_name / ts
-                # try:
-                #     frames_dir.mkdir(parents=True, exist_ok=True)
-                # except Exception as e:
-                #     errors.append({"error": f"Failed to create frames dir: {type(e).__name__}: {e}", "dir": str(frames_dir)})
-                #     frames_dir = None
-
-                # Keep output stable: sort by frame index
-                sampled.sort(key=lambda t: t[0])
-                sampled_indices = [i for (i, _) in sampled]
-
-                print(
-                    "VideoAnalyzer DEBUG sampling="
-                    f"seconds={seconds} sampled={sampled_indices} "
-                    f"frames_seen_in_window={seen}"
-                )
+        to_score = sampled
+        if self.face_cropper is not None:
+            with timed_stage("video", "face_detect"):
+                cropped, skipped = self.face_cropper.crop_frames(sampled)
+            face_crop = {
+                "frames_with_face": len(cropped),
+                "skipped_frame_indices": skipped,
+                "fallback_full_frames": False,
+            }
+            if cropped:
+                to_score = cropped
+                if skipped:
+                    VIDEO_FRAMES_SKIPPED.labels(reason="no_face").inc(len(skipped))
+            else:
+                # No face anywhere: scoring nothing would make the request fail, so fall
+                # back to whole frames and say so in the metadata.
+                face_crop["fallback_full_frames"] = True
 
-                for idx, frame in sampled:
-                    try:
-                        # ---- TEMP FRAME EXTRACTION (DISABLED) ----
-                        # if frames_dir is not None:
-                        #     try:
-                        #         out_path = frames_dir / f"frame_{int(idx)}.png"
-                        #         ok_write = cv2.imwrite(str(out_path), frame)
-                        #         if not ok_write:
-                        #             errors.append({"frame_index": idx, "error": "Failed to write frame to disk", "path": str(out_path)})
-                        #     except Exception as e:
-                        #         errors.append({"frame_index": idx, "error": f"Failed to save frame: {type(e).__name__}: {e}"})
-
-                        ok_enc, buf = cv2.imencode(".png", frame)
-                        if not ok_enc:
-                            errors.append({"frame_index": idx, "error": "Failed to encode frame as PNG"})
-                            continue
-
-                        b64_png = base64.b64encode(buf.tobytes()).decode("utf-8")
-
-                        t0 = time.time()
-                        out = self._query_image_endpoint(b64_png)
-                        dt_ms = (time.time() - t0) * 1000.0
-
-                        per_frame_results.append(
-                            {
-                                "frame_index": idx,
-                                "elapsed_ms": dt_ms,
-                                "output": out,
-                            }
-                        )
-                    except requests.exceptions.RequestException as e:
-                        preview = None
-                        try:
-                            resp = getattr(e, "response", None)
-                            if resp is not None:
-                                preview = (resp.text or "")[:2000]
-                        except Exception:
-                            preview = None
-                        errors.append(
-                            {
-                                "frame_index": idx,
-                                "error": f"Image inference failed: {type(e).__name__}: {e}",
-                                "upstream_body_preview": preview,
-                            }
-                        )
-                    except Exception as e:
-                        errors.append(
-                            {
-                                "frame_index": idx,
-                                "error": f"Unexpected error: {type(e).__name__}: {e}",
-                                "traceback": traceback.format_exc()[:4000],
-                            }
-                        )
-            finally:
-                try:
-                    cap.release()
-                except Exception:
-                    pass
+        segment_of = {}
+        for seg in segments or []:
+            for idx in seg.get("frame_indices", []):
+                segment_of[idx] = seg["index"]
 
         return {
-            "sampled_frame_indices": sampled_indices,
-            "per_frame_results": per_frame_results,
+            "to_score": to_score,
+            "sampled_indices": sampled_indices,
+            "segments": segments,
+            "segment_of": segment_of,
             "errors": errors,
+            "decode_truncated": decode_truncated,
             "metadata": {
+                "media_format": media_format,
+                "container": (
+                    {k: v for k, v in container.items() if k != "keyframes_s"} if container else None
+                ),
+                "coverage": coverage_used,
                 "seconds_window": int(seconds),
                 "requested_frames": int(frames),
-                "returned_frames": int(len(per_frame_results)),
-                # "saved_frames_dir": str(frames_dir) if "frames_dir" in locals() and frames_dir is not None else None,
+                **decode_stats,
+                "frames_sampled": int(len(sampled_indices)),
+                "inference_backend": self.backend.name if self.backend is not None else None,
+                "face_crop": face_crop,
+                "frame_selection": sampler.stats(),
             },
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def _tag_segment(prepared: dict, fr: dict) -> None:
+        if prepared["segments"] is not None:
+            fr["segment"] = prepared["segment_of"].get(fr.get("frame_index"))
+
+    @staticmethod
+    def _build_result(prepared: dict, scored: list[dict]) -> dict:
+        errors = list(prepared["errors"])
+        per_frame_results = []
+        for fr in scored:
+            if "error" in fr:
+                errors.append(fr)
+            else:
+                per_frame_results.append(fr)
+
+        metadata = dict(prepared["metadata"])
+        metadata["returned_frames"] = int(len(per_frame_results))
+
+        # Deadline: frames that were never sent upstream, or a decode that was cut short,
+        # make the verdict partial (computed from whatever finished).
+        dropped = [fr.get("frame_index") for fr in errors if isinstance(fr, dict) and fr.get("skipped") == "deadline"]
+        partial = bool(dropped) or prepared["decode_truncated"]
+        left = remaining()
+        if left is not None or partial:
+            metadata["deadline"] = {
+                "remaining_s": round(left, 3) if left is not None else None,
+                "dropped_frame_indices": dropped,
+                "decode_truncated": prepared["decode_truncated"],
+            }
+        return {
+            "partial": partial,
+            "sampled_frame_indices": prepared["sampled_indices"],
+            "per_frame_results": per_frame_results,
+            "errors": errors,
+            "segments": prepared["segments"],
+            "metadata": metadata,
+            # "saved_frames_dir": str(frames_dir) if "frames_dir" in locals() and frames_dir is not None else None,
+        }
+
+    @staticmethod
+    def _sample_window(cv2, path: str, seconds: int, sampler) -> dict:
+        """
+        Decode the first `seconds` sequentially and feed every frame to `sampler`.
+        Stops early (`truncated`) when the request deadline leaves no more time for decoding.
+        Returns {"sampled": [...], "stats": {...}, "truncated": bool} or {"error": "..."}.
+        """
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            return {"error": "Failed to open video (unsupported codec/container?)"}
+
+        try:
+            # Avoid random seeks on VP9/WebM: seeking to non-keyframes causes
+            # "[vp9] Not all references are available" warnings and sometimes invalid frames.
+            # Instead, read sequentially through the first `seconds` and let the sampler pick `frames`.
+
+            # Try to use POS_MSEC to enforce the time window; it's more reliable than FPS metadata.
+            max_ms = int(max(1, seconds) * 1000)
+
+            seen = 0
+            decoded = 0
+            frame_index = 0
+            truncated = False
+            t_decode = time.perf_counter()
+            budget_s = decode_budget()
+
+            while True:
+                if budget_s is not None and time.perf_counter() - t_decode >= budget_s:
+                    truncated = True
+                    break
+                ok, frame = cap.read()
+                if not ok or frame is None:
+                    break
+                decoded += 1
+
+                # CAP_PROP_POS_MSEC is "timestamp of the *current* position".
+                # After cap.read(), this should represent the frame just grabbed.
+                pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC) or 0.0
+                if pos_ms >= max_ms:
+                    break
+
+                seen += 1
+                sampler.offer(frame_index, frame)
+
+                frame_index += 1
+
+            observe_stage("video", "decode", time.perf_counter() - t_decode)
+        finally:
+            try:
+                cap.release()
+            except Exception:
+                pass
+
+        # ---- TEMP FRAME EXTRACTION (DISABLED) ----
+        # If you want to re-enable saving sampled frames locally, uncomment this block
+        # (and write `sampled` frames into `frames_dir` with cv2.imwrite).
+        #
+        # ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # video_name = self._safe_name(os.path.splitext(os.path.basename(filename or "video"))[0])
+        # frames_dir = self._project_root() / "temp_files" / video_name / ts
+        # frames_dir.mkdir(parents=True, exist_ok=True)
+
+        return {
+            "sampled": sampler.selected(),  # list[tuple[frame_index, frame_bgr]], sorted by index
+            "stats": {"frames_decoded": int(decoded), "frames_in_window": int(seen)},
+            "truncated": truncated,
+        }
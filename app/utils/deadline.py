@@ -0,0 +1,68 @@
+"""
+Per-request deadline, carried through the analysis pipeline in a ContextVar.
+
+The deadline is an absolute `time.perf_counter()` value. Worker threads that run with
+`contextvars.copy_context()` (upstream fan-out, the combined media pipeline) see the same
+deadline; worker processes get the remaining time passed explicitly.
+
+With no active deadline every helper is a no-op (`remaining()` is None).
+
+Settings (env):
+- DEADLINE_MIN_CALL_S: inference calls are not started with less time left (default 0.5)
+- DEADLINE_INFERENCE_RESERVE_S: part of the budget decoding leaves for inference (default 2, at most half)
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("deeptrust_request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(at: float | None):
+    """Publish an absolute deadline for the current context (no-op for None)."""
+    if at is None:
+        yield None
+        return
+    token = _deadline.set(at)
+    try:
+        yield at
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left until the deadline (may be negative), or None without a deadline."""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return at - time.perf_counter()
+
+
+def expired(margin_s: float = 0.0) -> bool:
+    """True if less than `margin_s` seconds are left."""
+    left = remaining()
+    return left is not None and left < margin_s
+
+
+def timeout_for(default_s: float, floor_s: float = 0.1) -> float:
+    """A per-call timeout: `default_s`, shrunk to the remaining budget (but at least `floor_s`)."""
+    left = remaining()
+    if left is None:
+        return default_s
+    return max(floor_s, min(default_s, left))
+
+
+def decode_budget(default_s: float | None = None, floor_s: float = 0.1) -> float | None:
+    """
+    Time that frame/audio decoding may take: `default_s` (None = unbounded), capped at the
+    remaining budget minus the share kept for inference: DEADLINE_INFERENCE_RESERVE_S (default 2),
+    or half of what is left for short budgets.
+    """
+    left = remaining()
+    if left is None:
+        return default_s
+    reserve_s = min(float(os.getenv("DEADLINE_INFERENCE_RESERVE_S", "2")), left / 2.0)
+    budget = max(floor_s, left - reserve_s)
+    return budget if default_s is None else min(default_s, budget)
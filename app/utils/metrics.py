@@ -0,0 +1,243 @@
+"""
+Prometheus metrics for the API and the analysis pipeline.
+
+- Stage latencies go to a single histogram labelled by (pipeline, stage), so adding a new
+  stage never needs a new metric.
+- Label children are resolved once and cached in plain dicts: the hot path is a dict lookup
+  plus `Histogram.observe`.
+- Multi-worker: when `PROMETHEUS_MULTIPROC_DIR` is set *before* this module is imported,
+  prometheus_client stores samples in mmap'd files in that directory and `render_metrics()`
+  aggregates them across all worker processes.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+from app.utils.profiling import record_stage
+
+# Covers a 1ms PNG encode up to a slow 60s upstream call.
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "deeptrust_stage_duration_seconds",
+    "Duration of a single pipeline stage.",
+    ["pipeline", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+HTTP_REQUESTS = Counter(
+    "deeptrust_http_requests_total",
+    "HTTP requests by endpoint, method and status code.",
+    ["endpoint", "method", "status"],
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "deeptrust_http_request_duration_seconds",
+    "End-to-end HTTP request duration.",
+    ["endpoint"],
+    buckets=STAGE_BUCKETS,
+)
+
+HTTP_IN_FLIGHT = Gauge(
+    "deeptrust_http_in_flight_requests",
+    "HTTP requests currently being served.",
+    multiprocess_mode="livesum",
+)
+
+ANALYSES_IN_FLIGHT = Gauge(
+    "deeptrust_analyses_in_flight",
+    "Media analyses currently running.",
+    ["pipeline"],
+    multiprocess_mode="livesum",
+)
+
+UPSTREAM_IN_FLIGHT = Gauge(
+    "deeptrust_upstream_in_flight_requests",
+    "Upstream inference calls currently waiting for a response.",
+    ["target"],
+    multiprocess_mode="livesum",
+)
+
+UPSTREAM_ERRORS = Counter(
+    "deeptrust_upstream_errors_total",
+    "Failed upstream inference calls.",
+    ["target", "kind"],
+)
+
+UPSTREAM_BYTES_SENT = Counter(
+    "deeptrust_upstream_bytes_sent_total",
+    "Request body bytes sent to upstream inference endpoints.",
+    ["target"],
+)
+
+UPSTREAM_REPLICA_REQUESTS = Counter(
+    "deeptrust_upstream_replica_requests_total",
+    "Upstream inference calls per replica and outcome (ok / error).",
+    ["target", "replica", "outcome"],
+)
+
+UPSTREAM_REPLICA_EJECTIONS = Counter(
+    "deeptrust_upstream_replica_ejections_total",
+    "Times an upstream replica was taken out of rotation after failing.",
+    ["target", "replica"],
+)
+
+VIDEO_FRAMES_SKIPPED = Counter(
+    "deeptrust_video_frames_skipped_total",
+    "Sampled video frames dropped before inference.",
+    ["reason"],
+)
+
+ADMISSION_ACTIVE = Gauge(
+    "deeptrust_admission_active_requests",
+    "Media requests admitted and currently running.",
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "deeptrust_admission_queue_depth",
+    "Media requests waiting for an analysis slot.",
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_QUEUED_BYTES = Gauge(
+    "deeptrust_admission_queued_bytes",
+    "Declared body bytes of admitted and waiting media requests.",
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "deeptrust_admission_rejections_total",
+    "Media requests rejected by admission control.",
+    ["reason"],
+)
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    "deeptrust_admission_wait_seconds",
+    "Time a media request waited in the admission queue.",
+    buckets=STAGE_BUCKETS,
+)
+
+UPSTREAM_LANE_ACTIVE = Gauge(
+    "deeptrust_upstream_lane_active_calls",
+    "Upstream inference calls holding a scheduler slot, per priority lane.",
+    ["lane"],
+    multiprocess_mode="livesum",
+)
+
+UPSTREAM_LANE_QUEUE_DEPTH = Gauge(
+    "deeptrust_upstream_lane_queue_depth",
+    "Upstream inference calls waiting for a scheduler slot, per priority lane.",
+    ["lane"],
+    multiprocess_mode="livesum",
+)
+
+UPSTREAM_LANE_WAIT_SECONDS = Histogram(
+    "deeptrust_upstream_lane_wait_seconds",
+    "Time an upstream inference call waited for a scheduler slot, per priority lane.",
+    ["lane"],
+    buckets=STAGE_BUCKETS,
+)
+
+UPSTREAM_LANE_TIMEOUTS = Counter(
+    "deeptrust_upstream_lane_timeouts_total",
+    "Upstream inference calls that gave up waiting for a scheduler slot, per priority lane.",
+    ["lane"],
+)
+
+AUDIO_VAD_SECONDS = Counter(
+    "deeptrust_audio_vad_seconds_total",
+    "Audio seconds seen by voice-activity trimming, by outcome (kept / removed).",
+    ["outcome"],
+)
+
+AUDIO_VAD_REJECTIONS = Counter(
+    "deeptrust_audio_vad_rejections_total",
+    "Audio clips rejected before inference for containing too little speech.",
+)
+
+AUDIO_UPSTREAM_PAYLOAD_BYTES = Histogram(
+    "deeptrust_audio_upstream_payload_bytes",
+    "Size of the audio clip sent to the audio backend (before base64), by encoding.",
+    ["encoding"],
+    buckets=(16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6, 32e6),
+)
+
+MEDIA_PROBE_CACHE = Counter(
+    "deeptrust_media_probe_cache_total",
+    "Container metadata cache lookups, by result (hit / miss); each worker has its own cache.",
+    ["result"],
+)
+
+AUTH_CACHE = Counter(
+    "deeptrust_auth_cache_total",
+    "Auth cache lookups, by cache (token / user) and result (hit / miss).",
+    ["cache", "result"],
+)
+
+LOG_PARTITIONS_DROPPED = Counter(
+    "deeptrust_log_partitions_dropped_total",
+    "DetectionLog partitions dropped by the retention policy.",
+)
+
+LOG_ROWS_PURGED = Counter(
+    "deeptrust_log_rows_purged_total",
+    "DetectionLog rows removed by row-level deletes, by reason (retention / range).",
+    ["reason"],
+)
+
+_stage_children: dict = {}
+
+
+def _stage_child(pipeline: str, stage: str):
+    key = (pipeline, stage)
+    child = _stage_children.get(key)
+    if child is None:
+        child = STAGE_SECONDS.labels(pipeline=pipeline, stage=stage)
+        _stage_children[key] = child
+    return child
+
+
+def observe_stage(pipeline: str, stage: str, seconds: float) -> None:
+    """Record an already-measured stage duration (also forwarded to the active request trace)."""
+    _stage_child(pipeline, stage).observe(seconds)
+    record_stage(pipeline, stage, seconds)
+
+
+@contextmanager
+def timed_stage(pipeline: str, stage: str):
+    """
+    Time the wrapped block into `deeptrust_stage_duration_seconds{pipeline, stage}`.
+    The duration is recorded even if the block raises.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(pipeline, stage, time.perf_counter() - t0)
+
+
+def record_upstream_error(target: str, exc: BaseException) -> None:
+    """Count an upstream failure, using the exception class name as `kind`."""
+    UPSTREAM_ERRORS.labels(target=target, kind=type(exc).__name__).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Return (body, content_type) in the Prometheus text exposition format."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
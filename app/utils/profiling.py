@@ -0,0 +1,192 @@
+"""
+Opt-in per-request tracing for the media endpoints.
+
+A `RequestTrace` is only created when a caller asks for debug output *and* presents the
+configured `DEBUG_TOKEN`. It is published through a ContextVar; pipeline code records stage
+timings via `app.utils.metrics.observe_stage`, which forwards to the active trace. With no
+active trace the extra cost is a single `ContextVar.get()`.
+
+Optionally a cProfile profile of the analysis is captured and saved under `DEBUG_PROFILE_DIR`
+so it can be downloaded later from `/debug/profiles/{profile_id}`. cProfile only sees the thread
+it is enabled in, so every thread that works for the request (the handler's worker thread, the
+upstream fan-out threads, the media pipeline threads) runs its part under `profiling_section()`
+/ `profiled()` with its own profiler; the profiles are merged when the summary is built.
+On Python 3.12+ only one cProfile profiler can be active per interpreter: threads that start
+while another thread is being profiled run unprofiled and are counted as `threads_skipped`.
+"""
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("deeptrust_request_trace", default=None)
+
+
+def profile_dir() -> str:
+    return os.getenv("DEBUG_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "deeptrust_profiles")
+
+
+def profile_path(profile_id: str) -> str | None:
+    """Return the on-disk path of a saved profile, or None if the id is malformed."""
+    try:
+        uuid.UUID(hex=profile_id)
+    except (ValueError, TypeError):
+        return None
+    return os.path.join(profile_dir(), f"{profile_id}.prof")
+
+
+class RequestTrace:
+    """
+    Collects stage timings for a single request.
+
+    - stages: {"video.upstream": [12.3, 11.9, ...], ...} (milliseconds, one entry per call)
+    """
+
+    def __init__(self, *, profile: bool = False, request_started_at: float | None = None):
+        self.started_at = time.perf_counter()
+        self.request_started_at = request_started_at
+        self.stages: dict[str, list[float]] = {}
+        self._profile = profile
+        self._profilers: list = []
+        self._profiling_threads: set = set()
+        self._threads_skipped = 0
+        self._lock = threading.Lock()
+        self._profile_id = None
+
+    def record(self, pipeline: str, stage: str, seconds: float) -> None:
+        self.stages.setdefault(f"{pipeline}.{stage}", []).append(seconds * 1000.0)
+
+    @contextmanager
+    def profiling(self):
+        """Profile the calling thread for the wrapped block (nested sections in one thread are no-ops)."""
+        if not self._profile:
+            yield
+            return
+        thread_id = threading.get_ident()
+        with self._lock:
+            nested = thread_id in self._profiling_threads
+            self._profiling_threads.add(thread_id)
+        if nested:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # "Another profiling tool is already active" (Python 3.12+): run this thread unprofiled.
+            profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            with self._lock:
+                self._profiling_threads.discard(thread_id)
+                if profiler is not None:
+                    self._profilers.append(profiler)
+                else:
+                    self._threads_skipped += 1
+
+    def _save_profile(self) -> dict | None:
+        if not self._profile:
+            return None
+        with self._lock:
+            profilers = list(self._profilers)
+            skipped = self._threads_skipped
+        if not profilers:
+            return {"threads": 0, "threads_skipped": skipped} if skipped else None
+        stats = pstats.Stats(*profilers, stream=io.StringIO())
+        if self._profile_id is None:
+            self._profile_id = uuid.uuid4().hex
+            os.makedirs(profile_dir(), exist_ok=True)
+            stats.dump_stats(profile_path(self._profile_id))
+            _prune_profiles()
+
+        top = io.StringIO()
+        stats.stream = top
+        stats.sort_stats("cumulative").print_stats(15)
+        return {
+            "id": self._profile_id,
+            "download_url": f"/debug/profiles/{self._profile_id}",
+            "threads": len(profilers),
+            "threads_skipped": skipped,
+            "top_cumulative": top.getvalue().strip().splitlines()[-20:],
+        }
+
+    def summary(self) -> dict:
+        """Return the JSON-friendly breakdown that is attached to the response."""
+        stages = {}
+        for name, calls in self.stages.items():
+            stages[name] = {
+                "count": len(calls),
+                "total_ms": round(sum(calls), 3),
+                "calls_ms": [round(c, 3) for c in calls],
+            }
+
+        out = {
+            "handler_ms": round((time.perf_counter() - self.started_at) * 1000.0, 3),
+            "stages": stages,
+        }
+        if self.request_started_at is not None:
+            # Time between the request arriving and the handler running: body upload,
+            # multipart parsing and any queueing in front of the handler.
+            out["pre_handler_ms"] = round((self.started_at - self.request_started_at) * 1000.0, 3)
+
+        profile = self._save_profile()
+        if profile is not None:
+            out["profile"] = profile
+        return out
+
+
+def _prune_profiles() -> None:
+    max_files = int(os.getenv("DEBUG_PROFILE_MAX_FILES", "50"))
+    try:
+        d = profile_dir()
+        files = [os.path.join(d, f) for f in os.listdir(d) if f.endswith(".prof")]
+        files.sort(key=os.path.getmtime)
+        for f in files[: max(0, len(files) - max_files)]:
+            os.remove(f)
+    except Exception as e:
+        print(f"Warning: could not prune debug profiles: {e}")
+
+
+def record_stage(pipeline: str, stage: str, seconds: float) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(pipeline, stage, seconds)
+
+
+@contextmanager
+def activate_trace(trace: RequestTrace | None):
+    """Publish `trace` for the current context (no-op for None)."""
+    if trace is None:
+        yield None
+        return
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def profiled(fn, *args, **kwargs):
+    """Call `fn` inside `profiling_section()`; for work handed to another thread."""
+    with profiling_section():
+        return fn(*args, **kwargs)
+
+
+@contextmanager
+def profiling_section():
+    """Enable the active trace's profiler (if any) around the wrapped block."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.profiling():
+        yield
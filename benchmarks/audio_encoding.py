@@ -0,0 +1,93 @@
+"""
+Upstream audio payload size and encode time per encoding (WAV vs FLAC).
+
+Runs `AudioAnalyzer`'s ffmpeg conversion pass on synthetic clips, once per encoding, without
+calling any inference endpoint, to help choose AUDIO_UPSTREAM_ENCODING per deployment.
+
+Usage:
+    python -m benchmarks.audio_encoding --durations 5,30,120 --inputs webm,wav --repeat 5 \\
+        --flac-levels 0,5,8 --output audio_encoding.json
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.media_gen import generate_audio_bytes
+
+
+def _analyzer():
+    # The conversion helpers do not touch the backend; any configuration is enough to build it.
+    os.environ.setdefault("AUDIO_INFERENCE_BACKEND", "http")
+    os.environ.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+    os.environ.setdefault("HUGGINGFACE_AUDIO_API_URL", "http://127.0.0.1:9/audio")
+    from app.services.audio_analyzer import AudioAnalyzer
+
+    return AudioAnalyzer()
+
+
+def measure(analyzer, data: bytes, input_format: str, encoding: str, repeat: int) -> dict:
+    demuxer = {"webm": "matroska", "opus": "ogg"}.get(input_format)
+    timings = []
+    out = b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        if input_format == "wav" and encoding == "flac":
+            # No conversion pass for WAV uploads: a standalone encode is the only option.
+            out = analyzer._encode_flac(data)
+        elif input_format == "wav":
+            out = data
+        else:
+            out = analyzer._convert_to_wav_bytes(data, input_format=demuxer, output_format=encoding)
+        timings.append(time.perf_counter() - t0)
+        if not isinstance(out, bytes):
+            raise RuntimeError(f"conversion failed: {out}")
+    return {
+        "payload_bytes": len(out),
+        "base64_bytes": len(base64.b64encode(out)),
+        "encode_ms_median": round(statistics.median(timings) * 1000.0, 3),
+        "encode_ms_min": round(min(timings) * 1000.0, 3),
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Audio upstream encoding benchmark.")
+    p.add_argument("--durations", default="5,30,120", help="Comma list of clip durations in seconds.")
+    p.add_argument("--inputs", default="webm,wav", help="Comma list of upload formats: wav, webm, opus.")
+    p.add_argument("--flac-levels", default="5", help="Comma list of FLAC compression levels (0..12).")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--output", default=None, help="Write JSON results here (default: stdout).")
+    args = p.parse_args(argv)
+
+    analyzer = _analyzer()
+    results = []
+    for seconds in [float(d) for d in args.durations.split(",") if d.strip()]:
+        for input_format in [f.strip() for f in args.inputs.split(",") if f.strip()]:
+            # Uploads at 48 kHz like browser recordings; the conversion pass resamples to 16 kHz mono.
+            data = generate_audio_bytes(input_format, seconds=seconds, sample_rate=48000 if input_format != "wav" else 16000)
+            variants = [("wav", None)] + [("flac", lvl.strip()) for lvl in args.flac_levels.split(",") if lvl.strip()]
+            for encoding, level in variants:
+                if level is not None:
+                    os.environ["AUDIO_FLAC_COMPRESSION_LEVEL"] = level
+                row = {"seconds": seconds, "input": input_format, "encoding": encoding, "flac_level": level}
+                row.update(measure(analyzer, data, input_format, encoding, args.repeat))
+                results.append(row)
+                print(
+                    f"{seconds:>6.0f}s {input_format:<5} {encoding:<4} level={level or '-':<2} "
+                    f"payload={row['payload_bytes']:>9}B encode={row['encode_ms_median']:.1f}ms",
+                    file=sys.stderr,
+                )
+
+    report = json.dumps({"results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
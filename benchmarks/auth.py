@@ -0,0 +1,141 @@
+"""
+Auth overhead per request (`app.core.security`).
+
+- dependency: `get_current_user` on a valid token with cold caches (JWT verification + user
+  lookup every call) and warm caches (token claims and user served from the caches);
+- http: the same protected route vs an unprotected one through the ASGI stack (TestClient), so
+  the difference is the auth cost a request actually sees;
+- logins: `authenticate_user_async` latency and throughput with concurrent logins on the bcrypt
+  thread pool (AUTH_HASH_WORKERS).
+
+Usage:
+    python -m benchmarks.auth --iterations 20000 --logins 8 --output auth.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+
+def _per_call_us(fn, iterations: int) -> dict:
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    return {
+        "median_us": round(statistics.median(timings) * 1e6, 2),
+        "p99_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6, 2),
+    }
+
+
+def bench_dependency(security, token: str, iterations: int) -> dict:
+    loop = asyncio.new_event_loop()
+
+    def cold():
+        security._token_cache.clear()
+        security._user_cache.clear()
+        loop.run_until_complete(security.get_current_user(token))
+
+    def warm():
+        loop.run_until_complete(security.get_current_user(token))
+
+    try:
+        return {"cold": _per_call_us(cold, iterations), "warm": _per_call_us(warm, iterations)}
+    finally:
+        loop.close()
+
+
+def bench_http(security, token: str, iterations: int) -> dict:
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+
+    @app.get("/open")
+    def open_route():
+        return {"ok": True}
+
+    @app.get("/protected")
+    def protected_route(user=Depends(security.get_current_user)):
+        return {"ok": True}
+
+    headers = {"Authorization": f"Bearer {token}"}
+    with TestClient(app) as client:
+        for path in ("/open", "/protected"):
+            client.get(path, headers=headers).raise_for_status()
+        result = {
+            "open": _per_call_us(lambda: client.get("/open"), iterations),
+            "protected": _per_call_us(lambda: client.get("/protected", headers=headers), iterations),
+        }
+    result["auth_overhead_us"] = round(result["protected"]["median_us"] - result["open"]["median_us"], 2)
+    return result
+
+
+def bench_logins(security, username: str, password: str, logins: int) -> dict:
+    async def one():
+        t0 = time.perf_counter()
+        user = await security.authenticate_user_async(security.mock_db, username, password)
+        if user is None:
+            raise RuntimeError("login failed")
+        return time.perf_counter() - t0
+
+    async def run():
+        t0 = time.perf_counter()
+        latencies = await asyncio.gather(*[one() for _ in range(logins)])
+        return latencies, time.perf_counter() - t0
+
+    single = asyncio.run(one())
+    latencies, wall = asyncio.run(run())
+    return {
+        "single_login_ms": round(single * 1000.0, 1),
+        "concurrent_logins": logins,
+        "hash_workers": int(os.getenv("AUTH_HASH_WORKERS", "2")),
+        "latency_ms_median": round(statistics.median(latencies) * 1000.0, 1),
+        "latency_ms_max": round(max(latencies) * 1000.0, 1),
+        "logins_per_s": round(logins / wall, 2),
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Auth overhead benchmark.")
+    p.add_argument("--iterations", type=int, default=20000, help="Calls per dependency measurement.")
+    p.add_argument("--http-iterations", type=int, default=2000, help="Requests per HTTP measurement.")
+    p.add_argument("--logins", type=int, default=8, help="Concurrent logins to run on the bcrypt pool.")
+    p.add_argument("--output", default=None, help="Write JSON results here (default: stdout).")
+    args = p.parse_args(argv)
+
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    from app.core import security
+
+    username, password = "tim445", "benchmark-password"
+    security.mock_db[username]["hash_password"] = security.get_password_hash(password)
+    token = security.create_access_token({"sub": username})
+
+    report = {
+        "dependency": bench_dependency(security, token, args.iterations),
+        "http": bench_http(security, token, args.http_iterations),
+        "logins": bench_logins(security, username, password, args.logins),
+    }
+    dep, http, logins = report["dependency"], report["http"], report["logins"]
+    print(
+        f"get_current_user: cold={dep['cold']['median_us']}us warm={dep['warm']['median_us']}us | "
+        f"http auth overhead={http['auth_overhead_us']}us | "
+        f"login={logins['single_login_ms']}ms, {logins['logins_per_s']} logins/s",
+        file=sys.stderr,
+    )
+
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out)
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
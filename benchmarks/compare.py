@@ -0,0 +1,65 @@
+"""
+Compare two `benchmarks.run` JSON reports (e.g. base commit vs. branch).
+
+Usage:
+    python -m benchmarks.compare base.json head.json [--fail-over-pct 10]
+
+Exits with status 1 if any p95 latency regressed by more than `--fail-over-pct` percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _key(result: dict) -> str:
+    return json.dumps(result["scenario"], sort_keys=True) + f" c={result['concurrency']}"
+
+
+def _pct(base, head):
+    if base in (None, 0) or head is None:
+        return None
+    return (head - base) / float(base) * 100.0
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    p.add_argument("base")
+    p.add_argument("head")
+    p.add_argument("--fail-over-pct", type=float, default=None, help="Fail if p95 regresses by more than this.")
+    args = p.parse_args(argv)
+
+    with open(args.base) as f:
+        base = {_key(r): r for r in json.load(f)["results"]}
+    with open(args.head) as f:
+        head = {_key(r): r for r in json.load(f)["results"]}
+
+    regressed = False
+    for key in sorted(set(base) & set(head)):
+        b, h = base[key], head[key]
+        rows = [
+            ("throughput_rps", b["throughput_rps"], h["throughput_rps"]),
+            ("p50_ms", b["latency_ms"]["p50"], h["latency_ms"]["p50"]),
+            ("p95_ms", b["latency_ms"]["p95"], h["latency_ms"]["p95"]),
+            ("p99_ms", b["latency_ms"]["p99"], h["latency_ms"]["p99"]),
+            ("peak_rss_mb", b["server_peak_rss_mb"], h["server_peak_rss_mb"]),
+            ("upstream_bytes", b["upstream"]["bytes_sent"], h["upstream"]["bytes_sent"]),
+        ]
+        print(key)
+        for name, bv, hv in rows:
+            d = _pct(bv, hv)
+            d_txt = f"{d:+.1f}%" if d is not None else "n/a"
+            print(f"  {name:<16} {bv!s:>14} -> {hv!s:<14} {d_txt}")
+            if name == "p95_ms" and args.fail_over_pct is not None and d is not None and d > args.fail_over_pct:
+                regressed = True
+
+    only = sorted(set(base) ^ set(head))
+    if only:
+        print("Scenarios present in only one report:")
+        for key in only:
+            print(f"  {key}")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Local stand-in for the HuggingFace image/audio inference endpoints.
+
+Routes:
+- POST /image  -> [{"label": "Deepfake", "score": ...}, {"label": "Realism", "score": ...}]
+- POST /audio  -> [{"deepfake_score": ..., "is_bonafide": ..., "label": ...}]
+- GET  /stats  -> request/byte/error counters since the last reset
+- POST /reset  -> zero the counters
+
+`inputs` may be a list (batched request); the response is then a list with one output per
+input, up to `max_batch` inputs per call.
+
+Usage:
+    python -m benchmarks.fake_inference_server --port 8100 --latency-ms 80 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeInferenceConfig:
+    def __init__(self, *, latency_ms: float = 50.0, jitter_ms: float = 10.0, error_rate: float = 0.0,
+                 max_batch: int = 32, realism: float = 0.7, deepfake_score: float = 0.4, seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.max_batch = max_batch
+        self.realism = realism
+        self.deepfake_score = deepfake_score
+        self.rng = random.Random(seed)
+
+
+class FakeInferenceStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.inputs = 0
+            self.bytes_received = 0
+            self.errors = 0
+            self.by_route = {}
+
+    def record(self, route: str, n_bytes: int, n_inputs: int, error: bool):
+        with self._lock:
+            self.requests += 1
+            self.inputs += n_inputs
+            self.bytes_received += n_bytes
+            self.errors += int(error)
+            r = self.by_route.setdefault(route, {"requests": 0, "bytes_received": 0})
+            r["requests"] += 1
+            r["bytes_received"] += n_bytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "inputs": self.inputs,
+                "bytes_received": self.bytes_received,
+                "errors": self.errors,
+                "by_route": json.loads(json.dumps(self.by_route)),
+            }
+
+
+def _image_output(cfg: FakeInferenceConfig) -> list:
+    realism = max(0.0, min(1.0, cfg.realism + cfg.rng.uniform(-0.05, 0.05)))
+    return [{"label": "Deepfake", "score": round(1.0 - realism, 4)}, {"label": "Realism", "score": round(realism, 4)}]
+
+
+def _audio_output(cfg: FakeInferenceConfig) -> dict:
+    s = max(0.0, min(2.0, cfg.deepfake_score + cfg.rng.uniform(-0.05, 0.05)))
+    return {"deepfake_score": round(s, 4), "is_bonafide": s < 1.0, "label": "bonafide" if s < 1.0 else "spoof"}
+
+
+def make_handler(cfg: FakeInferenceConfig, stats: FakeInferenceStats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, obj):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, stats.snapshot())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(n) if n else b""
+            route = self.path.split("?", 1)[0].rstrip("/")
+
+            if route == "/reset":
+                stats.reset()
+                self._send_json(200, {"ok": True})
+                return
+            if route not in ("/image", "/audio"):
+                self._send_json(404, {"error": "not found"})
+                return
+
+            try:
+                inputs = json.loads(raw or b"{}").get("inputs")
+            except Exception:
+                stats.record(route, len(raw), 0, True)
+                self._send_json(400, {"error": "invalid json"})
+                return
+
+            batched = isinstance(inputs, list)
+            n_inputs = len(inputs) if batched else 1
+            if batched and n_inputs > cfg.max_batch:
+                stats.record(route, len(raw), n_inputs, True)
+                self._send_json(413, {"error": f"batch too large (max {cfg.max_batch})"})
+                return
+
+            delay = max(0.0, cfg.latency_ms + cfg.rng.uniform(-cfg.jitter_ms, cfg.jitter_ms)) / 1000.0
+            time.sleep(delay)
+
+            if cfg.rng.random() < cfg.error_rate:
+                stats.record(route, len(raw), n_inputs, True)
+                self._send_json(503, {"error": "injected failure"})
+                return
+
+            make = _image_output if route == "/image" else _audio_output
+            if batched:
+                out = [make(cfg) for _ in range(n_inputs)]
+            else:
+                out = make(cfg) if route == "/image" else [make(cfg)]
+            stats.record(route, len(raw), n_inputs, False)
+            self._send_json(200, out)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class FakeInferenceServer:
+    """Runs the fake endpoints on a background thread (port 0 picks a free port)."""
+
+    def __init__(self, cfg: FakeInferenceConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.cfg = cfg or FakeInferenceConfig()
+        self.stats = FakeInferenceStats()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.cfg, self.stats))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeInferenceServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-inference", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Fake HuggingFace image/audio inference endpoint.")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8100)
+    p.add_argument("--latency-ms", type=float, default=50.0)
+    p.add_argument("--jitter-ms", type=float, default=10.0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--max-batch", type=int, default=32)
+    p.add_argument("--seed", type=int, default=None)
+    args = p.parse_args()
+
+    cfg = FakeInferenceConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                              max_batch=args.max_batch, seed=args.seed)
+    server = FakeInferenceServer(cfg, host=args.host, port=args.port)
+    print(f"Fake inference server listening on {server.base_url} (/image, /audio, /stats)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Synthetic media generators for the benchmark suite.
+
+Videos are drawn with OpenCV (moving shapes + noise so codecs can't collapse them to nothing);
+audio is a deterministic speech-like tone burst pattern. WebM/Opus and Ogg/Opus audio require
+ffmpeg in PATH.
+"""
+import io
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+# container -> (fourcc, file extension)
+VIDEO_CODECS = {
+    "mp4v": ("mp4v", ".mp4"),
+    "mjpg": ("MJPG", ".avi"),
+    "xvid": ("XVID", ".avi"),
+    "vp8": ("VP80", ".webm"),
+}
+
+AUDIO_FORMATS = ("wav", "webm", "opus")
+
+RESOLUTIONS = {
+    "240p": (426, 240),
+    "360p": (640, 360),
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+
+
+def generate_video(path: str, *, resolution: str = "360p", seconds: float = 5.0, fps: int = 30,
+                   codec: str = "mp4v", seed: int = 0) -> str:
+    """Write a synthetic video to `path` (extension is replaced to match the codec). Returns the final path."""
+    import cv2
+
+    fourcc, ext = VIDEO_CODECS[codec]
+    width, height = RESOLUTIONS.get(resolution, resolution) if isinstance(resolution, str) else resolution
+    path = os.path.splitext(path)[0] + ext
+
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV cannot write codec={codec} ({fourcc})")
+
+    base = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    try:
+        for i in range(int(seconds * fps)):
+            frame = (base // 2).copy()
+            cx = int((i * 7) % width)
+            cy = int(height / 2 + (height / 4) * np.sin(i / 10.0))
+            cv2.circle(frame, (cx, cy), max(8, height // 8), (40, 180, 220), -1)
+            cv2.rectangle(frame, (width // 4, height // 4), (width // 4 + 40, height // 4 + 40), (255, 255, 255), -1)
+            cv2.putText(frame, str(i), (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def generate_video_bytes(**kwargs) -> bytes:
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="deeptrust_bench_") as d:
+        path = generate_video(os.path.join(d, "video"), **kwargs)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def _pcm16(seconds: float, sample_rate: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / float(sample_rate)
+    # 4 Hz syllable envelope over a few harmonics, plus a little noise.
+    envelope = 0.5 * (1.0 + np.sin(2 * np.pi * 4.0 * t))
+    voice = sum(np.sin(2 * np.pi * f * t) / (n + 1) for n, f in enumerate((180.0, 360.0, 720.0)))
+    x = envelope * voice * 0.3 + rng.normal(0.0, 0.01, size=t.shape)
+    return (np.clip(x, -1.0, 1.0) * 32767).astype("<i2")
+
+
+def generate_wav_bytes(*, seconds: float = 5.0, sample_rate: int = 16000, seed: int = 0) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(_pcm16(seconds, sample_rate, seed).tobytes())
+    return buf.getvalue()
+
+
+def generate_audio_bytes(fmt: str = "wav", *, seconds: float = 5.0, sample_rate: int = 48000, seed: int = 0) -> bytes:
+    """
+    fmt:
+    - "wav":  PCM s16le WAV
+    - "webm": WebM/Opus (what browsers' MediaRecorder produces)
+    - "opus": Ogg/Opus
+    """
+    wav = generate_wav_bytes(seconds=seconds, sample_rate=sample_rate, seed=seed)
+    if fmt == "wav":
+        return wav
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError(f"ffmpeg is required to generate {fmt} audio")
+
+    container = {"webm": "webm", "opus": "ogg"}[fmt]
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+           "-c:a", "libopus", "-b:a", "32k", "-f", container, "pipe:1"]
+    p = subprocess.run(cmd, input=wav, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {p.stderr.decode('utf-8', errors='replace')[:500]}")
+    return p.stdout
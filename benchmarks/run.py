@@ -0,0 +1,321 @@
+"""
+Throughput / latency benchmark for the DeepTrust API.
+
+Each scenario gets a fresh API server (uvicorn subprocess, SQLite database) pointed at the local
+fake inference server, so peak RSS and upstream bytes are attributable to a single scenario.
+The logs scenario's database is seeded with `--log-rows` rows first, so its reads hit real data.
+
+Usage:
+    python -m benchmarks.run --scenarios video,audio,logs --concurrency 1,4,16 --requests 50 \\
+        --output bench.json
+    python -m benchmarks.compare base.json head.json
+"""
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from benchmarks.fake_inference_server import FakeInferenceConfig, FakeInferenceServer
+from benchmarks.media_gen import generate_audio_bytes, generate_video_bytes
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run with the API server's environment, so the rows land in its database with its schema/partitioning.
+_SEED_LOGS_SNIPPET = (
+    "import sys\n"
+    "from datetime import date, time, timedelta\n"
+    "from app.models.detection_log_model import init_db\n"
+    "from app.services.log_service import LogService\n"
+    "if not init_db():\n"
+    "    raise SystemExit('init_db failed')\n"
+    "n, today = int(sys.argv[1]), date.today()\n"
+    "for start in range(0, n, 5000):\n"
+    "    LogService().save_logs([\n"
+    "        {'isDeepFake': i % 3 == 0, 'classification': 'Deepfake' if i % 3 == 0 else 'Bonafide',\n"
+    "         'score': float(i % 100), 'date': today - timedelta(days=i % 90), 'hour': time(i % 24, i % 60),\n"
+    "         'modality': 'video', 'coverage': 'window'}\n"
+    "        for i in range(start, min(n, start + 5000))\n"
+    "    ])\n"
+)
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _round(v: float | None, ndigits: int = 3) -> float | None:
+    return None if v is None else round(v, ndigits)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+class ApiServer:
+    """The API under test, in a uvicorn subprocess."""
+
+    def __init__(self, upstream_url: str, workdir: str, extra_env: dict | None = None):
+        self.port = _free_port()
+        env = dict(os.environ)
+        env.update(
+            {
+                "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+                "HUGGINGFACE_API_KEY": "benchmark",
+                "HUGGINGFACE_IMAGE_API_URL": f"{upstream_url}/image",
+                "HUGGINGFACE_AUDIO_API_URL": f"{upstream_url}/audio",
+            }
+        )
+        env.update(extra_env or {})
+        self._env = env
+        self.proc = None
+
+    def seed_logs(self, rows: int) -> None:
+        """Insert `rows` DetectionLog rows (ids 1..rows) before the server starts."""
+        if rows > 0:
+            subprocess.run([sys.executable, "-c", _SEED_LOGS_SNIPPET, str(rows)], cwd=REPO_ROOT, env=self._env, check=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout_s: float = 30.0) -> "ApiServer":
+        cmd = [sys.executable, "-m", "uvicorn", "app.app:app", "--host", "127.0.0.1",
+               "--port", str(self.port), "--log-level", "warning"]
+        self.proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=self._env)
+        deadline = time.time() + timeout_s
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"API server exited early (code={self.proc.returncode})")
+            try:
+                requests.get(self.base_url + "/", timeout=1)
+                return self
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
+        raise RuntimeError("API server did not become ready in time")
+
+    def peak_rss_mb(self) -> float | None:
+        # VmHWM = peak resident set size (Linux only).
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024.0
+        except OSError:
+            return None
+        return None
+
+    def stop(self) -> float | None:
+        peak = self.peak_rss_mb()
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        if peak is None:
+            # ru_maxrss is KiB on Linux, bytes on macOS; max over all reaped children.
+            ru = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            peak = ru / (1024.0 * 1024.0) if sys.platform == "darwin" else ru / 1024.0
+        return peak
+
+
+def _make_request_fn(base_url: str, scenario: dict):
+    kind = scenario["kind"]
+    if kind == "video":
+        payload = generate_video_bytes(resolution=scenario["resolution"], seconds=scenario["duration"],
+                                       codec=scenario["codec"])
+        ext = {"mp4v": "mp4", "mjpg": "avi", "xvid": "avi", "vp8": "webm"}[scenario["codec"]]
+        files = ("file", f"bench.{ext}", payload, "video/" + ext)
+        url = base_url + "/analyze_video"
+    elif kind == "audio":
+        payload = generate_audio_bytes(scenario["format"], seconds=scenario["duration"])
+        mime = {"wav": "audio/wav", "webm": "audio/webm", "opus": "audio/ogg"}[scenario["format"]]
+        ext = {"wav": "wav", "webm": "webm", "opus": "ogg"}[scenario["format"]]
+        files = ("file", f"bench.{ext}", payload, mime)
+        url = base_url + "/analyze_audio"
+    elif kind == "logs":
+        files = None
+        payload = b""
+        url = None
+    else:
+        raise ValueError(f"unknown scenario kind: {kind}")
+
+    def call(session: requests.Session, i: int) -> int:
+        if kind == "logs":
+            # Mix of list, filter and point lookups (ids of seeded rows).
+            paths = ("/logs/all", "/logs/by_state?state=bonafide", f"/logs/get_by_id?id={i % max(1, scenario['rows']) + 1}")
+            r = session.get(base_url + paths[i % len(paths)], timeout=120)
+        else:
+            name, fname, data, mime = files
+            r = session.post(url, files={name: (fname, data, mime)}, timeout=600)
+        return r.status_code
+
+    return call, len(payload)
+
+
+def run_scenario(scenario: dict, *, concurrency: int, n_requests: int, upstream: FakeInferenceServer,
+                 warmup: int = 2, extra_env: dict | None = None) -> dict:
+    with tempfile.TemporaryDirectory(prefix="deeptrust_bench_") as workdir:
+        server = ApiServer(upstream.base_url, workdir, extra_env)
+        if scenario["kind"] == "logs":
+            server.seed_logs(scenario["rows"])
+        server.start()
+        try:
+            call, payload_bytes = _make_request_fn(server.base_url, scenario)
+            with requests.Session() as s:
+                for i in range(warmup):
+                    call(s, i)
+            upstream.stats.reset()
+
+            latencies: list[float] = []
+            statuses: dict[str, int] = {}
+
+            def worker(i: int):
+                with requests.Session() as s:
+                    t0 = time.perf_counter()
+                    try:
+                        code = call(s, i)
+                    except requests.exceptions.RequestException as e:
+                        code = type(e).__name__
+                    return (time.perf_counter() - t0) * 1000.0, str(code)
+
+            t_start = time.perf_counter()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for ms, code in pool.map(worker, range(n_requests)):
+                    latencies.append(ms)
+                    statuses[code] = statuses.get(code, 0) + 1
+            wall_s = time.perf_counter() - t_start
+        finally:
+            peak_rss = server.stop()
+
+    latencies.sort()
+    ok = statuses.get("200", 0)
+    up = upstream.stats.snapshot()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "status_counts": statuses,
+        "error_rate": round(1.0 - ok / float(n_requests), 4) if n_requests else 0.0,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(n_requests / wall_s, 3) if wall_s > 0 else None,
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "mean": _round(sum(latencies) / len(latencies) if latencies else None),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "upload_bytes_per_request": payload_bytes,
+        "server_peak_rss_mb": _round(peak_rss),
+        "upstream": {
+            "requests": up["requests"],
+            "bytes_sent": up["bytes_received"],
+            "bytes_per_request": round(up["bytes_received"] / float(n_requests), 1) if n_requests else None,
+            "errors": up["errors"],
+        },
+    }
+
+
+def build_scenarios(args) -> list[dict]:
+    out = []
+    kinds = [k.strip() for k in args.scenarios.split(",") if k.strip()]
+    for kind in kinds:
+        if kind == "video":
+            for res in args.resolutions.split(","):
+                for codec in args.codecs.split(","):
+                    for dur in args.durations.split(","):
+                        out.append({"kind": "video", "resolution": res, "codec": codec, "duration": float(dur)})
+        elif kind == "audio":
+            for fmt in args.audio_formats.split(","):
+                for dur in args.durations.split(","):
+                    out.append({"kind": "audio", "format": fmt, "duration": float(dur)})
+        elif kind == "logs":
+            out.append({"kind": "logs", "rows": args.log_rows})
+        else:
+            raise SystemExit(f"unknown scenario: {kind}")
+    return out
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DeepTrust API benchmark.")
+    p.add_argument("--scenarios", default="video,audio,logs", help="Comma list of: video, audio, logs.")
+    p.add_argument("--concurrency", default="1,4", help="Comma list of client concurrency levels.")
+    p.add_argument("--requests", type=int, default=20, help="Requests per (scenario, concurrency).")
+    p.add_argument("--resolutions", default="360p", help="Comma list of: " + ",".join(["240p", "360p", "480p", "720p", "1080p"]))
+    p.add_argument("--codecs", default="mp4v", help="Comma list of: mp4v, mjpg, xvid, vp8.")
+    p.add_argument("--durations", default="5", help="Comma list of media durations in seconds.")
+    p.add_argument("--audio-formats", default="wav", help="Comma list of: wav, webm, opus (webm/opus need ffmpeg).")
+    p.add_argument("--log-rows", type=int, default=1000, help="DetectionLog rows seeded for the logs scenario.")
+    p.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    p.add_argument("--upstream-jitter-ms", type=float, default=10.0)
+    p.add_argument("--upstream-error-rate", type=float, default=0.0)
+    p.add_argument("--upstream-max-batch", type=int, default=32)
+    p.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                   help="Extra environment for the API server (repeatable).")
+    p.add_argument("--output", default=None, help="Write JSON results here (default: stdout).")
+    args = p.parse_args(argv)
+
+    extra_env = dict(kv.split("=", 1) for kv in args.server_env)
+    cfg = FakeInferenceConfig(latency_ms=args.upstream_latency_ms, jitter_ms=args.upstream_jitter_ms,
+                              error_rate=args.upstream_error_rate, max_batch=args.upstream_max_batch, seed=0)
+
+    results = []
+    with FakeInferenceServer(cfg) as upstream:
+        for scenario in build_scenarios(args):
+            for c in (int(x) for x in args.concurrency.split(",")):
+                r = run_scenario(scenario, concurrency=c, n_requests=args.requests, upstream=upstream,
+                                 extra_env=extra_env)
+                results.append(r)
+                lat = r["latency_ms"]
+                print(
+                    f"{json.dumps(scenario, sort_keys=True)} c={c}: {r['throughput_rps']} req/s "
+                    f"p50={lat['p50']:.1f}ms p95={lat['p95']:.1f}ms p99={lat['p99']:.1f}ms "
+                    f"rss={r['server_peak_rss_mb']}MB upstream={r['upstream']['bytes_sent']}B",
+                    file=sys.stderr,
+                )
+
+    report = {
+        "schema": 1,
+        "git_commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Cold-start benchmark: import time of `app.app` and time until the API answers.
+
+- import: `import app.app` in a fresh interpreter, repeated; also which heavy third-party modules
+  the import pulls in and the slowest top-level imports (from `python -X importtime`).
+- serve: a uvicorn subprocess on a SQLite database; time until `/health` answers (serving) and
+  until `/ready` reports ready (schema checks done). Measured on a fresh database, then again on
+  the same database, where the recorded schema version lets `init_db` skip its DDL checks.
+
+Usage:
+    python -m benchmarks.startup --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.run import REPO_ROOT, _free_port
+
+# Imported on first use by the app; listed when the import of `app.app` loads them anyway.
+HEAVY_MODULES = ("sqlalchemy", "requests", "numpy", "cv2", "onnxruntime", "jose", "passlib", "av")
+
+_IMPORT_SNIPPET = (
+    "import json, sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "import app.app\n"
+    "elapsed = time.perf_counter() - t0\n"
+    f"print(json.dumps({{'import_s': elapsed, 'heavy': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def _env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+    env.setdefault("HUGGINGFACE_API_KEY", "benchmark")
+    env.setdefault("HUGGINGFACE_IMAGE_API_URL", "http://127.0.0.1:9/image")
+    env.setdefault("HUGGINGFACE_AUDIO_API_URL", "http://127.0.0.1:9/audio")
+    return env
+
+
+def measure_import(env: dict, repeat: int) -> dict:
+    timings = []
+    heavy = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", _IMPORT_SNIPPET], cwd=REPO_ROOT, env=env, text=True)
+        row = json.loads(out.strip().splitlines()[-1])
+        timings.append(row["import_s"])
+        heavy = row["heavy"]
+    return {
+        "import_ms_median": round(statistics.median(timings) * 1000.0, 1),
+        "import_ms_min": round(min(timings) * 1000.0, 1),
+        "heavy_modules_loaded": heavy,
+    }
+
+
+def slowest_imports(env: dict, top: int) -> list[dict]:
+    """Top-level packages (and `app.*` modules) by cumulative import time."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.app"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        try:
+            cumulative_us = int(cumulative.strip())
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        module = name.strip()
+        # Depth 0 = the `import app.app` statement itself, 1 = what it imports directly; app modules at any depth.
+        if depth <= 1 or module.startswith("app."):
+            rows.append({"module": module, "cumulative_ms": round(cumulative_us / 1000.0, 1)})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def measure_serve(env: dict, timeout_s: float = 60.0) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    cmd = [sys.executable, "-m", "uvicorn", "app.app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env)
+    result = {"health_s": None, "ready_s": None}
+    try:
+        deadline = time.time() + timeout_s
+        while time.time() < deadline and result["ready_s"] is None:
+            if proc.poll() is not None:
+                raise RuntimeError(f"API server exited early (code={proc.returncode})")
+            try:
+                if result["health_s"] is None:
+                    requests.get(base_url + "/health", timeout=1).raise_for_status()
+                    result["health_s"] = round(time.perf_counter() - t0, 3)
+                if requests.get(base_url + "/ready", timeout=1).status_code == 200:
+                    result["ready_s"] = round(time.perf_counter() - t0, 3)
+                    break
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    return result
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Cold-start benchmark.")
+    p.add_argument("--repeat", type=int, default=5, help="Fresh-interpreter imports to time.")
+    p.add_argument("--top", type=int, default=15, help="Slowest imports to report.")
+    p.add_argument("--skip-serve", action="store_true", help="Only measure the import.")
+    p.add_argument("--output", default=None, help="Write JSON results here (default: stdout).")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="deeptrust-startup-") as workdir:
+        env = _env(workdir)
+        report = {"import": measure_import(env, max(1, args.repeat)), "slowest_imports": slowest_imports(env, args.top)}
+        print(
+            f"import app.app: median={report['import']['import_ms_median']}ms "
+            f"min={report['import']['import_ms_min']}ms heavy={report['import']['heavy_modules_loaded']}",
+            file=sys.stderr,
+        )
+        if not args.skip_serve:
+            report["serve_fresh_db"] = measure_serve(env)
+            report["serve_existing_db"] = measure_serve(env)
+            for key in ("serve_fresh_db", "serve_existing_db"):
+                print(f"{key}: health={report[key]['health_s']}s ready={report[key]['ready_s']}s", file=sys.stderr)
+
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out)
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
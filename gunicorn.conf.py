@@ -0,0 +1,51 @@
+"""
+Production serving: a gunicorn master pre-forks uvicorn workers.
+
+    gunicorn app.app:app -c gunicorn.conf.py
+
+- Workers: WEB_CONCURRENCY (default: CPU count). Each worker is a full copy of the app with its
+  own thread pools, segment-decoding processes (VIDEO_SEGMENT_WORKERS), admission limits and
+  upstream scheduler (UPSTREAM_MAX_CONCURRENT), so per-process limits add up across workers.
+- Recycling: a worker restarts after GUNICORN_MAX_REQUESTS requests (default 1000, 0 = never)
+  plus up to GUNICORN_MAX_REQUESTS_JITTER (default 100), so workers do not all restart at once.
+- Graceful restart: `kill -HUP <master>` replaces the workers one generation at a time; a worker
+  being stopped gets GUNICORN_GRACEFUL_TIMEOUT seconds (default 60) to finish its requests.
+  GUNICORN_TIMEOUT (default 120) kills a worker that stops responding.
+- Metrics: prometheus_client multiprocess mode. PROMETHEUS_MULTIPROC_DIR (default: a fresh temp
+  directory) is set before any worker imports `app.utils.metrics`; `/metrics` aggregates all
+  workers' files and the files of exited workers' live gauges are removed.
+- Database: every worker runs `init_db` in the background after it starts serving, retrying
+  until it succeeds; the workers of a host take turns (file lock), so the DDL runs once and the
+  others only find the schema version current. `/ready` reports each worker's outcome.
+"""
+import glob
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn_worker.UvicornWorker"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+# Must be in the environment before `app.utils.metrics` is imported anywhere.
+if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="deeptrust-prometheus-")
+
+
+def on_starting(server):
+    # Samples left by a previous run would be summed into the new one.
+    multiproc_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(multiproc_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,24 @@
+import io
+import os
+import tempfile
+import wave
+
+# `app.config.db` builds its engine at import time; point it at a throwaway SQLite file.
+_TMP = tempfile.mkdtemp(prefix="deeptrust-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP, 'tests.db')}")
+os.environ.setdefault("HUGGINGFACE_API_KEY", "test")
+os.environ.setdefault("HUGGINGFACE_IMAGE_API_URL", "http://127.0.0.1:9/image")
+os.environ.setdefault("HUGGINGFACE_AUDIO_API_URL", "http://127.0.0.1:9/audio")
+
+
+def wav_bytes(samples, sample_rate: int = 16000) -> bytes:
+    """Mono 16-bit PCM WAV from an int16-compatible sequence."""
+    import numpy as np
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+    return buf.getvalue()
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionController, AdmissionRejected, ClientRateLimiter
+
+
+def _controller(**overrides):
+    settings = {"max_concurrent": 2, "max_queue": 2, "max_queued_bytes": 1000, "queue_timeout_s": 5}
+    settings.update(overrides)
+    return AdmissionController(**settings)
+
+
+def _rejection(coro) -> AdmissionRejected:
+    with pytest.raises(AdmissionRejected) as excinfo:
+        asyncio.run(coro)
+    return excinfo.value
+
+
+def test_body_larger_than_the_budget_is_413():
+    e = _rejection(_controller().acquire(1001))
+    assert (e.status_code, e.reason, e.retry_after) == (413, "too_large", None)
+
+
+def test_byte_budget_counts_running_and_queued_requests():
+    async def run():
+        controller = _controller()
+        await controller.acquire(600)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(500)
+        controller.release(600, hold_s=0.1)
+        await controller.acquire(500)
+        return controller, excinfo.value
+
+    controller, e = asyncio.run(run())
+    assert (e.status_code, e.reason) == (503, "queued_bytes")
+    assert e.retry_after >= 1
+    assert controller.queued_bytes == 500
+
+
+def test_full_queue_is_rejected_and_waiters_are_served_in_order():
+    async def run():
+        controller = _controller(max_concurrent=1, max_queue=2)
+        await controller.acquire(1)
+        order = []
+
+        async def waiter(name):
+            await controller.acquire(1)
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 2
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(1)
+
+        controller.release(1, hold_s=0.5)
+        await asyncio.sleep(0)
+        controller.release(1, hold_s=0.5)
+        await asyncio.gather(*tasks)
+        return controller, order, excinfo.value
+
+    controller, order, e = asyncio.run(run())
+    assert (e.status_code, e.reason) == (503, "queue_full")
+    assert order == ["first", "second"]
+    assert controller.running == 1 and controller.queue_depth == 0
+
+
+def test_queue_timeout_frees_the_queued_bytes():
+    async def run():
+        controller = _controller(max_concurrent=1, queue_timeout_s=0.05)
+        await controller.acquire(100)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(200)
+        return controller, excinfo.value
+
+    controller, e = asyncio.run(run())
+    assert e.reason == "queue_timeout"
+    assert controller.queue_depth == 0
+    assert controller.queued_bytes == 100
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    async def run():
+        controller = _controller(max_concurrent=1)
+        await controller.acquire(1)
+        cancelled = asyncio.create_task(controller.acquire(1))
+        served = asyncio.create_task(controller.acquire(1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        controller.release(1, hold_s=None)
+        await served
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.running == 1 and controller.queued_bytes == 1 and controller.queue_depth == 0
+
+
+def test_retry_after_follows_hold_time_and_backlog():
+    controller = _controller(max_concurrent=2)
+    assert controller.retry_after() == 1
+    controller._avg_hold_s = 4.0
+    controller._waiters.extend([object()] * 3)
+    assert controller.retry_after() == 8
+
+
+def test_rate_limiter_buckets_per_client(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.core.admission.time.monotonic", lambda: now[0])
+    limiter = ClientRateLimiter(rate=1.0, burst=2.0)
+    limiter.check("a")
+    limiter.check("a")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limiter.check("a")
+    assert (excinfo.value.status_code, excinfo.value.retry_after) == (429, 1)
+    limiter.check("b")
+    now[0] += 1.0
+    limiter.check("a")
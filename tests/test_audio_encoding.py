@@ -0,0 +1,114 @@
+import shutil
+import subprocess
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services import audio_analyzer
+from app.services.audio_analyzer import AudioAnalyzer
+from tests.conftest import wav_bytes
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+class _FakeBackend:
+    def __init__(self, accepts_flac):
+        self.accepts_flac = accepts_flac
+        self.payloads = []
+
+    def score_audio(self, payload):
+        self.payloads.append(payload)
+        return {"deepfake_score": 0.2, "is_bonafide": True}
+
+
+@pytest.fixture
+def ffmpeg_calls(monkeypatch):
+    calls = []
+    run = subprocess.run
+
+    def counting_run(cmd, *args, **kwargs):
+        calls.append(cmd)
+        return run(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(audio_analyzer.subprocess, "run", counting_run)
+    return calls
+
+
+def _analyzer(monkeypatch, *, encoding="flac", accepts_flac=True, vad="off"):
+    monkeypatch.setenv("AUDIO_UPSTREAM_ENCODING", encoding)
+    monkeypatch.setenv("AUDIO_VAD", vad)
+    analyzer = AudioAnalyzer()
+    analyzer.backend = _FakeBackend(accepts_flac)
+    return analyzer
+
+
+def _failed_encodes():
+    return REGISTRY.get_sample_value(
+        "deeptrust_stage_duration_seconds_count", {"pipeline": "audio", "stage": "encode_flac_failed"}
+    ) or 0.0
+
+
+@pytest.mark.parametrize(
+    "encoding, accepts_flac, expected",
+    [("flac", True, "flac"), ("flac", False, "wav"), ("wav", True, "wav"), ("opus", True, "wav"), ("", True, "wav")],
+)
+def test_flac_only_for_backends_that_accept_it(monkeypatch, encoding, accepts_flac, expected):
+    assert _analyzer(monkeypatch, encoding=encoding, accepts_flac=accepts_flac)._upstream_encoding() == expected
+
+
+def test_conversion_emits_wav_when_vad_needs_pcm(monkeypatch):
+    assert _analyzer(monkeypatch)._conversion_format() == "flac"
+    assert _analyzer(monkeypatch, vad="trim")._conversion_format() == "wav"
+    assert _analyzer(monkeypatch, accepts_flac=False)._conversion_format() == "wav"
+
+
+@needs_ffmpeg
+def test_wav_upload_is_flac_encoded_in_one_call(monkeypatch, ffmpeg_calls):
+    analyzer = _analyzer(monkeypatch)
+    result = analyzer.analyze_audio(wav_bytes([1000, -1000] * 8000), filename="a.wav", media_format="wav")
+
+    assert len(ffmpeg_calls) == 1
+    (payload,) = analyzer.backend.payloads
+    assert payload.startswith(b"fLaC")
+    assert result["upstream_payload"] == {"encoding": "flac", "bytes": len(payload)}
+
+
+def test_wav_upload_to_a_pcm_backend_is_sent_as_is(monkeypatch, ffmpeg_calls):
+    analyzer = _analyzer(monkeypatch, accepts_flac=False)
+    clip = wav_bytes([1000, -1000] * 8000)
+    result = analyzer.analyze_audio(clip, filename="a.wav", media_format="wav")
+
+    assert ffmpeg_calls == []
+    assert analyzer.backend.payloads == [clip]
+    assert result["upstream_payload"]["encoding"] == "wav"
+
+
+@needs_ffmpeg
+def test_vad_output_is_flac_encoded_in_one_call(monkeypatch, ffmpeg_calls):
+    trimmed = wav_bytes([500] * 4000)
+    monkeypatch.setattr(
+        audio_analyzer, "apply_vad", lambda wav, mode: {"wav": trimmed, "stats": {"applied": True, "kept_s": 0.25, "removed_s": 0.75}}
+    )
+    analyzer = _analyzer(monkeypatch, vad="trim")
+    result = analyzer.analyze_audio(wav_bytes([0] * 16000), filename="a.wav", media_format="wav")
+
+    assert len(ffmpeg_calls) == 1
+    assert ffmpeg_calls[0][ffmpeg_calls[0].index("-f") + 1] == "wav"  # the trimmed PCM is the encoder's input
+    assert analyzer.backend.payloads[0].startswith(b"fLaC")
+    assert result["upstream_payload"]["encoding"] == "flac"
+    assert result["vad"]["kept_s"] == 0.25
+
+
+def test_failed_encode_falls_back_to_wav(monkeypatch):
+    monkeypatch.setattr(
+        audio_analyzer.subprocess, "run", lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 1, b"", b"boom")
+    )
+    analyzer = _analyzer(monkeypatch)
+    clip = wav_bytes([1000, -1000] * 8000)
+    before = _failed_encodes()
+
+    result = analyzer.analyze_audio(clip, filename="a.wav", media_format="wav")
+
+    assert analyzer.backend.payloads == [clip]
+    assert result["upstream_payload"]["encoding"] == "wav"
+    assert _failed_encodes() == before + 1
@@ -0,0 +1,23 @@
+import pytest
+
+from benchmarks.run import percentile
+
+
+@pytest.mark.parametrize(
+    "values, q, expected",
+    [
+        (range(1, 11), 50, 5),
+        (range(1, 23), 50, 11),
+        (range(1, 101), 95, 95),
+        (range(1, 101), 99, 99),
+        (range(1, 101), 100, 100),
+        (range(1, 11), 0, 1),
+        ([7.0], 99, 7.0),
+    ],
+)
+def test_percentile_is_nearest_rank(values, q, expected):
+    assert percentile(list(values), q) == expected
+
+
+def test_percentile_of_nothing():
+    assert percentile([], 50) is None
@@ -0,0 +1,107 @@
+import argparse
+import json
+
+import pytest
+
+from app.cli import bulk_analyze
+from app.cli.bulk_analyze import BulkAnalyzer, load_checkpoint
+from app.services.log_service import LogService
+
+
+@pytest.fixture
+def archive(tmp_path):
+    root = tmp_path / "archive"
+    root.mkdir()
+    for name in ("a.mp4", "b.wav", "bad.mp4", "c.mp4"):
+        (root / name).write_bytes(b"\0" * 16)
+    return root
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Stubs the per-file analysis and the log inserts; records both (with the checkpoint as of each insert)."""
+    record = {"analyzed": [], "saved": []}
+    checkpoint_path = {}
+
+    def analyze_file(self, path):
+        record["analyzed"].append(path)
+        if "bad" in path:
+            return {"path": path, "modality": "video", "status": "error", "error": "boom"}
+        return {"path": path, "modality": "video", "status": "ok", "classification": "Realism", "score": 0.9,
+                "log": {"path": path}}
+
+    def save_logs(self, logs):
+        with open(checkpoint_path["path"]) as f:
+            record["saved"].append(([row["path"] for row in logs], f.read()))
+
+    monkeypatch.setattr(BulkAnalyzer, "analyze_file", analyze_file)
+    monkeypatch.setattr(LogService, "save_logs", save_logs)
+    record["checkpoint_path"] = checkpoint_path
+    return record
+
+
+def _run(tmp_path, calls, paths, **overrides):
+    args = argparse.Namespace(
+        paths=[str(p) for p in paths], manifest=[], checkpoint=str(tmp_path / "ckpt.jsonl"), retry_failed=False,
+        modality="auto", coverage="window", frames=10, seconds=10, selection=None, workers=1, concurrency=2,
+        batch_size=100, limit=0, no_log=False, progress_every=0,
+    )
+    for k, v in overrides.items():
+        setattr(args, k, v)
+    calls["checkpoint_path"]["path"] = args.checkpoint
+    calls["analyzed"].clear()
+    return bulk_analyze.run(args)
+
+
+def _checkpoint(tmp_path):
+    with open(tmp_path / "ckpt.jsonl") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_rerun_skips_checkpointed_paths(tmp_path, archive, calls):
+    summary = _run(tmp_path, calls, [archive])
+    assert summary["ok"] == 3 and summary["errors"] == 1
+    assert {e["path"] for e in _checkpoint(tmp_path)} == {str(p) for p in archive.iterdir()}
+    assert all("log" not in e for e in _checkpoint(tmp_path))
+
+    summary = _run(tmp_path, calls, [archive])
+    assert calls["analyzed"] == []
+    assert summary["skipped_checkpoint"] == 4
+
+
+def test_retry_failed_reanalyzes_only_errors(tmp_path, archive, calls):
+    _run(tmp_path, calls, [archive])
+    summary = _run(tmp_path, calls, [archive], retry_failed=True)
+    assert calls["analyzed"] == [str(archive / "bad.mp4")]
+    assert summary["skipped_checkpoint"] == 3
+
+
+def test_truncated_last_line_is_analyzed_again(tmp_path, archive, calls):
+    _run(tmp_path, calls, [archive])
+    ckpt = tmp_path / "ckpt.jsonl"
+    lines = ckpt.read_text().splitlines(keepends=True)
+    last = json.loads(lines[-1])["path"]
+    ckpt.write_text("".join(lines[:-1]) + lines[-1][: len(lines[-1]) // 2])
+
+    assert last not in load_checkpoint(str(ckpt), retry_failed=False)
+    _run(tmp_path, calls, [archive])
+    assert calls["analyzed"] == [last]
+
+
+def test_same_path_listed_twice_is_analyzed_once(tmp_path, archive, calls):
+    manifest = tmp_path / "files.txt"
+    manifest.write_text(f"{archive / 'a.mp4'}\n# comment\n{archive / 'a.mp4'}\n")
+    summary = _run(tmp_path, calls, [archive / "a.mp4"], manifest=[str(manifest)])
+    assert calls["analyzed"] == [str(archive / "a.mp4")]
+    assert summary["files_done"] == 1
+    assert len(_checkpoint(tmp_path)) == 1
+
+
+def test_log_batch_is_saved_before_its_checkpoint_lines(tmp_path, archive, calls):
+    _run(tmp_path, calls, [archive], batch_size=1, concurrency=1)
+    saved = calls["saved"]
+    assert len(saved) == 3  # one insert per successful file; the error has no log row
+    checkpointed = [e["path"] for e in _checkpoint(tmp_path)]
+    for logged, checkpoint_at_insert in saved:
+        assert not any(p in checkpoint_at_insert for p in logged)
+        assert set(logged) <= set(checkpointed)
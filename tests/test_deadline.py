@@ -0,0 +1,138 @@
+import time
+
+import numpy as np
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.app import app
+from app.controllers import media_controller
+from app.core.deadline import request_deadline
+from app.services.inference_backends import HttpImageBackend
+from app.utils.deadline import decode_budget, deadline_scope, expired, remaining, timeout_for
+
+
+def test_helpers_are_no_ops_without_a_deadline():
+    assert remaining() is None
+    assert not expired(1e9)
+    assert timeout_for(60.0) == 60.0
+    assert decode_budget() is None
+    assert decode_budget(5.0) == 5.0
+
+
+def test_helpers_shrink_to_the_remaining_budget(monkeypatch):
+    monkeypatch.setenv("DEADLINE_INFERENCE_RESERVE_S", "2")
+    with deadline_scope(time.perf_counter() + 10.0):
+        assert remaining() == pytest.approx(10.0, abs=0.5)
+        assert not expired()
+        assert expired(20.0)
+        assert timeout_for(60.0) == pytest.approx(10.0, abs=0.5)
+        assert timeout_for(5.0) == 5.0
+        # Decoding leaves DEADLINE_INFERENCE_RESERVE_S for inference.
+        assert decode_budget() == pytest.approx(8.0, abs=0.5)
+        assert decode_budget(3.0) == 3.0
+    assert remaining() is None
+
+
+def test_short_budgets_split_in_half_and_floor_when_expired():
+    with deadline_scope(time.perf_counter() + 1.0):
+        assert decode_budget() == pytest.approx(0.5, abs=0.1)
+    with deadline_scope(time.perf_counter() - 1.0):
+        assert remaining() < 0
+        assert expired()
+        assert timeout_for(60.0) == 0.1
+        assert decode_budget() == 0.1
+
+
+def _deadline_client():
+    probe = FastAPI()
+
+    @probe.get("/probe")
+    async def read_budget(deadline: float | None = Depends(request_deadline)):
+        return {"remaining": remaining()}
+
+    return TestClient(probe)
+
+
+@pytest.mark.parametrize(
+    "server, query, header, expected",
+    [
+        (None, None, None, None),
+        (None, "5", None, 5.0),
+        (None, None, "3", 3.0),
+        (None, "5", "3", 3.0),
+        ("2", "5", None, 2.0),
+        ("8", None, None, 8.0),
+    ],
+)
+def test_request_budget_is_the_smallest_of_server_query_and_header(monkeypatch, server, query, header, expected):
+    if server is None:
+        monkeypatch.delenv("REQUEST_DEADLINE_S", raising=False)
+    else:
+        monkeypatch.setenv("REQUEST_DEADLINE_S", server)
+    response = _deadline_client().get(
+        "/probe",
+        params={"deadline_s": query} if query else None,
+        headers={"X-Deadline-S": header} if header else None,
+    )
+
+    assert response.status_code == 200
+    if expected is None:
+        assert response.json()["remaining"] is None
+    else:
+        assert response.json()["remaining"] == pytest.approx(expected, abs=0.5)
+
+
+@pytest.mark.parametrize("params, headers", [({"deadline_s": "0"}, None), (None, {"X-Deadline-S": "-1"})])
+def test_non_positive_budgets_are_rejected(params, headers):
+    assert _deadline_client().get("/probe", params=params, headers=headers).status_code == 422
+
+
+def _video(tmp_path, frames=30):
+    cv2 = pytest.importorskip("cv2")
+    path = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+    return path.read_bytes()
+
+
+def _slow_upstream(monkeypatch, seconds):
+    def query(self, base64_png):
+        time.sleep(seconds)
+        return [{"label": "Realism", "score": 0.9}, {"label": "Deepfake", "score": 0.1}]
+
+    monkeypatch.setenv("HUGGINGFACE_MAX_CONCURRENCY", "1")
+    monkeypatch.setenv("DEADLINE_MIN_CALL_S", "0.5")
+    monkeypatch.delenv("REQUEST_DEADLINE_S", raising=False)
+    monkeypatch.setattr(HttpImageBackend, "_query_image_endpoint", query)
+    saved = []
+    monkeypatch.setattr(media_controller, "_save_detection_log", lambda *args: saved.append(args))
+    return saved
+
+
+def test_slow_backend_gives_a_partial_verdict(monkeypatch, tmp_path):
+    saved = _slow_upstream(monkeypatch, 0.3)
+
+    t0 = time.perf_counter()
+    response = TestClient(app).post(
+        "/analyze_video", params={"deadline_s": "1.5"}, files={"file": ("v.avi", _video(tmp_path), "video/avi")}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["partial"] is True
+    assert response.json()["score"] == pytest.approx(90.0)
+    assert time.perf_counter() - t0 < 2.5  # scoring all 10 frames would take 3s
+    assert len(saved) == 1
+
+
+def test_nothing_scored_before_the_deadline_is_a_504(monkeypatch, tmp_path):
+    saved = _slow_upstream(monkeypatch, 0.3)
+
+    response = TestClient(app).post(
+        "/analyze_video", headers={"X-Deadline-S": "0.3"}, files={"file": ("v.avi", _video(tmp_path), "video/avi")}
+    )
+
+    assert response.status_code == 504
+    assert saved == []
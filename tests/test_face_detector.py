@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from app.services import face_detector
+from app.services.face_detector import FaceCropper
+
+cv2 = pytest.importorskip("cv2")
+
+
+class _FakeCascade:
+    """Returns fixed boxes (detection coordinates) and records the image it was given."""
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.images = []
+
+    def detectMultiScale(self, gray, **kwargs):
+        self.images.append(gray)
+        return np.array(self.boxes, dtype=np.int32).reshape(-1, 4)
+
+
+@pytest.fixture
+def cropper(monkeypatch):
+    monkeypatch.setenv("VIDEO_FACE_DETECT_WIDTH", "320")
+    monkeypatch.setenv("VIDEO_FACE_MARGIN", "0.25")
+    return FaceCropper()
+
+
+def _use_cascade(monkeypatch, boxes):
+    cascade = _FakeCascade(boxes)
+    monkeypatch.setattr(face_detector, "_cascade", lambda name: cascade)
+    return cascade
+
+
+def test_detection_runs_downscaled_and_maps_back(cropper, monkeypatch):
+    cascade = _use_cascade(monkeypatch, [(10, 20, 30, 30), (40, 40, 50, 60)])
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    assert cropper.detect_largest(frame) == (160, 160, 200, 240)
+    assert cascade.images[0].shape == (180, 320)
+
+
+def test_small_frames_are_not_resized(cropper, monkeypatch):
+    cascade = _use_cascade(monkeypatch, [(5, 6, 20, 20)])
+    assert cropper.detect_largest(np.zeros((120, 160, 3), dtype=np.uint8)) == (5, 6, 20, 20)
+    assert cascade.images[0].shape == (120, 160)
+
+
+def test_crop_adds_margin_and_clamps(cropper, monkeypatch):
+    frame = np.arange(200 * 300 * 3, dtype=np.uint32).reshape(200, 300, 3)
+    monkeypatch.setattr(cropper, "detect_largest", lambda f: (100, 50, 80, 40))
+    crop = cropper.crop(frame)
+    # 25% of the box on each side: x 80..200, y 40..100.
+    assert crop.shape == (60, 120, 3)
+    assert (crop == frame[40:100, 80:200]).all()
+
+    monkeypatch.setattr(cropper, "detect_largest", lambda f: (260, 180, 40, 40))
+    assert cropper.crop(frame).shape == (30, 50, 3)  # clamped at the right/bottom edges
+
+
+def test_crop_frames_skips_frames_without_face(cropper, monkeypatch):
+    monkeypatch.setattr(cropper, "detect_largest", lambda f: (0, 0, 8, 8) if f[0, 0, 0] else None)
+    frames = [(i, np.full((32, 32, 3), i % 2, dtype=np.uint8)) for i in range(4)]
+    cropped, skipped = cropper.crop_frames(frames)
+    assert [i for i, _ in cropped] == [1, 3]
+    assert skipped == [0, 2]
+
+
+def test_real_cascade_finds_no_face_in_noise(cropper):
+    frame = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    assert cropper.detect_largest(frame) is None
+
+
+def _video(tmp_path, frames=20):
+    path = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    writer.release()
+    return path.read_bytes()
+
+
+def _prepare(monkeypatch, tmp_path, has_face):
+    from app.services.video_analyzer import VideoAnalyzer
+
+    monkeypatch.setenv("VIDEO_FACE_CROP", "true")
+    analyzer = VideoAnalyzer(decode_only=True)
+    calls = iter(range(100))
+    monkeypatch.setattr(
+        analyzer.face_cropper, "detect_largest", lambda f: (8, 8, 16, 16) if has_face(next(calls)) else None
+    )
+    return analyzer.prepare_frames(
+        _video(tmp_path), filename="clip.avi", seconds=10, frames=4, selection=None, coverage="window",
+        media_format="avi",
+    )
+
+
+def test_analyzer_records_skipped_frames(monkeypatch, tmp_path):
+    prepared = _prepare(monkeypatch, tmp_path, lambda call: call % 2 == 0)
+    face_crop = prepared["metadata"]["face_crop"]
+    with_face = [i for i, _ in prepared["to_score"]]
+
+    assert with_face and face_crop["skipped_frame_indices"]
+    assert sorted(with_face + face_crop["skipped_frame_indices"]) == prepared["sampled_indices"]
+    assert face_crop["frames_with_face"] == len(with_face)
+    assert not face_crop["fallback_full_frames"]
+    assert all(crop.shape[:2] == (24, 24) for _, crop in prepared["to_score"])
+
+
+def test_analyzer_scores_whole_frames_without_any_face(monkeypatch, tmp_path):
+    prepared = _prepare(monkeypatch, tmp_path, lambda call: False)
+    face_crop = prepared["metadata"]["face_crop"]
+
+    assert face_crop["fallback_full_frames"]
+    assert face_crop["frames_with_face"] == 0
+    assert [i for i, _ in prepared["to_score"]] == prepared["sampled_indices"]
+    assert all(frame.shape[:2] == (48, 64) for _, frame in prepared["to_score"])
@@ -0,0 +1,77 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.frame_selection import QualityDiverseSampler, ReservoirSampler, make_sampler
+
+
+def _textured(level: int, seed: int, amplitude: int = 40, size=(120, 160)) -> np.ndarray:
+    """Grey frame around `level` with a random checker texture (sharp edges)."""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 2, size=(size[0] // 8, size[1] // 8)).astype(np.float32)
+    texture = cv2.resize(blocks, (size[1], size[0]), interpolation=cv2.INTER_NEAREST)
+    gray = np.clip(level + (texture - 0.5) * amplitude, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def test_reservoir_keeps_k_frames_in_order():
+    sampler = ReservoirSampler(5, rng=random.Random(1))
+    for i in range(100):
+        sampler.offer(i, None)
+    picked = [i for i, _ in sampler.selected()]
+    assert len(picked) == 5
+    assert picked == sorted(picked)
+
+
+def test_make_sampler_rejects_unknown_strategy():
+    assert isinstance(make_sampler(3, "quality"), QualityDiverseSampler)
+    with pytest.raises(ValueError):
+        make_sampler(3, "best")
+
+
+def test_dark_clip_falls_back_to_the_sharpest_rejected_frames():
+    sampler = QualityDiverseSampler(5)
+    for i in range(30):
+        # Brightness ~8, below VIDEO_SELECTION_MIN_BRIGHTNESS; frames 20..24 have the most texture.
+        sampler.offer(i, _textured(8, seed=i, amplitude=14 if 20 <= i < 25 else 4))
+
+    picked = [i for i, _ in sampler.selected()]
+    assert picked == [20, 21, 22, 23, 24]
+    stats = sampler.stats()
+    assert stats["rejected_exposure"] == 30
+    assert stats["fallback"] is True
+
+
+def test_blown_out_clip_is_still_scored():
+    sampler = QualityDiverseSampler(3)
+    for i in range(10):
+        sampler.offer(i, _textured(250, seed=i, amplitude=6))
+    assert len(sampler.selected()) == 3
+
+
+def test_fallback_unused_once_a_frame_is_accepted():
+    sampler = QualityDiverseSampler(3)
+    for i in range(10):
+        sampler.offer(i, _textured(8, seed=i))
+    sampler.offer(10, _textured(128, seed=10))
+
+    assert [i for i, _ in sampler.selected()] == [10]
+    assert sampler.stats()["fallback"] is False
+
+
+def test_blurry_frames_are_rejected_and_scenes_spread():
+    sampler = QualityDiverseSampler(3)
+    for i in range(30):
+        scene = i // 10
+        frame = _textured(60 + 60 * scene, seed=100 + scene)
+        if i % 2:
+            frame = cv2.GaussianBlur(frame, (15, 15), 6)
+        sampler.offer(i, frame)
+
+    picked = [i for i, _ in sampler.selected()]
+    assert len(picked) == 3
+    assert all(i % 2 == 0 for i in picked)
+    assert sorted({i // 10 for i in picked}) == [0, 1, 2]
+    assert sampler.stats()["rejected_blur"] > 0
@@ -0,0 +1,173 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.config import db
+from app.models import detection_log_model
+from app.repository import detection_log_repository as partitions
+from app.services import log_service
+from app.services.log_service import LogService
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    for module in (db, detection_log_model, partitions, log_service):
+        monkeypatch.setattr(module, "engine", engine)
+    monkeypatch.setenv("LOG_PARTITIONS_AHEAD", "1")
+    monkeypatch.delenv("LOG_RETENTION_DAYS", raising=False)
+    monkeypatch.delenv("RESET_DB", raising=False)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def partitioned(engine, monkeypatch):
+    monkeypatch.setenv("LOG_PARTITIONING", "month")
+    assert detection_log_model.init_db()
+    partitions.ensure_partitions(date(2026, 1, 10))
+    return engine
+
+
+def _log(day, classification="Bonafide"):
+    return {"date": day, "classification": classification, "score": 50.0, "isDeepFake": classification == "Deepfake"}
+
+
+def _rows_in(engine, table):
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(text(f'SELECT id, "date" FROM "{table}" ORDER BY id'))]
+
+
+JAN = partitions.partition_name(date(2026, 1, 1), date(2026, 2, 1))
+FEB = partitions.partition_name(date(2026, 2, 1), date(2026, 3, 1))
+DEFAULT = "DetectionLog_default"
+
+
+def test_period_bounds():
+    assert partitions.period_bounds(date(2026, 3, 18), "day") == (date(2026, 3, 18), date(2026, 3, 19))
+    assert partitions.period_bounds(date(2026, 3, 18), "week") == (date(2026, 3, 16), date(2026, 3, 23))
+    assert partitions.period_bounds(date(2026, 12, 5), "month") == (date(2026, 12, 1), date(2027, 1, 1))
+
+
+def test_inserts_are_routed_by_date(partitioned):
+    with partitioned.connect() as conn:
+        assert partitions.is_partitioned(conn)
+        names = [p["name"] for p in partitions.list_partitions(conn)]
+    assert names[:2] == [JAN, FEB]
+
+    service = LogService()
+    service.save_logs([_log(date(2026, 1, 5)), _log(date(2026, 2, 20)), _log(date(2025, 6, 1)), _log(None)])
+    service.save_log(_log(date(2026, 1, 31)))
+
+    assert _rows_in(partitioned, JAN) == [(1, "2026-01-05"), (5, "2026-01-31")]
+    assert _rows_in(partitioned, FEB) == [(2, "2026-02-20")]
+    assert _rows_in(partitioned, DEFAULT) == [(3, "2025-06-01"), (4, None)]
+
+    # Reads, updates and deletes go through the view unchanged.
+    assert len(service.get_all_logs()) == 5
+    assert [r.id for r in service.get_all_logs(date(2026, 1, 1), date(2026, 2, 1))] == [1, 5]
+    service.update_verdicts([{"row_id": 2, "new_classification": "Deepfake", "new_score": 1.0, "new_is_deepfake": True}])
+    assert service.get_log_by_id(2).classification == "Deepfake"
+    service.delete_log_by_id(1)
+    assert service.get_log_by_id(1) is None
+    assert _rows_in(partitioned, JAN) == [(5, "2026-01-31")]
+
+
+def test_delete_range_truncates_inner_partitions(partitioned):
+    service = LogService()
+    service.save_logs([_log(date(2026, 1, d)) for d in (2, 15, 30)] + [_log(date(2026, 2, d)) for d in (3, 14, 15, 27)])
+    service.save_log(_log(date(2025, 12, 31)))
+
+    result = service.delete_logs_by_range(date(2026, 1, 1), date(2026, 2, 15))
+
+    assert result["partitions_truncated"] == [JAN]
+    assert result["rows_deleted"] == 5
+    assert [d for _, d in _rows_in(partitioned, FEB)] == ["2026-02-15", "2026-02-27"]
+    assert len(service.get_all_logs()) == 3
+    with pytest.raises(ValueError):
+        partitions.delete_range(date(2026, 2, 1), date(2026, 2, 1))
+
+
+def test_retention_drops_expired_partitions(partitioned, monkeypatch):
+    service = LogService()
+    service.save_logs([_log(date(2026, 1, 20)), _log(date(2026, 2, 10)), _log(date(2025, 6, 1)), _log(date(2026, 6, 1))])
+
+    monkeypatch.setenv("LOG_RETENTION_DAYS", "10")
+    # Cutoff 2026-02-05: January has fully expired, February has not.
+    result = partitions.apply_retention(today=date(2026, 2, 15))
+
+    assert result["partitions_dropped"] == [JAN]
+    assert result["rows_deleted"] == 1
+    with partitioned.connect() as conn:
+        assert JAN not in [p["name"] for p in partitions.list_partitions(conn)]
+    assert sorted(str(r.date) for r in service.get_all_logs()) == ["2026-02-10", "2026-06-01"]
+
+    # The rebuilt view still routes new rows; January now lands in the default partition.
+    service.save_log(_log(date(2026, 1, 25)))
+    assert [d for _, d in _rows_in(partitioned, DEFAULT)] == ["2026-06-01", "2026-01-25"]
+
+
+def test_without_partitioning_deletes_rows(engine, monkeypatch):
+    monkeypatch.setenv("LOG_PARTITIONING", "off")
+    assert detection_log_model.init_db()
+    service = LogService()
+    service.save_logs([_log(date(2026, 1, 5)), _log(date(2026, 2, 5)), _log(date(2026, 3, 5))])
+    with engine.connect() as conn:
+        assert not partitions.is_partitioned(conn)
+
+    assert partitions.delete_range(date(2026, 2, 1), date(2026, 3, 1)) == {
+        "start": "2026-02-01", "end": "2026-03-01", "partitions_truncated": [], "rows_deleted": 1,
+    }
+    assert partitions.drop_partitions_before(date(2026, 3, 1))["rows_deleted"] == 1
+    assert [str(r.date) for r in service.get_all_logs()] == ["2026-03-05"]
+
+
+def test_migrate_plain_table(engine, monkeypatch):
+    monkeypatch.setenv("LOG_PARTITIONING", "off")
+    assert detection_log_model.init_db()
+    LogService().save_logs([_log(date(2026, 1, 5)), _log(date(2026, 3, 9)), _log(None)])
+
+    monkeypatch.setenv("LOG_PARTITIONING", "month")
+    result = partitions.migrate_to_partitions()
+
+    assert result["migrated"] and result["rows_copied"] == 3
+    assert _rows_in(engine, JAN) == [(1, "2026-01-05")]
+    assert _rows_in(engine, DEFAULT) == [(3, None)]
+    # Ids continue after the migrated ones.
+    LogService().save_log(_log(date(2026, 3, 10)))
+    assert max(r.id for r in LogService().get_all_logs()) == 4
+    assert partitions.migrate_to_partitions() == {"migrated": False, "reason": "already partitioned"}
+
+
+def test_new_partition_takes_rows_from_the_default(partitioned):
+    service = LogService()
+    # No March partition yet (e.g. LOG_PARTITIONS_AHEAD=0 right after the month rolled over).
+    service.save_logs([_log(date(2026, 3, 2)), _log(date(2026, 3, 30)), _log(date(2026, 4, 1))])
+    assert [d for _, d in _rows_in(partitioned, DEFAULT)] == ["2026-03-02", "2026-03-30", "2026-04-01"]
+
+    created = partitions.ensure_partitions(date(2026, 3, 10))
+
+    march = partitions.partition_name(date(2026, 3, 1), date(2026, 4, 1))
+    april = partitions.partition_name(date(2026, 4, 1), date(2026, 5, 1))
+    assert created == [march, april]
+    assert _rows_in(partitioned, march) == [(1, "2026-03-02"), (2, "2026-03-30")]
+    assert _rows_in(partitioned, april) == [(3, "2026-04-01")]
+    assert _rows_in(partitioned, DEFAULT) == []
+    assert len(service.get_all_logs()) == 3
+
+
+def test_failing_period_does_not_block_the_others(partitioned, monkeypatch):
+    real = partitions._create_partition
+
+    def create(conn, start, end):
+        if start == date(2026, 3, 1):
+            raise RuntimeError("partition constraint violated")
+        real(conn, start, end)
+
+    monkeypatch.setattr(partitions, "_create_partition", create)
+    created = partitions.ensure_partitions(date(2026, 3, 10))
+
+    assert created == [partitions.partition_name(date(2026, 4, 1), date(2026, 5, 1))]
+    LogService().save_log(_log(date(2026, 4, 2)))
+    assert len(LogService().get_all_logs()) == 1
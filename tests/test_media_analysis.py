@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.app import app
+from app.controllers import media_controller
+from app.services.analyzer import Analyzer
+from app.services.scoring import fuse_verdicts, video_verdict
+
+_AVI_HEAD = b"RIFF\x00\x10\x00\x00AVI LIST" + b"\x00" * 64
+_AUDIO_RESULT = {"deepfake_score": 1.5, "is_bonafide": False, "label": "spoof"}
+
+
+def _video_result(*realism, partial=False):
+    frames = [{"frame_index": i, "output": [{"label": "Realism", "score": r}, {"label": "Deepfake", "score": 1 - r}]}
+              for i, r in enumerate(realism)]
+    result = {"per_frame_results": frames, "metadata": {"coverage": "window"}}
+    if partial:
+        result["partial"] = True
+    return result
+
+
+@pytest.mark.parametrize(
+    "video, audio, fused",
+    [
+        ("Bonafide", "Bonafide", "Bonafide"),
+        ("Bonafide", "Deepfake", "Deepfake"),
+        ("Deepfake", "Bonafide", "Deepfake"),
+        ("Bonafide", None, "Bonafide"),
+        ("Deepfake", None, "Deepfake"),
+        (None, None, None),
+    ],
+)
+def test_fuse_verdicts(video, audio, fused):
+    assert fuse_verdicts(video, audio) == fused
+
+
+def _stub_pipelines(monkeypatch, analyzer, audio_calls):
+    monkeypatch.setattr(analyzer, "analyze_video", lambda *args, **kwargs: _video_result(0.9))
+
+    def analyze_audio_track(media_bytes, filename):
+        audio_calls.append(filename)
+        return dict(_AUDIO_RESULT)
+
+    monkeypatch.setattr(analyzer.audio_analyzer, "analyze_audio_track", analyze_audio_track)
+
+
+def test_audio_is_skipped_when_the_header_has_no_audio_track(monkeypatch):
+    analyzer, audio_calls = Analyzer(), []
+    _stub_pipelines(monkeypatch, analyzer, audio_calls)
+
+    container = {"source": "parser", "video_codec": "h264", "audio_codec": None}
+    result = analyzer.analyze_media(b"data", "v.mp4", media_format="mp4", container=container)
+    assert result == {"video": _video_result(0.9), "audio": None}
+    assert audio_calls == []
+
+    # Without a parsed header (or with an audio track) both pipelines run.
+    result = analyzer.analyze_media(b"data", "v.mp4", media_format="mp4", container={"source": "ffprobe"})
+    assert result["audio"] == _AUDIO_RESULT
+    assert audio_calls == ["v.mp4"]
+
+
+def _post_media(monkeypatch, result):
+    monkeypatch.setattr(Analyzer, "analyze_media", lambda self, *args, **kwargs: result)
+    monkeypatch.setattr(media_controller, "_probe_upload", lambda *args, **kwargs: None)
+    saved = []
+    monkeypatch.setattr(media_controller, "_save_detection_log", lambda *args: saved.append(args))
+    response = TestClient(app).post("/analyze_media", files={"file": ("v.avi", _AVI_HEAD, "video/avi")})
+    return response, saved
+
+
+def test_media_fuses_and_logs_both_modalities(monkeypatch):
+    response, saved = _post_media(monkeypatch, {"video": _video_result(0.9, 0.8), "audio": dict(_AUDIO_RESULT)})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["classification"] == "Deepfake"
+    assert body["video"] == {"classification": video_verdict([0.9, 0.8])[0], "score": pytest.approx(85.0)}
+    assert body["audio"] == {"classification": "Deepfake", "score": pytest.approx(75.0)}
+    assert "partial" not in body
+    assert [(args[2]["modality"], args[0]) for args in saved] == [
+        ("video", body["video"]["classification"]),
+        ("audio", "Deepfake"),
+    ]
+
+
+def test_media_without_audio_logs_the_video_only(monkeypatch):
+    response, saved = _post_media(monkeypatch, {"video": _video_result(0.9), "audio": None})
+
+    assert response.status_code == 200
+    assert response.json()["classification"] == video_verdict([0.9])[0]
+    assert "audio" not in response.json()
+    assert [args[2]["modality"] for args in saved] == ["video"]
+
+
+def test_audio_deadline_skip_gives_a_partial_video_verdict(monkeypatch):
+    audio = {"error": "Request deadline reached before audio analysis", "skipped": "deadline"}
+    response, saved = _post_media(monkeypatch, {"video": _video_result(0.1), "audio": audio})
+
+    assert response.status_code == 200
+    classification = video_verdict([0.1])[0]
+    assert response.json() == {
+        "classification": classification,
+        "video": {"classification": classification, "score": pytest.approx(10.0)},
+        "partial": True,
+    }
+    assert [args[2]["modality"] for args in saved] == ["video"]
+
+
+@pytest.mark.parametrize(
+    "audio, status",
+    [({"error": "Not enough speech", "rejected": "no_speech"}, 422), ({"error": "upstream 500"}, 502)],
+)
+def test_audio_errors_map_like_analyze_audio(monkeypatch, audio, status):
+    response, saved = _post_media(monkeypatch, {"video": _video_result(0.9), "audio": audio})
+
+    assert response.status_code == status
+    assert response.json()["detail"] == audio["error"]
+    assert saved == []
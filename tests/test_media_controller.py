@@ -0,0 +1,241 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.app import app
+from app.controllers import media_controller
+from app.controllers.media_controller import VideoAnalysisResponse
+from app.core import admission
+from app.core.admission import AdmissionController
+from app.services.analyzer import Analyzer
+from app.services.scoring import video_verdict
+from tests.conftest import wav_bytes
+
+_AUDIO_RESULT = {"deepfake_score": 0.4, "is_bonafide": True, "label": "bonafide"}
+
+
+def _post_concurrently(delays: list[float]):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post(delay: float):
+                await asyncio.sleep(delay)
+                t0 = time.perf_counter()
+                response = await client.post("/analyze_audio", files={"file": ("a.wav", wav_bytes([0] * 1600), "audio/wav")})
+                return response, time.perf_counter() - t0
+
+            return await asyncio.gather(*[post(d) for d in delays])
+
+    return asyncio.run(run())
+
+
+def _slow_analyzer(monkeypatch, seconds: float):
+    def analyze_audio(self, audio_data, **kwargs):
+        time.sleep(seconds)
+        return dict(_AUDIO_RESULT)
+
+    monkeypatch.setattr(Analyzer, "analyze_audio", analyze_audio)
+    monkeypatch.setattr(media_controller, "_save_detection_log", lambda *args, **kwargs: None)
+
+
+def test_request_over_the_limit_is_rejected_while_analysis_runs(monkeypatch):
+    _slow_analyzer(monkeypatch, 0.6)
+    monkeypatch.setattr(
+        admission,
+        "_controller",
+        AdmissionController(max_concurrent=1, max_queue=0, max_queued_bytes=1 << 30, queue_timeout_s=10),
+    )
+
+    (first, first_s), (second, second_s) = _post_concurrently([0.0, 0.1])
+
+    assert first.status_code == 200
+    assert first.json()["classification"] == "Bonafide"
+    # Answered while the first analysis still runs: the handler does not block the event loop.
+    assert second.status_code == 503
+    assert second_s < 0.3
+    assert "retry-after" in second.headers
+
+
+def test_concurrent_analyses_overlap(monkeypatch):
+    _slow_analyzer(monkeypatch, 0.5)
+    monkeypatch.setattr(
+        admission,
+        "_controller",
+        AdmissionController(max_concurrent=4, max_queue=0, max_queued_bytes=1 << 30, queue_timeout_s=10),
+    )
+
+    t0 = time.perf_counter()
+    results = _post_concurrently([0.0, 0.0, 0.0])
+
+    assert [r.status_code for r, _ in results] == [200, 200, 200]
+    assert time.perf_counter() - t0 < 1.2
+
+
+def test_unsupported_container_is_rejected_before_analysis(monkeypatch):
+    _slow_analyzer(monkeypatch, 0.0)
+    calls = []
+    monkeypatch.setattr(Analyzer, "analyze_audio", lambda self, *args, **kwargs: calls.append(args))
+
+    response = TestClient(app).post("/analyze_audio", files={"file": ("a.wav", b"<html>" + b"x" * 4096, "audio/wav")})
+
+    assert response.status_code == 415
+    assert response.json()["detail"].startswith("Unsupported media format: unknown")
+    assert calls == []
+
+
+class _FakeStreamSession:
+    """Stands in for `StreamSession` (no ffmpeg); `fail` makes every periodic update raise."""
+
+    fail = False
+
+    async def start(self):
+        pass
+
+    async def feed(self, chunk):
+        pass
+
+    async def close_input(self):
+        pass
+
+    async def abort(self):
+        pass
+
+    def has_new_data(self):
+        return True
+
+    async def analyze_window(self):
+        if self.fail:
+            raise RuntimeError("decoder crashed")
+        return {"seq": 1, "video": {"classification": "Bonafide", "score": 0.1}, "audio": None}
+
+
+def test_stream_update_failure_sends_error_and_closes(monkeypatch):
+    monkeypatch.setenv("STREAM_UPDATE_INTERVAL_S", "0.01")
+    monkeypatch.setattr(_FakeStreamSession, "fail", True)
+    monkeypatch.setattr(media_controller, "StreamSession", _FakeStreamSession)
+
+    with TestClient(app).websocket_connect("/ws/analyze_stream") as ws:
+        message = ws.receive_json()
+        assert message == {"type": "error", "detail": "Stream analysis failed: RuntimeError: decoder crashed"}
+        assert ws.receive()["code"] == 1011
+
+
+def test_stream_final_log_runs_off_the_event_loop(monkeypatch):
+    monkeypatch.setenv("STREAM_UPDATE_INTERVAL_S", "60")
+    monkeypatch.setattr(media_controller, "StreamSession", _FakeStreamSession)
+    saved = []
+    monkeypatch.setattr(
+        media_controller, "_save_detection_log", lambda *args: saved.append((args, threading.current_thread().name))
+    )
+
+    with TestClient(app).websocket_connect("/ws/analyze_stream") as ws:
+        ws.send_text("end")
+        loop_thread = ws.portal.call(lambda: threading.current_thread().name)
+        assert ws.receive_json()["type"] == "final"
+
+    assert [args for args, _ in saved] == [("Bonafide", 0.1, {"modality": "video", "coverage": "stream"})]
+    assert saved[0][1] != loop_thread
+
+
+class _FailingFinalSession(_FakeStreamSession):
+    async def analyze_window(self):
+        raise RuntimeError("decoder crashed")
+
+
+class _FailingFeedSession(_FakeStreamSession):
+    async def feed(self, chunk):
+        raise OSError("broken pipe")
+
+
+@pytest.mark.parametrize(
+    "session, messages, detail",
+    [
+        (_FailingFinalSession, [b"chunk", "end"], "Stream analysis failed: RuntimeError: decoder crashed"),
+        (_FailingFeedSession, [b"chunk"], "Stream analysis failed: OSError: broken pipe"),
+    ],
+)
+def test_stream_unexpected_failure_sends_error_and_closes(monkeypatch, session, messages, detail):
+    monkeypatch.setenv("STREAM_UPDATE_INTERVAL_S", "60")
+    monkeypatch.setattr(media_controller, "StreamSession", session)
+    saved = []
+    monkeypatch.setattr(media_controller, "_save_detection_log", lambda *args: saved.append(args))
+
+    with TestClient(app).websocket_connect("/ws/analyze_stream") as ws:
+        for message in messages:
+            if isinstance(message, bytes):
+                ws.send_bytes(message)
+            else:
+                ws.send_text(message)
+        assert ws.receive_json() == {"type": "error", "detail": detail}
+        assert ws.receive()["code"] == 1011
+    assert saved == []
+
+
+_AVI_HEAD = b"RIFF\x00\x10\x00\x00AVI LIST" + b"\x00" * 64
+
+
+def _frame(index: int, realism: float) -> dict:
+    return {"frame_index": index, "output": [{"label": "Realism", "score": realism}, {"label": "Deepfake", "score": 1 - realism}]}
+
+
+def _sse_events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def _stream_video(monkeypatch, items):
+    monkeypatch.setattr(Analyzer, "iter_analyze_video", lambda self, *args, **kwargs: iter(items))
+    saved = []
+    monkeypatch.setattr(media_controller, "_save_detection_log", lambda *args: saved.append(args))
+    response = TestClient(app).post("/analyze_video/stream", files={"file": ("v.avi", _AVI_HEAD, "video/avi")})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return _sse_events(response.text), saved
+
+
+def test_video_stream_reports_frames_then_result(monkeypatch):
+    frames = [_frame(4, 0.9), {"frame_index": 1, "error": "upstream timeout"}, _frame(2, 0.2)]
+    result = {"per_frame_results": sorted(frames, key=lambda fr: fr["frame_index"]), "metadata": {"coverage": "window"}}
+    events, saved = _stream_video(monkeypatch, [("frame", fr) for fr in frames] + [("result", result)])
+
+    assert [kind for kind, _ in events] == ["frame", "frame", "frame", "result"]
+    first, failed, last = (data for _, data in events[:3])
+    assert first == {
+        "frame_index": 4,
+        "realism": pytest.approx(90.0),
+        "running_mean": pytest.approx(video_verdict([0.9])[1]),
+        "provisional_classification": video_verdict([0.9])[0],
+        "frames_scored": 1,
+    }
+    # A failed frame keeps the running verdict of the frames scored so far.
+    assert failed["error"] == "upstream timeout" and "realism" not in failed
+    assert failed["running_mean"] == first["running_mean"] and failed["frames_scored"] == 1
+    classification, score = video_verdict([0.9, 0.2])
+    assert (last["provisional_classification"], last["running_mean"], last["frames_scored"]) == (
+        classification, pytest.approx(score), 2
+    )
+
+    payload = events[-1][1]
+    assert VideoAnalysisResponse.model_validate(payload).model_dump(exclude_none=True) == payload
+    assert (payload["classification"], payload["score"]) == (classification, pytest.approx(score))
+    assert len(saved) == 1
+    assert saved[0][:2] == (classification, score)
+
+
+def test_video_stream_sends_error_when_no_frame_was_scored(monkeypatch):
+    frames = [{"frame_index": 0, "error": "upstream timeout"}]
+    result = {"per_frame_results": frames, "metadata": {"coverage": "window"}}
+    events, saved = _stream_video(monkeypatch, [("frame", frames[0]), ("result", result)])
+
+    assert [kind for kind, _ in events] == ["frame", "error"]
+    assert events[0][1] == {"frame_index": 0, "error": "upstream timeout", "frames_scored": 0}
+    assert events[1][1]["status_code"] == 502
+    assert saved == []
@@ -0,0 +1,119 @@
+import pytest
+
+from app.services import media_probe
+from app.services.media_probe import _probe_ebml, _probe_mp4, _probe_wav, probe_media, sniff_media_format
+from tests.conftest import wav_bytes
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (wav_bytes([0] * 16), "wav"),
+        (b"RIFF\x00\x00\x00\x00AVI LIST", "avi"),
+        (b"fLaC\x00\x00\x00\x22", "flac"),
+        (b"OggS\x00\x02", "ogg"),
+        (b"ID3\x04\x00", "mp3"),
+        (b"\xff\xfb\x90\x00", "mp3"),
+        (b"\x00\x00\x00\x20ftypisom", "mp4"),
+        (b"\x00\x00\x00\x08wide\x00\x00", "mp4"),
+        (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81", "webm"),
+        (b"<html>", "unknown"),
+        (b"", "unknown"),
+        (None, "unknown"),
+    ],
+)
+def test_sniff_media_format(head, expected):
+    assert sniff_media_format(head) == expected
+
+
+def _ffmpeg(tmp_path_factory, name, *args, pipe=False):
+    import shutil
+    import subprocess
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        pytest.skip("ffmpeg is not installed")
+    cmd = [
+        ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", "testsrc=size=64x48:rate=10",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", "2", "-g", "5", *args,
+    ]
+    if pipe:
+        return subprocess.run(cmd + ["pipe:1"], check=True, stdout=subprocess.PIPE).stdout
+    path = tmp_path_factory.mktemp("media") / name
+    subprocess.run(cmd + [str(path)], check=True)
+    return path.read_bytes()
+
+
+@pytest.fixture(scope="module")
+def mp4_moov_at_end(tmp_path_factory):
+    return _ffmpeg(tmp_path_factory, "end.mp4", "-c:v", "mpeg4", "-c:a", "aac")
+
+
+@pytest.fixture(scope="module")
+def mp4_faststart(tmp_path_factory):
+    return _ffmpeg(tmp_path_factory, "fast.mp4", "-c:v", "mpeg4", "-c:a", "aac", "-movflags", "+faststart")
+
+
+@pytest.fixture(scope="module")
+def webm(tmp_path_factory):
+    return _ffmpeg(tmp_path_factory, "clip.webm", "-c:v", "libvpx", "-c:a", "libopus")
+
+
+@pytest.mark.parametrize("fixture", ["mp4_moov_at_end", "mp4_faststart"])
+def test_probe_mp4(request, fixture):
+    data = request.getfixturevalue(fixture)
+    assert sniff_media_format(data) == "mp4"
+    info = _probe_mp4(memoryview(data))
+    assert info["duration_s"] == pytest.approx(2.0, abs=0.05)
+    assert info["fps"] == pytest.approx(10.0)
+    assert (info["width"], info["height"]) == (64, 48)
+    assert (info["video_codec"], info["audio_codec"]) == ("mp4v", "mp4a")
+    assert info["keyframes_s"] == pytest.approx([0.0, 0.5, 1.0, 1.5])
+
+
+def test_probe_webm(webm):
+    assert sniff_media_format(webm) == "webm"
+    info = _probe_ebml(memoryview(webm))
+    assert info["duration_s"] == pytest.approx(2.0, abs=0.05)
+    assert info["fps"] == pytest.approx(10.0)
+    assert (info["width"], info["height"]) == (64, 48)
+    assert (info["video_codec"], info["audio_codec"]) == ("V_VP8", "A_OPUS")
+    assert info["keyframes_s"] == pytest.approx([0.0, 0.5, 1.0, 1.5])
+
+
+def test_probe_live_webm_without_cues(tmp_path_factory):
+    # Written to a pipe, like MediaRecorder output: unknown-size segment/clusters, no duration or cues.
+    data = _ffmpeg(tmp_path_factory, None, "-c:v", "libvpx", "-c:a", "libopus", "-f", "webm", "-live", "1", pipe=True)
+    info = _probe_ebml(memoryview(data))
+    assert info["video_codec"] == "V_VP8"
+    assert info["duration_s"] is None and info["keyframes_s"] is None
+
+
+def test_probe_wav():
+    info = _probe_wav(memoryview(wav_bytes([0] * 24000, sample_rate=16000)))
+    assert info["duration_s"] == pytest.approx(1.5)
+    assert info["audio_codec"] == "pcm"
+    assert _probe_wav(memoryview(b"RIFF\x04\x00\x00\x00WAVE")) is None
+
+
+def test_probe_media_caches_by_content(mp4_faststart):
+    first = probe_media(mp4_faststart, "mp4")
+    assert first["source"] == "parser"
+    assert probe_media(bytes(mp4_faststart), "mp4") is first
+
+
+def test_unreadable_header_falls_back_to_ffprobe(monkeypatch):
+    calls = []
+
+    def ffprobe(data, media_format):
+        calls.append(media_format)
+        return None if len(calls) == 1 else {**media_probe._empty(media_format), "source": "ffprobe", "duration_s": 3.0}
+
+    monkeypatch.setattr(media_probe, "_probe_ffprobe", ffprobe)
+    # An `ftyp` box and no `moov`: the parser cannot read it.
+    assert probe_media(b"\x00\x00\x00\x08ftyp", "mp4") is None
+    info = probe_media(b"\x00\x00\x00\x08ftyp\x00", "mp4")
+    assert (info["source"], info["duration_s"]) == ("ffprobe", 3.0)
+    assert calls == ["mp4", "mp4"]
@@ -0,0 +1,82 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+from tests.conftest import wav_bytes
+
+pytest.importorskip("onnxruntime")
+
+from app.services.inference_backends import get_audio_backend, get_image_backend  # noqa: E402
+
+ASSETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "assets", "onnx")
+
+
+@pytest.fixture(autouse=True)
+def onnx_env(monkeypatch):
+    monkeypatch.setenv("INFERENCE_BACKEND", "onnx")
+    monkeypatch.setenv("ONNX_IMAGE_MODEL_PATH", os.path.join(ASSETS, "tiny_image_classifier.onnx"))
+    monkeypatch.setenv("ONNX_AUDIO_MODEL_PATH", os.path.join(ASSETS, "tiny_audio_classifier.onnx"))
+    monkeypatch.setenv("ONNX_IMAGE_SIZE", "16")
+    monkeypatch.setenv("ONNX_BATCH_SIZE", "2")
+
+
+def _top(result):
+    return result["output"][0]["label"], result["output"][0]["score"]
+
+
+def test_tiny_image_model_classifies_in_batches():
+    backend = get_image_backend()
+    assert backend.name == "onnx"
+    assert backend.size == (16, 16)
+
+    # BGR frames: white -> (0.6, -0.4) logits, black -> (-0.6, 0.8), red -> (1.0, -0.8).
+    frames = [
+        (3, np.full((24, 32, 3), 255, dtype=np.uint8)),
+        (7, np.zeros((24, 32, 3), dtype=np.uint8)),
+        (9, np.dstack([np.zeros((24, 32)), np.zeros((24, 32)), np.full((24, 32), 255)]).astype(np.uint8)),
+    ]
+    results = backend.classify_frames(frames)
+
+    assert [r["frame_index"] for r in results] == [3, 7, 9]
+    assert all("error" not in r for r in results)
+    labels = [_top(r) for r in results]
+    assert labels[0] == ("Deepfake", pytest.approx(1 / (1 + np.exp(-1.0)), abs=1e-4))
+    assert labels[1] == ("Realism", pytest.approx(1 / (1 + np.exp(-1.4)), abs=1e-4))
+    assert labels[2] == ("Deepfake", pytest.approx(1 / (1 + np.exp(-1.8)), abs=1e-4))
+
+
+def test_tiny_audio_model_scores_energy():
+    backend = get_audio_backend()
+
+    quiet = backend.score_audio(wav_bytes(np.zeros(1600)))
+    assert quiet["label"] == "bonafide" and quiet["is_bonafide"]
+    assert quiet["deepfake_score"] == pytest.approx(2 / (1 + np.exp(1.0)), abs=1e-4)
+
+    loud = backend.score_audio(wav_bytes(np.full(1600, 16384)))
+    assert loud["label"] == "spoof" and not loud["is_bonafide"]
+    assert loud["deepfake_score"] == pytest.approx(2 / (1 + np.exp(-3.0)), abs=1e-4)
+
+    assert "error" in backend.score_audio(b"not a wav")
+
+
+def test_missing_model_is_reported(monkeypatch, tmp_path):
+    monkeypatch.setenv("ONNX_IMAGE_MODEL_PATH", str(tmp_path / "missing.onnx"))
+    with pytest.raises(ValueError, match="ONNX model not found"):
+        get_image_backend()
+
+
+def test_generator_reproduces_the_shipped_models():
+    onnx = pytest.importorskip("onnx")
+    spec = importlib.util.spec_from_file_location("generate_tiny_models", os.path.join(ASSETS, "generate_tiny_models.py"))
+    generator = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(generator)
+
+    for name, model in (
+        ("tiny_image_classifier.onnx", generator._image_model()),
+        ("tiny_audio_classifier.onnx", generator._audio_model()),
+    ):
+        onnx.checker.check_model(model)
+        shipped = onnx.load(os.path.join(ASSETS, name))
+        assert shipped.graph.SerializeToString() == model.graph.SerializeToString()
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from app.core.priority import LaneScheduler, UpstreamSlotTimeout, resolve_lane
+
+
+def _wait_for(predicate, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _queue_waiters(scheduler, lanes, order):
+    """Queue one waiter per lane, in order, while the only slot is held; each records its grant and releases."""
+
+    def call(lane):
+        scheduler.acquire(lane, 10)
+        order.append(lane)
+        scheduler.release(lane)
+
+    threads = []
+    for lane in lanes:
+        depth = scheduler.queue_depth(lane)
+        thread = threading.Thread(target=call, args=(lane,))
+        thread.start()
+        _wait_for(lambda: scheduler.queue_depth(lane) == depth + 1)
+        threads.append(thread)
+    return threads
+
+
+def test_freed_slots_follow_lane_weights():
+    scheduler = LaneScheduler(max_concurrent=1, weights={"interactive": 4, "bulk": 1}, max_wait_s=60)
+    scheduler.acquire("interactive", 1)
+    order = []
+    threads = _queue_waiters(scheduler, ["bulk"] * 5 + ["interactive"] * 5, order)
+    scheduler.release("interactive")
+    for thread in threads:
+        thread.join(5)
+
+    assert len(order) == 10
+    # 4:1 weights: bulk gets one of the first six slots, then the rest once interactive is done.
+    assert order[:6].count("bulk") == 1
+    assert order[6:] == ["bulk"] * 4
+    assert scheduler.running == 0
+
+
+def test_starving_bulk_call_jumps_the_weights():
+    scheduler = LaneScheduler(max_concurrent=1, weights={"interactive": 100, "bulk": 1}, max_wait_s=0.05)
+    scheduler.acquire("interactive", 1)
+    order = []
+    threads = _queue_waiters(scheduler, ["bulk"], order)
+    time.sleep(0.1)
+    threads += _queue_waiters(scheduler, ["interactive"] * 3, order)
+    scheduler.release("interactive")
+    for thread in threads:
+        thread.join(5)
+    assert order[0] == "bulk"
+
+
+def test_idle_lane_does_not_bank_credit():
+    scheduler = LaneScheduler(max_concurrent=1, weights={"interactive": 1, "bulk": 1}, max_wait_s=60)
+    for _ in range(5):
+        scheduler.acquire("interactive", 1)
+        scheduler.release("interactive")
+    scheduler.acquire("interactive", 1)
+    order = []
+    threads = _queue_waiters(scheduler, ["bulk"] * 3 + ["interactive"] * 3, order)
+    scheduler.release("interactive")
+    for thread in threads:
+        thread.join(5)
+    # Equal weights alternate; bulk does not get five grants in a row for the time it was idle.
+    assert order[:4].count("bulk") == 2
+
+
+def test_acquire_times_out():
+    scheduler = LaneScheduler(max_concurrent=1, weights={}, max_wait_s=60)
+    scheduler.acquire("bulk", 1)
+    with pytest.raises(UpstreamSlotTimeout):
+        scheduler.acquire("interactive", 0.05)
+    assert scheduler.queue_depth("interactive") == 0
+    scheduler.release("bulk")
+    assert scheduler.running == 0
+
+
+def test_concurrent_interactive_and_bulk_share_one_scheduler():
+    scheduler = LaneScheduler(max_concurrent=2, weights={"interactive": 4, "bulk": 1}, max_wait_s=60)
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, max
+    finished = {"interactive": [], "bulk": []}
+    start = threading.Barrier(16)
+
+    def client(lane):
+        start.wait()
+        for _ in range(3):
+            scheduler.acquire(lane, 10)
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            time.sleep(0.005)
+            with lock:
+                in_flight[0] -= 1
+            scheduler.release(lane)
+        finished[lane].append(time.monotonic())
+
+    threads = [threading.Thread(target=client, args=(lane,)) for lane in ["interactive", "bulk"] * 8]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(finished["interactive"]) == len(finished["bulk"]) == 8
+    assert in_flight[1] == 2
+    assert scheduler.running == 0
+    assert scheduler.queue_depth("interactive") == scheduler.queue_depth("bulk") == 0
+    # Interactive clients finish well ahead of the bulk ones.
+    assert max(finished["interactive"]) < sorted(finished["bulk"])[4]
+
+
+def test_resolve_lane(monkeypatch):
+    monkeypatch.setenv("PRIORITY_LANE_API_KEYS", "batch=bulk,ui=interactive")
+    monkeypatch.delenv("PRIORITY_DEFAULT_LANE", raising=False)
+    assert resolve_lane(None, None) == "interactive"
+    assert resolve_lane("bulk", "ui") == "bulk"
+    assert resolve_lane("interactive", "batch") == "bulk"
+    monkeypatch.setenv("PRIORITY_DEFAULT_LANE", "bulk")
+    assert resolve_lane(None, "unknown") == "bulk"
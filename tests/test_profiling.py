@@ -0,0 +1,101 @@
+import contextvars
+import cProfile
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils import profiling
+from app.utils.metrics import timed_stage
+from app.utils.profiling import RequestTrace, activate_trace, profiled, profiling_section
+
+
+def _worker_task(n: int) -> int:
+    with timed_stage("video", "upstream"):
+        return sum(i * i for i in range(n))
+
+
+def _after_nested_section() -> int:
+    return 1
+
+
+def _load_stats(path) -> dict:
+    return {func[2]: row for func, row in pstats.Stats(str(path)).stats.items()}
+
+
+def test_profile_covers_worker_threads(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEBUG_PROFILE_DIR", str(tmp_path))
+    trace = RequestTrace(profile=True)
+    with activate_trace(trace), profiling_section():
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, profiled, _worker_task, 20000) for _ in range(3)]
+            [f.result() for f in futures]
+
+    summary = trace.summary()
+    assert summary["profile"]["threads"] == 4
+    stats = _load_stats(tmp_path / f"{summary['profile']['id']}.prof")
+    # ncalls of the function that only ran in the worker threads.
+    assert stats["_worker_task"][1] == 3
+    # Stage timings recorded inside the workers reach the request's trace.
+    assert summary["stages"]["video.upstream"]["count"] == 3
+
+
+def test_nested_sections_keep_profiling_the_outer_block(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEBUG_PROFILE_DIR", str(tmp_path))
+    trace = RequestTrace(profile=True)
+    with activate_trace(trace), profiling_section():
+        with profiling_section():
+            _worker_task(10)
+        _after_nested_section()
+
+    summary = trace.summary()
+    assert summary["profile"]["threads"] == 1
+    assert "_after_nested_section" in _load_stats(tmp_path / f"{summary['profile']['id']}.prof")
+
+
+def test_no_profile_without_request():
+    trace = RequestTrace(profile=False)
+    with activate_trace(trace), profiling_section():
+        _worker_task(10)
+    assert "profile" not in trace.summary()
+
+
+def test_summary_reports_stage_timings():
+    trace = RequestTrace(request_started_at=0.0)
+    trace.record("audio", "upstream", 0.012)
+    trace.record("audio", "upstream", 0.008)
+
+    summary = trace.summary()
+    assert set(summary) == {"handler_ms", "stages", "pre_handler_ms"}
+    assert summary["stages"]["audio.upstream"] == {"count": 2, "total_ms": 20.0, "calls_ms": [12.0, 8.0]}
+
+
+class _SingleActiveProfile(cProfile.Profile):
+    """Like cProfile on Python 3.12+: enabling a second profiler while one is active fails."""
+
+    active = 0
+
+    def enable(self, *args, **kwargs):
+        if _SingleActiveProfile.active:
+            raise ValueError("Another profiling tool is already active")
+        _SingleActiveProfile.active += 1
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        super().disable()
+        _SingleActiveProfile.active -= 1
+
+
+def test_threads_that_cannot_be_profiled_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setenv("DEBUG_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling.cProfile, "Profile", _SingleActiveProfile)
+    trace = RequestTrace(profile=True)
+    with activate_trace(trace), profiling_section():
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, profiled, _worker_task, 2000) for _ in range(3)]
+            results = [f.result() for f in futures]
+
+    assert results == [_worker_task(2000)] * 3
+    summary = trace.summary()
+    assert summary["profile"]["threads"] == 1
+    assert summary["profile"]["threads_skipped"] == 3
+    assert summary["stages"]["video.upstream"]["count"] == 3
+    assert trace._profiling_threads == set()
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.app import app
+from app.core import readiness
+from app.models import detection_log_model
+
+
+@pytest.fixture(autouse=True)
+def fresh_checks(monkeypatch):
+    monkeypatch.setattr(readiness, "_checks", {})
+    monkeypatch.setenv("LOG_MAINTENANCE_INTERVAL_S", "0")
+
+
+def _wait_for_ready(client, timeout_s: float = 5.0):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            return response
+        time.sleep(0.05)
+    return response
+
+
+def test_ready_only_when_every_check_passed():
+    readiness.begin("database")
+    readiness.begin("models")
+    assert readiness.status()["ready"] is False
+    readiness.finish("database")
+    readiness.finish("models", ok=False, error="boom")
+    status = readiness.status()
+    assert status["ready"] is False
+    assert status["checks"]["models"] == {"status": "failed", "error": "boom", "after_s": status["checks"]["models"]["after_s"]}
+    readiness.finish("models")
+    assert readiness.status()["ready"] is True
+
+
+def test_ready_after_background_init(monkeypatch):
+    monkeypatch.delenv("INIT_DB_ON_STARTUP", raising=False)
+    with TestClient(app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+        response = _wait_for_ready(client)
+        assert response.status_code == 200
+        assert response.json()["checks"]["database"]["status"] == "ok"
+
+
+def test_not_ready_while_database_init_fails(monkeypatch):
+    monkeypatch.setenv("INIT_DB_RETRY_S", "0.05")
+    calls = []
+
+    def failing_init_db():
+        calls.append(1)
+        return len(calls) >= 3
+
+    monkeypatch.setattr(detection_log_model, "init_db", failing_init_db)
+    with TestClient(app) as client:
+        first = client.get("/ready")
+        assert first.status_code == 503
+        assert _wait_for_ready(client).status_code == 200
+    assert len(calls) == 3
+
+
+def test_init_disabled_still_checks_the_schema(monkeypatch):
+    monkeypatch.setenv("INIT_DB_ON_STARTUP", "false")
+    monkeypatch.setenv("INIT_DB_RETRY_S", "0.05")
+    monkeypatch.setattr(detection_log_model, "stored_schema_version", lambda: None)
+    with TestClient(app) as client:
+        time.sleep(0.2)
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["checks"]["database"]["status"] == "failed"
+
+        monkeypatch.setattr(detection_log_model, "stored_schema_version", lambda: detection_log_model.SCHEMA_VERSION)
+        assert _wait_for_ready(client).status_code == 200
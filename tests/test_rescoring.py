@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from app.services.rescoring import aggregate_scores, audio_log_fields, pack_scores, rescore, video_log_fields
+from app.services.scoring import VIDEO_MAX_FRAMES_FOR_MEAN, audio_verdict, video_verdict
+
+
+def _frames(realism):
+    return [{"frame_index": i, "output": [{"label": "Realism", "score": r}, {"label": "Deepfake", "score": 1 - r}]}
+            for i, r in enumerate(realism)]
+
+
+def _rows(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        coverage = "full" if i % 3 == 0 else "window"
+        realism = rng.beta(0.5, 2.0, size=int(rng.integers(1, 30))).tolist()
+        classification, score = video_verdict(realism, None if coverage == "full" else VIDEO_MAX_FRAMES_FOR_MEAN)
+        fields = video_log_fields({"per_frame_results": _frames(realism)}, coverage)
+        rows.append({"id": i, "classification": classification, "score": score, **fields, "realism": realism})
+    return rows
+
+
+class _FakeLogService:
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+
+    def iter_raw_score_batches(self, batch_size):
+        for start in range(0, len(self.rows), batch_size):
+            yield self.rows[start:start + batch_size]
+
+    def update_verdicts(self, updates):
+        self.updates.extend(updates)
+
+
+def test_mean_matches_video_verdict():
+    rows = _rows()
+    max_frames = np.array([10**9 if r["coverage"] == "full" else VIDEO_MAX_FRAMES_FOR_MEAN for r in rows])
+    realism = aggregate_scores([r["raw_scores"] for r in rows], max_frames)
+    # float32 storage: equal to the endpoint's score within SCORE_TOLERANCE on the 0..100 scale.
+    np.testing.assert_allclose(realism * 100.0, [r["score"] for r in rows], rtol=0, atol=1e-3)
+
+
+@pytest.mark.parametrize("rule, reduce", [("min", min), ("max", max)])
+def test_min_max_rules(rule, reduce):
+    rows = _rows(50, seed=1)
+    out = aggregate_scores([r["raw_scores"] for r in rows], None, rule)
+    np.testing.assert_allclose(out, [reduce(r["realism"]) for r in rows], atol=1e-6)
+
+
+def test_rows_without_scores_are_nan():
+    blobs = [pack_scores([0.5, 0.7]), b"", pack_scores([0.2])]
+    out = aggregate_scores(blobs, np.array([1, 5, 5]))
+    assert out[0] == pytest.approx(0.5) and np.isnan(out[1]) and out[2] == pytest.approx(0.2)
+    assert np.isnan(aggregate_scores([b""], None)).all()
+    with pytest.raises(ValueError):
+        aggregate_scores(blobs, None, "median")
+
+
+def test_rescore_with_endpoint_settings_changes_nothing():
+    service = _FakeLogService(_rows())
+    stats = rescore(batch_size=64, log_service=service)
+    assert stats["rows_scanned"] == 200
+    assert stats["rows_changed"] == 0 and service.updates == []
+
+
+def test_rescore_new_threshold_flips_verdicts():
+    rows = _rows()
+    service = _FakeLogService(rows)
+    stats = rescore(threshold=30.0, batch_size=64, log_service=service)
+
+    expected = {r["id"] for r in rows if r["classification"] == "Bonafide" and r["score"] < 30.0}
+    assert {u["row_id"] for u in service.updates} == expected
+    assert stats["to_deepfake"] == len(expected) and stats["to_bonafide"] == 0
+    assert all(u["new_classification"] == "Deepfake" and u["new_is_deepfake"] for u in service.updates)
+
+    dry = _FakeLogService(_rows())
+    assert rescore(threshold=30.0, dry_run=True, log_service=dry)["rows_changed"] == len(expected)
+    assert dry.updates == []
+
+
+def test_rescore_audio_only_with_threshold():
+    results = [{"deepfake_score": s, "is_bonafide": s < 1.0} for s in (0.2, 0.9, 1.5)]
+    rows = []
+    for i, result in enumerate(results):
+        classification, score = audio_verdict(result)
+        rows.append({"id": i, "classification": classification, "score": score, **audio_log_fields(result)})
+
+    assert rescore(log_service=_FakeLogService(rows))["audio_skipped"] == 3
+    service = _FakeLogService(rows)
+    stats = rescore(audio_threshold=0.5, log_service=service)
+    assert [u["row_id"] for u in service.updates] == [1]
+    assert stats["to_deepfake"] == 1
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+
+USERNAME = "tim445"
+
+
+@pytest.fixture(autouse=True)
+def auth(monkeypatch):
+    monkeypatch.setattr(security, "SECRET_KEY", "test-secret")
+    for name in ("AUTH_TOKEN_CACHE_MAX_S", "AUTH_TOKEN_CACHE_SIZE", "AUTH_USER_CACHE_TTL_S", "AUTH_USER_CACHE_SIZE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setitem(security.mock_db, USERNAME, {**security.mock_db[USERNAME], "disabled": False})
+    security._token_cache.clear()
+    security._user_cache.clear()
+    yield
+    security._token_cache.clear()
+    security._user_cache.clear()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(security.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _current_user(token):
+    return asyncio.run(security.get_current_user(token))
+
+
+def test_token_claims_are_cached(monkeypatch):
+    token = security.create_access_token({"sub": USERNAME})
+    assert _current_user(token).user_nickname == USERNAME
+
+    decodes = []
+    monkeypatch.setattr(security.jwt, "decode", lambda *args, **kwargs: decodes.append(args))
+    assert _current_user(token).user_nickname == USERNAME
+    assert decodes == []
+
+
+def test_token_cache_entry_expires_with_the_token(clock):
+    token = security.create_access_token({"sub": USERNAME}, expires_delta=timedelta(seconds=30))
+    security.decode_access_token(token)
+    clock[0] += 29
+    assert security._token_cache.get(security.hashlib.sha256(token.encode()).digest()) is not None
+    clock[0] += 2
+    assert security._token_cache.get(security.hashlib.sha256(token.encode()).digest()) is None
+
+
+def test_invalid_tokens_are_rejected_and_not_cached():
+    with pytest.raises(HTTPException) as excinfo:
+        _current_user("not-a-token")
+    assert excinfo.value.status_code == 401
+
+    expired = security.create_access_token({"sub": USERNAME}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        _current_user(expired)
+    with pytest.raises(HTTPException):
+        _current_user(security.create_access_token({"sub": "nobody"}))
+    assert len(security._token_cache._data) == 1  # only the valid "nobody" token
+
+
+def test_user_cache_ttl_and_invalidation(monkeypatch, clock):
+    monkeypatch.setenv("AUTH_USER_CACHE_TTL_S", "60")
+    token = security.create_access_token({"sub": USERNAME})
+    _current_user(token)
+
+    monkeypatch.setitem(security.mock_db, USERNAME, {**security.mock_db[USERNAME], "disabled": True})
+    # Still cached: the change applies after the TTL...
+    assert _current_user(token).user_nickname == USERNAME
+    clock[0] += 61
+    with pytest.raises(HTTPException):
+        _current_user(token)
+
+    # ...or right away after invalidate_user().
+    monkeypatch.setitem(security.mock_db, USERNAME, {**security.mock_db[USERNAME], "disabled": False})
+    security.invalidate_user(USERNAME)
+    assert _current_user(token).user_nickname == USERNAME
+    monkeypatch.setitem(security.mock_db, USERNAME, {**security.mock_db[USERNAME], "disabled": True})
+    security.invalidate_user(USERNAME)
+    with pytest.raises(HTTPException):
+        _current_user(token)
+
+
+def test_user_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("AUTH_USER_CACHE_TTL_S", "0")
+    security.get_user(security.mock_db, USERNAME)
+    assert security._user_cache.get(USERNAME) is None
+
+
+def test_cache_is_bounded_lru(monkeypatch):
+    monkeypatch.setenv("AUTH_USER_CACHE_SIZE", "2")
+    for key in ("a", "b"):
+        security._user_cache.put(key, key, 60)
+    security._user_cache.get("a")
+    security._user_cache.put("c", "c", 60)
+    assert list(security._user_cache._data) == ["a", "c"]
+
+
+def test_authenticate_reads_the_stored_hash(monkeypatch):
+    monkeypatch.setattr(security, "pwd_context", security.CryptContext(schemes=["bcrypt"], bcrypt__rounds=4))
+    monkeypatch.setattr(security, "_dummy_hash", None)
+    monkeypatch.setitem(security.mock_db, USERNAME, {**security.mock_db[USERNAME], "hash_password": security.get_password_hash("old")})
+    assert security.get_user(security.mock_db, USERNAME) is not None  # now in the user cache
+
+    monkeypatch.setitem(security.mock_db, USERNAME, {**security.mock_db[USERNAME], "hash_password": security.get_password_hash("new")})
+    assert asyncio.run(security.authenticate_user_async(security.mock_db, USERNAME, "old")) is None
+    assert asyncio.run(security.authenticate_user_async(security.mock_db, USERNAME, "new")).user_nickname == USERNAME
+    assert asyncio.run(security.authenticate_user_async(security.mock_db, "nobody", "new")) is None
@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+from app.services.segment_decoder import _share_frames, plan_segments
+
+
+@pytest.fixture(autouse=True)
+def two_workers(monkeypatch):
+    monkeypatch.setenv("VIDEO_SEGMENT_WORKERS", "2")
+    monkeypatch.delenv("VIDEO_SEGMENTS", raising=False)
+
+
+def test_equal_segments_share_frames_equally():
+    assert plan_segments(8.0, 10) == [(0.0, 4.0, 5), (4.0, math.inf, 5)]
+
+
+def test_snapped_segments_get_frames_by_duration():
+    # Boundary 3.0 snaps back to the keyframe at 2.0: 0-2 s and 2-6 s.
+    plan = plan_segments(6.0, 10, keyframes_s=[0.0, 2.0, 5.0])
+    assert [(s, e) for s, e, _ in plan] == [(0.0, 2.0), (2.0, math.inf)]
+    assert [k for _, _, k in plan] == [3, 7]
+
+
+def test_collapsed_boundaries_merge(monkeypatch):
+    monkeypatch.setenv("VIDEO_SEGMENTS", "4")
+    plan = plan_segments(10.0, 8, keyframes_s=[0.0, 4.0])
+    assert [(s, e) for s, e, _ in plan] == [(0.0, 4.0), (4.0, math.inf)]
+    assert sum(k for _, _, k in plan) == 8
+    assert [k for _, _, k in plan] == [3, 5]
+
+
+def test_every_segment_keeps_at_least_one_frame(monkeypatch):
+    monkeypatch.setenv("VIDEO_SEGMENTS", "3")
+    assert _share_frames(3, [0.1, 0.1, 29.8]) == [1, 1, 1]
+    plan = plan_segments(100.0, 4, keyframes_s=[0.0, 0.5, 1.0])
+    assert sum(k for _, _, k in plan) == 4
+    assert all(k >= 1 for _, _, k in plan)
+
+
+def test_share_frames_is_largest_remainder():
+    assert _share_frames(10, [1.0, 1.0, 1.0]) == [4, 3, 3]
+    assert _share_frames(7, [0.0, 0.0]) == [4, 3]
+    assert _share_frames(5, [0.1, 0.1, 9.8]) == [1, 1, 3]
+
+
+def _write_video(path, frames=30, fps=10):
+    cv2 = pytest.importorskip("cv2")
+    import numpy as np
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (32, 32))
+    for i in range(frames):
+        writer.write(np.full((32, 32, 3), (i * 8) % 256, dtype=np.uint8))
+    writer.release()
+    return frames / fps
+
+
+def test_dead_worker_recreates_pool(tmp_path, monkeypatch):
+    import multiprocessing
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+
+    from app.services import segment_decoder
+
+    path = tmp_path / "clip.avi"
+    duration_s = _write_video(path)
+    container = {"duration_s": duration_s, "fps": 10.0}
+
+    broken = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+    with pytest.raises(Exception):
+        broken.submit(os._exit, 1).result(timeout=30)
+    monkeypatch.setattr(segment_decoder, "_pool", broken)
+    try:
+        result = segment_decoder.decode_full_video(str(path), 4, container=container)
+        assert "error" in result
+        assert segment_decoder._pool is None
+
+        result = segment_decoder.decode_full_video(str(path), 4, container=container)
+        assert "error" not in result
+        assert len(result["segments"]) == 2
+        assert result["sampled"]
+    finally:
+        segment_decoder.shutdown_pool()
@@ -0,0 +1,140 @@
+import pytest
+import requests
+
+from app.services import upstream_pool
+from app.services.upstream_pool import ReplicaPool, parse_urls
+
+A, B = "http://a.test/infer", "http://b.test/infer"
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}", response=self)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(upstream_pool.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def pool(monkeypatch, clock):
+    monkeypatch.setenv("UPSTREAM_EJECT_FAILURES", "2")
+    monkeypatch.setenv("UPSTREAM_EJECT_S", "10")
+    monkeypatch.setenv("UPSTREAM_EJECT_MAX_S", "25")
+    return ReplicaPool("image", [A, B])
+
+
+def _replica(pool, url):
+    return next(r for r in pool.replicas if r.url == url)
+
+
+def _route(monkeypatch, outcomes):
+    """requests.post stub: `outcomes[url]` is a status code or an exception instance."""
+    calls = []
+
+    def post(url, **kwargs):
+        calls.append(url)
+        outcome = outcomes[url]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Response(outcome)
+
+    monkeypatch.setattr(requests, "post", post)
+    return calls
+
+
+def _ordered_acquire(pool, order):
+    real = pool.acquire
+    urls = iter(order)
+
+    def acquire(exclude=None):
+        want = next(urls)
+        return real(exclude={u for u in (A, B) if u != want})
+
+    return acquire
+
+
+def test_parse_urls():
+    assert parse_urls(f" {A}, ,{B} ") == [A, B]
+    assert parse_urls(None) == []
+    with pytest.raises(ValueError):
+        ReplicaPool("image", [])
+
+
+def test_consecutive_failures_eject_with_backoff(pool, clock):
+    a = _replica(pool, A)
+    pool.release(pool.acquire(exclude={B}), 0.01, ok=False)
+    assert a.ejected_until == 0.0
+    pool.release(pool.acquire(exclude={B}), 0.01, ok=False)
+    assert a.ejected_until == clock[0] + 10
+    # Ejected replicas get no traffic while another one is eligible.
+    assert {pool.acquire().url for _ in range(5)} == {B}
+
+
+def test_probation_single_probe_then_readmit(pool, clock):
+    a = _replica(pool, A)
+    for _ in range(2):
+        pool.release(pool.acquire(exclude={B}), 0.01, ok=False)
+    clock[0] += 11
+
+    probe = pool.acquire(exclude={B})
+    assert probe is a and a.probation
+    # Only one probe call at a time.
+    assert pool.acquire(exclude={B}).url == B
+    pool.release(probe, 0.01, ok=True)
+    assert not a.probation and a.ejected_until == 0.0 and a.ejections == 0
+
+
+def test_failed_probe_ejects_again_for_longer(pool, clock):
+    a = _replica(pool, A)
+    for _ in range(2):
+        pool.release(pool.acquire(exclude={B}), 0.01, ok=False)
+    clock[0] += 11
+    pool.release(pool.acquire(exclude={B}), 0.01, ok=False)
+    assert a.ejected_until == clock[0] + 20
+    clock[0] += 21
+    pool.release(pool.acquire(exclude={B}), 0.01, ok=False)
+    # Capped by UPSTREAM_EJECT_MAX_S.
+    assert a.ejected_until == clock[0] + 25
+
+
+def test_all_ejected_tries_the_first_to_return(pool, clock):
+    for url, other in ((A, B), (B, A)):
+        for _ in range(2):
+            pool.release(pool.acquire(exclude={other}), 0.01, ok=False)
+        clock[0] += 1
+    assert pool.acquire().url == A
+
+
+def test_post_retries_replica_failure_on_other_replica(pool, monkeypatch):
+    monkeypatch.setattr(pool, "acquire", _ordered_acquire(pool, [A, B]))
+    calls = _route(monkeypatch, {A: 503, B: 200})
+    assert pool.post(b"x", {}, 5).status_code == 200
+    assert calls == [A, B]
+    assert _replica(pool, A).consecutive_failures == 1
+    assert [r.in_flight for r in pool.replicas] == [0, 0]
+
+
+def test_post_client_error_is_not_retried_or_blamed(pool, monkeypatch):
+    monkeypatch.setattr(pool, "acquire", _ordered_acquire(pool, [A, B]))
+    calls = _route(monkeypatch, {A: 400, B: 200})
+    with pytest.raises(requests.exceptions.HTTPError):
+        pool.post(b"x", {}, 5)
+    assert calls == [A]
+    assert _replica(pool, A).consecutive_failures == 0
+
+
+def test_post_releases_on_non_request_exception(pool, monkeypatch):
+    _route(monkeypatch, {A: RuntimeError("boom"), B: RuntimeError("boom")})
+    with pytest.raises(RuntimeError):
+        pool.post(b"x", {}, 5)
+    assert [r.in_flight for r in pool.replicas] == [0, 0]
+    assert all(r.consecutive_failures == 0 for r in pool.replicas)
+
@@ -0,0 +1,95 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from app.services.vad import apply_vad, speech_mask, vad_mode
+from tests.conftest import wav_bytes
+
+RATE = 16000
+
+
+@pytest.fixture(autouse=True)
+def vad_env(monkeypatch):
+    for name in ("AUDIO_VAD_FRAME_MS", "AUDIO_VAD_MARGIN_DB", "AUDIO_VAD_MIN_ENERGY_DBFS", "AUDIO_VAD_ZCR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AUDIO_VAD_PAD_MS", "0")
+    monkeypatch.setenv("AUDIO_VAD_MIN_SPEECH_S", "0.5")
+
+
+def _tone(seconds, amplitude=8000, hz=220):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * hz * t)).astype(np.int16)
+
+
+def _noise(seconds, amplitude=30, seed=0):
+    return np.random.default_rng(seed).integers(-amplitude, amplitude, int(seconds * RATE)).astype(np.int16)
+
+
+def _seconds(wav):
+    with wave.open(io.BytesIO(wav)) as w:
+        return w.getnframes() / w.getframerate()
+
+
+def test_vad_mode_defaults_to_off(monkeypatch):
+    monkeypatch.delenv("AUDIO_VAD", raising=False)
+    assert vad_mode() == "off"
+    monkeypatch.setenv("AUDIO_VAD", " Trim ")
+    assert vad_mode() == "trim"
+    monkeypatch.setenv("AUDIO_VAD", "bogus")
+    assert vad_mode() == "off"
+
+
+def test_speech_mask_thresholds():
+    samples = np.concatenate([_noise(0.3), _tone(0.3), _noise(0.3)]).astype(np.float32) / 32768.0
+    mask = speech_mask(samples, 480)
+    assert mask[10:20].all()
+    assert not mask[:10].any() and not mask[20:].any()
+
+
+def test_min_energy_floor(monkeypatch):
+    # -60 dBFS tone: above the noise floor, but below AUDIO_VAD_MIN_ENERGY_DBFS.
+    quiet = np.concatenate([_noise(0.3, amplitude=2), _tone(0.6, amplitude=33)]).astype(np.float32) / 32768.0
+    assert not speech_mask(quiet, 480).any()
+    monkeypatch.setenv("AUDIO_VAD_MIN_ENERGY_DBFS", "-80")
+    assert speech_mask(quiet, 480).any()
+
+
+def test_trim_keeps_inner_pause_and_drop_removes_it():
+    clip = wav_bytes(np.concatenate([_noise(0.5), _tone(0.6), _noise(0.5, seed=1), _tone(0.6), _noise(0.5, seed=2)]))
+    trimmed = apply_vad(clip, "trim")
+    assert trimmed["stats"]["applied"]
+    assert _seconds(trimmed["wav"]) == pytest.approx(1.7, abs=0.07)
+    dropped = apply_vad(clip, "drop")
+    assert _seconds(dropped["wav"]) == pytest.approx(1.2, abs=0.07)
+    assert dropped["stats"]["removed_s"] == pytest.approx(1.5, abs=0.07)
+
+
+def test_pad_widens_kept_region(monkeypatch):
+    monkeypatch.setenv("AUDIO_VAD_PAD_MS", "90")
+    clip = wav_bytes(np.concatenate([_noise(0.5), _tone(0.6), _noise(0.5, seed=1)]))
+    assert _seconds(apply_vad(clip, "trim")["wav"]) == pytest.approx(0.78, abs=0.07)
+
+
+def test_too_little_speech_is_rejected():
+    result = apply_vad(wav_bytes(np.concatenate([_noise(1.0), _tone(0.2), _noise(1.0, seed=1)])), "trim")
+    assert result["rejected"] == "no_speech"
+    assert result["stats"]["kept_s"] == 0.0
+
+
+@pytest.mark.parametrize("mode", ["trim", "drop"])
+def test_silence_is_rejected_without_min_speech(monkeypatch, mode):
+    monkeypatch.setenv("AUDIO_VAD_MIN_SPEECH_S", "0")
+    result = apply_vad(wav_bytes(np.zeros(RATE, dtype=np.int16)), mode)
+    assert result["rejected"] == "no_speech"
+
+
+def test_unsupported_or_short_input_passes_through():
+    assert apply_vad(b"not a wav", "trim") == {
+        "wav": b"not a wav",
+        "stats": {"mode": "trim", "applied": False, "reason": "not 16-bit PCM WAV"},
+    }
+    short = wav_bytes([100] * 10)
+    assert apply_vad(short, "trim")["wav"] == short
+    assert apply_vad(short, "trim")["stats"]["reason"] == "clip too short"